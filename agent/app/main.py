@@ -1,4 +1,8 @@
-from fastapi import FastAPI
+import json
+from time import perf_counter
+from typing import Optional
+
+from fastapi import FastAPI, Header, Response
 from .schemas import AgentRequest, AgentResponse
 from .providers import generate_report
 from .settings import settings
@@ -10,6 +14,21 @@ def health():
     return {"status": "ok", "provider": settings.agent_provider}
 
 @app.post("/report", response_model=AgentResponse)
-async def report(payload: AgentRequest):
+async def report(payload: AgentRequest, response: Response, traceparent: Optional[str] = Header(None)):
+    t0 = perf_counter()
     text = await generate_report(payload.model_dump())
+    duration_ms = (perf_counter() - t0) * 1000
+
+    response.headers["Server-Timing"] = f"report;dur={duration_ms:.2f}"
+    # Trace propagée par l'API (W3C traceparent) : span "agent.report" rattaché à la décision
+    if traceparent:
+        response.headers["traceparent"] = traceparent
+        parts = traceparent.split("-")
+        print(json.dumps({
+            "trace_id": parts[1] if len(parts) == 4 else None,
+            "parent_id": parts[2] if len(parts) == 4 else None,
+            "span": "agent.report",
+            "provider": settings.agent_provider,
+            "duration_ms": round(duration_ms, 3),
+        }))
     return AgentResponse(report_summary=text)
@@ -1,9 +1,16 @@
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import create_engine, inspect, literal_column, text, Column, Integer, SmallInteger, String, Float, DateTime, Text, JSON, ForeignKey, Index, LargeBinary
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from .settings import settings
-
-engine = create_engine(settings.database_url, connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {})
+from .services.serialization import dumps, loads
+
+# Colonnes JSON encodées / décodées avec l'encodeur rapide partagé avec les réponses HTTP
+engine = create_engine(
+    settings.database_url,
+    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {},
+    json_serializer=dumps,
+    json_deserializer=loads,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -25,15 +32,33 @@ class Decision(Base):
 
     request_payload = Column(JSON, nullable=False)
 
+    # Mode de service (services/admission.py) : full, no_report, no_explain, rules_only ; NULL = historique (full)
+    service_tier = Column(String(16))
+
+    # File de revue (services/review_queue.py) : montant dénormalisé pour le tri, réservation d'un analyste
+    amount = Column(Float)
+    claimed_by = Column(String(64))
+    claim_expires_at = Column(DateTime)
+
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     reviews = relationship("Review", back_populates="decision", cascade="all, delete-orphan")
 
+# Une revue fait toujours passer REVIEW à ACCEPT / REJECT : decision = 'REVIEW' <=> en attente de revue.
+# Littéral (pas de paramètre lié) : SQLite n'utilise un index partiel que si la requête reprend le même terme.
+PENDING_REVIEW = Decision.decision == literal_column("'REVIEW'")
+
+# Index partiels de la file de revue, un par ordre de tri : taille = décisions en attente, pas l'historique
+_PARTIAL = {"sqlite_where": PENDING_REVIEW, "postgresql_where": PENDING_REVIEW}
+Index("ix_decisions_pending_risk", Decision.risk_score.desc(), Decision.id.desc(), **_PARTIAL)
+Index("ix_decisions_pending_amount", Decision.amount.desc(), Decision.id.desc(), **_PARTIAL)
+Index("ix_decisions_pending_age", Decision.created_at, Decision.id, **_PARTIAL)
+
 class Review(Base):
     __tablename__ = "reviews"
 
     id = Column(Integer, primary_key=True, index=True)
-    decision_id_fk = Column(Integer, ForeignKey("decisions.id"), nullable=False)
+    decision_id_fk = Column(Integer, ForeignKey("decisions.id"), index=True, nullable=False)
 
     reviewer_id = Column(String(64), nullable=False)
     human_decision = Column(String(16), nullable=False)  # APPROVE/REJECT
@@ -46,5 +71,72 @@ class Review(Base):
 
     decision = relationship("Decision", back_populates="reviews")
 
+class Explanation(Base):
+    """Vecteurs d'explication complets d'une décision, calculés au premier GET /explain puis immuables."""
+    __tablename__ = "explanations"
+
+    decision_id = Column(String(64), ForeignKey("decisions.decision_id"), primary_key=True)
+
+    # Listes {feature, impact, value} triées par |value|, toutes les features d'origine
+    credit = Column(JSON, nullable=False)
+    fraud = Column(JSON, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class IdempotencyKey(Base):
+    """Réponse rejouable d'une requête de décision portant un en-tête Idempotency-Key."""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)  # "<route>:<Idempotency-Key>"
+    request_hash = Column(String(64), nullable=False)  # SHA-256 du corps brut
+
+    # NULL tant que le calcul est en cours (expires_at = fin du bail), puis réponse encodée (expires_at = TTL)
+    response = Column(LargeBinary)
+    decision_id = Column(String(64))
+
+    expires_at = Column(DateTime, index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class ShadowScore(Base):
+    """Scores d'un challenger calculés en shadow (services/shadow.py) : une ligne compacte par décision."""
+    __tablename__ = "shadow_scores"
+
+    id = Column(Integer, primary_key=True)
+    decision_id = Column(String(64), ForeignKey("decisions.decision_id"), index=True, nullable=False)
+    challenger = Column(String(64), index=True, nullable=False)  # clés du registre, ex. "credit_xgb+fraud_v2"
+
+    # Scores du challenger (NULL si seul l'autre modèle est challengé) et écart au champion
+    risk_score = Column(Float)
+    fraud_score = Column(Float)
+    risk_delta = Column(Float)
+    fraud_delta = Column(Float)
+
+    # Indices dans policy.DECISIONS
+    champion_code = Column(SmallInteger, nullable=False)
+    challenger_code = Column(SmallInteger, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, index=True, nullable=False)
+
+def _add_missing_columns() -> None:
+    # create_all ne modifie pas une table existante : colonnes ajoutées depuis (toutes nullables) créées ici
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"))
+
+def _create_missing_indexes() -> None:
+    # Idem pour les index déclarés après la création de la table
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
 def init_db() -> None:
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _create_missing_indexes()
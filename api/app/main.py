@@ -1,12 +1,25 @@
+import asyncio
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from .settings import settings
 from .db import init_db
+from .services.drift import get_drift_monitor, run_drift_monitor
+from .services.idempotency import get_idempotency_store, run_idempotency_purge
+from .services.capture import start_recorder, stop_recorder
+from .services.ml_client import reload_models, run_model_watcher
+from .services.model_registry import get_registry
+from .services.review_queue import backfill_pending_amounts
+from .services.shadow import start_shadow, stop_shadow
+from .services.velocity import start_velocity
+from .services.tracing import StageTimingMiddleware
+from .services.monitoring import MULTIPROC_DIR, cleanup_dead_workers
 from .routes.decision import router as decision_router
 from .routes.explain import router as explain_router
 from .routes.review import router as review_router
+from .routes.policy import router as policy_router
+from .routes.debug import router as debug_router
 from .routes.ui import router as ui_router
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -17,17 +30,56 @@ def create_app() -> FastAPI:
     # Fichiers statiques (CSS, JS, images)
     app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 
+    # Server-Timing / traceparent sur les routes de décision
+    app.add_middleware(StageTimingMiddleware)
+
     from prometheus_fastapi_instrumentator import Instrumentator
     Instrumentator().instrument(app).expose(app)
 
+    background_tasks = []
+
     @app.on_event("startup")
-    def _startup():
+    async def _startup():
         init_db()
+        if MULTIPROC_DIR:
+            # Multi-workers : fichiers de métriques laissés par des workers morts/redémarrés
+            cleanup_dead_workers()
+        if settings.drift_enabled:
+            get_drift_monitor()  # charge reference.json hors du chemin de requête
+            background_tasks.append(asyncio.create_task(run_drift_monitor(settings.drift_interval_seconds)))
+        try:
+            # Chargement + warm-up des modèles avant la première requête (pas de pic de cold start)
+            await asyncio.to_thread(reload_models)
+        except FileNotFoundError as e:
+            print(f"WARNING: models not loaded at startup: {e}")
+        # Anneaux de vélocité reconstruits depuis `decisions` (dernières 24 h) avant la première requête
+        await asyncio.to_thread(start_velocity)
+        # Montant des décisions REVIEW antérieures à la colonne `amount` (tri de la file de revue)
+        n = await asyncio.to_thread(backfill_pending_amounts)
+        if n:
+            print(f"INFO: review queue: backfilled amount for {n} pending decisions")
+        get_registry()  # configuration du registre validée au démarrage (modèles chargés à la demande)
+        if settings.model_watch_interval_seconds > 0:
+            background_tasks.append(asyncio.create_task(run_model_watcher(settings.model_watch_interval_seconds)))
+        idempotency = get_idempotency_store()
+        if idempotency is not None:
+            background_tasks.append(asyncio.create_task(run_idempotency_purge(idempotency, settings.idempotency_purge_interval_seconds)))
+        start_recorder()
+        start_shadow()
+
+    @app.on_event("shutdown")
+    async def _shutdown():
+        for task in background_tasks:
+            task.cancel()
+        stop_recorder()
+        stop_shadow()
 
     # API routes
     app.include_router(decision_router)
     app.include_router(explain_router)
     app.include_router(review_router)
+    app.include_router(policy_router)
+    app.include_router(debug_router)
 
     # Routes UI (doit être en dernier pour ne pas masquer les routes API)
     app.include_router(ui_router)
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from ..db import SessionLocal
+from ..services.auth import require_admin
+from ..services import ml_client, model_store, profiler
+from ..services.model_registry import get_registry
+from ..services.profile_store import get_profile_store
+from ..services.shadow import shadow_report
+
+router = APIRouter(tags=["debug"], dependencies=[Depends(require_admin)])
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@router.get("/debug/profile")
+async def profile(
+    seconds: float = Query(5.0, gt=0, le=60),
+    mode: Literal["all", "decision"] = "all",
+    interval_ms: float = Query(5.0, ge=1, le=100),
+    top: int = Query(25, ge=1, le=200),
+    format: Literal["json", "collapsed"] = "json",
+    include_idle: bool = False,
+):
+    if not profiler.try_acquire():
+        raise HTTPException(status_code=409, detail="a profiling session is already running")
+    try:
+        prof = profiler.SamplingProfiler(
+            interval=interval_ms / 1000,
+            scope=profiler.DECISION_SCOPE if mode == "decision" else None,
+            include_idle=include_idle,
+        ).start()
+        # Attente non bloquante : la boucle d'événements continue de servir le trafic échantillonné
+        await asyncio.sleep(seconds)
+        prof.stop()
+    finally:
+        profiler.release()
+
+    if format == "collapsed":
+        return PlainTextResponse(prof.collapsed())
+    return prof.report(top_n=top)
+
+
+@router.get("/debug/models")
+def models_status():
+    bundle = ml_client.get_bundle()
+    out = {"versions": bundle.versions, "loaded_at": bundle.loaded_at, "pointers": {}}
+    for name in ("credit_risk", "fraud"):
+        root = model_store.find_artifact_root(name)
+        if root is not None:
+            out["pointers"][name] = {
+                "current": model_store.current_version(root),
+                "versions": model_store.list_versions(root),
+                "rollback_target": model_store.rollback_target(root),
+            }
+    registry = get_registry()
+    # Par modèle du registre : résident ou non, taille, hit rate, temps de chargement
+    out["registry"] = registry.stats() if registry is not None else None
+    return out
+
+
+@router.get("/debug/profiles")
+def profiles_status():
+    # Cache de profils clients : hit rate, profils périmés, temps d'inférence économisé
+    store = get_profile_store()
+    return store.stats() if store is not None else {"enabled": False}
+
+
+@router.post("/debug/models/reload")
+async def models_reload(force: bool = False):
+    # Chargement + warm-up dans un thread : la boucle continue de servir sur l'ancien bundle
+    try:
+        return await asyncio.to_thread(ml_client.reload_models, force=force)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"reload failed, previous models kept: {e}")
+
+
+@router.post("/debug/models/rollback")
+async def models_rollback(model: Literal["credit_risk", "fraud"], to: Optional[str] = None):
+    root = model_store.find_artifact_root(model)
+    if root is None:
+        raise HTTPException(status_code=404, detail=f"no artifacts for {model}")
+    try:
+        entry = model_store.rollback(root, to)
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"pointer": entry, "reload": await models_reload()}
+
+
+@router.get("/debug/shadow")
+def shadow_status(
+    challenger: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    # Accord champion / challenger sur les décisions scorées en shadow + état de la file
+    return shadow_report(db, challenger=challenger, since=since, until=until)
@@ -1,20 +1,23 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from ..schemas import DecisionRequest, DecisionResponse, ExplanationsPreview, FeatureImpact
-from ..db import SessionLocal, Decision as DecisionRow
-from ..services.ml_client import predict_risk_and_fraud
-from ..services.policy import apply_policy
-from ..services.logging import hash_client_id, build_decision_id, store_decision
-from ..services.agent_client import generate_report
-from ..services.monitoring import (
-    DECISION_COUNTER,
-    RISK_SCORE_DIST,
-    FRAUD_SCORE_DIST,
-    INPUT_INCOME_DIST,
-    INPUT_DEBT_RATIO_DIST,
-    MODEL_LATENCY,
-    DRIFT_WARNING
+from ..schemas import (
+    ClientPayload,
+    DecisionRequest,
+    DecisionResponse,
+    TransactionDecisionRequest,
 )
+from ..db import SessionLocal
+from ..services.admission import AdmissionRejected, get_admission_controller, run_admitted
+from ..services.decision_pipeline import DecisionMode, run_decision
+from ..services.decision_stream import DecisionStream, DuplexStreamingResponse
+from ..services.idempotency import IdempotencyError, get_idempotency_store, request_fingerprint
+from ..services.logging import hash_client_id
+from ..services.profile_store import get_profile_store
+from ..services.serialization import FastJSONResponse, dumps_bytes
+from ..services.tracing import mark_since_start
+from ..settings import settings
 
 router = APIRouter(tags=["decision"])
 
@@ -25,77 +28,108 @@ def get_db():
     finally:
         db.close()
 
+IdempotencyKeyHeader = Header(None, alias="Idempotency-Key", min_length=1, max_length=200)
+# Budget du client : attente maximale d'une place avant 503 (plafonnée par ADMISSION_QUEUE_TIMEOUT_SECONDS)
+DeadlineHeader = Header(None, alias="X-Request-Deadline-Ms", gt=0)
+# Modes demandés par le client ; la charge peut dégrader davantage (voir services/admission.py)
+ExplainQuery = Query(True, description="false : ni SHAP ni contributions fraude (GET /explain plus tard)")
+ReportQuery = Query(True, description="false : pas de rapport agent")
+
 @router.post("/decision", response_model=DecisionResponse)
-async def make_decision(payload: DecisionRequest, db: Session = Depends(get_db)):
-    with MODEL_LATENCY.time():
-        risk_score, fraud_score, model_versions, shap_impacts = predict_risk_and_fraud(payload)
-    pr = apply_policy(risk_score, fraud_score)
+async def make_decision(
+    payload: DecisionRequest,
+    request: Request,
+    explain: bool = ExplainQuery,
+    report: bool = ReportQuery,
+    idempotency_key: Optional[str] = IdempotencyKeyHeader,
+    deadline_ms: Optional[float] = DeadlineHeader,
+    db: Session = Depends(get_db),
+):
+    # Lecture du corps + validation Pydantic + dépendances (depuis l'arrivée de la requête)
+    mark_since_start("validation")
+    return await _idempotent(
+        request, idempotency_key, lambda: _admitted(lambda mode: _decide(payload, db, mode), deadline_ms, explain, report)
+    )
 
-    # Monitoring (Prometheus)
-    RISK_SCORE_DIST.observe(risk_score)
-    FRAUD_SCORE_DIST.observe(fraud_score)
-    DECISION_COUNTER.labels(decision=pr.decision, policy_rule=pr.rule).inc()
-    
-    # Monitoring de Dérive
-    INPUT_INCOME_DIST.observe(payload.client.income_annual)
-    INPUT_DEBT_RATIO_DIST.observe(payload.client.debt_to_income)
+@router.post("/decision/transaction", response_model=DecisionResponse)
+async def make_transaction_decision(
+    payload: TransactionDecisionRequest,
+    request: Request,
+    explain: bool = ExplainQuery,
+    report: bool = ReportQuery,
+    idempotency_key: Optional[str] = IdempotencyKeyHeader,
+    deadline_ms: Optional[float] = DeadlineHeader,
+    db: Session = Depends(get_db),
+):
+    """
+    Transaction seule : les features crédit viennent du profil client en cache (dernière requête
+    /decision complète pour ce client). Sans profil (jamais vu, expiré, évincé) : 404.
+    """
+    mark_since_start("validation")
+    return await _idempotent(
+        request,
+        idempotency_key,
+        lambda: _admitted(lambda mode: _decide_transaction(payload, db, mode), deadline_ms, explain, report),
+    )
 
-    # Simulation alerte drift (règle experte simple pour la démo)
-    # Si revenu > 150k ou debt_ratio > 0.6 => Drift potentiel (population inattendue)
-    is_drift_income = 1 if payload.client.income_annual > 150000 else 0
-    is_drift_dti = 1 if payload.client.debt_to_income > 0.6 else 0
-    
-    DRIFT_WARNING.labels(feature="income_annual").set(is_drift_income)
-    DRIFT_WARNING.labels(feature="debt_to_income").set(is_drift_dti)
+async def _admitted(decide, deadline_ms: Optional[float], explain: bool, report: bool) -> dict:
+    try:
+        return await run_admitted(decide, deadline_ms=deadline_ms, explain=explain, report=report)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
-    # Aperçu minimal et cohérent des explications
-    # Risque Crédit : Valeurs SHAP (Réelles)
-    # Fraude : Placeholder pour l'instant (jusqu'à la Phase 4b)
-    fraud_preview = [
-        FeatureImpact(feature="is_new_device", impact="+"),
-        FeatureImpact(feature="hour", impact="+"),
-        FeatureImpact(feature="distance_from_home_km", impact="+"),
-    ]
+async def _decide_transaction(payload: TransactionDecisionRequest, db: Session, mode: DecisionMode) -> dict:
+    store = get_profile_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Client profile cache disabled (PROFILE_STORE_ENABLED=false): send the full /decision request")
+    profile = store.get(hash_client_id(payload.client_id))
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No cached client profile: send the full /decision request")
+    full = DecisionRequest(
+        client=ClientPayload(client_id=payload.client_id, **profile.features),
+        transaction=payload.transaction,
+    )
+    return await _decide(full, db, mode)
 
-    explanations_preview = ExplanationsPreview(
-        credit_top_features=shap_impacts,
-        fraud_top_features=fraud_preview,
+@router.post("/decision/stream")
+async def stream_decisions(request: Request):
+    """
+    Corps NDJSON chunked de `DecisionRequest`, lu au fil de l'eau ; réponse NDJSON (une décision ou
+    une erreur `{"line", "error"}` par ligne, dans l'ordre), scorée par micro-lots.
+    """
+    stream = DecisionStream(
+        SessionLocal,
+        batch_size=settings.stream_batch_size,
+        batch_wait_seconds=settings.stream_batch_wait_seconds,
+        max_in_flight=settings.stream_max_in_flight,
+        max_line_bytes=settings.stream_max_line_bytes,
+        report_concurrency=settings.stream_report_concurrency,
+        admission=get_admission_controller(),
     )
+    return DuplexStreamingResponse(stream.run(request.stream(), request.receive), media_type="application/x-ndjson")
 
-    decision_id = build_decision_id()
-    client_hash = hash_client_id(payload.client.client_id)
+async def _decide(payload: DecisionRequest, db: Session, mode: DecisionMode) -> dict:
+    # Pipeline partagé avec /ui/decide ; corps déjà au format DecisionResponse
+    return await run_decision(payload, db, mode)
 
-    stored = store_decision(
-        db,
-        decision_id=decision_id,
-        client_id_hash=client_hash,
-        risk_score=risk_score,
-        fraud_score=fraud_score,
-        decision=pr.decision,
-        policy_rule=pr.rule,
-        model_versions=model_versions,
-        explanations_preview=explanations_preview.model_dump(),
-        request_payload=payload.model_dump(),
-    )
+async def _idempotent(request: Request, idempotency_key: Optional[str], decide) -> Response:
+    """Corps encodé sans revalidation ; avec Idempotency-Key, calculé une fois puis rejoué."""
+    store = get_idempotency_store()
+    if idempotency_key is None or store is None:
+        return FastJSONResponse(await decide())
 
-    # Payload Agent (n'utilise que les sorties système : pas d'hallucination)
-    agent_payload = {
-        "decision": pr.decision,
-        "risk_score": risk_score,
-        "fraud_score": fraud_score,
-        "policy_rule": pr.rule,
-        "model_versions": model_versions,
-        "explanations_preview": explanations_preview.model_dump(),
-    }
-    report_summary = await generate_report(agent_payload)
+    async def compute():
+        body = await decide()
+        return dumps_bytes(body), body["decision_id"]
 
-    return DecisionResponse(
-        decision_id=stored.decision_id,
-        decision=pr.decision,
-        risk_score=risk_score,
-        fraud_score=fraud_score,
-        policy_rule=pr.rule,
-        model_versions=model_versions,
-        explanations_preview=explanations_preview,
-        report_summary=report_summary,
+    # Corps brut déjà lu (et mis en cache) par FastAPI pour la validation ; options (?explain, ?report) incluses
+    fingerprint = request_fingerprint(await request.body(), request.url.query)
+    try:
+        content, replayed = await store.run(f"{request.url.path}:{idempotency_key}", fingerprint, compute)
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return Response(
+        content=content,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true" if replayed else "false"},
     )
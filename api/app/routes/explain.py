@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from ..db import SessionLocal, Decision
-from ..schemas import ExplainResponse, FeatureImpact
+from ..schemas import ExplainBatchResponse, ExplainResponse, FeatureImpact
+from ..services.explanations import cache_control_for, etag_for, get_explanations
+from ..services.fraud_rules import RULES_VERSION
+from ..settings import settings
 
 router = APIRouter(tags=["explain"])
 
@@ -12,16 +15,8 @@ def get_db():
     finally:
         db.close()
 
-@router.get("/explain/{decision_id}", response_model=ExplainResponse)
-def explain(decision_id: str, db: Session = Depends(get_db)):
-    row = db.query(Decision).filter(Decision.decision_id == decision_id).first()
-    if not row:
-        raise HTTPException(status_code=404, detail="decision_id not found")
-
-    # MVP : retourner l'aperçu comme "shap top" jusqu'à ce que le vrai SHAP soit implémenté
-    credit = [FeatureImpact(**x) for x in row.explanations_preview.get("credit_top_features", [])]
-    fraud = [FeatureImpact(**x) for x in row.explanations_preview.get("fraud_top_features", [])]
-
+def _response(row: Decision, explanation) -> ExplainResponse:
+    preview = row.explanations_preview or {}
     return ExplainResponse(
         decision_id=row.decision_id,
         decision=row.decision,
@@ -29,6 +24,54 @@ def explain(decision_id: str, db: Session = Depends(get_db)):
         model_versions=row.model_versions,
         risk_score=row.risk_score,
         fraud_score=row.fraud_score,
-        credit_shap_top=credit,
-        fraud_shap_top=fraud,
+        credit_shap_top=[FeatureImpact(**x) for x in preview.get("credit_top_features", [])],
+        fraud_shap_top=[FeatureImpact(**x) for x in preview.get("fraud_top_features", [])],
+        fraud_velocity=preview.get("fraud_velocity"),
+        credit_shap=explanation.credit,
+        fraud_contributions=explanation.fraud,
+        fraud_explanation="rules" if (row.model_versions or {}).get("fraud") == RULES_VERSION else "isolation_paths",
+    )
+
+def _not_modified(request: Request, response: Response, rows: list) -> bool:
+    # Explications immuables pour une décision et des versions données : validation par ETag
+    etag = etag_for(rows)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control_for(rows)
+    return etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
+
+@router.get("/explain", response_model=ExplainBatchResponse)
+def explain_bulk(
+    request: Request,
+    response: Response,
+    ids: str = Query(..., description="decision_id séparés par des virgules"),
+    db: Session = Depends(get_db),
+):
+    wanted = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not wanted or len(wanted) > settings.explain_bulk_max_ids:
+        raise HTTPException(status_code=422, detail=f"ids: between 1 and {settings.explain_bulk_max_ids} decision_id expected")
+    by_id = {r.decision_id: r for r in db.query(Decision).filter(Decision.decision_id.in_(wanted))}
+    rows = [by_id[i] for i in wanted if i in by_id]
+    if _not_modified(request, response, rows):
+        return Response(status_code=304, headers=dict(response.headers))
+
+    # Absents calculés en une passe vectorisée par couple de versions, puis persistés
+    explanations, unavailable = get_explanations(db, rows)
+    return ExplainBatchResponse(
+        explanations=[_response(r, explanations[r.decision_id]) for r in rows if r.decision_id in explanations],
+        not_found=[i for i in wanted if i not in by_id],
+        unavailable=unavailable,
     )
+
+@router.get("/explain/{decision_id}", response_model=ExplainResponse)
+def explain(decision_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    row = db.query(Decision).filter(Decision.decision_id == decision_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="decision_id not found")
+    if _not_modified(request, response, [row]):
+        return Response(status_code=304, headers=dict(response.headers))
+
+    # Vecteurs complets calculés au premier appel avec les versions exactes des modèles, puis lus en base
+    explanations, unavailable = get_explanations(db, [row])
+    if unavailable:
+        raise HTTPException(status_code=409, detail="model version used for this decision is no longer available")
+    return _response(row, explanations[row.decision_id])
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from ..db import SessionLocal
+from ..schemas import PolicyReplayRequest, PolicyReplayResponse
+from ..services.auth import require_admin
+from ..services.policy import PolicyConfig
+from ..services.policy_replay import ReplayCandidate, replay_policies
+
+router = APIRouter(tags=["policy"])
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@router.post("/policy/replay", response_model=PolicyReplayResponse, dependencies=[Depends(require_admin)])
+def policy_replay(payload: PolicyReplayRequest, db: Session = Depends(get_db)):
+    # Route synchrone : exécutée dans le threadpool, ne bloque pas la boucle des décisions
+    candidates = [
+        ReplayCandidate(
+            name=c.name,
+            policy=PolicyConfig.from_settings(**c.policy.model_dump()),
+            credit_model_path=c.credit_model_path,
+            fraud_model_path=c.fraud_model_path,
+        )
+        for c in payload.candidates
+    ]
+    baseline = PolicyConfig.from_settings(**payload.baseline.model_dump()) if payload.baseline else None
+
+    try:
+        return replay_policies(
+            db,
+            candidates,
+            baseline=baseline,
+            since=payload.since,
+            until=payload.until,
+            chunk_size=payload.chunk_size,
+            restrict_models_to_artifacts=True,
+        )
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
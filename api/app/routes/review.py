@@ -1,7 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+from dataclasses import asdict
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from ..db import SessionLocal, Decision, Review
-from ..schemas import ReviewRequest, ReviewResponse
+from ..db import SessionLocal, Decision
+from ..schemas import (
+    BulkReviewRequest,
+    BulkReviewResponse,
+    ReviewClaimRequest,
+    ReviewClaimResponse,
+    ReviewOrder,
+    ReviewQueueItem,
+    ReviewQueueResponse,
+    ReviewReleaseRequest,
+    ReviewRequest,
+    ReviewResponse,
+)
+from ..services.monitoring import REVIEWS_STORED
+from ..services.review_queue import (
+    InvalidCursor,
+    apply_review,
+    bulk_review,
+    claim,
+    claimed_by_other,
+    list_pending,
+    release,
+)
+from ..settings import settings
 
 router = APIRouter(tags=["review"])
 
@@ -12,41 +37,83 @@ def get_db():
     finally:
         db.close()
 
-def map_human_to_final(previous_decision: str, human_decision: str) -> str:
-    # Mapping simple pour le MVP :
-    # - APPROVE humain transforme REVIEW en ACCEPT
-    # - REJECT humain transforme REVIEW en REJECT
-    # - Pour les autres décisions, garder la précédente sauf si on veut surcharger partout.
-    if previous_decision == "REVIEW":
-        return "ACCEPT" if human_decision == "APPROVE" else "REJECT"
-    return previous_decision
+def _item(row: Decision) -> ReviewQueueItem:
+    return ReviewQueueItem(
+        decision_id=row.decision_id,
+        decision=row.decision,
+        risk_score=row.risk_score,
+        fraud_score=row.fraud_score,
+        amount=row.amount,
+        created_at=row.created_at,
+        claimed_by=row.claimed_by,
+        claim_expires_at=row.claim_expires_at,
+    )
+
+@router.get("/review/queue", response_model=ReviewQueueResponse)
+def review_queue(
+    order: ReviewOrder = "risk",
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = None,
+    include_claimed: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Décisions REVIEW en attente, par risque ou montant décroissant, ou par ancienneté ; `cursor` de la
+    réponse précédente pour la page suivante. Les décisions réservées par un analyste sont masquées
+    sauf `include_claimed=true`.
+    """
+    try:
+        rows, next_cursor = list_pending(
+            db, order=order, limit=min(limit, settings.review_queue_page_max), cursor=cursor, include_claimed=include_claimed
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return ReviewQueueResponse(order=order, items=[_item(r) for r in rows], next_cursor=next_cursor)
+
+@router.post("/review/claim", response_model=ReviewClaimResponse)
+def claim_reviews(payload: ReviewClaimRequest, db: Session = Depends(get_db)):
+    """Réserve les prochaines décisions libres de la file pour un analyste (bail de REVIEW_LEASE_SECONDS)."""
+    rows, expires_at = claim(
+        db, payload.reviewer_id, limit=payload.limit, order=payload.order, lease_seconds=settings.review_lease_seconds
+    )
+    return ReviewClaimResponse(reviewer_id=payload.reviewer_id, lease_expires_at=expires_at, items=[_item(r) for r in rows])
+
+@router.post("/review/release")
+def release_reviews(payload: ReviewReleaseRequest, db: Session = Depends(get_db)):
+    return {"released": release(db, payload.reviewer_id, payload.decision_ids)}
+
+@router.post("/review/bulk", response_model=BulkReviewResponse)
+def review_bulk(payload: BulkReviewRequest, db: Session = Depends(get_db)):
+    """Plusieurs revues en une transaction ; un statut par élément (stored, not_found, not_pending, claimed, duplicate)."""
+    if len(payload.items) > settings.review_bulk_max_items:
+        raise HTTPException(status_code=422, detail=f"items: at most {settings.review_bulk_max_items} reviews per call")
+    results = bulk_review(db, payload.reviewer_id, payload.items)
+    return BulkReviewResponse(
+        stored=sum(r.status == "stored" for r in results),
+        results=[asdict(r) for r in results],
+    )
 
 @router.post("/review/{decision_id}", response_model=ReviewResponse)
 def review(decision_id: str, payload: ReviewRequest, db: Session = Depends(get_db)):
     row = db.query(Decision).filter(Decision.decision_id == decision_id).first()
     if not row:
         raise HTTPException(status_code=404, detail="decision_id not found")
+    decision_id = row.decision_id
+    if row.decision != "REVIEW":
+        raise HTTPException(status_code=409, detail=f"decision is not pending review (decision={row.decision})")
+    if claimed_by_other(row, payload.reviewer_id):
+        raise HTTPException(status_code=409, detail=f"decision claimed by {row.claimed_by} until {row.claim_expires_at.isoformat()}")
 
-    prev = row.decision
-    final = map_human_to_final(prev, payload.human_decision)
-
-    review_row = Review(
-        decision_id_fk=row.id,
-        reviewer_id=payload.reviewer_id,
-        human_decision=payload.human_decision,
-        comment=payload.comment,
-        previous_decision=prev,
-        final_decision=final,
-    )
-    db.add(review_row)
-
-    # Stocker la décision finale tout en préservant la trace originale (audit)
-    row.decision = final
+    final = apply_review(db, row, payload.reviewer_id, payload.human_decision, payload.comment)
+    if final is None:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="decision was reviewed or claimed concurrently")
     db.commit()
+    REVIEWS_STORED.labels(route="single").inc()
 
     return ReviewResponse(
-        decision_id=row.decision_id,
-        previous_decision=prev,
+        decision_id=decision_id,
+        previous_decision="REVIEW",
         human_decision=payload.human_decision,
         final_decision=final,
         stored=True,
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Request, Depends, Form
+from fastapi import APIRouter, Request, Depends, Form, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
@@ -6,18 +6,9 @@ from typing import Optional
 
 from ..db import SessionLocal, Decision as DecisionRow
 from ..schemas import DecisionRequest, ClientPayload, TransactionPayload
-from ..services.ml_client import predict_risk_and_fraud
-from ..services.policy import apply_policy
-from ..services.logging import hash_client_id, build_decision_id, store_decision
-from ..services.agent_client import generate_report
-from ..schemas import ExplanationsPreview, FeatureImpact
-from ..services.monitoring import (
-    DECISION_COUNTER,
-    RISK_SCORE_DIST,
-    FRAUD_SCORE_DIST,
-    INPUT_INCOME_DIST,
-    INPUT_DEBT_RATIO_DIST,
-)
+from ..services.admission import AdmissionRejected, run_admitted
+from ..services.decision_pipeline import run_decision
+from ..services.tracing import mark_since_start
 
 from pathlib import Path
 
@@ -103,64 +94,14 @@ async def ui_decide(
         ),
     )
 
-    # Exécuter le pipeline de décision (même logique que la route API)
-    risk_score, fraud_score, model_versions, shap_impacts = predict_risk_and_fraud(payload)
-    pr = apply_policy(risk_score, fraud_score)
-
-    # Monitoring
-    RISK_SCORE_DIST.observe(risk_score)
-    FRAUD_SCORE_DIST.observe(fraud_score)
-    DECISION_COUNTER.labels(decision=pr.decision, policy_rule=pr.rule).inc()
-    INPUT_INCOME_DIST.observe(payload.client.income_annual)
-    INPUT_DEBT_RATIO_DIST.observe(payload.client.debt_to_income)
-
-    fraud_preview = [
-        FeatureImpact(feature="is_new_device", impact="+"),
-        FeatureImpact(feature="hour", impact="+"),
-        FeatureImpact(feature="distance_from_home_km", impact="+"),
-    ]
-    explanations_preview = ExplanationsPreview(
-        credit_top_features=shap_impacts,
-        fraud_top_features=fraud_preview,
-    )
-
-    decision_id = build_decision_id()
-    client_hash = hash_client_id(payload.client.client_id)
-
-    stored = store_decision(
-        db,
-        decision_id=decision_id,
-        client_id_hash=client_hash,
-        risk_score=risk_score,
-        fraud_score=fraud_score,
-        decision=pr.decision,
-        policy_rule=pr.rule,
-        model_versions=model_versions,
-        explanations_preview=explanations_preview.model_dump(),
-        request_payload=payload.model_dump(),
-    )
+    # Lecture du formulaire + construction/validation des modèles Pydantic
+    mark_since_start("validation")
 
-    # Rapport Agent IA
-    agent_payload = {
-        "decision": pr.decision,
-        "risk_score": risk_score,
-        "fraud_score": fraud_score,
-        "policy_rule": pr.rule,
-        "model_versions": model_versions,
-        "explanations_preview": explanations_preview.model_dump(),
-    }
-    report_summary = await generate_report(agent_payload)
-
-    result = {
-        "decision_id": stored.decision_id,
-        "decision": pr.decision,
-        "risk_score": risk_score,
-        "fraud_score": fraud_score,
-        "policy_rule": pr.rule,
-        "model_versions": model_versions,
-        "explanations_preview": explanations_preview.model_dump(),
-        "report_summary": report_summary,
-    }
+    # Exécuter le pipeline de décision (le même que la route API, même contrôle d'admission)
+    try:
+        result = await run_admitted(lambda mode: run_decision(payload, db, mode))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
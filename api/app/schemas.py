@@ -1,4 +1,5 @@
-from typing import Literal, Optional, List
+from datetime import datetime
+from typing import Dict, Literal, Optional, List
 from pydantic import BaseModel, Field, conint, confloat
 
 DecisionType = Literal["ACCEPT", "REVIEW", "REJECT", "ALERT"]
@@ -25,6 +26,11 @@ class DecisionRequest(BaseModel):
     client: ClientPayload
     transaction: TransactionPayload
 
+class TransactionDecisionRequest(BaseModel):
+    # Features crédit reprises du profil client en cache (POST /decision/transaction)
+    client_id: str = Field(..., min_length=3, max_length=64)
+    transaction: TransactionPayload
+
 class FeatureImpact(BaseModel):
     feature: str
     impact: str
@@ -32,6 +38,8 @@ class FeatureImpact(BaseModel):
 class ExplanationsPreview(BaseModel):
     credit_top_features: List[FeatureImpact]
     fraud_top_features: List[FeatureImpact]
+    # Vélocité du client avant cette transaction (entrées du modèle fraude), absente si désactivée
+    fraud_velocity: Optional[Dict[str, float]] = None
 
 class DecisionResponse(BaseModel):
     decision_id: str
@@ -42,6 +50,11 @@ class DecisionResponse(BaseModel):
     model_versions: dict
     explanations_preview: ExplanationsPreview
     report_summary: Optional[str] = None
+    # Mode de service appliqué (full, no_report, no_explain, rules_only), voir services/admission.py
+    service_tier: str = "full"
+
+class FeatureContribution(FeatureImpact):
+    value: float
 
 class ExplainResponse(BaseModel):
     decision_id: str
@@ -50,8 +63,21 @@ class ExplainResponse(BaseModel):
     model_versions: dict
     risk_score: float
     fraud_score: float
+    # Aperçu renvoyé au moment de la décision
     credit_shap_top: List[FeatureImpact]
     fraud_shap_top: List[FeatureImpact]
+    fraud_velocity: Optional[Dict[str, float]] = None
+    # Vecteurs complets (toutes les features d'origine), recalculés avec les versions exactes des modèles
+    credit_shap: List[FeatureContribution]
+    fraud_contributions: List[FeatureContribution]
+    # isolation_paths : contributions du modèle fraude ; rules : règles déclenchées (palier rules_only)
+    fraud_explanation: Literal["isolation_paths", "rules"] = "isolation_paths"
+
+class ExplainBatchResponse(BaseModel):
+    explanations: List[ExplainResponse]
+    not_found: List[str]
+    # Version de modèle plus disponible (ni servie, ni dans versions/) : explication non recalculable
+    unavailable: List[str]
 
 class ReviewRequest(BaseModel):
     human_decision: Literal["APPROVE", "REJECT"]
@@ -64,3 +90,99 @@ class ReviewResponse(BaseModel):
     human_decision: Literal["APPROVE", "REJECT"]
     final_decision: DecisionType
     stored: bool
+
+ReviewOrder = Literal["risk", "amount", "age"]
+
+class ReviewQueueItem(BaseModel):
+    decision_id: str
+    decision: DecisionType
+    risk_score: float
+    fraud_score: float
+    amount: Optional[float] = None
+    created_at: datetime
+    claimed_by: Optional[str] = None
+    claim_expires_at: Optional[datetime] = None
+
+class ReviewQueueResponse(BaseModel):
+    order: ReviewOrder
+    items: List[ReviewQueueItem]
+    next_cursor: Optional[str] = None
+
+class ReviewClaimRequest(BaseModel):
+    reviewer_id: str = Field(..., min_length=2, max_length=64)
+    limit: conint(ge=1, le=100) = 10
+    order: ReviewOrder = "risk"
+
+class ReviewClaimResponse(BaseModel):
+    reviewer_id: str
+    lease_expires_at: datetime
+    items: List[ReviewQueueItem]
+
+class ReviewReleaseRequest(BaseModel):
+    reviewer_id: str = Field(..., min_length=2, max_length=64)
+    decision_ids: List[str] = Field(..., min_length=1)
+
+class BulkReviewItem(BaseModel):
+    decision_id: str
+    human_decision: Literal["APPROVE", "REJECT"]
+    comment: str = Field(..., min_length=3, max_length=500)
+
+class BulkReviewRequest(BaseModel):
+    reviewer_id: str = Field(..., min_length=2, max_length=64)
+    items: List[BulkReviewItem] = Field(..., min_length=1)
+
+class BulkReviewResult(BaseModel):
+    decision_id: str
+    status: Literal["stored", "not_found", "not_pending", "claimed", "duplicate"]
+    previous_decision: Optional[DecisionType] = None
+    final_decision: Optional[DecisionType] = None
+
+class BulkReviewResponse(BaseModel):
+    stored: int
+    results: List[BulkReviewResult]
+
+class PolicyThresholds(BaseModel):
+    fraud_alert_threshold: Optional[confloat(ge=0, le=1)] = None
+    risk_reject_threshold: Optional[confloat(ge=0, le=1)] = None
+    risk_review_lower: Optional[confloat(ge=0, le=1)] = None
+    risk_review_upper: Optional[confloat(ge=0, le=1)] = None
+
+class ReplayCandidateRequest(BaseModel):
+    name: str = Field(..., min_length=1, max_length=64)
+    policy: PolicyThresholds = PolicyThresholds()
+    # Re-scoring optionnel des request_payload stockés (chemins sous ml/artifacts)
+    credit_model_path: Optional[str] = None
+    fraud_model_path: Optional[str] = None
+
+class PolicyReplayRequest(BaseModel):
+    candidates: List[ReplayCandidateRequest] = Field(..., min_length=1, max_length=20)
+    baseline: Optional[PolicyThresholds] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    chunk_size: conint(ge=1000, le=500000) = 50000
+
+class DailyVolume(BaseModel):
+    day: str
+    baseline: Dict[str, int]
+    candidate: Dict[str, int]
+    delta: Dict[str, int]
+
+class CandidateReplayReport(BaseModel):
+    name: str
+    policy: Dict[str, float]
+    credit_model_path: Optional[str] = None
+    fraud_model_path: Optional[str] = None
+    transitions: Dict[str, Dict[str, int]]
+    flipped: int
+    totals_baseline: Dict[str, int]
+    totals_candidate: Dict[str, int]
+    mean_daily_delta: Dict[str, float]
+    daily: List[DailyVolume]
+    score_delta: Optional[Dict[str, Optional[float]]] = None
+
+class PolicyReplayResponse(BaseModel):
+    rows: int
+    # Lignes écartées du re-scoring (request_payload inexploitable)
+    skipped_rows: int = 0
+    baseline: Dict[str, float]
+    candidates: List[CandidateReplayReport]
@@ -0,0 +1,214 @@
+"""
+Contrôle d'admission des routes de décision (POST /decision, /decision/transaction, /ui/decide).
+
+Sans limite, un pic fait tout le travail pour chaque requête (scoring, SHAP, commit, rapport agent)
+et la latence croît sans borne. Ici, par worker :
+- au plus `max_concurrency` décisions en cours, les suivantes attendent dans une file FIFO bornée
+  (`max_queue`) ; file pleine : 503 immédiat avec `Retry-After` ;
+- chaque requête a une échéance d'attente (`queue_timeout_seconds`, réduite par l'en-tête
+  `X-Request-Deadline-Ms` du client) ; dépassée avant d'obtenir une place : 503 ;
+- un niveau de dégradation (0 à 3, voir `decision_pipeline.TIERS`) est choisi à l'admission, le plus
+  élevé entre celui dicté par la profondeur de file (`degrade_queue_depths`) et celui dicté par la
+  latence de bout en bout lissée (EWMA, `degrade_latency_ms`) : sans rapport agent, puis sans SHAP
+  (explication calculée plus tard par GET /explain), puis fraude par règles seules.
+
+Une place libérée est transmise directement au premier en attente (pas de course entre nouveaux
+arrivants et file). Les requêtes rejouées par Idempotency-Key ne passent pas par ici. Le flux NDJSON
+(POST /decision/stream) y passe par micro-lot (une place par lot), en plus de son propre contrôle de
+flux (services/decision_stream.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, Sequence, TypeVar
+
+from ..settings import settings
+from .decision_pipeline import DecisionMode
+from .monitoring import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_LEVEL,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_QUEUE_WAIT,
+    ADMISSION_REJECTED,
+)
+from .tracing import mark_since_start
+
+MAX_LEVEL = 3
+
+T = TypeVar("T")
+
+
+class AdmissionRejected(Exception):
+    """Requête refusée (file pleine ou échéance dépassée) : 503 + Retry-After."""
+
+    status_code = 503
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Service overloaded ({reason}), retry later")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_thresholds(value: str) -> tuple[float, ...]:
+    """Seuils croissants "a,b,c" (niveaux 1, 2, 3) ; chaîne vide = critère désactivé."""
+    return tuple(sorted(float(v) for v in value.split(",") if v.strip()))
+
+
+def _level_for(value: float, thresholds: Sequence[float]) -> int:
+    return sum(1 for t in thresholds if value >= t)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 32,
+        max_queue: int = 256,
+        queue_timeout_seconds: float = 2.0,
+        degrade_queue_depths: Sequence[float] = (),
+        degrade_latency_ms: Sequence[float] = (),
+        latency_alpha: float = 0.2,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.degrade_queue_depths = tuple(degrade_queue_depths)[:MAX_LEVEL]
+        self.degrade_latency_ms = tuple(degrade_latency_ms)[:MAX_LEVEL]
+        self.latency_alpha = latency_alpha
+        self.in_flight = 0
+        self.latency_ewma_ms = 0.0
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def current_level(self) -> int:
+        level = max(
+            _level_for(self.queue_depth, self.degrade_queue_depths),
+            _level_for(self.latency_ewma_ms, self.degrade_latency_ms),
+        )
+        return min(level, MAX_LEVEL)
+
+    def _retry_after(self) -> int:
+        # Ordre de grandeur du temps de vidange de la file, en secondes entières (>= 1)
+        per_request_s = max(self.latency_ewma_ms, 1.0) / 1000.0
+        return max(1, round((self.queue_depth + 1) * per_request_s / self.max_concurrency))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        ADMISSION_REJECTED.labels(reason=reason).inc()
+        return AdmissionRejected(reason, self._retry_after())
+
+    def _gauges(self) -> None:
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        ADMISSION_QUEUE_DEPTH.set(self.queue_depth)
+
+    async def _acquire(self, timeout_seconds: float) -> None:
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+        if timeout_seconds <= 0:
+            raise self._reject("deadline")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._gauges()
+        try:
+            # asyncio.wait n'annule pas la future : une place transmise pendant le timeout n'est pas perdue
+            await asyncio.wait({waiter}, timeout=timeout_seconds)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            raise self._reject("deadline")
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # Place reçue mais plus attendue (client parti) : rendue au suivant
+            self._release()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._gauges()
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # place transmise : in_flight inchangé
+                self._gauges()
+                return
+        self.in_flight -= 1
+        self._gauges()
+
+    def _observe_latency(self, seconds: float) -> None:
+        ms = seconds * 1000.0
+        if self.latency_ewma_ms == 0.0:
+            self.latency_ewma_ms = ms
+        else:
+            self.latency_ewma_ms += self.latency_alpha * (ms - self.latency_ewma_ms)
+
+    @asynccontextmanager
+    async def admit(self, deadline_ms: Optional[float] = None) -> AsyncIterator[int]:
+        """Place de décision pour la durée du bloc ; renvoie le niveau de dégradation (0 = complet)."""
+        t0 = time.perf_counter()
+        # Niveau dicté par la charge à l'arrivée (file devant cette requête, latence récente)
+        level = self.current_level()
+        timeout = self.queue_timeout_seconds
+        if deadline_ms is not None:
+            timeout = min(timeout, deadline_ms / 1000.0)
+        await self._acquire(timeout)
+        ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - t0)
+        ADMISSION_LEVEL.set(level)
+        self._gauges()
+        try:
+            yield level
+        finally:
+            self._observe_latency(time.perf_counter() - t0)
+            self._release()
+
+
+async def run_admitted(
+    decide: Callable[[DecisionMode], Awaitable[T]],
+    *,
+    deadline_ms: Optional[float] = None,
+    explain: bool = True,
+    report: bool = True,
+) -> T:
+    """`decide(mode)` sous contrôle d'admission ; lève `AdmissionRejected` si aucune place à temps."""
+    controller = get_admission_controller()
+    if controller is None:
+        return await decide(DecisionMode.for_level(0, explain=explain, report=report))
+    async with controller.admit(deadline_ms) as level:
+        # Depuis l'arrivée de la requête : validation + attente d'une place
+        mark_since_start("admission")
+        return await decide(DecisionMode.for_level(level, explain=explain, report=report))
+
+
+_CONTROLLER: Optional[AdmissionController] = None
+_LOADED = False
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    global _CONTROLLER, _LOADED
+    if _LOADED:
+        return _CONTROLLER
+    _LOADED = True
+    if settings.admission_enabled:
+        _CONTROLLER = AdmissionController(
+            max_concurrency=settings.admission_max_concurrency,
+            max_queue=settings.admission_max_queue,
+            queue_timeout_seconds=settings.admission_queue_timeout_seconds,
+            degrade_queue_depths=parse_thresholds(settings.admission_degrade_queue_depths),
+            degrade_latency_ms=parse_thresholds(settings.admission_degrade_latency_ms),
+            latency_alpha=settings.admission_latency_alpha,
+        )
+    return _CONTROLLER
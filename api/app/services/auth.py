@@ -0,0 +1,15 @@
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+from ..settings import settings
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    # Endpoints d'administration : désactivés tant qu'ADMIN_TOKEN n'est pas configuré
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="admin endpoints disabled (ADMIN_TOKEN not set)")
+    # Sans jeton : 401 (authentification requise) ; jeton présent mais faux : 403
+    if not x_admin_token:
+        raise HTTPException(status_code=401, detail="admin token required (X-Admin-Token)")
+    if not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="invalid admin token")
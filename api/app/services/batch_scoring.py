@@ -0,0 +1,381 @@
+"""
+Scoring hors-ligne par lots (revue mensuelle du portefeuille, re-scoring de masse).
+
+Le fichier d'entrée (CSV, Parquet ou NDJSON) est lu par blocs de `chunk_size` lignes ; chaque
+bloc est scoré de façon vectorisée avec exactement la logique de `ml_client` / `policy`
+(mêmes frames, modèle crédit, modèle fraude, SHAP, `apply_policy`) dans un pool de process
+où les modèles sont chargés une seule fois par worker.
+
+Sortie incrémentale et reprenable : un fichier `part-<bloc>.<fmt>` par bloc (écriture atomique)
+et un `_checkpoint.json` listant les blocs terminés. Relancer la même commande reprend là où le
+run s'est arrêté. Avec `--to-db`, les décisions sont aussi insérées en masse dans `decisions`
+(identifiants déterministes `dcn_batch_<run>_<bloc>_<ligne>`, donc ré-insertion idempotente).
+
+Formats d'entrée acceptés :
+- colonnes plates : client_id (optionnel) + features crédit + features transaction ;
+- NDJSON/Parquet imbriqués `{"client": {...}, "transaction": {...}}` (générateur de trafic, capture).
+
+Usage CLI (depuis api/) :
+    python -m app.services.batch_scoring portfolio.parquet --out scored/ --workers 4
+    python -m app.services.batch_scoring traffic.ndjson.gz --out scored/ --format csv --to-db --run-id 2026_10
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from .ml_client import CREDIT_FEATURES, FRAUD_FEATURES
+from .velocity import VELOCITY_FEATURES
+from .policy import DECISIONS, PolicyConfig, apply_policy_codes, policy_rules
+
+DEFAULT_CHUNK_SIZE = 50_000
+CHECKPOINT_FILE = "_checkpoint.json"
+OUTPUT_FORMATS = ("parquet", "csv", "ndjson")
+
+
+@dataclass
+class BatchConfig:
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    workers: int = 1
+    output_format: str = "parquet"
+    with_shap: bool = True
+    to_db: bool = False
+    run_id: Optional[str] = None
+
+
+# -----------------------------
+# Lecture par blocs
+# -----------------------------
+def _flatten(records: list[dict]) -> pd.DataFrame:
+    """Enregistrements imbriqués (client/transaction, ou capture {"request": ...}) -> frame plat."""
+    rows = []
+    for rec in records:
+        rec = rec.get("request", rec)
+        if "client" in rec:
+            rows.append({**rec["client"], **rec["transaction"]})
+        else:
+            rows.append(rec)
+    return pd.DataFrame.from_records(rows)
+
+
+def _iter_ndjson(path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        batch = []
+        for line in f:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) == chunk_size:
+                yield _flatten(batch)
+                batch = []
+        if batch:
+            yield _flatten(batch)
+
+
+def _iter_parquet(path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    for batch in pf.iter_batches(batch_size=chunk_size):
+        df = batch.to_pandas()
+        if "client" in df.columns:
+            # Colonnes struct du générateur de trafic
+            df = pd.concat([pd.DataFrame(df["client"].tolist()), pd.DataFrame(df["transaction"].tolist())], axis=1)
+        yield df
+
+
+def iter_input_chunks(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    suffixes = path.suffixes
+    if ".parquet" in suffixes:
+        yield from _iter_parquet(path, chunk_size)
+    elif ".csv" in suffixes:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif ".ndjson" in suffixes or ".jsonl" in suffixes:
+        yield from _iter_ndjson(path, chunk_size)
+    else:
+        raise ValueError(f"Unsupported input format: {path.name} (expected .csv, .parquet, .ndjson[.gz] or .jsonl[.gz])")
+
+
+# -----------------------------
+# Scoring d'un bloc (dans un worker)
+# -----------------------------
+def _init_worker() -> None:
+    # Chargement unique par process (l'explainer SHAP est ensuite créé au premier bloc et réutilisé)
+    from . import ml_client
+
+    ml_client.get_bundle()
+
+
+def score_frame(df: pd.DataFrame, policy: PolicyConfig, *, with_shap: bool = True) -> pd.DataFrame:
+    """Scores, décision et règle pour chaque ligne de `df` (frame plat)."""
+    from . import ml_client
+
+    missing = [c for c in CREDIT_FEATURES + FRAUD_FEATURES if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing input columns: {missing}")
+
+    bundle = ml_client.get_bundle()
+    model, fraud_model = bundle.credit, bundle.fraud
+    X_df = df[CREDIT_FEATURES].reset_index(drop=True)
+    # Vélocité : colonnes du fichier si présentes, sinon 0 (pas d'historique client en batch)
+    Xf = df.reindex(columns=FRAUD_FEATURES + VELOCITY_FEATURES).reset_index(drop=True)
+    Xf[VELOCITY_FEATURES] = Xf[VELOCITY_FEATURES].fillna(0.0)
+
+    risk = np.clip(model.predict_proba(X_df)[:, 1], 0.0, 1.0)
+    if with_shap:
+        # Même passe que la route /decision : scores + contributions (explain_fraud_batch, par blocs)
+        fraud, fraud_top = ml_client.fraud_scores_and_explanations(fraud_model, Xf)
+    else:
+        fraud = ml_client.fraud_scores(fraud_model, Xf)
+    codes = apply_policy_codes(risk, fraud, policy)
+
+    out = pd.DataFrame({"risk_score": risk, "fraud_score": fraud})
+    out["decision"] = np.asarray(DECISIONS)[codes]
+    out["policy_rule"] = np.asarray(policy_rules(policy), dtype=object)[codes]
+    if with_shap:
+        out["credit_top_features"] = ml_client.compute_shap_values_batch(model, X_df)
+        out["fraud_top_features"] = fraud_top
+    return out
+
+
+def _write_part(out: pd.DataFrame, path: Path, fmt: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    if fmt == "parquet":
+        out.to_parquet(tmp, index=False)
+    elif fmt == "csv":
+        frame = out.copy()
+        for col in ("credit_top_features", "fraud_top_features"):
+            if col in frame:
+                frame[col] = [json.dumps(x) for x in frame[col]]
+        frame.to_csv(tmp, index=False)
+    else:
+        out.to_json(tmp, orient="records", lines=True, force_ascii=False)
+    os.replace(tmp, path)
+
+
+def _score_chunk(idx: int, df: pd.DataFrame, row_offset: int, policy: PolicyConfig, cfg: BatchConfig, out_dir: str) -> dict:
+    from . import ml_client
+    from .logging import hash_client_id
+
+    t0 = time.perf_counter()
+    df = df.reset_index(drop=True)
+    scored = score_frame(df, policy, with_shap=cfg.with_shap)
+    has_id = "client_id" in df.columns
+    client_hash = [hash_client_id(str(c)) for c in df["client_id"]] if has_id else None
+
+    out = pd.DataFrame({"row": row_offset + np.arange(len(df))})
+    if has_id:
+        out["client_id_hash"] = client_hash
+    out = pd.concat([out, scored], axis=1)
+    _write_part(out, Path(out_dir) / f"part-{idx:05d}.{cfg.output_format}", cfg.output_format)
+
+    model_versions = ml_client.model_versions()
+    db_rows = None
+    if cfg.to_db:
+        clients = df[(["client_id"] if has_id else []) + CREDIT_FEATURES].to_dict("records")
+        txs = df[FRAUD_FEATURES].to_dict("records")
+        # Même forme que ExplanationsPreview.model_dump() côté API (feature/impact, sans valeur)
+        def _preview(col: str) -> list:
+            if not cfg.with_shap:
+                return [[]] * len(df)
+            return [[{"feature": f["feature"], "impact": f["impact"]} for f in top] for top in scored[col]]
+
+        shap_rows, fraud_rows = _preview("credit_top_features"), _preview("fraud_top_features")
+        db_rows = [
+            {
+                "decision_id": f"dcn_batch_{cfg.run_id}_{idx:05d}_{i}",
+                "client_id_hash": client_hash[i] if has_id else hash_client_id(f"row:{row_offset + i}"),
+                "risk_score": float(scored["risk_score"].iat[i]),
+                "fraud_score": float(scored["fraud_score"].iat[i]),
+                "decision": scored["decision"].iat[i],
+                "policy_rule": scored["policy_rule"].iat[i],
+                "model_versions": model_versions,
+                "explanations_preview": {"credit_top_features": shap_rows[i], "fraud_top_features": fraud_rows[i]},
+                "request_payload": {"client": clients[i], "transaction": txs[i]},
+            }
+            for i in range(len(df))
+        ]
+
+    return {
+        "chunk": idx,
+        "rows": len(df),
+        "decisions": {d: int(n) for d, n in scored["decision"].value_counts().items()},
+        "model_versions": model_versions,
+        "seconds": time.perf_counter() - t0,
+        "db_rows": db_rows,
+    }
+
+
+# -----------------------------
+# Checkpoint & base
+# -----------------------------
+def _fingerprint(input_path: Path, policy: PolicyConfig, cfg: BatchConfig) -> str:
+    st = input_path.stat()
+    key = {
+        "input": str(input_path.resolve()),
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "policy": policy.to_dict(),
+        **{k: v for k, v in asdict(cfg).items() if k != "workers"},
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _load_checkpoint(out_dir: Path, fingerprint: str) -> dict:
+    path = out_dir / CHECKPOINT_FILE
+    if path.exists():
+        state = json.loads(path.read_text(encoding="utf-8"))
+        if state.get("fingerprint") == fingerprint:
+            return state
+        raise RuntimeError(
+            f"{path} belongs to a different run (input, policy or options changed); use a new --out directory"
+        )
+    return {"fingerprint": fingerprint, "done": {}}
+
+
+def _save_checkpoint(out_dir: Path, state: dict) -> None:
+    tmp = out_dir / (CHECKPOINT_FILE + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, out_dir / CHECKPOINT_FILE)
+
+
+def _insert_rows(db, idx: int, run_id: str, rows: list[dict]) -> None:
+    from sqlalchemy import delete, insert
+
+    from ..db import Decision
+
+    # Reprise après un crash entre l'insertion et le checkpoint : remplacer les lignes du bloc
+    db.execute(delete(Decision).where(Decision.decision_id.like(f"dcn_batch_{run_id}_{idx:05d}_%")))
+    db.execute(insert(Decision), rows)
+    db.commit()
+
+
+def run_batch(input_path: Path, out_dir: Path, cfg: BatchConfig, policy: Optional[PolicyConfig] = None) -> dict:
+    policy = policy or PolicyConfig.from_settings()
+    if cfg.output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {cfg.output_format!r}, expected one of {OUTPUT_FORMATS}")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fingerprint = _fingerprint(input_path, policy, cfg)
+    cfg.run_id = cfg.run_id or fingerprint
+    state = _load_checkpoint(out_dir, fingerprint)
+    state.update({"input": str(input_path), "policy": policy.to_dict(), "config": asdict(cfg)})
+
+    db = None
+    if cfg.to_db:
+        from ..db import SessionLocal, init_db
+
+        init_db()
+        db = SessionLocal()
+
+    t0 = time.perf_counter()
+    scored_rows = 0
+    pool = ProcessPoolExecutor(cfg.workers, initializer=_init_worker) if cfg.workers > 1 else None
+    if pool is None:
+        _init_worker()
+
+    def finish(res: dict) -> None:
+        nonlocal scored_rows
+        if db is not None:
+            _insert_rows(db, res["chunk"], cfg.run_id, res.pop("db_rows"))
+        res.pop("db_rows", None)
+        state["done"][str(res["chunk"])] = res
+        _save_checkpoint(out_dir, state)
+        scored_rows += res["rows"]
+        elapsed = time.perf_counter() - t0
+        print(f"chunk {res['chunk']:05d}: {res['rows']} rows in {res['seconds']:.2f}s ({scored_rows / elapsed:,.0f} rows/s overall)", file=sys.stderr)
+
+    try:
+        pending = set()
+        offset = 0
+        for idx, df in enumerate(iter_input_chunks(input_path, cfg.chunk_size)):
+            n = len(df)
+            if str(idx) in state["done"]:
+                offset += n
+                continue
+            args = (idx, df, offset, policy, cfg, str(out_dir))
+            offset += n
+            if pool is None:
+                finish(_score_chunk(*args))
+                continue
+            # Au plus 2 blocs en attente par worker : mémoire bornée quelle que soit la taille du fichier
+            if len(pending) >= 2 * cfg.workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    finish(fut.result())
+            pending.add(pool.submit(_score_chunk, *args))
+        for fut in pending:
+            finish(fut.result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if db is not None:
+            db.close()
+
+    elapsed = time.perf_counter() - t0
+    totals = dict.fromkeys(DECISIONS, 0)
+    for res in state["done"].values():
+        for d, n in res["decisions"].items():
+            totals[d] += n
+    return {
+        "run_id": cfg.run_id,
+        "output": str(out_dir),
+        "chunks": len(state["done"]),
+        "rows": sum(res["rows"] for res in state["done"].values()),
+        "scored_this_run": scored_rows,
+        "seconds": elapsed,
+        "rows_per_s": scored_rows / elapsed if elapsed > 0 else None,
+        "decisions": totals,
+    }
+
+
+def _parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Offline chunked batch scoring (resumable)")
+    p.add_argument("input", help=".csv, .parquet, .ndjson[.gz] or .jsonl[.gz]")
+    p.add_argument("--out", required=True, help="Output directory (part files + checkpoint)")
+    p.add_argument("--format", choices=OUTPUT_FORMATS, default="parquet")
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--no-shap", action="store_true", help="Skip SHAP explanations (faster)")
+    p.add_argument("--to-db", action="store_true", help="Bulk-insert decisions into the decisions table")
+    p.add_argument("--run-id", help="Suffix for decision ids (default: run fingerprint)")
+    p.add_argument("--fraud-alert-threshold", type=float)
+    p.add_argument("--risk-reject-threshold", type=float)
+    p.add_argument("--risk-review-lower", type=float)
+    p.add_argument("--risk-review-upper", type=float)
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = _parse_args(argv)
+    policy = PolicyConfig.from_settings(
+        fraud_alert_threshold=args.fraud_alert_threshold,
+        risk_reject_threshold=args.risk_reject_threshold,
+        risk_review_lower=args.risk_review_lower,
+        risk_review_upper=args.risk_review_upper,
+    )
+    cfg = BatchConfig(
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        output_format=args.format,
+        with_shap=not args.no_shap,
+        to_db=args.to_db,
+        run_id=args.run_id,
+    )
+    summary = run_batch(Path(args.input), Path(args.out), cfg, policy)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
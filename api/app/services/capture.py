@@ -0,0 +1,148 @@
+"""
+Capture échantillonnée du trafic de décision, pour rejeu déterministe (benchmarks/replay.py).
+
+Sur le chemin de requête : un tirage aléatoire puis, pour les requêtes échantillonnées, un
+`put_nowait` dans une file bornée (l'objet Pydantic est passé tel quel, sans sérialisation).
+Un thread d'écriture pseudonymise `client_id` (hash_client_id), sérialise et écrit des segments
+NDJSON gzip avec rotation par nombre de lignes / durée. Un segment n'apparaît sous son nom final
+(`capture-*.ndjson.gz`) qu'une fois fermé. File pleine => la requête n'est pas capturée (compteur).
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from ..schemas import DecisionRequest
+from ..settings import settings
+from .monitoring import CAPTURE_DROPPED, CAPTURE_RECORDED
+
+_RECORDER: Optional["TrafficRecorder"] = None
+_STOP = object()
+
+
+class TrafficRecorder:
+    def __init__(
+        self,
+        directory: str,
+        *,
+        sample_rate: float,
+        max_records: int = 100_000,
+        max_seconds: float = 3600.0,
+        queue_size: int = 10_000,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sample_rate = sample_rate
+        self.max_records = max_records
+        self.max_seconds = max_seconds
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="traffic-recorder", daemon=True)
+        self._file = None
+        self._path: Optional[Path] = None
+        self._opened_at = 0.0
+        self._n_in_segment = 0
+        self.segments: list[Path] = []
+
+    def start(self) -> "TrafficRecorder":
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # -----------------------------
+    # Chemin de requête
+    # -----------------------------
+    def record(self, payload: DecisionRequest, response: dict, ts: Optional[float] = None) -> None:
+        """`ts` : arrivée de la requête (ordre et écarts du rejeu), à défaut l'instant de l'appel."""
+        if random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((time.time() if ts is None else ts, payload, response))
+        except queue.Full:
+            CAPTURE_DROPPED.inc()
+
+    # -----------------------------
+    # Thread d'écriture
+    # -----------------------------
+    def _open_segment(self, ts: float) -> None:
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(ts))
+        self._path = self.directory / f"capture-{stamp}-{os.getpid()}-{len(self.segments):05d}.ndjson.gz.open"
+        self._file = gzip.open(self._path, "wt", encoding="utf-8")
+        self._opened_at = ts
+        self._n_in_segment = 0
+
+    def _close_segment(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        final = self._path.with_suffix("")  # retire ".open"
+        self._path.rename(final)
+        self.segments.append(final)
+        self._file = None
+
+    def _write(self, ts: float, payload: DecisionRequest, response: dict) -> None:
+        from .logging import hash_client_id
+
+        if self._file is None:
+            self._open_segment(ts)
+        request = payload.model_dump()
+        request["client"]["client_id"] = hash_client_id(request["client"]["client_id"])
+        self._file.write(json.dumps({"ts": ts, "request": request, "response": response}, separators=(",", ":")))
+        self._file.write("\n")
+        self._n_in_segment += 1
+        CAPTURE_RECORDED.inc()
+        if self._n_in_segment >= self.max_records or ts - self._opened_at >= self.max_seconds:
+            self._close_segment()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                # Pas de trafic : fermer un segment trop vieux pour qu'il devienne lisible
+                if self._file is not None and time.time() - self._opened_at >= self.max_seconds:
+                    self._close_segment()
+                continue
+            if item is _STOP:
+                self._close_segment()
+                return
+            try:
+                self._write(*item)
+            except Exception as e:
+                # La capture ne doit jamais impacter l'API
+                print(f"ERROR: traffic capture failed: {e}")
+
+
+def start_recorder() -> Optional[TrafficRecorder]:
+    global _RECORDER
+    if not settings.capture_enabled or _RECORDER is not None:
+        return _RECORDER
+    _RECORDER = TrafficRecorder(
+        settings.capture_dir,
+        sample_rate=settings.capture_sample_rate,
+        max_records=settings.capture_segment_max_records,
+        max_seconds=settings.capture_segment_max_seconds,
+        queue_size=settings.capture_queue_size,
+    ).start()
+    return _RECORDER
+
+
+def stop_recorder() -> None:
+    global _RECORDER
+    if _RECORDER is not None:
+        _RECORDER.stop()
+        _RECORDER = None
+
+
+def capture_decision(payload: DecisionRequest, response: dict, ts: Optional[float] = None) -> None:
+    if _RECORDER is not None:
+        _RECORDER.record(payload, response, ts)
@@ -0,0 +1,267 @@
+"""
+Pipeline de décision unique : POST /decision, /decision/transaction et /ui/decide passent par
+`run_decision` ; les routes par micro-lots (POST /decision/stream) par `run_decision_batch`, mêmes
+étapes avec un seul scoring vectorisé et une seule insertion par lot.
+
+Étapes : vélocité, scoring + explications, politique, métriques, drift, stockage, shadow, rapport
+agent, capture. Chaque structure est sérialisée une seule fois :
+- le payload (`model_dump`) sert au scoring et à la colonne `request_payload` ;
+- l'aperçu des explications est un dict construit une fois, partagé par la colonne JSON, l'agent
+  et la réponse ;
+- la réponse est un dict au format `DecisionResponse`, encodé par `FastJSONResponse` sans
+  revalidation : ses valeurs viennent des modèles et de la politique, pas du client.
+
+Modes de service (`DecisionMode`, choisis par le contrôle d'admission ou demandés par le client) :
+`full`, `no_report` (pas de rapport agent), `no_explain` (ni SHAP ni contributions fraude),
+`rules_only` (fraude par règles, services/fraud_rules.py). Le mode est stocké avec la décision.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from ..schemas import DecisionRequest
+from .agent_client import generate_report
+from .capture import capture_decision
+from .drift import observe_drift
+from .logging import build_decision_id, build_decision_ids, hash_client_id, store_decision, store_decisions
+from .ml_client import predict_risk_and_fraud, predict_risk_and_fraud_batch
+from .monitoring import (
+    DECISION_COUNTER,
+    DECISION_TIER,
+    FRAUD_SCORE_DIST,
+    INPUT_DEBT_RATIO_DIST,
+    INPUT_INCOME_DIST,
+    MODEL_LATENCY,
+    RISK_SCORE_DIST,
+)
+from .policy import PolicyResult, apply_policy
+from .shadow import shadow_decision
+from .tracing import request_received_at, stage
+from .velocity import observe_velocity
+
+
+# Niveaux de dégradation croissants (services/admission.py)
+TIERS = ("full", "no_report", "no_explain", "rules_only")
+
+
+@dataclass(frozen=True)
+class DecisionMode:
+    report: bool = True
+    explain: bool = True
+    fraud_rules_only: bool = False
+
+    @classmethod
+    def for_level(cls, level: int, *, explain: bool = True, report: bool = True) -> "DecisionMode":
+        """Mode du niveau de charge `level`, restreint par les options du client (`explain`, `report`)."""
+        return cls(
+            report=report and level < 1,
+            explain=explain and level < 2,
+            fraud_rules_only=level >= 3,
+        )
+
+    @property
+    def tier(self) -> str:
+        # Étape la plus lourde sautée (explain=false seul : "no_explain", rapport conservé)
+        if self.fraud_rules_only:
+            return "rules_only"
+        if not self.explain:
+            return "no_explain"
+        if not self.report:
+            return "no_report"
+        return "full"
+
+
+FULL = DecisionMode()
+
+
+def _feature_impacts(features: list[dict]) -> list[dict]:
+    # Forme FeatureImpact (feature, impact) ; la valeur signée reste disponible via GET /explain
+    return [{"feature": f["feature"], "impact": f["impact"]} for f in features]
+
+
+def build_preview(shap_impacts: list[dict], fraud_impacts: list[dict], velocity: Optional[dict]) -> dict:
+    """Aperçu des explications au format `ExplanationsPreview`, en dict (stocké, envoyé à l'agent, renvoyé)."""
+    return {
+        # Risque Crédit : valeurs SHAP réelles
+        "credit_top_features": _feature_impacts(shap_impacts),
+        # Fraude : contributions le long des chemins d'isolation (services/fraud_explainer.py)
+        "fraud_top_features": _feature_impacts(fraud_impacts),
+        "fraud_velocity": velocity,
+    }
+
+
+def _observe(payload: DecisionRequest, risk_score: float, fraud_score: float, pr: PolicyResult) -> None:
+    # Monitoring (Prometheus)
+    RISK_SCORE_DIST.observe(risk_score)
+    FRAUD_SCORE_DIST.observe(fraud_score)
+    DECISION_COUNTER.labels(decision=pr.decision, policy_rule=pr.rule).inc()
+    INPUT_INCOME_DIST.observe(payload.client.income_annual)
+    INPUT_DEBT_RATIO_DIST.observe(payload.client.debt_to_income)
+
+    # Drift streaming : simple incrément de compteurs, PSI/KS calculés en tâche de fond
+    observe_drift(payload)
+
+
+def _agent_payload(body: dict) -> dict:
+    # Payload Agent (n'utilise que les sorties système : pas d'hallucination)
+    return {k: body[k] for k in ("decision", "risk_score", "fraud_score", "policy_rule", "model_versions", "explanations_preview")}
+
+
+def _capture(payload: DecisionRequest, body: dict, received_at: float) -> None:
+    capture_decision(payload, {k: body[k] for k in ("decision", "risk_score", "fraud_score", "model_versions")}, received_at)
+
+
+async def run_decision(payload: DecisionRequest, db: Session, mode: DecisionMode = FULL) -> dict:
+    """Décision pour un payload validé, dans le mode `mode` ; renvoie le corps de réponse (format `DecisionResponse`)."""
+    # Horodatage de capture : arrivée de la requête, pas fin du traitement (rapport agent compris)
+    received_at = request_received_at()
+    request = payload.model_dump()
+    tier = mode.tier
+
+    # Vélocité du client (anneaux en mémoire), avant d'y ajouter cette transaction
+    velocity = observe_velocity(payload)
+
+    with MODEL_LATENCY.time():
+        risk_score, fraud_score, model_versions, shap_impacts, fraud_impacts = predict_risk_and_fraud(
+            payload, velocity=velocity, request=request, explain=mode.explain, fraud_rules_only=mode.fraud_rules_only
+        )
+    with stage("policy"):
+        pr = apply_policy(risk_score, fraud_score)
+
+    _observe(payload, risk_score, fraud_score, pr)
+    DECISION_TIER.labels(tier=tier).inc()
+
+    preview = build_preview(shap_impacts, fraud_impacts, velocity)
+    decision_id = build_decision_id()
+    store_decision(
+        db,
+        decision_id=decision_id,
+        client_id_hash=hash_client_id(payload.client.client_id),
+        risk_score=risk_score,
+        fraud_score=fraud_score,
+        decision=pr.decision,
+        policy_rule=pr.rule,
+        model_versions=model_versions,
+        explanations_preview=preview,
+        request_payload=request,
+        service_tier=tier,
+        amount=payload.transaction.amount,
+    )
+    # Challenger en shadow : mis en file, scoré par lots hors du chemin de requête
+    shadow_decision(payload, decision_id, risk_score, fraud_score, pr.decision, velocity=velocity)
+
+    body = {
+        "decision_id": decision_id,
+        "decision": pr.decision,
+        "risk_score": risk_score,
+        "fraud_score": fraud_score,
+        "policy_rule": pr.rule,
+        "model_versions": model_versions,
+        "explanations_preview": preview,
+        "report_summary": None,
+        "service_tier": tier,
+    }
+    if mode.report:
+        body["report_summary"] = await generate_report(_agent_payload(body))
+    _capture(payload, body, received_at)
+    return body
+
+
+def decide_batch(payloads: list[DecisionRequest], db: Session, mode: DecisionMode = FULL) -> list[dict]:
+    """
+    Étapes synchrones de `run_decision` pour un micro-lot, sans le rapport agent : un scoring
+    vectorisé, une insertion groupée, corps de réponse dans l'ordre des payloads.
+    """
+    if not payloads:
+        return []
+    received_at = time.time()
+    tier = mode.tier
+    requests = [p.model_dump() for p in payloads]
+    # Séquentiel : deux transactions du même client dans le lot se voient l'une l'autre
+    velocities = [observe_velocity(p) for p in payloads]
+
+    t0 = time.perf_counter()
+    scored = predict_risk_and_fraud_batch(
+        payloads, velocities, requests, explain=mode.explain, fraud_rules_only=mode.fraud_rules_only
+    )
+    # Coût d'inférence amorti par décision, comparable à celui de run_decision
+    per_decision = (time.perf_counter() - t0) / len(payloads)
+    for _ in payloads:
+        MODEL_LATENCY.observe(per_decision)
+
+    bodies, rows = [], []
+    for payload, request, velocity, decision_id, (risk_score, fraud_score, model_versions, shap_impacts, fraud_impacts) in zip(
+        payloads, requests, velocities, build_decision_ids(len(payloads)), scored
+    ):
+        with stage("policy"):
+            pr = apply_policy(risk_score, fraud_score)
+        _observe(payload, risk_score, fraud_score, pr)
+        preview = build_preview(shap_impacts, fraud_impacts, velocity)
+        rows.append({
+            "decision_id": decision_id,
+            "client_id_hash": hash_client_id(payload.client.client_id),
+            "risk_score": risk_score,
+            "fraud_score": fraud_score,
+            "decision": pr.decision,
+            "policy_rule": pr.rule,
+            "model_versions": model_versions,
+            "explanations_preview": preview,
+            "request_payload": request,
+            "service_tier": tier,
+            "amount": payload.transaction.amount,
+        })
+        bodies.append({
+            "decision_id": decision_id,
+            "decision": pr.decision,
+            "risk_score": risk_score,
+            "fraud_score": fraud_score,
+            "policy_rule": pr.rule,
+            "model_versions": model_versions,
+            "explanations_preview": preview,
+            "report_summary": None,
+            "service_tier": tier,
+        })
+    DECISION_TIER.labels(tier=tier).inc(len(bodies))
+    store_decisions(db, rows)
+
+    for payload, body, velocity in zip(payloads, bodies, velocities):
+        shadow_decision(payload, body["decision_id"], body["risk_score"], body["fraud_score"], body["decision"], velocity=velocity)
+        _capture(payload, body, received_at)
+    return bodies
+
+
+async def run_decision_batch(
+    payloads: list[DecisionRequest],
+    session_factory: Callable[[], Session],
+    mode: DecisionMode = FULL,
+    *,
+    report_concurrency: int = 8,
+) -> list[dict]:
+    """
+    `decide_batch` dans un thread (la boucle d'événements reste libre pendant le scoring), puis les
+    rapports agent du lot (si `mode.report`), au plus `report_concurrency` à la fois.
+    """
+    def _run() -> list[dict]:
+        db = session_factory()
+        try:
+            return decide_batch(payloads, db, mode)
+        finally:
+            db.close()
+
+    bodies = await asyncio.to_thread(_run)
+    if not mode.report or report_concurrency <= 0:
+        return bodies
+    # Un lot de 64 lignes ne lance pas 64 appels agent simultanés
+    slots = asyncio.Semaphore(report_concurrency)
+
+    async def _report(body: dict) -> None:
+        async with slots:
+            body["report_summary"] = await generate_report(_agent_payload(body))
+
+    await asyncio.gather(*(_report(b) for b in bodies))
+    return bodies
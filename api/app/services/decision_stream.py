@@ -0,0 +1,228 @@
+"""
+Décisions en flux NDJSON (POST /decision/stream) pour les producteurs qui poussent en continu.
+
+Trois étapes reliées par des files asyncio bornées :
+- lecture : corps chunked lu au fil de l'eau, découpé en lignes, chaque ligne validée (`DecisionRequest`) ;
+- scoring : micro-lots (jusqu'à `batch_size` lignes, ou `batch_wait_seconds` après la première),
+  `decision_pipeline.run_decision_batch` (un scoring vectorisé et une insertion par lot) ;
+  chaque micro-lot passe par le contrôle d'admission (services/admission.py) comme une requête
+  POST /decision : une place, et le mode dégradé du niveau de charge (sans rapport, sans SHAP,
+  fraude par règles) ; rapports agent au plus `report_concurrency` à la fois, aucun si 0 ;
+- écriture : une ligne NDJSON par ligne d'entrée non vide, dans l'ordre du corps.
+
+Contrôle de flux : au plus ~`max_in_flight` décisions entre lecture et écriture. Un client qui lit
+lentement bloque l'envoi (drain du transport), la file de sortie se remplit, le scoring s'arrête,
+la file d'entrée se remplit et la lecture du corps est suspendue : la pression remonte jusqu'au
+producteur (fenêtre TCP) au lieu de faire grossir des buffers.
+
+Ligne invalide (JSON, schéma, trop longue) : `{"line": n, "error": ..., "detail": [...]}` à sa place
+dans la sortie, le flux continue. Micro-lot refusé par l'admission (file pleine, attente dépassée) :
+`{"line": n, "error": "service overloaded", "retry_after": s}` pour chacune de ses lignes, à renvoyer
+par le client. Client déconnecté : lecture et scoring arrêtés.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+from ..schemas import DecisionRequest
+from .admission import AdmissionController, AdmissionRejected
+from .decision_pipeline import DecisionMode, run_decision_batch
+from .monitoring import DECISION_STREAM_BATCH_SIZE, DECISION_STREAM_LINES
+from .serialization import dumps_bytes
+
+_END = object()
+_TOO_LONG = object()
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse qui ne lit pas `receive` : le corps de la requête est consommé en parallèle
+    par le générateur (StreamingResponse écoute la déconnexion et volerait les morceaux du corps).
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[object]:
+    """Lignes (sans le `\\n`) d'un flux de morceaux ; `_TOO_LONG` pour une ligne dépassant la limite (ignorée)."""
+    buf = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            nl = chunk.find(b"\n", start)
+            if nl < 0:
+                if not skipping:
+                    buf += chunk[start:]
+                    if len(buf) > max_line_bytes:
+                        # Ligne sans fin : on ne bufferise pas plus, le reste est sauté jusqu'au prochain \n
+                        buf.clear()
+                        skipping = True
+                        yield _TOO_LONG
+                break
+            if skipping:
+                skipping = False
+            else:
+                buf += chunk[start:nl]
+                yield _TOO_LONG if len(buf) > max_line_bytes else bytes(buf)
+            buf.clear()
+            start = nl + 1
+    if buf and not skipping:
+        yield bytes(buf)
+
+
+def _error_line(line_no: int, error: str, detail: Optional[list] = None, **extra) -> bytes:
+    out = {"line": line_no, "error": error, **extra}
+    if detail is not None:
+        out["detail"] = detail
+    return dumps_bytes(out) + b"\n"
+
+
+class DecisionStream:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        *,
+        batch_size: int = 64,
+        batch_wait_seconds: float = 0.05,
+        max_in_flight: int = 512,
+        max_line_bytes: int = 65536,
+        report_concurrency: int = 8,
+        admission: Optional[AdmissionController] = None,
+        score_batch: Callable[..., Awaitable[list[dict]]] = run_decision_batch,
+    ):
+        self.session_factory = session_factory
+        self.report_concurrency = max(0, report_concurrency)
+        self.admission = admission
+        self.batch_size = max(1, batch_size)
+        self.batch_wait_seconds = batch_wait_seconds
+        self.max_line_bytes = max_line_bytes
+        self.score_batch = score_batch
+        # Entrée : un lot d'avance ; sortie : le reste du budget, en lots
+        self.inbox_size = self.batch_size
+        self.outbox_batches = max(1, max_in_flight // self.batch_size - 2)
+        self.disconnected = False
+
+    async def _read(self, chunks: AsyncIterator[bytes], receive, inbox: asyncio.Queue) -> None:
+        line_no = 0
+        try:
+            async for line in iter_lines(chunks, self.max_line_bytes):
+                line_no += 1
+                if line is _TOO_LONG:
+                    await inbox.put((line_no, None, _error_line(line_no, "line too long")))
+                    continue
+                if not line.strip():
+                    continue
+                try:
+                    payload = DecisionRequest.model_validate_json(line)
+                except ValidationError as e:
+                    detail = e.errors(include_url=False, include_context=False, include_input=False)
+                    await inbox.put((line_no, None, _error_line(line_no, "invalid request", detail)))
+                    continue
+                # File pleine : la lecture du corps attend que le scoring avance
+                await inbox.put((line_no, payload, None))
+        except ClientDisconnect:
+            self.disconnected = True
+        await inbox.put(_END)
+        if receive is not None and not self.disconnected:
+            # Corps terminé : seul message restant possible, la déconnexion du client
+            message = await receive()
+            self.disconnected = message["type"] == "http.disconnect"
+
+    async def _next_batch(self, inbox: asyncio.Queue) -> tuple[list, bool]:
+        item = await inbox.get()
+        if item is _END:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait_seconds
+        while len(batch) < self.batch_size:
+            try:
+                item = inbox.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(inbox.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is _END:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _admitted(self, payloads: list[DecisionRequest]) -> list[dict]:
+        """Un micro-lot = une place d'admission ; lève `AdmissionRejected` si aucune place à temps."""
+        report = self.report_concurrency > 0
+        if self.admission is None:
+            mode = DecisionMode.for_level(0, report=report)
+            return await self.score_batch(payloads, self.session_factory, mode, report_concurrency=self.report_concurrency)
+        async with self.admission.admit() as level:
+            mode = DecisionMode.for_level(level, report=report)
+            return await self.score_batch(payloads, self.session_factory, mode, report_concurrency=self.report_concurrency)
+
+    async def _score(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        done = False
+        while not done:
+            batch, done = await self._next_batch(inbox)
+            if not batch:
+                break
+            valid = [payload for _, payload, _ in batch if payload is not None]
+            bodies: list = []
+            rejected: Optional[AdmissionRejected] = None
+            if valid:
+                DECISION_STREAM_BATCH_SIZE.observe(len(valid))
+                try:
+                    bodies = await self._admitted(valid)
+                except AdmissionRejected as e:
+                    rejected = e
+                except Exception as e:
+                    print(f"ERROR: stream batch failed: {e}")
+                    bodies = None
+            out, k = [], 0
+            for line_no, payload, error in batch:
+                if payload is None:
+                    DECISION_STREAM_LINES.labels(result="invalid").inc()
+                    out.append(error)
+                elif rejected is not None:
+                    DECISION_STREAM_LINES.labels(result="rejected").inc()
+                    out.append(_error_line(line_no, "service overloaded", retry_after=rejected.retry_after))
+                elif bodies is None:
+                    DECISION_STREAM_LINES.labels(result="error").inc()
+                    out.append(_error_line(line_no, "scoring failed"))
+                else:
+                    DECISION_STREAM_LINES.labels(result="ok").inc()
+                    out.append(dumps_bytes(bodies[k]) + b"\n")
+                    k += 1
+            # File pleine : le scoring attend que le client lise
+            await outbox.put(b"".join(out))
+        await outbox.put(_END)
+
+    async def run(self, chunks: AsyncIterator[bytes], receive=None) -> AsyncIterator[bytes]:
+        """Lignes NDJSON de résultats, par lot, dans l'ordre des lignes d'entrée."""
+        inbox: asyncio.Queue = asyncio.Queue(maxsize=self.inbox_size)
+        outbox: asyncio.Queue = asyncio.Queue(maxsize=self.outbox_batches)
+        tasks = [
+            asyncio.create_task(self._read(chunks, receive, inbox)),
+            asyncio.create_task(self._score(inbox, outbox)),
+        ]
+        try:
+            while not self.disconnected:
+                item = await outbox.get()
+                if item is _END:
+                    break
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,243 @@
+"""
+Monitoring de dérive (drift) en streaming contre les distributions de référence d'entraînement.
+
+- Sur le chemin de la requête : `observe_drift(payload)` incrémente seulement des compteurs
+  (histogrammes sur les bornes de référence, fréquences catégorielles) dans le bucket de temps courant.
+- Hors chemin de requête : `run_drift_monitor` calcule périodiquement PSI / KS / chi² sur la fenêtre
+  glissante (somme des buckets) et exporte les scores par feature vers Prometheus.
+
+Mémoire fixe : n_buckets x (somme des bins de toutes les features), indépendante du trafic.
+
+Les références sont celles des versions servies : après un rechargement à chaud des modèles
+(`ml_client.reload_models`), `reload_drift_references` reconstruit le moniteur depuis les
+reference.json des nouvelles versions, fenêtre vide (trafic comparé à la bonne distribution).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from ..schemas import DecisionRequest
+from ..settings import settings
+from .monitoring import (
+    DRIFT_WARNING,
+    FEATURE_DRIFT_CHI2_PVALUE,
+    FEATURE_DRIFT_KS,
+    FEATURE_DRIFT_PSI,
+    DRIFT_WINDOW_SAMPLES,
+)
+
+_EPS = 1e-4
+
+_MONITOR: Optional["DriftMonitor"] = None
+_MONITOR_LOADED = False
+
+
+@dataclass(frozen=True)
+class _FeatureSpec:
+    model: str  # "credit_risk" | "fraud"
+    source: str  # "client" | "transaction"
+    name: str
+    kind: str  # "numeric" | "categorical"
+    offset: int
+    size: int
+    reference: np.ndarray
+    edges: tuple = ()
+    index: Optional[dict] = None  # modalité -> position (catégorielles)
+
+    def bin_of(self, value) -> int:
+        if self.kind == "numeric":
+            return self.offset + bisect_right(self.edges, float(value))
+        # Dernière case réservée aux modalités inconnues de la référence
+        return self.offset + self.index.get(str(value), self.size - 1)
+
+
+class DriftMonitor:
+    def __init__(
+        self,
+        references: dict,
+        *,
+        window_seconds: int = 3600,
+        bucket_seconds: int = 300,
+    ):
+        """`references` : {"credit_risk": profil reference.json, "fraud": profil reference.json}."""
+        sources = {"credit_risk": "client", "fraud": "transaction"}
+        specs = []
+        offset = 0
+        for model, profile in references.items():
+            for name, ref in profile.get("numeric", {}).items():
+                size = len(ref["edges"]) + 1
+                specs.append(_FeatureSpec(
+                    model, sources[model], name, "numeric", offset, size,
+                    np.asarray(ref["proportions"], dtype=float), edges=tuple(ref["edges"]),
+                ))
+                offset += size
+            for name, ref in profile.get("categorical", {}).items():
+                cats = list(ref["categories"])
+                size = len(cats) + 1
+                specs.append(_FeatureSpec(
+                    model, sources[model], name, "categorical", offset, size,
+                    np.asarray(list(ref["proportions"]) + [0.0], dtype=float),
+                    index={c: i for i, c in enumerate(cats)},
+                ))
+                offset += size
+
+        self.specs = specs
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = max(1, window_seconds // bucket_seconds)
+        self._counts = np.zeros((self.n_buckets, offset), dtype=np.int64)
+        self._samples = np.zeros(self.n_buckets, dtype=np.int64)
+        self._slot: Optional[int] = None
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Chemin de requête
+    # -----------------------------
+    def _rotate(self, now: float) -> int:
+        # Appelé sous verrou : remet à zéro les buckets sortis de la fenêtre
+        slot = int(now // self.bucket_seconds)
+        if self._slot is None:
+            self._slot = slot
+        elif slot > self._slot:
+            for s in range(self._slot + 1, min(slot, self._slot + self.n_buckets) + 1):
+                self._counts[s % self.n_buckets] = 0
+                self._samples[s % self.n_buckets] = 0
+            self._slot = slot
+        return self._slot % self.n_buckets
+
+    def observe(self, payload: DecisionRequest, now: Optional[float] = None) -> None:
+        parts = {"client": payload.client, "transaction": payload.transaction}
+        idx = [s.bin_of(getattr(parts[s.source], s.name)) for s in self.specs]
+        with self._lock:
+            b = self._rotate(time.time() if now is None else now)
+            # Les features occupent des plages disjointes : pas d'indice dupliqué
+            self._counts[b, idx] += 1
+            self._samples[b] += 1
+
+    # -----------------------------
+    # Calcul périodique (hors requête)
+    # -----------------------------
+    def compute(self, now: Optional[float] = None) -> list[dict]:
+        from scipy.stats import chi2
+
+        with self._lock:
+            self._rotate(time.time() if now is None else now)
+            window = self._counts.sum(axis=0)
+            samples = int(self._samples.sum())
+
+        results = []
+        for s in self.specs:
+            observed = window[s.offset:s.offset + s.size].astype(float)
+            n = int(observed.sum())
+            res = {"model": s.model, "feature": s.name, "kind": s.kind, "n": n, "psi": None, "ks": None, "chi2_pvalue": None}
+            if n > 0:
+                p = observed / n
+                q = s.reference
+                pc, qc = np.clip(p, _EPS, None), np.clip(q, _EPS, None)
+                res["psi"] = float(np.sum((pc - qc) * np.log(pc / qc)))
+                if s.kind == "numeric":
+                    # KS sur CDF binnée (bornes de référence) : borne inférieure du KS exact
+                    res["ks"] = float(np.max(np.abs(np.cumsum(p) - np.cumsum(q))))
+                else:
+                    expected = n * qc
+                    stat = float(np.sum((observed - expected) ** 2 / expected))
+                    res["chi2_pvalue"] = float(chi2.sf(stat, df=max(s.size - 1, 1)))
+            results.append(res)
+
+        DRIFT_WINDOW_SAMPLES.set(samples)
+        return results
+
+
+def export_drift(results: list[dict]) -> None:
+    for r in results:
+        if r["psi"] is None:
+            continue
+        FEATURE_DRIFT_PSI.labels(model=r["model"], feature=r["feature"]).set(r["psi"])
+        if r["ks"] is not None:
+            FEATURE_DRIFT_KS.labels(model=r["model"], feature=r["feature"]).set(r["ks"])
+        if r["chi2_pvalue"] is not None:
+            FEATURE_DRIFT_CHI2_PVALUE.labels(model=r["model"], feature=r["feature"]).set(r["chi2_pvalue"])
+        is_drift = r["n"] >= settings.drift_min_samples and r["psi"] >= settings.drift_psi_threshold
+        DRIFT_WARNING.labels(feature=r["feature"]).set(1 if is_drift else 0)
+
+
+def _load_references() -> dict:
+    from .ml_client import _find_fraud_model_path, _find_model_path
+
+    refs = {}
+    for model, finder in (("credit_risk", _find_model_path), ("fraud", _find_fraud_model_path)):
+        try:
+            path: Path = finder().parent / "reference.json"
+        except FileNotFoundError:
+            continue
+        if path.exists():
+            refs[model] = json.loads(path.read_text(encoding="utf-8"))
+    return refs
+
+
+def _build_monitor() -> Optional[DriftMonitor]:
+    refs = _load_references()
+    if not refs:
+        print("WARNING: drift monitor disabled (no reference.json next to model artifacts)")
+        return None
+    return DriftMonitor(
+        refs,
+        window_seconds=settings.drift_window_seconds,
+        bucket_seconds=settings.drift_bucket_seconds,
+    )
+
+
+def get_drift_monitor() -> Optional[DriftMonitor]:
+    global _MONITOR, _MONITOR_LOADED
+    if _MONITOR_LOADED:
+        return _MONITOR
+    _MONITOR_LOADED = True
+    if not settings.drift_enabled:
+        return None
+    _MONITOR = _build_monitor()
+    return _MONITOR
+
+
+def reload_drift_references() -> None:
+    """
+    Nouvelles versions servies : références relues, buckets remis à zéro (nouveau moniteur, remplacé
+    en une affectation). Alertes de l'ancien moniteur levées. Hors boucle d'événements (lecture disque).
+    """
+    global _MONITOR
+    if not _MONITOR_LOADED or not settings.drift_enabled:
+        return  # jamais chargé : le premier accès lira les références courantes
+    previous = _MONITOR
+    _MONITOR = _build_monitor()
+    if previous is not None:
+        for s in previous.specs:
+            DRIFT_WARNING.labels(feature=s.name).set(0)
+
+
+def observe_drift(payload: DecisionRequest) -> None:
+    monitor = _MONITOR if _MONITOR_LOADED else get_drift_monitor()
+    if monitor is not None:
+        monitor.observe(payload)
+
+
+async def run_drift_monitor(interval_seconds: float) -> None:
+    if not settings.drift_enabled:
+        return
+    while True:
+        await asyncio.sleep(interval_seconds)
+        # Relu à chaque tour : remplacé après un rechargement de modèles
+        monitor = get_drift_monitor()
+        if monitor is None:
+            continue
+        try:
+            export_drift(await asyncio.to_thread(monitor.compute))
+        except Exception as e:
+            # Le monitoring ne doit jamais faire tomber l'API
+            print(f"ERROR: drift computation failed: {e}")
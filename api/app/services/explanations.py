@@ -0,0 +1,180 @@
+"""
+Explications complètes à la demande pour `GET /explain`, persistées par décision.
+
+Au moment de la décision, seul l'aperçu top-5 est stocké. Au premier `GET /explain/{id}`, le vecteur
+complet (SHAP crédit et contributions fraude par chemins d'isolation, toutes les features d'origine)
+est recalculé depuis `request_payload` (+ vélocité stockée) avec les modèles des versions exactes de
+`model_versions`, puis écrit dans la table `explanations` : les appels suivants sont une lecture.
+
+Résolution d'une version : modèle servi (bundle ou registre) de même version, sinon répertoire
+`versions/<v>` désigné par le suffixe `@<v>` (chargé, vérifié, gardé dans un petit LRU). Une version
+introuvable (disposition à plat remplacée, modèle MLflow retiré) n'est pas approchée par un autre
+modèle : l'explication est signalée indisponible.
+
+Décision du palier `rules_only` (fraude `fraud:rules_precheck`, services/fraud_rules.py) : le SHAP
+crédit est calculé normalement, la partie fraude est la liste des règles déclenchées (recalculée à
+l'identique depuis le payload et la vélocité stockée : leur somme redonne le score).
+
+Le mode bulk (`GET /explain?ids=...`) calcule les absents en une passe vectorisée par couple de
+versions (crédit, fraude).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import joblib
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..db import Decision, Explanation
+from ..settings import settings
+from . import ml_client, model_store
+from .fraud_explainer import explainer_for
+from .fraud_rules import RULES_VERSION, fraud_precheck
+from .model_registry import get_registry
+from .monitoring import EXPLANATION_COMPUTE_SECONDS, EXPLANATION_REQUESTS
+
+_ARTIFACTS = {"credit": "credit_risk", "fraud": "fraud"}
+_ARCHIVED: "OrderedDict[str, object]" = OrderedDict()
+_ARCHIVE_LOCK = threading.Lock()
+
+# "Modèle" fraude des décisions scorées par le pré-contrôle à règles
+RULES = "rules"
+
+# Une décision REVIEW peut encore changer (POST /review) : revalidée par ETag, les autres sont immuables
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def _version_of(kind: str, model_dir) -> str:
+    return (ml_client._credit_version if kind == "credit" else ml_client._fraud_version)(model_dir)
+
+
+def _archived_model(kind: str, version: str) -> Optional[object]:
+    """Modèle du répertoire `versions/<v>` désigné par le suffixe `@<v>`, si sa version correspond."""
+    m = re.search(r"@([^@\[\]/]+)$", version)
+    root = model_store.find_artifact_root(_ARTIFACTS[kind])
+    if m is None or root is None:
+        return None
+    model_dir = root / model_store.VERSIONS_DIR / m.group(1)
+    if not (model_dir / model_store.MODEL_FILE).exists() or _version_of(kind, model_dir) != version:
+        return None
+    key = f"{kind}:{model_dir}"
+    with _ARCHIVE_LOCK:
+        model = _ARCHIVED.get(key)
+        if model is not None:
+            _ARCHIVED.move_to_end(key)
+            return model
+    model = joblib.load(model_dir / model_store.MODEL_FILE)
+    with _ARCHIVE_LOCK:
+        _ARCHIVED[key] = model
+        while len(_ARCHIVED) > max(1, settings.explain_archived_models):
+            _ARCHIVED.popitem(last=False)
+    return model
+
+
+def resolve_model(kind: str, version: str) -> Optional[object]:
+    """Modèle ("credit" | "fraud") ayant produit `version` (chaîne de model_versions) ; None si introuvable."""
+    if kind == "fraud" and version == RULES_VERSION:
+        return RULES
+    bundle = ml_client.get_bundle()
+    if version == (bundle.credit_version if kind == "credit" else bundle.fraud_version):
+        return bundle.credit if kind == "credit" else bundle.fraud
+    base = version
+    m = re.fullmatch(r"(.*)\[([^\]]+)\]", version)
+    if m is not None:
+        # Modèle du registre : résident de même version, sinon son répertoire versionné
+        base, key = m.groups()
+        registry = get_registry()
+        if registry is not None and key in registry.specs and registry.specs[key].kind == kind:
+            resident = registry.get(key)
+            if resident.version == version:
+                return resident.model
+    return _archived_model(kind, base)
+
+
+def _full_vectors(names: list[str], impacts: np.ndarray) -> list[list[dict]]:
+    order = np.argsort(-np.abs(impacts), axis=1, kind="stable")
+    return [
+        [{"feature": names[j], "impact": "+" if row[j] > 0 else "-", "value": float(row[j])} for j in idx]
+        for row, idx in zip(impacts, order)
+    ]
+
+
+def compute_explanations(rows: list[Decision], credit_model, fraud_model) -> list[Explanation]:
+    """Vecteurs complets pour des décisions scorées par les mêmes modèles, en une passe par modèle."""
+    payloads = [r.request_payload for r in rows]
+    credit, fraud = [[] for _ in rows], [[] for _ in rows]
+
+    res = ml_client.shap_matrix(credit_model, ml_client.credit_frame([p["client"] for p in payloads]))
+    if res is not None:
+        credit = _full_vectors(*res)
+
+    # Vélocité telle qu'au moment de la décision (absente = 0, comme au scoring)
+    velocity = [(r.explanations_preview or {}).get("fraud_velocity") or {} for r in rows]
+    if fraud_model is RULES:
+        fraud = [sorted(fraud_precheck(p["transaction"], v)[1], key=lambda f: -f["value"]) for p, v in zip(payloads, velocity)]
+    elif (explainer := explainer_for(fraud_model)) is not None:
+        _, impacts = explainer.contributions(ml_client.fraud_frame([p["transaction"] for p in payloads], velocity))
+        fraud = _full_vectors(explainer.names, impacts)
+
+    return [Explanation(decision_id=r.decision_id, credit=c, fraud=f) for r, c, f in zip(rows, credit, fraud)]
+
+
+def get_explanations(db: Session, rows: list[Decision]) -> tuple[dict[str, Explanation], list[str]]:
+    """
+    Explications des décisions `rows` : lues en base, sinon calculées (groupées par versions de modèles)
+    et persistées. Renvoie ({decision_id: Explanation}, ids dont un modèle est introuvable).
+    """
+    ids = [r.decision_id for r in rows]
+    found = {e.decision_id: e for e in db.query(Explanation).filter(Explanation.decision_id.in_(ids))} if ids else {}
+    EXPLANATION_REQUESTS.labels(result="hit").inc(len(found))
+
+    groups: dict[tuple[str, str], list[Decision]] = {}
+    for r in rows:
+        if r.decision_id not in found:
+            versions = r.model_versions or {}
+            groups.setdefault((versions.get("credit_risk", ""), versions.get("fraud", "")), []).append(r)
+
+    unavailable, computed = [], []
+    for (credit_version, fraud_version), group in groups.items():
+        credit_model, fraud_model = resolve_model("credit", credit_version), resolve_model("fraud", fraud_version)
+        if credit_model is None or fraud_model is None:
+            unavailable.extend(r.decision_id for r in group)
+            continue
+        t0 = time.perf_counter()
+        computed.extend(compute_explanations(group, credit_model, fraud_model))
+        EXPLANATION_COMPUTE_SECONDS.observe(time.perf_counter() - t0)
+    EXPLANATION_REQUESTS.labels(result="miss").inc(len(computed))
+    EXPLANATION_REQUESTS.labels(result="unavailable").inc(len(unavailable))
+
+    if computed:
+        db.add_all(computed)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Calcul concurrent de la même décision : résultat identique, on relit celui déjà stocké
+            db.rollback()
+            stored = {e.decision_id: e for e in db.query(Explanation).filter(Explanation.decision_id.in_([e.decision_id for e in computed]))}
+            computed = [stored.get(e.decision_id, e) for e in computed]
+        found.update((e.decision_id, e) for e in computed)
+    return found, unavailable
+
+
+def etag_for(rows: Iterable[Decision]) -> str:
+    """ETag fort : identité des décisions, versions des modèles et décision courante (modifiée par une revue)."""
+    h = hashlib.sha256()
+    for r in rows:
+        h.update(json.dumps([r.decision_id, r.model_versions, r.decision], sort_keys=True).encode("utf-8"))
+    return f'"{h.hexdigest()[:32]}"'
+
+
+def cache_control_for(rows: Iterable[Decision]) -> str:
+    return REVALIDATE_CACHE_CONTROL if any(r.decision == "REVIEW" for r in rows) else IMMUTABLE_CACHE_CONTROL
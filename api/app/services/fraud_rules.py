@@ -0,0 +1,51 @@
+"""
+Pré-contrôle fraude par règles, sans modèle : mode dégradé `rules_only` (services/admission.py)
+quand le service est saturé.
+
+Signaux repris du générateur d'entraînement (ml/training/train_fraud.py) et des features de
+vélocité ; le score est la somme des poids des règles déclenchées (bornée à 1). Calibrage
+conservateur : une règle isolée reste loin du seuil ALERT (0.85 par défaut), le profil complet
+nouvel appareil + nuit + gros montant + loin du domicile, ou une rafale de vélocité combinée à
+d'autres signaux, l'atteint. La décision porte la version `fraud:rules_precheck` ; GET /explain
+en donne le SHAP crédit et, pour la fraude, les règles déclenchées.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+RULES_VERSION = "fraud:rules_precheck"
+
+# (feature, poids)
+RULE_WEIGHTS = {
+    "is_new_device": 0.25,
+    "hour": 0.20,  # nuit : 23h-5h
+    "amount": 0.20,  # > 800
+    "distance_from_home_km": 0.20,  # > 200 km
+    "tx_count_10m": 0.30,  # >= 5 transactions sur 10 min
+    "distinct_countries_1h": 0.30,  # >= 3 pays sur 1 h
+}
+
+
+def fired_rules(transaction: dict, velocity: Optional[dict] = None) -> list[str]:
+    velocity = velocity or {}
+    fired = []
+    if transaction["is_new_device"]:
+        fired.append("is_new_device")
+    if transaction["hour"] >= 23 or transaction["hour"] <= 5:
+        fired.append("hour")
+    if transaction["amount"] > 800:
+        fired.append("amount")
+    if transaction["distance_from_home_km"] > 200:
+        fired.append("distance_from_home_km")
+    if velocity.get("tx_count_10m", 0) >= 5:
+        fired.append("tx_count_10m")
+    if velocity.get("distinct_countries_1h", 0) >= 3:
+        fired.append("distinct_countries_1h")
+    return fired
+
+
+def fraud_precheck(transaction: dict, velocity: Optional[dict] = None) -> tuple[float, list[dict]]:
+    """Score fraude par règles et règles déclenchées (forme FeatureContribution, poids en valeur)."""
+    fired = fired_rules(transaction, velocity)
+    score = min(1.0, sum(RULE_WEIGHTS[f] for f in fired))
+    return score, [{"feature": f, "impact": "+", "value": RULE_WEIGHTS[f]} for f in fired]
@@ -0,0 +1,304 @@
+"""
+Clés d'idempotence (en-tête `Idempotency-Key`) pour les routes de décision.
+
+Un retry de la passerelle après timeout ne doit ni rescorer, ni créer une seconde ligne
+`decisions`, ni rappeler l'agent : la première réponse complète est rejouée telle quelle.
+
+- Table `idempotency_keys` (clé primaire = route + clé), partagée par les workers : une ligne
+  "en cours" (sans réponse, bail de `lease_seconds`) est posée avant le calcul, la réponse encodée
+  y est écrite à la fin avec l'expiration `ttl_seconds`.
+- Front LRU en mémoire (par worker) pour les rejeux sans aller-retour base.
+- Doublons concurrents dans le même worker : ils attendent le calcul en vol (future asyncio) ;
+  dans un autre worker : ils relisent la ligne jusqu'à la réponse (`wait_seconds` max, puis 409).
+- Même clé avec une autre requête : 422 (empreinte SHA-256 du corps brut et des paramètres de
+  requête triés : `?explain=false` ou `?report=false` changent la réponse).
+- Échec du calcul : la ligne "en cours" est supprimée, un retry recalcule. Bail expiré (worker
+  mort en plein calcul) : la clé est reprise. Lignes expirées purgées en tâche de fond.
+- Accès base (SQLAlchemy synchrone) dans un thread (`asyncio.to_thread`) : la boucle d'événements
+  n'attend pas sqlite ou le réseau.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..db import IdempotencyKey, SessionLocal
+from ..settings import settings
+from .monitoring import IDEMPOTENCY_REQUESTS
+
+
+class IdempotencyError(Exception):
+    status_code = 409
+
+
+class IdempotencyMismatch(IdempotencyError):
+    """Clé déjà utilisée pour une autre requête (corps ou paramètres)."""
+
+    status_code = 422
+
+
+class IdempotencyInProgress(IdempotencyError):
+    """Calcul toujours en cours ailleurs après `wait_seconds`."""
+
+    status_code = 409
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    request_hash: str
+    body: bytes
+    expires_at: float
+
+
+def request_fingerprint(body: bytes, query: str = "") -> str:
+    # Paramètres triés : `?report=false&explain=false` et `?explain=false&report=false` sont la même requête
+    params = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    return hashlib.sha256(params.encode() + b"\n" + body).hexdigest()
+
+
+def _utc(ts: float) -> datetime:
+    # Colonnes DateTime naïves en UTC, comme le reste du schéma (datetime.utcnow)
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _ts(dt: datetime) -> float:
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        *,
+        ttl_seconds: float = 86400.0,
+        max_entries: int = 10_000,
+        lease_seconds: float = 60.0,
+        wait_seconds: float = 30.0,
+        poll_seconds: float = 0.05,
+    ):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lease_seconds = lease_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self._memory: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: dict[str, tuple[str, asyncio.Future]] = {}
+
+    # -----------------------------
+    # Front mémoire
+    # -----------------------------
+    def _memory_get(self, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry
+
+    def _memory_put(self, key: str, entry: StoredResponse) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    # -----------------------------
+    # Table idempotency_keys
+    # -----------------------------
+    def _claim(self, key: str, request_hash: str) -> Optional[IdempotencyKey]:
+        """Pose la ligne "en cours" ; renvoie la ligne existante (réponse ou bail actif) si la clé est prise."""
+        now = time.time()
+        db = self.session_factory()
+        try:
+            row = db.get(IdempotencyKey, key)
+            if row is not None and row.expires_at > _utc(now):
+                db.expunge(row)
+                return row
+            if row is not None:
+                # Réponse expirée ou bail abandonné : la clé est reprise
+                db.delete(row)
+                db.flush()
+            db.add(IdempotencyKey(key=key, request_hash=request_hash, expires_at=_utc(now + self.lease_seconds)))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                row = db.get(IdempotencyKey, key)
+                if row is not None:
+                    db.expunge(row)
+                return row
+            return None
+        finally:
+            db.close()
+
+    def _complete(self, key: str, body: bytes, decision_id: Optional[str]) -> float:
+        expires_at = time.time() + self.ttl_seconds
+        db = self.session_factory()
+        try:
+            row = db.get(IdempotencyKey, key)
+            if row is not None:
+                row.response = body
+                row.decision_id = decision_id
+                row.expires_at = _utc(expires_at)
+                db.commit()
+        finally:
+            db.close()
+        return expires_at
+
+    def _release(self, key: str) -> None:
+        db = self.session_factory()
+        try:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.response.is_(None)))
+            db.commit()
+        finally:
+            db.close()
+
+    def _load(self, key: str) -> Optional[IdempotencyKey]:
+        db = self.session_factory()
+        try:
+            row = db.get(IdempotencyKey, key)
+            if row is not None:
+                db.expunge(row)
+            return row
+        finally:
+            db.close()
+
+    def purge_expired(self) -> int:
+        db = self.session_factory()
+        try:
+            n = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())).rowcount
+            db.commit()
+            return n
+        finally:
+            db.close()
+
+    def _stored(self, key: str, row: IdempotencyKey) -> StoredResponse:
+        entry = StoredResponse(row.request_hash, row.response, _ts(row.expires_at))
+        self._memory_put(key, entry)
+        return entry
+
+    async def _wait_other_worker(self, key: str, request_hash: str) -> bytes:
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_seconds)
+            row = await asyncio.to_thread(self._load, key)
+            if row is None:
+                break  # calcul échoué ailleurs : la ligne a été libérée
+            if row.request_hash != request_hash:
+                raise IdempotencyMismatch("Idempotency-Key already used with a different request (body or query)")
+            if row.response is not None:
+                return self._stored(key, row).body
+        IDEMPOTENCY_REQUESTS.labels(result="in_progress").inc()
+        raise IdempotencyInProgress("A request with this Idempotency-Key is still being processed")
+
+    # -----------------------------
+    # Point d'entrée
+    # -----------------------------
+    async def run(
+        self, key: str, request_hash: str, compute: Callable[[], Awaitable[tuple[bytes, Optional[str]]]]
+    ) -> tuple[bytes, bool]:
+        """
+        Réponse pour cette clé : rejouée si déjà calculée (ou en cours), sinon `compute()` ->
+        (corps encodé, decision_id) une seule fois. Renvoie (corps, rejouée).
+        """
+        entry = self._memory_get(key)
+        if entry is not None:
+            if entry.request_hash != request_hash:
+                IDEMPOTENCY_REQUESTS.labels(result="mismatch").inc()
+                raise IdempotencyMismatch("Idempotency-Key already used with a different request (body or query)")
+            IDEMPOTENCY_REQUESTS.labels(result="hit").inc()
+            return entry.body, True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            if inflight[0] != request_hash:
+                IDEMPOTENCY_REQUESTS.labels(result="mismatch").inc()
+                raise IdempotencyMismatch("Idempotency-Key already used with a different request (body or query)")
+            IDEMPOTENCY_REQUESTS.labels(result="joined").inc()
+            return await asyncio.shield(inflight[1]), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (request_hash, future)
+        try:
+            existing = await asyncio.to_thread(self._claim, key, request_hash)
+            if existing is not None:
+                if existing.request_hash != request_hash:
+                    IDEMPOTENCY_REQUESTS.labels(result="mismatch").inc()
+                    raise IdempotencyMismatch("Idempotency-Key already used with a different request (body or query)")
+                if existing.response is not None:
+                    IDEMPOTENCY_REQUESTS.labels(result="hit").inc()
+                    body = self._stored(key, existing).body
+                else:
+                    IDEMPOTENCY_REQUESTS.labels(result="joined").inc()
+                    body = await self._wait_other_worker(key, request_hash)
+                future.set_result(body)
+                return body, True
+
+            IDEMPOTENCY_REQUESTS.labels(result="miss").inc()
+            try:
+                body, decision_id = await compute()
+            except BaseException:
+                await asyncio.to_thread(self._release, key)
+                raise
+            expires_at = await asyncio.to_thread(self._complete, key, body, decision_id)
+            self._memory_put(key, StoredResponse(request_hash, body, expires_at))
+            future.set_result(body)
+            return body, False
+        except BaseException as e:
+            # Les doublons en attente reçoivent la même erreur (ex. 404 de /decision/transaction)
+            if not future.done():
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    future.exception()  # marquée consultée : pas d'avertissement si personne n'attendait
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+
+async def run_idempotency_purge(store: IdempotencyStore, interval_seconds: float) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            n = await asyncio.to_thread(store.purge_expired)
+            if n:
+                print(f"INFO: purged {n} expired idempotency keys")
+        except Exception as e:
+            print(f"ERROR: idempotency purge failed: {e}")
+
+
+_STORE: Optional[IdempotencyStore] = None
+_LOADED = False
+
+
+def get_idempotency_store() -> Optional[IdempotencyStore]:
+    global _STORE, _LOADED
+    if _LOADED:
+        return _STORE
+    _LOADED = True
+    if settings.idempotency_enabled:
+        _STORE = IdempotencyStore(
+            SessionLocal,
+            ttl_seconds=settings.idempotency_ttl_seconds,
+            max_entries=settings.idempotency_memory_entries,
+            lease_seconds=settings.idempotency_lease_seconds,
+            wait_seconds=settings.idempotency_wait_seconds,
+        )
+    return _STORE
@@ -0,0 +1,350 @@
+"""
+Ré-entraînement incrémental du modèle crédit à partir des décisions revues (`/review/{decision_id}`).
+
+Chaque revue humaine d'une décision crédit (REVIEW, ACCEPT ou REJECT automatique) devient une
+étiquette tirée du jugement de l'analyste (`human_decision` : REJECT -> défaut = 1, APPROVE -> 0) sur
+les features `client` du `request_payload`. Pas `final_decision` : hors REVIEW elle reprend la
+décision du modèle, un désaveu humain serait appris comme la sortie du modèle. Les revues d'une
+alerte fraude (ALERT) ne disent rien du risque crédit et sont ignorées.
+
+- Watermark : `reviews.id` de la dernière revue consommée (`incremental/state.json`). Un run ne lit
+  que les revues postérieures, par blocs (pagination sur la clé primaire, sans OFFSET) : coût
+  proportionnel au nombre de nouvelles étiquettes, pas à l'historique.
+- Mise à jour à chaud du modèle de base, préprocesseur figé :
+  régression logistique -> SGDClassifier initialisé avec ses coefficients puis `partial_fit` ;
+  SGDClassifier (chemin out-of-core) -> `partial_fit` directement ;
+  XGBoost -> quelques arbres ajoutés au booster existant.
+- Holdout : ~20 % des décisions (hash du decision_id, donc jamais à la fois en train et en test)
+  mis de côté à chaque run et conservés (`incremental/holdout.parquet`, borné). Base et candidat
+  y sont évalués (log-loss, AUC et rappel si les deux classes sont présentes).
+- Publication : `versions/inc-<horodatage>-r<watermark>/` (model.joblib, metrics.json, schema.json, reference.json),
+  par `model_store.publish_version` (répertoire temporaire renommé, comme les scripts d'entraînement). Le run suivant repart de la dernière version
+  publiée ; un ré-entraînement complet (nouveau `mlflow_run_id` dans la version servie)
+  réinitialise la chaîne et le watermark.
+- Promotion (`--promote`) : si le candidat ne dégrade pas la log-loss du holdout (tolérance
+  `--tolerance`), la publication active la nouvelle version (pointeur `current`) ; sinon elle est
+  seulement publiée. Les workers API la chargent à chaud.
+
+Usage CLI (depuis api/) :
+    python -m app.services.incremental_training
+    python -m app.services.incremental_training --promote --min-labels 200
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import log_loss, recall_score, roc_auc_score
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..db import Decision, Review, SessionLocal
+from . import model_store
+from .ml_client import CREDIT_FEATURES, _find_model_path, credit_frame
+
+LABELS = {"APPROVE": 0, "REJECT": 1}
+CREDIT_DECISIONS = ("REVIEW", "ACCEPT", "REJECT")
+STATE_DIR = "incremental"
+COPIED_FILES = ("schema.json", "reference.json")
+
+
+@dataclass
+class IncrementalConfig:
+    chunk_size: int = 1_000
+    epochs: int = 3
+    eta0: float = 1e-3
+    alpha: float = 1e-4
+    xgb_rounds: int = 20  # arbres ajoutés par bloc (base XGBoost)
+    holdout_fraction: float = 0.2
+    holdout_max: int = 20_000
+    min_labels: int = 50
+    tolerance: float = 0.0
+    promote: bool = False
+
+
+# -----------------------------
+# Lecture des étiquettes
+# -----------------------------
+def _labelled_reviews():
+    return (
+        select(Review.id, Decision.decision_id, Review.human_decision, Decision.request_payload)
+        .join(Decision, Review.decision_id_fk == Decision.id)
+        .where(Review.previous_decision.in_(CREDIT_DECISIONS), Review.human_decision.in_(tuple(LABELS)))
+    )
+
+
+def count_new_labels(db: Session, after_review_id: int) -> int:
+    stmt = select(func.count()).select_from(_labelled_reviews().where(Review.id > after_review_id).subquery())
+    return int(db.execute(stmt).scalar_one())
+
+
+def iter_reviewed_chunks(db: Session, after_review_id: int, chunk_size: int) -> Iterator[list]:
+    """Revues étiquetables d'id > `after_review_id`, par blocs, dans l'ordre des ids."""
+    last_id = after_review_id
+    while True:
+        stmt = _labelled_reviews().where(Review.id > last_id).order_by(Review.id).limit(chunk_size)
+        rows = db.execute(stmt).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _is_holdout(decision_id: str, fraction: float) -> bool:
+    h = int.from_bytes(hashlib.sha1(decision_id.encode("utf-8")).digest()[:4], "big")
+    return h / 2**32 < fraction
+
+
+def rows_to_frame(rows: list) -> tuple[pd.DataFrame, np.ndarray, list[str]]:
+    X = credit_frame([r.request_payload["client"] for r in rows])
+    y = np.array([LABELS[r.human_decision] for r in rows], dtype=np.int8)
+    return X, y, [r.decision_id for r in rows]
+
+
+# -----------------------------
+# Mise à jour du modèle
+# -----------------------------
+def _balanced_weights(default_rate: Optional[float]) -> Optional[dict]:
+    # Même pondération que class_weight="balanced" à l'entraînement initial
+    if not default_rate or not 0 < default_rate < 1:
+        return None
+    return {0: 1 / (2 * (1 - default_rate)), 1: 1 / (2 * default_rate)}
+
+
+def warm_start(pipeline, cfg: IncrementalConfig, default_rate: Optional[float]):
+    """Copie du pipeline dont l'étape `model` peut être mise à jour par `update`."""
+    model = copy.deepcopy(pipeline)
+    clf = model.named_steps["model"]
+    if isinstance(clf, SGDClassifier):
+        return model
+    if hasattr(clf, "get_booster"):
+        return model
+    if not hasattr(clf, "coef_"):
+        raise ValueError(f"Incremental update not supported for {type(clf).__name__}")
+    sgd = SGDClassifier(
+        loss="log_loss",
+        alpha=cfg.alpha,
+        learning_rate="constant",
+        eta0=cfg.eta0,
+        class_weight=_balanced_weights(default_rate) if getattr(clf, "class_weight", None) == "balanced" else None,
+    )
+    sgd.coef_ = clf.coef_.copy()
+    sgd.intercept_ = clf.intercept_.copy()
+    sgd.classes_ = clf.classes_
+    model.steps[-1] = ("model", sgd)
+    return model
+
+
+def update(model, X: pd.DataFrame, y: np.ndarray, cfg: IncrementalConfig) -> None:
+    clf = model.named_steps["model"]
+    Xt = model.named_steps["preprocess"].transform(X)
+    if isinstance(clf, SGDClassifier):
+        for _ in range(cfg.epochs):
+            clf.partial_fit(Xt, y, classes=np.array([0, 1]))
+        return
+    # XGBoost : continuer le boosting depuis le booster courant
+    booster = clf.get_booster()
+    params = {**clf.get_params(), "n_estimators": cfg.xgb_rounds, "early_stopping_rounds": None}
+    new = type(clf)(**params)
+    new.fit(Xt, y, xgb_model=booster, verbose=False)
+    model.steps[-1] = ("model", new)
+
+
+def holdout_metrics(model, X: pd.DataFrame, y: np.ndarray) -> dict:
+    if len(y) == 0:
+        return {"n": 0}
+    proba = model.predict_proba(X)[:, 1]
+    out = {"n": int(len(y)), "log_loss": float(log_loss(y, proba, labels=[0, 1]))}
+    if len(np.unique(y)) == 2:
+        out["auc"] = float(roc_auc_score(y, proba))
+        out["recall_default"] = float(recall_score(y, (proba >= 0.5).astype(int), pos_label=1))
+    return out
+
+
+# -----------------------------
+# État, holdout, publication
+# -----------------------------
+def _read_json(path: Path, default=None):
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else default
+
+
+def _write_json_atomic(path: Path, data: dict) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def load_state(artifacts_dir: Path) -> dict:
+    return _read_json(artifacts_dir / STATE_DIR / "state.json", {"last_review_id": 0, "base_version": None, "versions": []})
+
+
+def _load_holdout(artifacts_dir: Path) -> pd.DataFrame:
+    path = artifacts_dir / STATE_DIR / "holdout.parquet"
+    if path.exists():
+        return pd.read_parquet(path)
+    return pd.DataFrame(columns=[*CREDIT_FEATURES, "label", "decision_id"])
+
+
+def _save_holdout(artifacts_dir: Path, df: pd.DataFrame) -> None:
+    path = artifacts_dir / STATE_DIR / "holdout.parquet"
+    tmp = path.with_name(f".{path.name}.tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _base(artifacts_dir: Path, state: dict) -> tuple[Path, dict]:
+    """Répertoire du modèle de base et état effectif (réinitialisé après un ré-entraînement complet)."""
+    served = model_store.current_dir(artifacts_dir)
+    root_run = _read_json(served / "metrics.json", {}).get("mlflow_run_id")
+    if state.get("root_run_id") != root_run:
+        state = {"last_review_id": 0, "base_version": None, "versions": [], "root_run_id": root_run}
+    if state["base_version"]:
+        return artifacts_dir / model_store.VERSIONS_DIR / state["base_version"], state
+    return served, state
+
+
+def publish_version(
+    artifacts_dir: Path, version: str, model, metrics: dict, base_dir: Path, *, activate_after: bool = False
+) -> Path:
+    """Version complète (modèle, métriques, fichiers du modèle de base) ; activée seulement si `activate_after`."""
+    with model_store.publish_version(artifacts_dir, version, activate_after=activate_after) as tmp:
+        joblib.dump(model, tmp / model_store.MODEL_FILE)
+        (tmp / "metrics.json").write_text(json.dumps(metrics, indent=2, ensure_ascii=False), encoding="utf-8")
+        for name in COPIED_FILES:
+            if (base_dir / name).exists():
+                shutil.copy2(base_dir / name, tmp / name)
+    return artifacts_dir / model_store.VERSIONS_DIR / version
+
+
+def run_incremental(db: Session, artifacts_dir: Path, cfg: IncrementalConfig) -> dict:
+    t0 = time.perf_counter()
+    (artifacts_dir / STATE_DIR).mkdir(parents=True, exist_ok=True)
+    base_dir, state = _base(artifacts_dir, load_state(artifacts_dir))
+    watermark = state["last_review_id"]
+
+    n_new = count_new_labels(db, watermark)
+    if n_new < cfg.min_labels:
+        return {"status": "skipped", "new_labels": n_new, "min_labels": cfg.min_labels, "last_review_id": watermark}
+
+    base_model = joblib.load(base_dir / "model.joblib")
+    base_metrics = _read_json(base_dir / "metrics.json", {})
+    model = warm_start(base_model, cfg, base_metrics.get("default_rate"))
+
+    holdout_new, n_train, n_pos, last_id = [], 0, 0, watermark
+    for rows in iter_reviewed_chunks(db, watermark, cfg.chunk_size):
+        X, y, ids = rows_to_frame(rows)
+        held = np.array([_is_holdout(d, cfg.holdout_fraction) for d in ids], dtype=bool)
+        if held.any():
+            holdout_new.append(X[held].assign(label=y[held], decision_id=np.asarray(ids)[held]))
+        if (~held).any():
+            update(model, X[~held], y[~held], cfg)
+            n_train += int((~held).sum())
+            n_pos += int(y[~held].sum())
+        last_id = rows[-1][0]
+    t_train = time.perf_counter() - t0
+
+    frames = [f for f in (_load_holdout(artifacts_dir), *holdout_new) if len(f)]
+    holdout = pd.concat(frames, ignore_index=True) if frames else _load_holdout(artifacts_dir)
+    holdout = holdout.drop_duplicates("decision_id", keep="last").tail(cfg.holdout_max)
+    X_h, y_h = holdout[CREDIT_FEATURES], holdout["label"].to_numpy(dtype=np.int8)
+    eval_base = holdout_metrics(base_model, X_h, y_h)
+    eval_candidate = holdout_metrics(model, X_h, y_h)
+    gate_passed = eval_base["n"] > 0 and eval_candidate["log_loss"] <= eval_base["log_loss"] + cfg.tolerance
+
+    version = f"inc-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-r{last_id}"
+    incremental = {
+        "version": version,
+        "base_version": state["base_version"],
+        "review_id_range": [watermark + 1, last_id],
+        "n_train": n_train,
+        "n_train_default": n_pos,
+        "n_holdout_new": int(sum(len(h) for h in holdout_new)),
+        "holdout_base": eval_base,
+        "holdout_candidate": eval_candidate,
+        "gate_passed": bool(gate_passed),
+        "config": asdict(cfg),
+        "train_s": t_train,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    metrics = {
+        **{k: v for k, v in base_metrics.items() if k != "incremental"},
+        "best_model": f"{base_metrics.get('best_model', 'model').split('+')[0]}+{version}",
+        "incremental": incremental,
+    }
+    # Activation conditionnée à l'évaluation : un candidat qui dégrade le holdout reste publié, pas servi
+    promoted = bool(cfg.promote and gate_passed)
+    version_dir = publish_version(artifacts_dir, version, model, metrics, base_dir, activate_after=promoted)
+
+    # Holdout et watermark enregistrés seulement une fois la version publiée
+    _save_holdout(artifacts_dir, holdout)
+    state.update(
+        last_review_id=last_id,
+        base_version=version,
+        versions=[*state["versions"], {"version": version, "promoted": promoted, **{k: incremental[k] for k in ("n_train", "gate_passed")}}],
+    )
+    _write_json_atomic(artifacts_dir / STATE_DIR / "state.json", state)
+
+    return {
+        "status": "published",
+        "version": version,
+        "path": str(version_dir),
+        "promoted": promoted,
+        "new_labels": n_new,
+        "n_train": n_train,
+        "holdout_base": eval_base,
+        "holdout_candidate": eval_candidate,
+        "last_review_id": last_id,
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def _parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Incremental credit model update from reviewed decisions")
+    p.add_argument("--artifacts-dir", help="Credit risk artifacts directory (default: located like the API model)")
+    p.add_argument("--chunk-size", type=int, default=IncrementalConfig.chunk_size)
+    p.add_argument("--epochs", type=int, default=IncrementalConfig.epochs)
+    p.add_argument("--eta0", type=float, default=IncrementalConfig.eta0)
+    p.add_argument("--min-labels", type=int, default=IncrementalConfig.min_labels)
+    p.add_argument("--holdout-fraction", type=float, default=IncrementalConfig.holdout_fraction)
+    p.add_argument("--tolerance", type=float, default=IncrementalConfig.tolerance, help="Allowed holdout log-loss increase")
+    p.add_argument("--promote", action="store_true", help="Replace the served model if the holdout gate passes")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = _parse_args(argv)
+    cfg = IncrementalConfig(
+        chunk_size=args.chunk_size,
+        epochs=args.epochs,
+        eta0=args.eta0,
+        min_labels=args.min_labels,
+        holdout_fraction=args.holdout_fraction,
+        tolerance=args.tolerance,
+        promote=args.promote,
+    )
+    artifacts_dir = Path(args.artifacts_dir) if args.artifacts_dir else model_store.find_artifact_root("credit_risk")
+    if artifacts_dir is None:
+        _find_model_path()  # FileNotFoundError explicite
+    db = SessionLocal()
+    try:
+        summary = run_incremental(db, artifacts_dir, cfg)
+    finally:
+        db.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
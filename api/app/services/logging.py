@@ -1,8 +1,11 @@
 import hashlib
 from datetime import datetime
+from typing import Optional
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from ..db import Decision
 from ..settings import settings
+from .tracing import stage
 
 def hash_client_id(client_id: str) -> str:
     # Pseudonymisation pour le RGPD : ne pas stocker les identifiants clients bruts
@@ -14,6 +17,11 @@ def build_decision_id() -> str:
     now = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
     return f"dcn_{now}"
 
+def build_decision_ids(n: int) -> list[str]:
+    # Micro-lot : même horodatage + rang (des appels successifs peuvent tomber dans la même microseconde)
+    base = build_decision_id()
+    return [f"{base}_{k}" for k in range(n)]
+
 def store_decision(
     db: Session,
     *,
@@ -26,6 +34,8 @@ def store_decision(
     model_versions: dict,
     explanations_preview: dict,
     request_payload: dict,
+    service_tier: Optional[str] = None,
+    amount: Optional[float] = None,
 ) -> Decision:
     row = Decision(
         decision_id=decision_id,
@@ -37,8 +47,19 @@ def store_decision(
         model_versions=model_versions,
         explanations_preview=explanations_preview,
         request_payload=request_payload,
+        service_tier=service_tier,
+        amount=amount,
     )
     db.add(row)
-    db.commit()
-    db.refresh(row)
+    with stage("db_commit"):
+        db.commit()
+    # Pas de refresh : l'appelant connaît déjà toutes les valeurs (rechargées à la demande si lues)
     return row
+
+def store_decisions(db: Session, rows: list[dict]) -> None:
+    """Insertion groupée (routes batch / stream) : une requête INSERT et un commit par micro-lot."""
+    if not rows:
+        return
+    with stage("db_commit"):
+        db.execute(insert(Decision), rows)
+        db.commit()
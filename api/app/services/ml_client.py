@@ -1,5 +1,11 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional
 
@@ -9,28 +15,87 @@ import mlflow.sklearn
 import numpy as np
 import pandas as pd
 from ..schemas import DecisionRequest
+from . import model_store
+from .drift import reload_drift_references
+from .fraud_explainer import explain_fraud_batch
+from .fraud_rules import RULES_VERSION, fraud_precheck
+from .logging import hash_client_id
+from .model_registry import get_registry
+from .profile_store import ClientProfile, get_profile_store
+from .monitoring import MODEL_RELOADS
+from .tracing import stage
+from .velocity import VELOCITY_FEATURES
+
+# Explainers SHAP par classifieur (un par version chargée, bornés)
+_EXPLAINERS: "OrderedDict[int, tuple]" = OrderedDict()
+_MAX_EXPLAINERS = 8
+# Threadpool FastAPI, workers shadow / batch : OrderedDict partagé (move_to_end, popitem)
+_EXPLAINERS_LOCK = threading.Lock()
+
+CREDIT_FEATURES = [
+    "age",
+    "income_annual",
+    "employment_status",
+    "debt_to_income",
+    "credit_history_length_months",
+    "num_open_accounts",
+    "late_payments_12m",
+]
+FRAUD_FEATURES = [
+    "amount",
+    "merchant_category",
+    "country",
+    "hour",
+    "is_new_device",
+    "distance_from_home_km",
+]
+
+
+def credit_frame(clients: list[dict]) -> pd.DataFrame:
+    """DataFrame d'entrée du modèle crédit à partir de payloads `client` (dicts)."""
+    return pd.DataFrame.from_records(clients, columns=CREDIT_FEATURES)
+
+
+def fraud_frame(transactions: list[dict], velocity: Optional[list[dict]] = None) -> pd.DataFrame:
+    """
+    DataFrame d'entrée du modèle fraude à partir de payloads `transaction` (dicts), complétée des
+    features de vélocité (0 sans historique). Un modèle entraîné sans elles ignore ces colonnes.
+    """
+    if velocity is not None:
+        transactions = [{**t, **v} for t, v in zip(transactions, velocity)]
+    df = pd.DataFrame.from_records(transactions, columns=FRAUD_FEATURES + VELOCITY_FEATURES)
+    df[VELOCITY_FEATURES] = df[VELOCITY_FEATURES].fillna(0.0)
+    return df
 
-_MODEL: Optional[object] = None
-_MODEL_VERSION: Optional[str] = None
-_EXPL_MODEL: Optional[object] = None # Cached LinearExplainer
 
-_FRAUD_MODEL: Optional[object] = None
-_FRAUD_VERSION: Optional[str] = None
+def _normalize_fraud(decision: np.ndarray) -> np.ndarray:
+    # score d'anomalie -> normalisé 0..1 (sigmoïde, normalisation MVP)
+    anomaly_score = -np.asarray(decision, dtype=float)
+    return np.clip(1.0 / (1.0 + np.exp(-anomaly_score)), 0.0, 1.0)
 
 
-def _find_model_path() -> Path:
-    # 1) Chemin de montage Docker
-    docker_path = Path("/ml/artifacts/credit_risk/model.joblib")
-    if docker_path.exists():
-        return docker_path
-
-    # 2) Recherche locale robuste : remonter à la racine du repo contenant /ml/artifacts/...
-    here = Path(__file__).resolve()
-    for p in here.parents:
-        candidate = p / "ml" / "artifacts" / "credit_risk" / "model.joblib"
-        if candidate.exists():
-            return candidate
+def fraud_scores(fraud_model, Xf: pd.DataFrame) -> np.ndarray:
+    # Cette logique suppose une Isolation Forest ou similaire
+    return _normalize_fraud(fraud_model.decision_function(Xf))
+
+
+def fraud_scores_and_explanations(fraud_model, Xf: pd.DataFrame, top_k: int = 5) -> tuple[np.ndarray, list[list[dict]]]:
+    """
+    Scores fraude + contributions par feature (chemins d'isolation, services/fraud_explainer.py) en une
+    passe. Modèle non expliquable (autre qu'une Isolation Forest) : scores seuls, explications vides.
+    """
+    res = explain_fraud_batch(fraud_model, Xf, top_k=top_k)
+    if res is None:
+        return fraud_scores(fraud_model, Xf), [[] for _ in range(len(Xf))]
+    decision, tops = res
+    return _normalize_fraud(decision), tops
+
 
+def _find_model_path() -> Path:
+    # Docker (/ml/artifacts) ou repo local ; version pointée par `current` si présente
+    root = model_store.find_artifact_root("credit_risk")
+    if root is not None:
+        return model_store.current_dir(root) / model_store.MODEL_FILE
     raise FileNotFoundError(
         "Credit risk model not found. "
         "Expected either /ml/artifacts/credit_risk/model.joblib (Docker mount) "
@@ -39,76 +104,249 @@ def _find_model_path() -> Path:
     )
 
 
-def _load_model() -> object:
-    global _MODEL, _MODEL_VERSION
-    if _MODEL is not None:
-        return _MODEL
+def _find_fraud_model_path() -> Path:
+    root = model_store.find_artifact_root("fraud")
+    if root is not None:
+        return model_store.current_dir(root) / model_store.MODEL_FILE
+    raise FileNotFoundError("Fraud model not found. Run: python ml/training/train_fraud.py")
+
+
+def _read_metrics(model_dir: Path) -> Optional[dict]:
+    metrics_path = model_dir / "metrics.json"
+    if not metrics_path.exists():
+        return None
+    try:
+        return json.loads(metrics_path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def _with_dir_version(version: str, model_dir: Path) -> str:
+    # Répertoire versionné : suffixe du nom de version s'il n'apparaît pas déjà
+    if model_dir.parent.name != model_store.VERSIONS_DIR or model_dir.name in version:
+        return version
+    return f"{version}@{model_dir.name}"
+
+
+def _credit_version(model_dir: Path) -> str:
+    data = _read_metrics(model_dir)
+    if data is None:
+        return "credit_risk:model.joblib"
+    best = data.get("best_model", "unknown")
+    seed = data.get("data_config", {}).get("seed", "na")
+    run_id = data.get("mlflow_run_id", "na")
+    return _with_dir_version(f"credit_risk:{best}(seed={seed}, run_id={run_id})", model_dir)
+
+
+def _fraud_version(model_dir: Path) -> str:
+    data = _read_metrics(model_dir)
+    if data is None:
+        return "fraud:model.joblib"
+    seed = data.get("data_config", {}).get("seed", "na")
+    return _with_dir_version(f"fraud:isolation_forest(seed={seed})", model_dir)
+
+
+# -----------------------------
+# Modèles servis : chargement, warm-up, swap atomique
+# -----------------------------
+@dataclass(frozen=True)
+class ModelBundle:
+    """Modèles crédit + fraude servis ensemble. Une requête lit le bundle une fois et le garde jusqu'au bout."""
+
+    credit: object
+    fraud: object
+    credit_version: str
+    fraud_version: str
+    credit_path: Path
+    fraud_path: Path
+    credit_mtime_ns: int
+    fraud_mtime_ns: int
+    loaded_at: float = field(default_factory=time.time)
+
+    @property
+    def versions(self) -> dict:
+        return {"credit_risk": self.credit_version, "fraud": self.fraud_version}
+
+
+_BUNDLE: Optional[ModelBundle] = None
+_RELOAD_LOCK = threading.Lock()
+
+# Ligne de warm-up : premier predict_proba / SHAP / decision_function hors du chemin de requête
+WARMUP_CLIENT = {
+    "age": 35,
+    "income_annual": 42000.0,
+    "employment_status": "CDI",
+    "debt_to_income": 0.3,
+    "credit_history_length_months": 120,
+    "num_open_accounts": 3,
+    "late_payments_12m": 0,
+}
+WARMUP_TRANSACTION = {
+    "amount": 80.0,
+    "merchant_category": "groceries",
+    "country": "FR",
+    "hour": 14,
+    "is_new_device": False,
+    "distance_from_home_km": 5.0,
+}
+
+
+def _warm_up(bundle: ModelBundle) -> None:
+    X_df = credit_frame([WARMUP_CLIENT])
+    bundle.credit.predict_proba(X_df)
+    compute_shap_values_batch(bundle.credit, X_df)
+    # Construit aussi les tables de nœuds de l'explainer fraude (une fois par modèle)
+    fraud_scores_and_explanations(bundle.fraud, fraud_frame([WARMUP_TRANSACTION]))
+
+
+def _load_bundle(previous: Optional[ModelBundle], *, force: bool = False) -> ModelBundle:
+    credit_path, fraud_path = _find_model_path(), _find_fraud_model_path()
+    credit_mtime, fraud_mtime = credit_path.stat().st_mtime_ns, fraud_path.stat().st_mtime_ns
+    # Un modèle inchangé (même fichier, même mtime) est réutilisé tel quel
+    same_credit = not force and previous is not None and (previous.credit_path, previous.credit_mtime_ns) == (credit_path, credit_mtime)
+    same_fraud = not force and previous is not None and (previous.fraud_path, previous.fraud_mtime_ns) == (fraud_path, fraud_mtime)
+    return ModelBundle(
+        credit=previous.credit if same_credit else joblib.load(credit_path),
+        fraud=previous.fraud if same_fraud else joblib.load(fraud_path),
+        credit_version=previous.credit_version if same_credit else _credit_version(credit_path.parent),
+        fraud_version=previous.fraud_version if same_fraud else _fraud_version(fraud_path.parent),
+        credit_path=credit_path,
+        fraud_path=fraud_path,
+        credit_mtime_ns=credit_mtime,
+        fraud_mtime_ns=fraud_mtime,
+    )
+
 
-    model_path = _find_model_path()
-    _MODEL = joblib.load(model_path)
+def get_bundle() -> ModelBundle:
+    bundle = _BUNDLE
+    if bundle is not None:
+        return bundle
+    with _RELOAD_LOCK:
+        if _BUNDLE is None:
+            _swap(_load_bundle(None))
+        return _BUNDLE
 
-    # Optionnel : charger les métadonnées de version
-    metrics_path = model_path.parent / "metrics.json"
-    if metrics_path.exists():
+
+def _swap(bundle: ModelBundle) -> None:
+    global _BUNDLE
+    _BUNDLE = bundle
+
+
+def models_changed() -> bool:
+    """Pointeur `current` ou fichier à plat modifié depuis le dernier chargement (stat seulement)."""
+    bundle = _BUNDLE
+    if bundle is None:
+        return False
+    credit_path, fraud_path = _find_model_path(), _find_fraud_model_path()
+    return (credit_path, credit_path.stat().st_mtime_ns, fraud_path, fraud_path.stat().st_mtime_ns) != (
+        bundle.credit_path, bundle.credit_mtime_ns, bundle.fraud_path, bundle.fraud_mtime_ns
+    )
+
+
+def reload_models(*, force: bool = False) -> dict:
+    """
+    Charge la version courante, la chauffe puis remplace le bundle servi en une affectation.
+    Les requêtes en cours terminent sur l'ancien bundle. En cas d'erreur, l'ancien reste servi.
+    À appeler hors de la boucle d'événements (asyncio.to_thread).
+    """
+    with _RELOAD_LOCK:
+        previous = _BUNDLE
+        t0 = time.perf_counter()
         try:
-            import json
-            data = json.loads(metrics_path.read_text(encoding="utf-8"))
-            best = data.get("best_model", "unknown")
-            seed = data.get("data_config", {}).get("seed", "na")
-            run_id = data.get("mlflow_run_id", "na")
-            _MODEL_VERSION = f"credit_risk:{best}(seed={seed}, run_id={run_id})"
+            bundle = _load_bundle(previous, force=force)
+            changed = previous is None or bundle.credit is not previous.credit or bundle.fraud is not previous.fraud
+            if changed:
+                _warm_up(bundle)
+                _swap(bundle)
+                registry = get_registry()
+                if registry is not None:
+                    # Modèles de segment qui suivent `current` : rechargés à la demande
+                    registry.invalidate()
+                # Dérive mesurée contre les références des versions désormais servies
+                reload_drift_references()
         except Exception:
-            _MODEL_VERSION = "credit_risk:model.joblib"
-    else:
-        _MODEL_VERSION = "credit_risk:model.joblib"
+            MODEL_RELOADS.labels(status="error").inc()
+            raise
+        MODEL_RELOADS.labels(status="swapped" if changed else "unchanged").inc()
+        return {
+            "changed": changed,
+            "previous": previous.versions if previous else None,
+            "current": _BUNDLE.versions,
+            "paths": {"credit_risk": str(_BUNDLE.credit_path), "fraud": str(_BUNDLE.fraud_path)},
+            "load_s": time.perf_counter() - t0,
+        }
+
+
+async def run_model_watcher(interval_seconds: float) -> None:
+    """Recharge à chaud quand le pointeur `current` (ou le fichier à plat) change ; vaut pour chaque worker."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            if await asyncio.to_thread(models_changed):
+                info = await asyncio.to_thread(reload_models)
+                print(f"INFO: models reloaded {info['previous']} -> {info['current']} ({info['load_s']:.2f}s)")
+        except Exception as e:
+            # Version invalide : l'ancien bundle reste servi
+            print(f"ERROR: model reload failed: {e}")
 
-    return _MODEL
 
+def _load_model() -> object:
+    return get_bundle().credit
 
-def _find_fraud_model_path() -> Path:
-    docker_path = Path("/ml/artifacts/fraud/model.joblib")
-    if docker_path.exists():
-        return docker_path
 
-    here = Path(__file__).resolve()
-    for p in here.parents:
-        candidate = p / "ml" / "artifacts" / "fraud" / "model.joblib"
-        if candidate.exists():
-            return candidate
+def _load_fraud_model() -> object:
+    return get_bundle().fraud
 
-    raise FileNotFoundError("Fraud model not found. Run: python ml/training/train_fraud.py")
 
+def model_versions() -> dict:
+    return get_bundle().versions
 
-def _load_fraud_model() -> object:
-    global _FRAUD_MODEL, _FRAUD_VERSION
-    if _FRAUD_MODEL is not None:
-        return _FRAUD_MODEL
-
-    model_path = _find_fraud_model_path()
-    _FRAUD_MODEL = joblib.load(model_path)
-
-    metrics_path = model_path.parent / "metrics.json"
-    if metrics_path.exists():
-        import json
-        data = json.loads(metrics_path.read_text(encoding="utf-8"))
-        seed = data.get("data_config", {}).get("seed", "na")
-        _FRAUD_VERSION = f"fraud:isolation_forest(seed={seed})"
-    else:
-        _FRAUD_VERSION = "fraud:model.joblib"
 
-    return _FRAUD_MODEL
+def _shap_original_name(name: str) -> str:
+    # Heuristique pour trouver le nom original : diviser par underscore ?
+    # Better: use the feature prefixes from ColumnTransformer if possible.
+    # Standard: "cat__employment_status_CDI" / "num__age"
+    if name.startswith("cat__"):
+        # cat__employment_status_CDI -> employment_status
+        clean = name.replace("cat__", "")
+        if "employment_status" in clean:
+            return "employment_status"
+        return clean
+    if name.startswith("num__"):
+        return name.replace("num__", "")
+    return name
 
 
-def compute_shap_values(model_pipeline, X_df) -> list[dict]:
-    """
-    Compute local SHAP values for a single prediction using LinearExplainer.
-    Maps One-Hot Encoded features back to original feature names.
-    # Calculer les valeurs SHAP locales pour une prédiction unique via LinearExplainer.
-    # Mappe les features One-Hot Encoded vers les noms de features originaux.
-    """
+def _explainer_for(classifier, n_features: int):
     import shap
-    global _EXPL_MODEL
 
+    with _EXPLAINERS_LOCK:
+        entry = _EXPLAINERS.get(id(classifier))
+        if entry is not None and entry[0] is classifier:
+            _EXPLAINERS.move_to_end(id(classifier))
+            return entry[1]
+    # LinearExplainer est rapide et léger pour la Régression Logistique
+    # Crucial : LinearExplainer a besoin d'un dataset de référence pour comparer.
+    # Puisque nous utilisons StandardScaler, la moyenne est approx 0.
+    # Nous utilisons un fond synthétique zéro pour représenter le client "moyen".
+    background = np.zeros((1, n_features))
+    explainer = shap.LinearExplainer(
+        classifier,
+        background,
+        feature_perturbation="interventional"
+    )
+    with _EXPLAINERS_LOCK:
+        _EXPLAINERS[id(classifier)] = (classifier, explainer)
+        while len(_EXPLAINERS) > _MAX_EXPLAINERS:
+            _EXPLAINERS.popitem(last=False)
+    return explainer
+
+
+def shap_matrix(model_pipeline, X_df) -> Optional[tuple[list[str], np.ndarray]]:
+    """
+    Valeurs SHAP locales (LinearExplainer) de chaque ligne de X_df, agrégées par feature originale
+    (OHE regroupé) : (noms, matrice n_lignes x n_features). None si la structure du pipeline est inattendue.
+    """
     # 1. Accéder aux parties du pipeline
     # Expected structure: Pipeline(steps=[('preprocess', ColumnTransformer), ('model', LogisticRegression)])
     try:
@@ -116,11 +354,11 @@ def compute_shap_values(model_pipeline, X_df) -> list[dict]:
         classifier = model_pipeline.named_steps["model"]
     except Exception as e:
         print(f"ERROR: Pipeline structure mismatch: {e}")
-        return []
+        return None
 
     # 2. Transformer l'entrée pour obtenir les features réelles utilisées par le modèle
     X_transformed = preprocessor.transform(X_df)
-    
+
     # 3. Obtenir les noms de features depuis le préprocesseur
     # New in sklearn 1.0+: get_feature_names_out
     try:
@@ -129,138 +367,233 @@ def compute_shap_values(model_pipeline, X_df) -> list[dict]:
         # Fallback if old sklearn or incompatible
         feature_names = [f"feat_{i}" for i in range(X_transformed.shape[1])]
 
-    # 4. Créer ou réutiliser l'Explainer
-    # LinearExplainer est rapide et léger pour la Régression Logistique
-    if _EXPL_MODEL is None:
-        # Crucial : LinearExplainer a besoin d'un dataset de référence pour comparer.
-        # Puisque nous utilisons StandardScaler, la moyenne est approx 0.
-        # Nous utilisons un fond synthétique zéro pour représenter le client "moyen".
-        background = np.zeros((1, X_transformed.shape[1]))
-        
-        _EXPL_MODEL = shap.LinearExplainer(
-            classifier, 
-            background,
-            feature_perturbation="interventional"
-        )
-    
+    # 4. Créer ou réutiliser l'Explainer (un par classifieur : un modèle rechargé a le sien)
+    explainer = _explainer_for(classifier, X_transformed.shape[1])
+
     # 5. Calculer les valeurs SHAP
-    shap_values = _EXPL_MODEL.shap_values(X_transformed)
-    # print(f"DEBUG: SHAP values raw type: {type(shap_values)}, shape: {np.shape(shap_values)}")
-
-    
-    # shap_values is a list for classifier? or array?
-    # For binary classification with LinearExplainer, it might be an array (n_samples, n_features)
-    if isinstance(shap_values, list):
-        vals = shap_values[0] # Class 0? Or Class 1? Usually check documentation
-        # LinearExplainer for binary often returns just one array of raw margins
-        pass
+    shap_values = explainer.shap_values(X_transformed)
+    # For binary classification with LinearExplainer, it might be a list or an array (n_samples, n_features)
+    vals = np.atleast_2d(shap_values[0] if isinstance(shap_values, list) else shap_values)
+
+    # 6. Post-traitement : Mapper clé OHE -> Clé originale (ex: "employment_status_CDI" -> "employment_status")
+    # Agrégation par feature originale via une matrice d'appartenance (n_features_ohe x n_features_orig)
+    originals: dict = {}
+    owner = np.array([originals.setdefault(_shap_original_name(n), len(originals)) for n in feature_names])
+    membership = np.zeros((len(owner), len(originals)))
+    membership[np.arange(len(owner)), owner] = 1.0
+    return list(originals), vals @ membership
+
+
+def compute_shap_values_batch(model_pipeline, X_df, top_k: int = 5) -> list[list[dict]]:
+    """
+    Local SHAP values for every row of X_df (LinearExplainer), aggregated by original feature.
+    One top-k list of FeatureImpact dicts per row; [] if the pipeline structure is unexpected.
+    # Valeurs SHAP locales pour chaque ligne, agrégées par feature originale (OHE regroupé).
+    """
+    res = shap_matrix(model_pipeline, X_df)
+    if res is None:
+        return []
+    names, impacts = res
+
+    # Convertir en listes de FeatureImpact, triées par impact absolu
+    # Filtre minimal : afficher seulement si l'impact est significatif (> 0.01)
+    order = np.argsort(-np.abs(impacts), axis=1, kind="stable")
+    results = []
+    for row, idx in zip(impacts, order):
+        top = []
+        for j in idx:
+            v = float(row[j])
+            if abs(v) > 0.01:
+                top.append({"feature": names[j], "impact": "+" if v > 0 else "-", "value": v})
+                if len(top) == top_k:
+                    break
+        results.append(top)
+    return results
+
+
+def compute_shap_values(model_pipeline, X_df) -> list[dict]:
+    """
+    Compute local SHAP values for a single prediction using LinearExplainer.
+    Maps One-Hot Encoded features back to original feature names.
+    # Calculer les valeurs SHAP locales pour une prédiction unique via LinearExplainer.
+    # Mappe les features One-Hot Encoded vers les noms de features originaux.
+    """
+    rows = compute_shap_values_batch(model_pipeline, X_df.iloc[:1])
+    return rows[0] if rows else []
+
+
+def route_models(payload: DecisionRequest, bundle: Optional[ModelBundle] = None) -> tuple[object, object, dict]:
+    """Modèles crédit / fraude pour ce payload : segment du registre s'il y en a un, champion sinon."""
+    bundle = bundle or get_bundle()
+    credit, fraud, versions = bundle.credit, bundle.fraud, bundle.versions
+    registry = get_registry()
+    if registry is None:
+        return credit, fraud, versions
+    versions = dict(versions)
+    routed = registry.route("credit", payload)
+    if routed is not None:
+        credit, versions["credit_risk"] = routed.model, routed.version
+    routed = registry.route("fraud", payload)
+    if routed is not None:
+        fraud, versions["fraud"] = routed.model, routed.version
+    return credit, fraud, versions
+
+
+def predict_risk_and_fraud(
+    payload: DecisionRequest,
+    velocity: Optional[dict] = None,
+    request: Optional[dict] = None,
+    *,
+    explain: bool = True,
+    fraud_rules_only: bool = False,
+) -> tuple[float, float, dict, list, list]:
+    """
+    Scores, versions et explications d'un payload. Modes dégradés (services/admission.py) :
+    `explain=False` saute SHAP et les contributions fraude (calculables plus tard par GET /explain),
+    `fraud_rules_only=True` remplace le modèle fraude par le pré-contrôle par règles.
+    """
+    # Modèles résolus une seule fois : un rechargement concurrent n'affecte pas cette requête
+    model, fraud_model, model_versions = route_models(payload)
+    if fraud_rules_only:
+        model_versions = {**model_versions, "fraud": RULES_VERSION}
+
+    # `request` : payload déjà sérialisé par l'appelant (pipeline de décision), sinon sérialisé ici
+    request = request if request is not None else payload.model_dump()
+    client = request["client"]
+    profile = None
+    store = get_profile_store()
+    if store is not None:
+        # Features crédit et version du modèle inchangées : score et SHAP du profil réutilisés
+        client_hash = hash_client_id(client["client_id"])
+        features = {k: client[k] for k in CREDIT_FEATURES}
+        profile = store.lookup(client_hash, features, model_versions["credit_risk"])
+
+    if not fraud_rules_only:
+        with stage("build_frames"):
+            Xf = fraud_frame([request["transaction"]], [velocity] if velocity is not None else None)
+
+    if profile is not None:
+        risk_score, shap_impacts = profile.risk_score, profile.shap_impacts
     else:
-        vals = shap_values
-
-    # Check shape: (1, n_features) -> flatten to (n_features,)
-    if vals.ndim > 1:
-        vals = vals[0]
-        
-    # 6. Post-traitement : Mapper clé OHE -> Clé originale
-    # ex: "employment_status_CDI" -> "employment_status"
-    # Nous voulons agréger les impacts par feature originale
-    
-    impacts = {}
-    for name, value in zip(feature_names, vals):
-        # Heuristique pour trouver le nom original : diviser par underscore ?
-        # Better: use the feature prefixes from ColumnTransformer if possible.
-        # Standard: "cat__employment_status_CDI" / "num__age"
-        
-        # Simple parsing for our known schema
-        original_name = name
-        if name.startswith("cat__"):
-            # cat__employment_status_CDI -> employment_status
-            # remove prefix "cat__"
-            clean = name.replace("cat__", "")
-            # remove value suffix? hard without knowing all values.
-            # But wait, for the end user, "employment_status" is enough?
-            # actually we might want to group by prefix.
-            parts = clean.split("_")
-            # employment_status_CDI -> employment_status
-            if "employment_status" in clean:
-                original_name = "employment_status"
+        t0 = time.perf_counter()
+        X_df = credit_frame([client])
+
+        # Prediction
+        with stage("credit_score"):
+            risk_score = float(model.predict_proba(X_df)[:, 1][0])
+            risk_score = float(np.clip(risk_score, 0.0, 1.0))
+
+        # SHAP (Local Explanation)
+        shap_impacts = []
+        if explain:
+            with stage("shap"):
+                shap_impacts = compute_shap_values(model, X_df)
+
+        # Profil sans SHAP non mis en cache : il servirait ensuite des explications vides
+        if store is not None and explain:
+            store.put(client_hash, ClientProfile(
+                features=features,
+                risk_score=risk_score,
+                shap_impacts=shap_impacts,
+                credit_version=model_versions["credit_risk"],
+                cost_s=time.perf_counter() - t0,
+            ))
+
+    if fraud_rules_only:
+        with stage("fraud_score"):
+            fraud_score, fraud_impacts = fraud_precheck(request["transaction"], velocity)
+        return risk_score, fraud_score, model_versions, shap_impacts, fraud_impacts
+
+    # Fraud Model (Phase 2A) + contributions par feature le long des chemins d'isolation
+    with stage("fraud_score"):
+        if explain:
+            scores, fraud_impacts = fraud_scores_and_explanations(fraud_model, Xf)
+        else:
+            scores, fraud_impacts = fraud_scores(fraud_model, Xf), [[]]
+        fraud_score = float(scores[0])
+
+    return risk_score, fraud_score, model_versions, shap_impacts, fraud_impacts[0]
+
+
+def predict_risk_and_fraud_batch(
+    payloads: list[DecisionRequest],
+    velocities: Optional[list] = None,
+    requests: Optional[list[dict]] = None,
+    *,
+    explain: bool = True,
+    fraud_rules_only: bool = False,
+) -> list[tuple[float, float, dict, list, list]]:
+    """
+    `predict_risk_and_fraud` pour un micro-lot (routes batch / stream) : mêmes modèles, profils,
+    explications et modes dégradés, mais un seul predict_proba / SHAP / passe fraude par groupe de
+    modèles routés.
+    """
+    n = len(payloads)
+    velocities = velocities if velocities is not None else [None] * n
+    requests = requests if requests is not None else [p.model_dump() for p in payloads]
+    bundle = get_bundle()
+    store = get_profile_store()
+
+    # Regroupement par couple de modèles (segments du registre) ; ordre d'origine restitué à la fin
+    groups: dict = {}
+    for i, payload in enumerate(payloads):
+        model, fraud_model, versions = route_models(payload, bundle)
+        if fraud_rules_only:
+            versions = {**versions, "fraud": RULES_VERSION}
+        groups.setdefault((id(model), id(fraud_model)), (model, fraud_model, versions, []))[3].append(i)
+
+    results: list = [None] * n
+    for model, fraud_model, versions, idx in groups.values():
+        clients = [requests[i]["client"] for i in idx]
+        risk = [0.0] * len(idx)
+        shap_rows: list = [[] for _ in idx]
+        misses = list(range(len(idx)))
+        if store is not None:
+            hashes = [hash_client_id(c["client_id"]) for c in clients]
+            features = [{k: c[k] for k in CREDIT_FEATURES} for c in clients]
+            misses = []
+            for j in range(len(idx)):
+                profile = store.lookup(hashes[j], features[j], versions["credit_risk"])
+                if profile is None:
+                    misses.append(j)
+                else:
+                    risk[j], shap_rows[j] = profile.risk_score, profile.shap_impacts
+
+        if not fraud_rules_only:
+            with stage("build_frames"):
+                Xf = fraud_frame([requests[i]["transaction"] for i in idx], [velocities[i] or {} for i in idx])
+
+        if misses:
+            t0 = time.perf_counter()
+            X_df = credit_frame([clients[j] for j in misses])
+            with stage("credit_score"):
+                proba = np.clip(model.predict_proba(X_df)[:, 1], 0.0, 1.0)
+            impacts = [[] for _ in misses]
+            if explain:
+                with stage("shap"):
+                    impacts = compute_shap_values_batch(model, X_df) or impacts
+            cost_s = (time.perf_counter() - t0) / len(misses)
+            for k, j in enumerate(misses):
+                risk[j], shap_rows[j] = float(proba[k]), impacts[k]
+                # Profil sans SHAP non mis en cache (comme predict_risk_and_fraud)
+                if store is not None and explain:
+                    store.put(hashes[j], ClientProfile(
+                        features=features[j],
+                        risk_score=risk[j],
+                        shap_impacts=shap_rows[j],
+                        credit_version=versions["credit_risk"],
+                        cost_s=cost_s,
+                    ))
+
+        with stage("fraud_score"):
+            if fraud_rules_only:
+                checks = [fraud_precheck(requests[i]["transaction"], velocities[i]) for i in idx]
+                scores, fraud_impacts = [c[0] for c in checks], [c[1] for c in checks]
+            elif explain:
+                scores, fraud_impacts = fraud_scores_and_explanations(fraud_model, Xf)
             else:
-                original_name = clean
-        elif name.startswith("num__"):
-            original_name = name.replace("num__", "")
-            
-        impacts[original_name] = impacts.get(original_name, 0.0) + value
-
-    # 7. Convertir en liste de FeatureImpact
-    # Trier par impact absolu
-    sorted_impacts = sorted(impacts.items(), key=lambda x: abs(x[1]), reverse=True)
-    
-    result = []
-    for k, v in sorted_impacts:
-        # direction
-        direction = "+" if v > 0 else "-"
-        # Filtre minimal : afficher seulement si l'impact est significatif (> 0.01 ?)
-        if abs(v) > 0.01:
-            result.append({"feature": k, "impact": direction, "value": float(v)})
-    
-    # print(f"DEBUG: Calculated impacts: {result[:2]}...")
-            
-    return result[:5] # Top 5
-
-
-def predict_risk_and_fraud(payload: DecisionRequest) -> tuple[float, float, dict, list]:
-    model = _load_model()
-
-    c = payload.client
-    X_row = {
-        "age": c.age,
-        "income_annual": c.income_annual,
-        "employment_status": c.employment_status,
-        "debt_to_income": c.debt_to_income,
-        "credit_history_length_months": c.credit_history_length_months,
-        "num_open_accounts": c.num_open_accounts,
-        "late_payments_12m": c.late_payments_12m,
-    }
-
-    X_df = pd.DataFrame([X_row])
-
-    required_cols = list(X_row.keys())
-    missing = [col for col in required_cols if col not in X_df.columns]
-    if missing:
-        raise ValueError(f"Missing columns for credit risk model: {missing}")
-    
-    # Prediction
-    risk_score = float(model.predict_proba(X_df)[:, 1][0])
-    risk_score = float(np.clip(risk_score, 0.0, 1.0))
-    
-    # SHAP (Local Explanation)
-    shap_impacts = compute_shap_values(model, X_df)
-
-    # Fraud Model (Phase 2A)
-    fraud_model = _load_fraud_model()
-
-    t = payload.transaction
-    X_fraud = {
-        "amount": t.amount,
-        "merchant_category": t.merchant_category,
-        "country": t.country,
-        "hour": t.hour,
-        "is_new_device": t.is_new_device,
-        "distance_from_home_km": t.distance_from_home_km,
-    }
-    Xf = pd.DataFrame([X_fraud])
-    
-    # Cette logique suppose une Isolation Forest ou similaire
-    # score d'anomalie -> normalisé 0..1
-    normal_score = fraud_model.decision_function(Xf)
-    anomaly_score = -float(normal_score[0])
-
-    # Normalisation MVP
-    fraud_score = 1.0 / (1.0 + np.exp(-anomaly_score))
-    fraud_score = float(np.clip(fraud_score, 0.0, 1.0))
-
-    model_versions = {
-        "credit_risk": _MODEL_VERSION or "credit_risk:model.joblib",
-        "fraud": _FRAUD_VERSION or "fraud:model.joblib",
-    }
-    return risk_score, fraud_score, model_versions, shap_impacts
+                scores, fraud_impacts = fraud_scores(fraud_model, Xf), [[] for _ in idx]
+
+        for j, i in enumerate(idx):
+            results[i] = (risk[j], float(scores[j]), versions, shap_rows[j], fraud_impacts[j])
+    return results
@@ -0,0 +1,281 @@
+"""
+Registre multi-modèles : modèles par segment (pays, catégorie marchand...) et paires champion/challenger.
+
+Configuration JSON (`MODEL_REGISTRY_PATH`) :
+    {
+      "models": {
+        "credit_fr": {"kind": "credit", "source": "artifacts", "name": "credit_risk", "version": "20261019T065309Z-672da8da"},
+        "credit_xgb": {"kind": "credit", "source": "mlflow", "uri": "models:/credit-risk/3"},
+        "fraud_be": {"kind": "fraud", "source": "artifacts", "name": "fraud"}
+      },
+      "routes": {
+        "credit": {"segment": "transaction.country", "map": {"FR": "credit_fr", "BE": "credit_xgb"}},
+        "fraud": {"segment": "transaction.country", "map": {"BE": "fraud_be"}}
+      }
+    }
+- `source: artifacts` : `ml/artifacts/<name>/versions/<version>` (version absente = pointeur `current`).
+- `source: mlflow` : URI MLflow (`models:/<nom>/<version>`, `runs:/<run>/model`), téléchargée une fois dans
+  `MODEL_REGISTRY_CACHE_DIR` puis relue depuis le disque.
+- Un segment absent des routes reste servi par le bundle champion de `ml_client` (rechargé à chaud).
+
+Résidence : les modèles sont chargés à la première requête qui les vise et gardés en LRU sous un budget
+mémoire (`MODEL_REGISTRY_BUDGET_MB`, taille estimée par la sérialisation pickle). Un modèle évincé est
+rechargé à la demande. Temps de chargement, hits / misses et taille résidente : métriques Prometheus
+`model_registry_*` et `GET /debug/models`.
+"""
+from __future__ import annotations
+
+import json
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import joblib
+
+from ..settings import settings
+from . import model_store
+from .monitoring import (
+    MODEL_REGISTRY_EVICTIONS,
+    MODEL_REGISTRY_LOAD_SECONDS,
+    MODEL_REGISTRY_REQUESTS,
+    MODEL_REGISTRY_RESIDENT_BYTES,
+)
+
+KINDS = ("credit", "fraud")
+SOURCES = ("artifacts", "mlflow")
+_ARTIFACT_NAMES = {"credit": "credit_risk", "fraud": "fraud"}
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    key: str
+    kind: str
+    source: str
+    name: Optional[str] = None
+    version: Optional[str] = None
+    uri: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, key: str, d: dict) -> "ModelSpec":
+        kind, source = d.get("kind"), d.get("source", "artifacts")
+        if kind not in KINDS:
+            raise ValueError(f"model {key!r}: kind must be one of {KINDS}")
+        if source not in SOURCES:
+            raise ValueError(f"model {key!r}: source must be one of {SOURCES}")
+        if source == "mlflow" and not d.get("uri"):
+            raise ValueError(f"model {key!r}: mlflow source requires 'uri'")
+        return cls(key=key, kind=kind, source=source, name=d.get("name", _ARTIFACT_NAMES[kind]), version=d.get("version"), uri=d.get("uri"))
+
+
+@dataclass
+class Resident:
+    spec: ModelSpec
+    model: object
+    version: str
+    size_bytes: int
+    load_s: float
+    loaded_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class _Stats:
+    hits: int = 0
+    misses: int = 0
+    loads: int = 0
+    load_s_total: float = 0.0
+    last_load_s: Optional[float] = None
+    evictions: int = 0
+
+
+def _segment_value(payload, path: str):
+    value = payload
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else getattr(value, part, None)
+        if value is None:
+            return None
+    return value
+
+
+class ModelRegistry:
+    def __init__(self, specs: dict[str, ModelSpec], routes: dict, *, budget_bytes: int, cache_dir: Path):
+        for kind, route in routes.items():
+            if kind not in KINDS:
+                raise ValueError(f"routes: unknown kind {kind!r}")
+            targets = [(f"map[{seg!r}]", key) for seg, key in route.get("map", {}).items()]
+            if route.get("default"):
+                targets.append(("default", route["default"]))
+            for where, key in targets:
+                if key not in specs or specs[key].kind != kind:
+                    raise ValueError(f"routes.{kind}.{where} -> {key!r}: no {kind} model with that key")
+        self.specs = specs
+        self.routes = routes
+        self.budget_bytes = budget_bytes
+        self.cache_dir = Path(cache_dir)
+        self._resident: "OrderedDict[str, Resident]" = OrderedDict()
+        self._stats = {key: _Stats() for key in specs}
+        self._lock = threading.Lock()
+        self._key_locks = {key: threading.Lock() for key in specs}
+
+    @classmethod
+    def from_file(cls, path: Path, *, budget_bytes: int, cache_dir: Path) -> "ModelRegistry":
+        cfg = json.loads(Path(path).read_text(encoding="utf-8"))
+        specs = {key: ModelSpec.from_dict(key, d) for key, d in cfg.get("models", {}).items()}
+        return cls(specs, cfg.get("routes", {}), budget_bytes=budget_bytes, cache_dir=cache_dir)
+
+    # -----------------------------
+    # Chargement
+    # -----------------------------
+    def _artifact_dir(self, spec: ModelSpec) -> Path:
+        root = model_store.find_artifact_root(spec.name)
+        if root is None:
+            raise FileNotFoundError(f"model {spec.key!r}: no artifacts for {spec.name!r}")
+        if spec.version:
+            return root / model_store.VERSIONS_DIR / spec.version
+        return model_store.current_dir(root)
+
+    def _mlflow_dir(self, spec: ModelSpec) -> Path:
+        # Cache disque : un répertoire par URI, marqué complet seulement après téléchargement
+        import hashlib
+
+        import mlflow
+
+        local = self.cache_dir / hashlib.sha1(spec.uri.encode("utf-8")).hexdigest()[:16]
+        if not (local / ".complete").exists():
+            local.mkdir(parents=True, exist_ok=True)
+            mlflow.artifacts.download_artifacts(artifact_uri=spec.uri, dst_path=str(local))
+            (local / ".complete").write_text(spec.uri, encoding="utf-8")
+        return local
+
+    def _load(self, spec: ModelSpec) -> Resident:
+        from .ml_client import _credit_version, _fraud_version
+
+        t0 = time.perf_counter()
+        if spec.source == "artifacts":
+            model_dir = self._artifact_dir(spec)
+            model = joblib.load(model_dir / model_store.MODEL_FILE)
+            version = (_credit_version if spec.kind == "credit" else _fraud_version)(model_dir)
+        else:
+            import mlflow.sklearn
+
+            local = self._mlflow_dir(spec)
+            model_path = next((p.parent for p in local.rglob("MLmodel")), local)
+            model = mlflow.sklearn.load_model(str(model_path))
+            version = f"{_ARTIFACT_NAMES[spec.kind]}:{spec.uri}"
+        load_s = time.perf_counter() - t0
+        size = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+        return Resident(spec=spec, model=model, version=f"{version}[{spec.key}]", size_bytes=size, load_s=load_s)
+
+    def get(self, key: str) -> Resident:
+        with self._lock:
+            res = self._resident.get(key)
+            if res is not None:
+                self._resident.move_to_end(key)
+                self._stats[key].hits += 1
+                MODEL_REGISTRY_REQUESTS.labels(model=key, result="hit").inc()
+                return res
+        # Chargement hors du verrou global : un modèle lent ne bloque pas les autres clés
+        with self._key_locks[key]:
+            with self._lock:
+                res = self._resident.get(key)
+            if res is None:
+                res = self._load(self.specs[key])
+                stats = self._stats[key]
+                stats.loads += 1
+                stats.load_s_total += res.load_s
+                stats.last_load_s = res.load_s
+                MODEL_REGISTRY_LOAD_SECONDS.labels(model=key).observe(res.load_s)
+                with self._lock:
+                    self._resident[key] = res
+                    MODEL_REGISTRY_RESIDENT_BYTES.labels(model=key).set(res.size_bytes)
+                    self._evict(keep=key)
+        with self._lock:
+            self._stats[key].misses += 1
+        MODEL_REGISTRY_REQUESTS.labels(model=key, result="miss").inc()
+        return res
+
+    def _evict(self, keep: str) -> None:
+        # LRU : le modèle qui vient d'être chargé reste, même seul au-dessus du budget
+        while self.resident_bytes > self.budget_bytes and len(self._resident) > 1:
+            key = next(k for k in self._resident if k != keep)
+            self._resident.pop(key)
+            self._stats[key].evictions += 1
+            MODEL_REGISTRY_EVICTIONS.labels(model=key).inc()
+            MODEL_REGISTRY_RESIDENT_BYTES.labels(model=key).set(0)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(r.size_bytes for r in self._resident.values())
+
+    def invalidate(self, *, floating_only: bool = True) -> list[str]:
+        """
+        Décharge les modèles qui suivent un pointeur `current` (sans version fixée), ou tous :
+        ils seront rechargés à la demande sur la nouvelle version.
+        """
+        with self._lock:
+            dropped = [
+                k for k, r in self._resident.items()
+                if not floating_only or (r.spec.source == "artifacts" and r.spec.version is None)
+            ]
+            for key in dropped:
+                self._resident.pop(key)
+                MODEL_REGISTRY_RESIDENT_BYTES.labels(model=key).set(0)
+        return dropped
+
+    # -----------------------------
+    # Routage
+    # -----------------------------
+    def route_key(self, kind: str, payload) -> Optional[str]:
+        """Clé du modèle pour ce segment, `default` de la route sinon ; None = champion de ml_client."""
+        route = self.routes.get(kind)
+        if not route:
+            return None
+        seg = _segment_value(payload, route["segment"])
+        return route.get("map", {}).get(str(seg), route.get("default"))
+
+    def route(self, kind: str, payload) -> Optional[Resident]:
+        key = self.route_key(kind, payload)
+        return self.get(key) if key else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            resident = dict(self._resident)
+            out = {}
+            for key, s in self._stats.items():
+                seen = s.hits + s.misses
+                res = resident.get(key)
+                out[key] = {
+                    "kind": self.specs[key].kind,
+                    "resident": res is not None,
+                    "version": res.version if res else None,
+                    "size_bytes": res.size_bytes if res else 0,
+                    "hits": s.hits,
+                    "misses": s.misses,
+                    "hit_rate": s.hits / seen if seen else None,
+                    "loads": s.loads,
+                    "last_load_s": s.last_load_s,
+                    "avg_load_s": s.load_s_total / s.loads if s.loads else None,
+                    "evictions": s.evictions,
+                }
+        return {"budget_bytes": self.budget_bytes, "resident_bytes": sum(r.size_bytes for r in resident.values()), "models": out}
+
+
+_REGISTRY: Optional[ModelRegistry] = None
+_REGISTRY_LOADED = False
+
+
+def get_registry() -> Optional[ModelRegistry]:
+    global _REGISTRY, _REGISTRY_LOADED
+    if _REGISTRY_LOADED:
+        return _REGISTRY
+    _REGISTRY_LOADED = True
+    if settings.model_registry_path:
+        _REGISTRY = ModelRegistry.from_file(
+            Path(settings.model_registry_path),
+            budget_bytes=int(settings.model_registry_budget_mb * 1024 * 1024),
+            cache_dir=Path(settings.model_registry_cache_dir),
+        )
+    return _REGISTRY
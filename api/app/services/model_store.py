@@ -0,0 +1,162 @@
+"""
+Répertoires d'artefacts versionnés et pointeur `current` atomique.
+
+Disposition par modèle (`ml/artifacts/<modèle>/`) :
+    versions/<version>/   model.joblib, metrics.json, schema.json, reference.json (immuable une fois publié)
+    current               nom de la version servie (remplacé par rename atomique)
+    history.ndjson        journal des activations / rollbacks
+Sans fichier `current`, l'ancienne disposition à plat (`<modèle>/model.joblib`) reste servie.
+
+Une version n'est visible sous `versions/` qu'une fois complète (répertoire temporaire renommé,
+`publish_version`, partagé par les scripts d'entraînement et le ré-entraînement incrémental), et
+le pointeur ne change qu'après : l'API ne peut jamais charger un fichier à moitié écrit. Le
+rechargement côté API (chargement, warm-up, swap) est dans `ml_client.reload_models`.
+
+Usage CLI (depuis api/) :
+    python -m app.services.model_store list credit_risk
+    python -m app.services.model_store activate credit_risk inc-20261019T064928Z-r5500
+    python -m app.services.model_store rollback credit_risk [--to VERSION]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+VERSIONS_DIR = "versions"
+POINTER_FILE = "current"
+HISTORY_FILE = "history.ndjson"
+MODEL_FILE = "model.joblib"
+
+
+def find_artifact_root(name: str) -> Optional[Path]:
+    """`ml/artifacts/<name>` : montage Docker, sinon recherche en remontant depuis ce fichier."""
+    candidates = [Path("/ml/artifacts") / name]
+    candidates += [p / "ml" / "artifacts" / name for p in Path(__file__).resolve().parents]
+    for candidate in candidates:
+        if (candidate / MODEL_FILE).exists() or (candidate / POINTER_FILE).exists():
+            return candidate
+    return None
+
+
+def current_version(root: Path) -> Optional[str]:
+    pointer = root / POINTER_FILE
+    if not pointer.exists():
+        return None
+    return pointer.read_text(encoding="utf-8").strip() or None
+
+
+def current_dir(root: Path) -> Path:
+    """Répertoire servi : version pointée par `current`, sinon la racine (disposition à plat)."""
+    version = current_version(root)
+    if version is None:
+        return root
+    path = root / VERSIONS_DIR / version
+    if not (path / MODEL_FILE).exists():
+        raise FileNotFoundError(f"{root / POINTER_FILE} points to {version!r} but {path / MODEL_FILE} is missing")
+    return path
+
+
+def list_versions(root: Path) -> list[str]:
+    versions = root / VERSIONS_DIR
+    if not versions.is_dir():
+        return []
+    return sorted(p.name for p in versions.iterdir() if not p.name.startswith(".") and (p / MODEL_FILE).exists())
+
+
+def read_history(root: Path) -> list[dict]:
+    path = root / HISTORY_FILE
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def _append_history(root: Path, entry: dict) -> None:
+    with open(root / HISTORY_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"ts": datetime.now(timezone.utc).isoformat(), **entry}) + "\n")
+
+
+def activate(root: Path, version: str, *, action: str = "activate") -> dict:
+    if not (root / VERSIONS_DIR / version / MODEL_FILE).exists():
+        raise FileNotFoundError(f"Unknown version {version!r} under {root / VERSIONS_DIR}")
+    previous = current_version(root)
+    tmp = root / f".{POINTER_FILE}.{os.getpid()}.tmp"
+    tmp.write_text(version + "\n", encoding="utf-8")
+    os.replace(tmp, root / POINTER_FILE)
+    entry = {"action": action, "version": version, "from": previous}
+    _append_history(root, entry)
+    return entry
+
+
+@contextmanager
+def publish_version(root: Path, version: str, *, activate_after: bool = True) -> Iterator[Path]:
+    """Répertoire temporaire à remplir ; renommé en versions/<version> (puis activé) si aucun échec."""
+    versions = root / VERSIONS_DIR
+    versions.mkdir(parents=True, exist_ok=True)
+    tmp = versions / f".{version}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    try:
+        yield tmp
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    os.replace(tmp, versions / version)
+    if activate_after:
+        activate(root, version)
+
+
+def rollback_target(root: Path) -> Optional[str]:
+    """Dernière version activée avant la courante, en sautant celles déjà quittées par rollback."""
+    current = current_version(root)
+    history = read_history(root)
+    abandoned = {e["from"] for e in history if e["action"] == "rollback"} | {current}
+    available = set(list_versions(root))
+    for entry in reversed(history):
+        if entry["version"] not in abandoned and entry["version"] in available:
+            return entry["version"]
+    return None
+
+
+def rollback(root: Path, to: Optional[str] = None) -> dict:
+    target = to or rollback_target(root)
+    if target is None:
+        raise ValueError(f"No previous version to roll back to under {root}")
+    return activate(root, target, action="rollback")
+
+
+def _parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Versioned model artifacts: list, activate, rollback")
+    sub = p.add_subparsers(dest="command", required=True)
+    for cmd in ("list", "activate", "rollback"):
+        s = sub.add_parser(cmd)
+        s.add_argument("model", choices=["credit_risk", "fraud"])
+        if cmd == "activate":
+            s.add_argument("version")
+        if cmd == "rollback":
+            s.add_argument("--to", help="Target version (default: previously active one)")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = _parse_args(argv)
+    root = find_artifact_root(args.model)
+    if root is None:
+        raise SystemExit(f"No artifacts found for {args.model}")
+    if args.command == "list":
+        out = {"current": current_version(root), "versions": list_versions(root), "history": read_history(root)[-10:]}
+    elif args.command == "activate":
+        out = activate(root, args.version)
+    else:
+        out = rollback(root, args.to)
+    # Les workers API détectent le nouveau pointeur (watcher) ou via POST /debug/models/reload
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,18 @@
-from prometheus_client import Counter, Histogram, Gauge
+"""
+Métriques Prometheus de l'API.
+
+Mode multi-process (uvicorn/gunicorn avec plusieurs workers) : activé quand la variable
+d'environnement PROMETHEUS_MULTIPROC_DIR pointe vers un répertoire partagé, vidé avant le démarrage
+des workers. Chaque worker écrit ses valeurs dans des fichiers mmap de ce répertoire et `/metrics`
+agrège tous les workers (MultiProcessCollector, via Instrumentator.expose). Les jauges déclarent
+leur sémantique d'agrégation (`multiprocess_mode`), ignorée en mode mono-process.
+"""
+import os
+import re
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, Gauge, multiprocess
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
 
 # Business Metrics
 DECISION_COUNTER = Counter(
@@ -39,8 +53,256 @@ MODEL_LATENCY = Histogram(
     buckets=[0.01, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0]
 )
 
+STAGE_LATENCY = Histogram(
+    "decision_stage_seconds",
+    "Temps passé par étape du pipeline de décision (validation, scoring, SHAP, DB, agent...)",
+    ["stage"],
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+)
+
 DRIFT_WARNING = Gauge(
     "model_drift_warning",
     "Indicateur de drift détecté (1=Drift, 0=Normal)",
-    ["feature"]
+    ["feature"],
+    # Multi-workers : 1 si au moins un worker vivant détecte le drift
+    multiprocess_mode="livemax"
+)
+
+# Capture de trafic (services/capture.py)
+CAPTURE_RECORDED = Counter(
+    "traffic_capture_recorded_total",
+    "Requêtes de décision écrites dans les segments de capture"
+)
+
+CAPTURE_DROPPED = Counter(
+    "traffic_capture_dropped_total",
+    "Requêtes échantillonnées non capturées (file d'écriture pleine)"
+)
+
+# Profils clients (services/profile_store.py)
+PROFILE_STORE_REQUESTS = Counter(
+    "profile_store_requests_total",
+    "Consultations du cache de profils (hit, miss, stale = features ou modèle changés, error)",
+    ["result"]
+)
+
+PROFILE_STORE_SAVED_SECONDS = Counter(
+    "profile_store_saved_inference_seconds_total",
+    "Temps de scoring crédit + SHAP évité grâce aux profils en cache"
+)
+
+# Features de vélocité (services/velocity.py)
+VELOCITY_TRACKED_CLIENTS = Gauge(
+    "velocity_tracked_clients",
+    "Clients suivis par le store de vélocité en mémoire",
+    multiprocess_mode="livesum"
+)
+
+VELOCITY_EVICTIONS = Counter(
+    "velocity_evictions_total",
+    "Clients évincés du store de vélocité (inactifs ou plafond atteint)"
+)
+
+# Clés d'idempotence (services/idempotency.py)
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Requêtes avec Idempotency-Key (miss = calculée, hit = rejouée, joined = a attendu un calcul en vol, mismatch, in_progress)",
+    ["result"]
 )
+
+# Contrôle d'admission et modes dégradés (services/admission.py)
+DECISION_TIER = Counter(
+    "decision_service_tier_total",
+    "Décisions par mode de service (full, no_report, no_explain, rules_only)",
+    ["tier"]
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Décisions en cours (places de concurrence occupées)",
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Requêtes de décision en attente d'une place",
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_LEVEL = Gauge(
+    "admission_degradation_level",
+    "Niveau de dégradation choisi à la dernière admission (0 = complet, 3 = règles seules)",
+    multiprocess_mode="livemax"
+)
+
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "Attente avant d'obtenir une place de décision",
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0]
+)
+
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Requêtes refusées en 503 (queue_full = file pleine, deadline = échéance dépassée en file)",
+    ["reason"]
+)
+
+# File de revue humaine (services/review_queue.py)
+REVIEWS_STORED = Counter(
+    "reviews_stored_total",
+    "Revues humaines enregistrées (single = POST /review/{id}, bulk = POST /review/bulk)",
+    ["route"]
+)
+
+REVIEW_CLAIMS = Counter(
+    "review_claims_total",
+    "Décisions REVIEW réservées par un analyste (POST /review/claim)"
+)
+
+# Flux NDJSON de décisions (services/decision_stream.py)
+DECISION_STREAM_LINES = Counter(
+    "decision_stream_lines_total",
+    "Lignes traitées par POST /decision/stream (ok, invalid = JSON ou schéma, rejected = lot refusé par l'admission, error = échec du lot)",
+    ["result"]
+)
+
+DECISION_STREAM_BATCH_SIZE = Histogram(
+    "decision_stream_batch_size",
+    "Taille des micro-lots scorés par POST /decision/stream",
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+)
+
+# Explications complètes à la demande (services/explanations.py)
+EXPLANATION_REQUESTS = Counter(
+    "explanation_requests_total",
+    "Explications demandées via GET /explain (hit = déjà en base, miss = calculée, unavailable = modèle introuvable)",
+    ["result"]
+)
+
+EXPLANATION_COMPUTE_SECONDS = Histogram(
+    "explanation_compute_seconds",
+    "Durée de calcul d'un lot d'explications (une passe vectorisée par couple de versions de modèles)",
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+)
+
+# Shadow scoring des challengers (services/shadow.py)
+SHADOW_SCORED = Counter(
+    "shadow_scored_total",
+    "Décisions scorées par le challenger en shadow",
+    ["challenger"]
+)
+
+SHADOW_DROPPED = Counter(
+    "shadow_dropped_total",
+    "Décisions non scorées en shadow (file pleine ou échec du lot)",
+    ["reason"]
+)
+
+SHADOW_BATCH_SECONDS = Histogram(
+    "shadow_batch_seconds",
+    "Durée de scoring + écriture d'un lot shadow",
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+)
+
+# Rechargement à chaud des modèles (ml_client.reload_models)
+MODEL_RELOADS = Counter(
+    "model_reload_total",
+    "Tentatives de rechargement des modèles (swapped, unchanged, error)",
+    ["status"]
+)
+
+# Registre multi-modèles (services/model_registry.py)
+MODEL_REGISTRY_REQUESTS = Counter(
+    "model_registry_requests_total",
+    "Accès aux modèles du registre (hit = déjà résident, miss = chargé à la demande)",
+    ["model", "result"]
+)
+
+MODEL_REGISTRY_LOAD_SECONDS = Histogram(
+    "model_registry_load_seconds",
+    "Durée de chargement d'un modèle du registre",
+    ["model"],
+    buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
+MODEL_REGISTRY_RESIDENT_BYTES = Gauge(
+    "model_registry_resident_bytes",
+    "Taille estimée des modèles résidents (0 = non chargé / évincé)",
+    ["model"],
+    multiprocess_mode="livesum"
+)
+
+MODEL_REGISTRY_EVICTIONS = Counter(
+    "model_registry_evictions_total",
+    "Modèles évincés du registre (budget mémoire dépassé, LRU)",
+    ["model"]
+)
+
+# Drift streaming (services/drift.py) : fenêtre glissante vs distributions de référence d'entraînement
+FEATURE_DRIFT_PSI = Gauge(
+    "feature_drift_psi",
+    "Population Stability Index par feature (fenêtre glissante vs référence)",
+    ["model", "feature"],
+    multiprocess_mode="livemax"
+)
+
+FEATURE_DRIFT_KS = Gauge(
+    "feature_drift_ks",
+    "Statistique KS (CDF binnée) par feature numérique",
+    ["model", "feature"],
+    multiprocess_mode="livemax"
+)
+
+FEATURE_DRIFT_CHI2_PVALUE = Gauge(
+    "feature_drift_chi2_pvalue",
+    "p-value du test du chi² par feature catégorielle",
+    ["model", "feature"],
+    multiprocess_mode="livemin"
+)
+
+DRIFT_WINDOW_SAMPLES = Gauge(
+    "drift_window_samples",
+    "Nombre de requêtes dans la fenêtre glissante de drift",
+    multiprocess_mode="livesum"
+)
+
+
+# -----------------------------
+# Mode multi-process
+# -----------------------------
+_PID_FILE = re.compile(r"_(\d+)\.db$")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def cleanup_dead_workers(path: str | None = None) -> list[int]:
+    """
+    Supprime les fichiers de jauges "live*" des workers morts (les compteurs et histogrammes
+    sont conservés : les totaux agrégés restent monotones). Appelé au démarrage de chaque worker.
+    """
+    path = path or MULTIPROC_DIR
+    if not path or not os.path.isdir(path):
+        return []
+    dead = set()
+    for name in os.listdir(path):
+        m = _PID_FILE.search(name)
+        if m and int(m.group(1)) != os.getpid() and not _pid_alive(int(m.group(1))):
+            dead.add(int(m.group(1)))
+    for pid in dead:
+        multiprocess.mark_process_dead(pid, path)
+    return sorted(dead)
+
+
+def aggregated_registry(path: str | None = None) -> CollectorRegistry:
+    """Registre éphémère agrégeant tous les workers (ce que sert `/metrics` en multi-process)."""
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path or MULTIPROC_DIR)
+    return registry
@@ -1,23 +1,75 @@
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import numpy as np
+
 from ..settings import settings
 
+DECISIONS = ("ACCEPT", "REVIEW", "REJECT", "ALERT")
+
 @dataclass(frozen=True)
 class PolicyResult:
     decision: str
     rule: str
 
-def apply_policy(risk_score: float, fraud_score: float) -> PolicyResult:
-    # La fraude est prioritaire : ALERT surcharge la décision de crédit
-    if fraud_score >= settings.fraud_alert_threshold:
-        return PolicyResult("ALERT", f"fraud_score >= {settings.fraud_alert_threshold} => ALERT")
+@dataclass(frozen=True)
+class PolicyConfig:
+    fraud_alert_threshold: float
+    risk_reject_threshold: float
+    risk_review_lower: float
+    risk_review_upper: float
 
-    if risk_score >= settings.risk_reject_threshold:
-        return PolicyResult("REJECT", f"risk_score >= {settings.risk_reject_threshold} => REJECT")
+    @classmethod
+    def from_settings(cls, **overrides) -> "PolicyConfig":
+        # Seuils courants (variables d'environnement), éventuellement surchargés pour un what-if
+        base = {
+            "fraud_alert_threshold": settings.fraud_alert_threshold,
+            "risk_reject_threshold": settings.risk_reject_threshold,
+            "risk_review_lower": settings.risk_review_lower,
+            "risk_review_upper": settings.risk_review_upper,
+        }
+        base.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(**base)
 
-    if settings.risk_review_lower <= risk_score < settings.risk_review_upper:
-        return PolicyResult(
-            "REVIEW",
-            f"risk_score in [{settings.risk_review_lower}, {settings.risk_review_upper}) => REVIEW (human-in-the-loop)",
-        )
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+def policy_rules(cfg: PolicyConfig) -> tuple:
+    """Libellé de la règle appliquée pour chaque décision, aligné sur DECISIONS."""
+    return (
+        "otherwise => ACCEPT",
+        f"risk_score in [{cfg.risk_review_lower}, {cfg.risk_review_upper}) => REVIEW (human-in-the-loop)",
+        f"risk_score >= {cfg.risk_reject_threshold} => REJECT",
+        f"fraud_score >= {cfg.fraud_alert_threshold} => ALERT",
+    )
+
+def apply_policy(risk_score: float, fraud_score: float, cfg: Optional[PolicyConfig] = None) -> PolicyResult:
+    cfg = cfg or PolicyConfig.from_settings()
+
+    # La fraude est prioritaire : ALERT surcharge la décision de crédit
+    if fraud_score >= cfg.fraud_alert_threshold:
+        decision = "ALERT"
+    elif risk_score >= cfg.risk_reject_threshold:
+        decision = "REJECT"
+    elif cfg.risk_review_lower <= risk_score < cfg.risk_review_upper:
+        decision = "REVIEW"
+    else:
+        decision = "ACCEPT"
+    return PolicyResult(decision, policy_rules(cfg)[DECISIONS.index(decision)])
 
-    return PolicyResult("ACCEPT", "otherwise => ACCEPT")
+def apply_policy_codes(risk_scores: np.ndarray, fraud_scores: np.ndarray, cfg: PolicyConfig) -> np.ndarray:
+    """
+    Version vectorisée de `apply_policy` : renvoie l'indice de la décision dans DECISIONS
+    pour chaque ligne. Même ordre de priorité que la version scalaire.
+    """
+    risk = np.asarray(risk_scores, dtype=float)
+    fraud = np.asarray(fraud_scores, dtype=float)
+    return np.select(
+        [
+            fraud >= cfg.fraud_alert_threshold,
+            risk >= cfg.risk_reject_threshold,
+            (risk >= cfg.risk_review_lower) & (risk < cfg.risk_review_upper),
+        ],
+        [DECISIONS.index("ALERT"), DECISIONS.index("REJECT"), DECISIONS.index("REVIEW")],
+        default=DECISIONS.index("ACCEPT"),
+    ).astype(np.int8)
@@ -0,0 +1,310 @@
+"""
+Rejeu "what-if" de la politique de décision sur l'historique d'audit.
+
+Les lignes de `decisions` sont lues par blocs (pagination par clé sur `id`, mémoire bornée),
+la politique de référence et les politiques candidates sont réévaluées de façon vectorisée
+sur les `risk_score` / `fraud_score` stockés, puis agrégées en matrices de transition et
+volumes journaliers. Optionnellement, les `request_payload` stockés sont re-scorés avec un
+modèle candidat avant application de la politique candidate ; les lignes dont le payload est
+inexploitable (absent, tronqué, features manquantes) sont alors écartées et comptées (`skipped_rows`).
+
+Usage CLI (depuis api/) :
+    python -m app.services.policy_replay --fraud-alert-threshold 0.80 --risk-review-lower 0.40
+    python -m app.services.policy_replay --candidates candidates.json --out report.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+import joblib
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..db import Decision
+from . import model_store
+from .ml_client import CREDIT_FEATURES, FRAUD_FEATURES, _find_model_path, credit_frame, fraud_frame, fraud_scores
+from .policy import DECISIONS, PolicyConfig, apply_policy_codes
+
+DEFAULT_CHUNK_SIZE = 50_000
+N_DECISIONS = len(DECISIONS)
+
+
+@dataclass
+class ReplayCandidate:
+    name: str
+    policy: PolicyConfig
+    credit_model_path: Optional[str] = None
+    fraud_model_path: Optional[str] = None
+
+
+@dataclass
+class _Tally:
+    """Agrégats d'un candidat : taille constante (hors nombre de jours)."""
+    transitions: np.ndarray = field(default_factory=lambda: np.zeros((N_DECISIONS, N_DECISIONS), dtype=np.int64))
+    daily: dict = field(default_factory=dict)  # day (datetime64[D]) -> array (2, N_DECISIONS)
+    risk_delta_abs_sum: float = 0.0
+    fraud_delta_abs_sum: float = 0.0
+
+    def add(self, days: np.ndarray, base: np.ndarray, cand: np.ndarray) -> None:
+        self.transitions += np.bincount(
+            base.astype(np.int64) * N_DECISIONS + cand, minlength=N_DECISIONS * N_DECISIONS
+        ).reshape(N_DECISIONS, N_DECISIONS)
+
+        uniq, inv = np.unique(days, return_inverse=True)
+        counts = np.zeros((len(uniq), 2, N_DECISIONS), dtype=np.int64)
+        np.add.at(counts, (inv, 0, base), 1)
+        np.add.at(counts, (inv, 1, cand), 1)
+        for i, day in enumerate(uniq):
+            prev = self.daily.get(day)
+            self.daily[day] = counts[i] if prev is None else prev + counts[i]
+
+
+def _as_counts(arr: np.ndarray) -> dict:
+    return {d: int(arr[i]) for i, d in enumerate(DECISIONS)}
+
+
+def iter_decision_chunks(
+    db: Session,
+    *,
+    with_payload: bool = False,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[list]:
+    """
+    Parcourt `decisions` par blocs de `chunk_size` lignes, sans OFFSET (pagination sur la clé primaire),
+    en ne chargeant que les colonnes nécessaires. `request_payload` et `explanations_preview`
+    (vélocité vue au moment de la décision) ne sont lus que si `with_payload`.
+    """
+    cols = [Decision.id, Decision.created_at, Decision.risk_score, Decision.fraud_score]
+    if with_payload:
+        cols += [Decision.request_payload, Decision.explanations_preview]
+
+    last_id = 0
+    while True:
+        stmt = select(*cols).where(Decision.id > last_id)
+        if since is not None:
+            stmt = stmt.where(Decision.created_at >= since)
+        if until is not None:
+            stmt = stmt.where(Decision.created_at < until)
+        rows = db.execute(stmt.order_by(Decision.id).limit(chunk_size)).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _replayable(payload) -> bool:
+    """Payload re-scorable : client et transaction présents avec toutes leurs features."""
+    if not isinstance(payload, dict):
+        return False
+    client, transaction = payload.get("client"), payload.get("transaction")
+    return (
+        isinstance(client, dict) and isinstance(transaction, dict)
+        and all(k in client for k in CREDIT_FEATURES) and all(k in transaction for k in FRAUD_FEATURES)
+    )
+
+
+def _artifacts_root() -> Path:
+    # ml/artifacts (ou /ml/artifacts sous Docker)
+    root = model_store.find_artifact_root("credit_risk")
+    if root is None:
+        _find_model_path()  # FileNotFoundError explicite
+    return root.parent.resolve()
+
+
+def load_candidate_model(path: str, *, restrict_to_artifacts: bool = False):
+    model_path = Path(path).resolve()
+    if restrict_to_artifacts and _artifacts_root() not in model_path.parents:
+        raise ValueError(f"Candidate model must live under {_artifacts_root()}")
+    if not model_path.exists():
+        raise FileNotFoundError(f"Candidate model not found: {model_path}")
+    return joblib.load(model_path)
+
+
+def replay_policies(
+    db: Session,
+    candidates: list[ReplayCandidate],
+    *,
+    baseline: Optional[PolicyConfig] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    restrict_models_to_artifacts: bool = False,
+) -> dict:
+    """
+    Rejoue la politique `baseline` (par défaut : seuils courants) et chaque candidat sur l'historique.
+
+    La référence est recalculée depuis les scores stockés plutôt que lue dans `decision`,
+    qui contient la décision finale après revue humaine.
+    """
+    baseline = baseline or PolicyConfig.from_settings()
+
+    models = {}
+    for cand in candidates:
+        for path in (cand.credit_model_path, cand.fraud_model_path):
+            if path and path not in models:
+                models[path] = load_candidate_model(path, restrict_to_artifacts=restrict_models_to_artifacts)
+    with_payload = bool(models)
+
+    tallies = [_Tally() for _ in candidates]
+    n_rows = n_skipped = 0
+
+    for rows in iter_decision_chunks(db, with_payload=with_payload, since=since, until=until, chunk_size=chunk_size):
+        if with_payload:
+            # Mêmes lignes pour tous les candidats : un payload non re-scorable est écarté du rejeu
+            kept = [r for r in rows if _replayable(r[4])]
+            n_skipped += len(rows) - len(kept)
+            rows = kept
+            if not rows:
+                continue
+        n_rows += len(rows)
+        days = np.array([r[1] for r in rows], dtype="datetime64[D]")
+        risk = np.fromiter((r[2] for r in rows), dtype=float, count=len(rows))
+        fraud = np.fromiter((r[3] for r in rows), dtype=float, count=len(rows))
+        base_codes = apply_policy_codes(risk, fraud, baseline)
+
+        X_credit = X_fraud = None
+        if with_payload:
+            X_credit = credit_frame([r[4]["client"] for r in rows])
+            X_fraud = fraud_frame(
+                [r[4]["transaction"] for r in rows],
+                [(r[5] or {}).get("fraud_velocity") or {} for r in rows],
+            )
+
+        for cand, tally in zip(candidates, tallies):
+            cand_risk, cand_fraud = risk, fraud
+            if cand.credit_model_path:
+                cand_risk = np.clip(models[cand.credit_model_path].predict_proba(X_credit)[:, 1], 0.0, 1.0)
+                tally.risk_delta_abs_sum += float(np.abs(cand_risk - risk).sum())
+            if cand.fraud_model_path:
+                cand_fraud = fraud_scores(models[cand.fraud_model_path], X_fraud)
+                tally.fraud_delta_abs_sum += float(np.abs(cand_fraud - fraud).sum())
+            tally.add(days, base_codes, apply_policy_codes(cand_risk, cand_fraud, cand.policy))
+
+    return {
+        "rows": n_rows,
+        "skipped_rows": n_skipped,
+        "baseline": baseline.to_dict(),
+        "candidates": [_candidate_report(c, t, n_rows) for c, t in zip(candidates, tallies)],
+    }
+
+
+def _candidate_report(cand: ReplayCandidate, tally: _Tally, n_rows: int) -> dict:
+    m = tally.transitions
+    daily = []
+    for day in sorted(tally.daily):
+        counts = tally.daily[day]
+        daily.append({
+            "day": str(day),
+            "baseline": _as_counts(counts[0]),
+            "candidate": _as_counts(counts[1]),
+            "delta": _as_counts(counts[1] - counts[0]),
+        })
+
+    n_days = max(len(daily), 1)
+    delta_total = m.sum(axis=0) - m.sum(axis=1)
+
+    score_delta = None
+    if cand.credit_model_path or cand.fraud_model_path:
+        score_delta = {
+            "risk_mean_abs": tally.risk_delta_abs_sum / n_rows if n_rows and cand.credit_model_path else None,
+            "fraud_mean_abs": tally.fraud_delta_abs_sum / n_rows if n_rows and cand.fraud_model_path else None,
+        }
+
+    return {
+        "name": cand.name,
+        "policy": cand.policy.to_dict(),
+        "credit_model_path": cand.credit_model_path,
+        "fraud_model_path": cand.fraud_model_path,
+        # transitions[baseline][candidate] = nombre de décisions
+        "transitions": {DECISIONS[i]: _as_counts(m[i]) for i in range(N_DECISIONS)},
+        "flipped": int(m.sum() - np.trace(m)),
+        "totals_baseline": _as_counts(m.sum(axis=1)),
+        "totals_candidate": _as_counts(m.sum(axis=0)),
+        "mean_daily_delta": {d: float(delta_total[i]) / n_days for i, d in enumerate(DECISIONS)},
+        "daily": daily,
+        "score_delta": score_delta,
+    }
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="What-if replay of policy thresholds over the decisions audit table.")
+    p.add_argument("--candidates", help="JSON file: list of {name, policy: {...}, credit_model_path?, fraud_model_path?}")
+    p.add_argument("--name", default="candidate")
+    p.add_argument("--fraud-alert-threshold", type=float)
+    p.add_argument("--risk-reject-threshold", type=float)
+    p.add_argument("--risk-review-lower", type=float)
+    p.add_argument("--risk-review-upper", type=float)
+    p.add_argument("--credit-model", help="Candidate credit model.joblib used to re-score stored payloads")
+    p.add_argument("--fraud-model", help="Candidate fraud model.joblib used to re-score stored payloads")
+    p.add_argument("--since", type=datetime.fromisoformat)
+    p.add_argument("--until", type=datetime.fromisoformat)
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    p.add_argument("--out", help="Write the JSON report here (default: stdout)")
+    return p.parse_args(argv)
+
+
+def _candidates_from_args(args: argparse.Namespace) -> list[ReplayCandidate]:
+    if args.candidates:
+        spec = json.loads(Path(args.candidates).read_text(encoding="utf-8"))
+        return [
+            ReplayCandidate(
+                name=c.get("name", f"candidate_{i}"),
+                policy=PolicyConfig.from_settings(**c.get("policy", {})),
+                credit_model_path=c.get("credit_model_path"),
+                fraud_model_path=c.get("fraud_model_path"),
+            )
+            for i, c in enumerate(spec)
+        ]
+    return [
+        ReplayCandidate(
+            name=args.name,
+            policy=PolicyConfig.from_settings(
+                fraud_alert_threshold=args.fraud_alert_threshold,
+                risk_reject_threshold=args.risk_reject_threshold,
+                risk_review_lower=args.risk_review_lower,
+                risk_review_upper=args.risk_review_upper,
+            ),
+            credit_model_path=args.credit_model,
+            fraud_model_path=args.fraud_model,
+        )
+    ]
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    from ..db import SessionLocal
+
+    args = _parse_args(argv)
+    db = SessionLocal()
+    try:
+        report = replay_policies(
+            db,
+            _candidates_from_args(args),
+            since=args.since,
+            until=args.until,
+            chunk_size=args.chunk_size,
+        )
+    finally:
+        db.close()
+
+    out = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        Path(args.out).write_text(out, encoding="utf-8")
+        print(f"✅ Replay done: {report['rows']} decisions -> {args.out}", file=sys.stderr)
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Profils clients : dernier vecteur de features crédit, score de risque et impacts SHAP, indexés par
+l'identifiant pseudonymisé (`hash_client_id`).
+
+Les features crédit changent rarement alors que chaque transaction les renvoie : si le profil est
+présent, non expiré (`PROFILE_STORE_TTL_SECONDS`), avec les mêmes features et la même version du
+modèle crédit (champion ou segment du registre), le score et les impacts SHAP sont réutilisés
+sans inférence. Un profil permet aussi une requête transaction seule (`POST /decision/transaction`).
+
+Backends (`PROFILE_STORE_BACKEND`) :
+- `memory` : dict LRU par process, borné à `PROFILE_STORE_MAX_ENTRIES`.
+- `redis` : serveur compatible Redis (Redis, Valkey, KeyDB...) partagé entre workers / nœuds,
+  `PROFILE_STORE_REDIS_URL` ; TTL par clé (SETEX), éviction LRU laissée au serveur
+  (`maxmemory-policy allkeys-lru`). Nécessite le paquet `redis` (optionnel).
+
+Hit rate et temps d'inférence économisé : métriques `profile_store_*` et `GET /debug/profiles`.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Optional, Protocol
+
+from ..settings import settings
+from .monitoring import PROFILE_STORE_REQUESTS, PROFILE_STORE_SAVED_SECONDS
+
+KEY_PREFIX = "profile:"
+
+
+@dataclass
+class ClientProfile:
+    features: dict  # ClientPayload sans client_id
+    risk_score: float
+    shap_impacts: list
+    credit_version: str
+    cost_s: float  # durée du scoring crédit + SHAP évitée à chaque réutilisation
+    updated_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw) -> "ClientProfile":
+        return cls(**json.loads(raw))
+
+
+class ProfileBackend(Protocol):
+    def get(self, key: str) -> Optional[ClientProfile]: ...
+    def set(self, key: str, profile: ClientProfile) -> None: ...
+    def size(self) -> Optional[int]: ...
+
+
+class MemoryBackend:
+    def __init__(self, *, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple[float, ClientProfile]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[ClientProfile]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, profile = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return profile
+
+    def set(self, key: str, profile: ClientProfile) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, profile)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def size(self) -> Optional[int]:
+        return len(self._data)
+
+
+class RedisBackend:
+    def __init__(self, url: str, *, ttl_seconds: float, timeout_seconds: float = 0.05):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("PROFILE_STORE_BACKEND=redis requires the 'redis' package (pip install redis)") from e
+        # Timeout court : un serveur lent dégrade en miss (scoring normal), jamais en requête bloquée
+        self._client = redis.Redis.from_url(url, socket_timeout=timeout_seconds, socket_connect_timeout=timeout_seconds)
+        self.ttl_seconds = max(1, int(ttl_seconds))
+
+    def get(self, key: str) -> Optional[ClientProfile]:
+        raw = self._client.get(KEY_PREFIX + key)
+        return ClientProfile.from_json(raw) if raw is not None else None
+
+    def set(self, key: str, profile: ClientProfile) -> None:
+        self._client.setex(KEY_PREFIX + key, self.ttl_seconds, profile.to_json())
+
+    def size(self) -> Optional[int]:
+        return None  # partagé entre nœuds : voir INFO keyspace côté serveur
+
+
+class ProfileStore:
+    def __init__(self, backend: ProfileBackend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._counts = {"hit": 0, "miss": 0, "stale": 0, "error": 0}
+        self.saved_s = 0.0
+
+    def _count(self, result: str) -> None:
+        PROFILE_STORE_REQUESTS.labels(result=result).inc()
+        with self._lock:
+            self._counts[result] += 1
+
+    def get(self, client_hash: str) -> Optional[ClientProfile]:
+        """Profil brut (requête transaction seule), sans contrôle des features ; None si absent ou backend en échec."""
+        try:
+            return self.backend.get(client_hash)
+        except Exception as e:
+            print(f"WARNING: profile store read failed: {e}")
+            self._count("error")
+            return None
+
+    def lookup(self, client_hash: str, features: dict, credit_version: str) -> Optional[ClientProfile]:
+        """Profil réutilisable : mêmes features et même version du modèle crédit, sinon None (à rescorer)."""
+        profile = self.get(client_hash)
+        if profile is None:
+            self._count("miss")
+            return None
+        if profile.features != features or profile.credit_version != credit_version:
+            self._count("stale")
+            return None
+        self._count("hit")
+        PROFILE_STORE_SAVED_SECONDS.inc(profile.cost_s)
+        with self._lock:
+            self.saved_s += profile.cost_s
+        return profile
+
+    def put(self, client_hash: str, profile: ClientProfile) -> None:
+        try:
+            self.backend.set(client_hash, profile)
+        except Exception as e:
+            # Le cache ne doit jamais faire échouer une décision
+            print(f"WARNING: profile store write failed: {e}")
+            self._count("error")
+
+    def stats(self) -> dict:
+        with self._lock:
+            c = dict(self._counts)
+            seen = c["hit"] + c["miss"] + c["stale"]
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": self.backend.size(),
+                "hits": c["hit"],
+                "misses": c["miss"],
+                "stale": c["stale"],
+                "errors": c["error"],
+                "evictions": getattr(self.backend, "evictions", None),
+                "hit_rate": c["hit"] / seen if seen else None,
+                "saved_inference_s": self.saved_s,
+            }
+
+
+_STORE: Optional[ProfileStore] = None
+_STORE_LOADED = False
+
+
+def get_profile_store() -> Optional[ProfileStore]:
+    global _STORE, _STORE_LOADED
+    if _STORE_LOADED:
+        return _STORE
+    _STORE_LOADED = True
+    if not settings.profile_store_enabled:
+        return None
+    if settings.profile_store_backend == "redis":
+        backend = RedisBackend(settings.profile_store_redis_url, ttl_seconds=settings.profile_store_ttl_seconds)
+    elif settings.profile_store_backend == "memory":
+        backend = MemoryBackend(ttl_seconds=settings.profile_store_ttl_seconds, max_entries=settings.profile_store_max_entries)
+    else:
+        raise ValueError(f"PROFILE_STORE_BACKEND must be 'memory' or 'redis', got {settings.profile_store_backend!r}")
+    _STORE = ProfileStore(backend)
+    return _STORE
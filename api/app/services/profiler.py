@@ -0,0 +1,158 @@
+"""
+Profiler par échantillonnage de piles (sans outil externe) pour le process API en production.
+
+Un thread démon lit `sys._current_frames()` toutes les `interval` secondes et agrège les piles
+(racine -> feuille). Le coût est porté par le thread d'échantillonnage ; le code profilé
+n'est pas instrumenté.
+
+Mode "decision" : seuls les échantillons dont la pile traverse `predict_risk_and_fraud` ou
+`store_decision` (ou leurs variantes par lot) sont gardés, enracinés sur cette frame, et
+attribués à la première librairie (pandas, sklearn, shap, sqlalchemy, numpy...) appelée depuis ce point.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+DECISION_SCOPE = frozenset({"predict_risk_and_fraud", "predict_risk_and_fraud_batch", "store_decision", "store_decisions"})
+
+LIBRARIES = ("pandas", "sklearn", "shap", "sqlalchemy", "numpy", "scipy", "joblib", "pydantic", "httpx", "starlette", "fastapi")
+
+# Feuilles typiques d'un thread qui attend (boucle d'événements, threadpool inactif)
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+_PROFILE_LOCK = threading.Lock()
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    parts = path.replace("\\", "/").split("/")
+    if "site-packages" in parts:
+        parts = parts[parts.index("site-packages") + 1:]
+    elif "app" in parts:
+        parts = parts[len(parts) - 1 - parts[::-1].index("app"):]
+    else:
+        parts = parts[-1:]
+    return f"{'/'.join(parts)}:{code.co_name}"
+
+
+def _library_of(code) -> Optional[str]:
+    parts = code.co_filename.replace("\\", "/").split("/")
+    if "site-packages" in parts:
+        i = parts.index("site-packages")
+        if i + 1 < len(parts):
+            top = parts[i + 1]
+            return top if top in LIBRARIES else "other"
+    return None
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, scope: Optional[frozenset] = None, include_idle: bool = False):
+        self.interval = interval
+        self.scope = scope
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.libraries: Counter = Counter()
+        self.n_ticks = 0
+        self.n_samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._started_at = 0.0
+        self.duration = 0.0
+
+    def _sample(self, own_ident: int) -> None:
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            codes = []
+            f = frame
+            while f is not None:
+                codes.append(f.f_code)
+                f = f.f_back
+            codes.reverse()  # racine -> feuille
+
+            if self.scope is not None:
+                start = next((i for i, c in enumerate(codes) if c.co_name in self.scope), None)
+                if start is None:
+                    continue
+                codes = codes[start:]
+                lib = next((lib for lib in map(_library_of, codes[1:]) if lib is not None), "app")
+                self.libraries[lib] += 1
+            elif not self.include_idle and codes[-1].co_filename.endswith(_IDLE_FILES):
+                continue
+
+            self.stacks[tuple(_frame_label(c) for c in codes)] += 1
+            self.n_samples += 1
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.is_set():
+            self._sample(own)
+            self.n_ticks += 1
+            time.sleep(self.interval)
+
+    def start(self) -> "SamplingProfiler":
+        self._started_at = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started_at
+        return self
+
+    # -----------------------------
+    # Rapports
+    # -----------------------------
+    def collapsed(self) -> str:
+        """Format "collapsed stacks" (flamegraph.pl, speedscope, inferno)."""
+        return "\n".join(f"{';'.join(stack)} {n}" for stack, n in self.stacks.most_common())
+
+    def top(self, n: int = 25) -> list[dict]:
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for label in set(stack):
+                total_counts[label] += count
+        total = max(self.n_samples, 1)
+        return [
+            {
+                "function": label,
+                "self": self_counts[label],
+                "total": count,
+                "self_pct": round(100.0 * self_counts[label] / total, 2),
+                "total_pct": round(100.0 * count / total, 2),
+            }
+            for label, count in sorted(total_counts.items(), key=lambda x: (self_counts[x[0]], x[1]), reverse=True)[:n]
+        ]
+
+    def report(self, top_n: int = 25) -> dict:
+        total = max(sum(self.libraries.values()), 1)
+        return {
+            "pid": os.getpid(),
+            "mode": "decision" if self.scope is not None else "all",
+            "duration_s": round(self.duration, 3),
+            "interval_ms": self.interval * 1000,
+            "ticks": self.n_ticks,
+            "samples": self.n_samples,
+            "top": self.top(top_n),
+            "libraries": {
+                lib: {"samples": n, "pct": round(100.0 * n / total, 2)} for lib, n in self.libraries.most_common()
+            },
+            "collapsed": self.collapsed(),
+        }
+
+
+def try_acquire() -> bool:
+    # Une seule session de profiling à la fois par process
+    return _PROFILE_LOCK.acquire(blocking=False)
+
+
+def release() -> None:
+    _PROFILE_LOCK.release()
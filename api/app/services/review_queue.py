@@ -0,0 +1,258 @@
+"""
+File de revue humaine : décisions REVIEW en attente, triées, réservées par analyste, revues par lots.
+
+- Vue "en attente" : `decision = 'REVIEW'` (une revue fait toujours passer REVIEW à ACCEPT / REJECT,
+  donc aucune revue), servie par trois index partiels (db.py) : risque décroissant, montant décroissant,
+  ancienneté. Leur taille suit la file, pas l'historique : lecture d'une page en O(page) même avec des
+  millions de décisions.
+- Pagination par curseur (valeur de tri + id de la dernière ligne), jamais d'OFFSET.
+- Réservation : `claim` pose `claimed_by` / `claim_expires_at` sur les N premières décisions libres
+  par un UPDATE conditionnel (une décision ne peut être gagnée que par un analyste) ; la réservation
+  expire seule après `lease_seconds` (analyste parti). Une décision réservée par un autre analyste
+  ne peut pas être revue tant que la réservation court.
+- Revue : seule une décision encore en attente est revue, par un UPDATE conditionnel (REVIEW, libre
+  ou réservée par ce même analyste) dont on vérifie le nombre de lignes : deux revues concurrentes de
+  la même décision ne peuvent pas réussir toutes les deux.
+- Revue par lots : toutes les décisions lues en une requête, une seule transaction, un résultat par
+  élément (stored, not_found, not_pending, claimed, duplicate).
+"""
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import or_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from ..db import PENDING_REVIEW, Decision, Review, SessionLocal
+from .monitoring import REVIEW_CLAIMS, REVIEWS_STORED
+from .serialization import dumps_bytes, loads
+
+# Ordre de tri -> (colonnes, décroissant) ; mêmes colonnes que les index partiels
+ORDERS = {
+    "risk": ((Decision.risk_score, Decision.id), True),
+    "amount": ((Decision.amount, Decision.id), True),
+    "age": ((Decision.created_at, Decision.id), False),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def map_human_to_final(previous_decision: str, human_decision: str) -> str:
+    # Mapping simple pour le MVP :
+    # - APPROVE humain transforme REVIEW en ACCEPT
+    # - REJECT humain transforme REVIEW en REJECT
+    # - Pour les autres décisions, garder la précédente sauf si on veut surcharger partout.
+    if previous_decision == "REVIEW":
+        return "ACCEPT" if human_decision == "APPROVE" else "REJECT"
+    return previous_decision
+
+
+# -----------------------------
+# Curseur
+# -----------------------------
+def encode_cursor(order: str, row: Decision) -> str:
+    value = row.created_at.isoformat() if order == "age" else getattr(row, ORDERS[order][0][0].key)
+    return base64.urlsafe_b64encode(dumps_bytes([order, value, row.id])).decode("ascii")
+
+
+def _decode_cursor(order: str, cursor: str) -> tuple:
+    try:
+        cursor_order, value, row_id = loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+    if cursor_order != order:
+        raise InvalidCursor("Cursor was issued for another order")
+    if order == "age":
+        value = datetime.fromisoformat(value)
+    return value, row_id
+
+
+# -----------------------------
+# Vue "en attente"
+# -----------------------------
+def _free(now: datetime):
+    return or_(Decision.claim_expires_at.is_(None), Decision.claim_expires_at <= now)
+
+
+def _pending(order: str, *, now: datetime, include_claimed: bool = False, after: Optional[tuple] = None):
+    columns, descending = ORDERS[order]
+    stmt = select(Decision).where(PENDING_REVIEW)
+    if not include_claimed:
+        stmt = stmt.where(_free(now))
+    if after is not None:
+        # Comparaison de tuples : reprise exactement après la dernière ligne de la page, via l'index
+        key = tuple_(*columns)
+        stmt = stmt.where(key < tuple_(*after) if descending else key > tuple_(*after))
+    return stmt.order_by(*(c.desc() if descending else c for c in columns))
+
+
+def list_pending(
+    db: Session,
+    *,
+    order: str = "risk",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_claimed: bool = False,
+) -> tuple[list[Decision], Optional[str]]:
+    """Page de la file dans l'ordre `order` ; renvoie (décisions, curseur de la page suivante ou None)."""
+    after = _decode_cursor(order, cursor) if cursor else None
+    rows = db.scalars(_pending(order, now=datetime.utcnow(), include_claimed=include_claimed, after=after).limit(limit + 1)).all()
+    next_cursor = encode_cursor(order, rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def claim(db: Session, reviewer_id: str, *, limit: int, order: str = "risk", lease_seconds: float = 900.0) -> tuple[list[Decision], datetime]:
+    """Réserve pour `reviewer_id` jusqu'à `limit` décisions libres en tête de file ; renvoie (décisions, fin du bail)."""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=lease_seconds)
+    won: list[int] = []
+    # Quelques tentatives : des candidats peuvent être pris entre la lecture et l'UPDATE par un autre analyste
+    for _ in range(3):
+        wanted = limit - len(won)
+        candidates = db.scalars(
+            _pending(order, now=now).with_only_columns(Decision.id).where(Decision.id.not_in(won)).limit(wanted)
+        ).all()
+        if not candidates:
+            break
+        db.execute(
+            update(Decision)
+            .where(Decision.id.in_(candidates), PENDING_REVIEW, _free(now))
+            .values(claimed_by=reviewer_id, claim_expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        won += db.scalars(
+            select(Decision.id).where(
+                Decision.id.in_(candidates), Decision.claimed_by == reviewer_id, Decision.claim_expires_at == expires_at
+            )
+        ).all()
+        if len(won) >= limit:
+            break
+    REVIEW_CLAIMS.inc(len(won))
+    if not won:
+        return [], expires_at
+    columns, descending = ORDERS[order]
+    rows = db.scalars(select(Decision).where(Decision.id.in_(won)).order_by(*(c.desc() if descending else c for c in columns))).all()
+    return rows, expires_at
+
+
+def release(db: Session, reviewer_id: str, decision_ids: list[str]) -> int:
+    """Rend à la file les décisions réservées par `reviewer_id` ; renvoie le nombre libéré."""
+    n = db.execute(
+        update(Decision)
+        .where(Decision.decision_id.in_(decision_ids), Decision.claimed_by == reviewer_id)
+        .values(claimed_by=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return n
+
+
+# -----------------------------
+# Revues
+# -----------------------------
+def claimed_by_other(row: Decision, reviewer_id: str, now: Optional[datetime] = None) -> bool:
+    now = now or datetime.utcnow()
+    return row.claimed_by is not None and row.claimed_by != reviewer_id and row.claim_expires_at is not None and row.claim_expires_at > now
+
+
+def apply_review(db: Session, row: Decision, reviewer_id: str, human_decision: str, comment: str) -> Optional[str]:
+    """
+    Revue d'une décision en attente (sans commit) ; renvoie la décision finale, ou None si la décision
+    n'est plus en attente ou est réservée par un autre analyste au moment de l'écriture.
+    """
+    final = map_human_to_final("REVIEW", human_decision)
+    # Stocker la décision finale tout en préservant la trace originale (audit) ; la décision sort de la file
+    n = db.execute(
+        update(Decision)
+        .where(Decision.id == row.id, PENDING_REVIEW, or_(_free(datetime.utcnow()), Decision.claimed_by == reviewer_id))
+        .values(decision=final, claimed_by=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if n != 1:
+        return None
+    db.add(Review(
+        decision_id_fk=row.id,
+        reviewer_id=reviewer_id,
+        human_decision=human_decision,
+        comment=comment,
+        previous_decision="REVIEW",
+        final_decision=final,
+    ))
+    return final
+
+
+def _refused(row: Decision, reviewer_id: str, now: datetime) -> Optional[str]:
+    if row.decision != "REVIEW":
+        return "not_pending"
+    if claimed_by_other(row, reviewer_id, now):
+        return "claimed"
+    return None
+
+
+@dataclass(frozen=True)
+class BulkResult:
+    decision_id: str
+    status: str
+    previous_decision: Optional[str] = None
+    final_decision: Optional[str] = None
+
+
+def bulk_review(db: Session, reviewer_id: str, items: list) -> list[BulkResult]:
+    """
+    Revues `items` (decision_id, human_decision, comment) en une transaction : une lecture groupée,
+    un commit. Éléments refusés (inconnus, déjà revus, réservés par un autre, en double) signalés sans
+    bloquer le lot.
+    """
+    ids = list(dict.fromkeys(item.decision_id for item in items))
+    rows = {r.decision_id: r for r in db.scalars(select(Decision).where(Decision.decision_id.in_(ids))).all()}
+    now = datetime.utcnow()
+    seen: set[str] = set()
+    results = []
+    for item in items:
+        row = rows.get(item.decision_id)
+        if item.decision_id in seen:
+            results.append(BulkResult(item.decision_id, "duplicate"))
+        elif row is None:
+            results.append(BulkResult(item.decision_id, "not_found"))
+        elif (refused := _refused(row, reviewer_id, now)) is not None:
+            results.append(BulkResult(item.decision_id, refused))
+        else:
+            final = apply_review(db, row, reviewer_id, item.human_decision, item.comment)
+            if final is None:
+                # Revue ou réservée par un autre entre la lecture et l'écriture
+                db.refresh(row)
+                results.append(BulkResult(item.decision_id, _refused(row, reviewer_id, datetime.utcnow()) or "claimed"))
+            else:
+                results.append(BulkResult(item.decision_id, "stored", "REVIEW", final))
+        seen.add(item.decision_id)
+    db.commit()
+    REVIEWS_STORED.labels(route="bulk").inc(sum(r.status == "stored" for r in results))
+    return results
+
+
+def backfill_pending_amounts(session_factory: Callable[[], Session] = SessionLocal, batch_size: int = 1000) -> int:
+    """Montant des décisions en attente antérieures à la colonne `amount` (lu dans request_payload)."""
+    total = 0
+    db = session_factory()
+    try:
+        while True:
+            rows = db.execute(
+                select(Decision.id, Decision.request_payload).where(PENDING_REVIEW, Decision.amount.is_(None)).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            db.execute(
+                update(Decision),
+                [{"id": row_id, "amount": float(payload["transaction"]["amount"])} for row_id, payload in rows],
+            )
+            db.commit()
+            total += len(rows)
+        return total
+    finally:
+        db.close()
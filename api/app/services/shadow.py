@@ -0,0 +1,356 @@
+"""
+Shadow scoring : un challenger du registre multi-modèles est scoré sur le trafic réel, sans
+influencer la décision servie.
+
+Sur le chemin de requête : un tirage (`SHADOW_SAMPLE_RATE`) puis un `put_nowait` dans une file
+bornée (payload Pydantic passé tel quel, avec les scores / la décision du champion). File pleine
+=> la décision n'est pas scorée en shadow (compteur `shadow_dropped_total`), jamais d'attente.
+
+Un pool de threads (`SHADOW_WORKERS`) vide la file par lots (`SHADOW_BATCH_SIZE`, ou ce qui est
+arrivé en `SHADOW_BATCH_WAIT_SECONDS`) : frames construites une fois pour le lot, scoring vectorisé
+du ou des challengers (`SHADOW_CREDIT_MODEL` / `SHADOW_FRAUD_MODEL`, clés du registre), décision
+via `apply_policy_codes`, puis insertion groupée dans la table `shadow_scores` (liée à
+`decisions.decision_id`). Un modèle non challengé reprend le score du champion pour la décision.
+
+Rapport d'accord (taux d'accord, matrice de transitions, écarts de score) : `shadow_report`,
+exposé par `GET /debug/shadow` et en CLI :
+    python -m app.services.shadow [--since 2026-10-01T00:00:00] [--challenger credit_xgb]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal, ShadowScore
+from ..schemas import DecisionRequest
+from ..settings import settings
+from .model_registry import ModelRegistry, get_registry
+from .monitoring import SHADOW_BATCH_SECONDS, SHADOW_DROPPED, SHADOW_SCORED
+from .policy import DECISIONS, PolicyConfig, apply_policy_codes
+
+_SCORER: Optional["ShadowScorer"] = None
+_STOP = object()
+# Attente maximale d'un worker inactif avant de revérifier l'arrêt
+_POLL_SECONDS = 0.5
+
+
+class ShadowScorer:
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        *,
+        credit_key: Optional[str] = None,
+        fraud_key: Optional[str] = None,
+        sample_rate: float = 1.0,
+        queue_size: int = 10_000,
+        batch_size: int = 256,
+        batch_wait_seconds: float = 0.5,
+        workers: int = 1,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        if not credit_key and not fraud_key:
+            raise ValueError("shadow scoring needs a credit and/or fraud challenger")
+        for key, kind in ((credit_key, "credit"), (fraud_key, "fraud")):
+            if key and (key not in registry.specs or registry.specs[key].kind != kind):
+                raise ValueError(f"shadow {kind} challenger {key!r}: no {kind} model with that key in the registry")
+        self.registry = registry
+        self.credit_key = credit_key or None
+        self.fraud_key = fraud_key or None
+        self.challenger = "+".join(k for k in (self.credit_key, self.fraud_key) if k)
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self.session_factory = session_factory
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._threads = [
+            threading.Thread(target=self._run, name=f"shadow-scorer-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.submitted = 0
+        self.dropped = 0
+        self.scored = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self) -> "ShadowScorer":
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Les workers scorent ce qui est déjà en file puis s'arrêtent ; rend la main au plus tard après
+        `timeout` secondes, même file pleine ou workers bloqués (threads démons abandonnés).
+        """
+        self._stopping.set()
+        # Marqueurs de réveil pour les workers en attente ; file pleine : ils verront l'arrêt en la vidant
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                break
+        deadline = time.monotonic() + timeout
+        for t in self._threads:
+            if t.is_alive():
+                t.join(max(0.0, deadline - time.monotonic()))
+
+    # -----------------------------
+    # Chemin de requête
+    # -----------------------------
+    def submit(
+        self,
+        payload: DecisionRequest,
+        decision_id: str,
+        risk_score: float,
+        fraud_score: float,
+        decision: str,
+        velocity: Optional[dict] = None,
+    ) -> bool:
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        try:
+            self._queue.put_nowait((payload, decision_id, risk_score, fraud_score, decision, velocity))
+        except queue.Full:
+            SHADOW_DROPPED.labels(reason="queue_full").inc()
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    # -----------------------------
+    # Workers
+    # -----------------------------
+    def _next_batch(self) -> tuple[list, bool]:
+        """
+        Attend le premier élément, puis complète le lot jusqu'à batch_size ou batch_wait_seconds ;
+        `stop=True` une fois l'arrêt demandé et la file vide.
+        """
+        while True:
+            try:
+                first = self._queue.get(timeout=_POLL_SECONDS)
+                break
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return [], True
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def score_batch(self, batch: list) -> list[dict]:
+        from .ml_client import credit_frame, fraud_frame, fraud_scores
+
+        champion_risk = np.fromiter((b[2] for b in batch), dtype=float, count=len(batch))
+        champion_fraud = np.fromiter((b[3] for b in batch), dtype=float, count=len(batch))
+        risk, fraud = champion_risk, champion_fraud
+        challenger_risk = challenger_fraud = None
+        if self.credit_key:
+            model = self.registry.get(self.credit_key).model
+            X = credit_frame([b[0].client.model_dump() for b in batch])
+            risk = challenger_risk = np.clip(model.predict_proba(X)[:, 1], 0.0, 1.0)
+        if self.fraud_key:
+            model = self.registry.get(self.fraud_key).model
+            # Vélocité vue par le champion au moment de la requête (0 si absente)
+            Xf = fraud_frame([b[0].transaction.model_dump() for b in batch], [b[5] or {} for b in batch])
+            fraud = challenger_fraud = fraud_scores(model, Xf)
+        codes = apply_policy_codes(risk, fraud, PolicyConfig.from_settings())
+
+        rows = []
+        for i, (_, decision_id, _, _, decision, _) in enumerate(batch):
+            rows.append({
+                "decision_id": decision_id,
+                "challenger": self.challenger,
+                "risk_score": float(challenger_risk[i]) if challenger_risk is not None else None,
+                "fraud_score": float(challenger_fraud[i]) if challenger_fraud is not None else None,
+                "risk_delta": float(challenger_risk[i] - champion_risk[i]) if challenger_risk is not None else None,
+                "fraud_delta": float(challenger_fraud[i] - champion_fraud[i]) if challenger_fraud is not None else None,
+                "champion_code": DECISIONS.index(decision),
+                "challenger_code": int(codes[i]),
+                "created_at": datetime.utcnow(),
+            })
+        return rows
+
+    def _process(self, batch: list) -> None:
+        t0 = time.perf_counter()
+        try:
+            rows = self.score_batch(batch)
+            with self.session_factory() as db:
+                db.execute(insert(ShadowScore), rows)
+                db.commit()
+        except Exception as e:
+            # Le shadow ne doit jamais impacter l'API : le lot est perdu, compté
+            print(f"ERROR: shadow scoring failed for {len(batch)} decisions: {e}")
+            SHADOW_DROPPED.labels(reason="error").inc(len(batch))
+            with self._lock:
+                self.failed += len(batch)
+            return
+        SHADOW_BATCH_SECONDS.observe(time.perf_counter() - t0)
+        SHADOW_SCORED.labels(challenger=self.challenger).inc(len(rows))
+        with self._lock:
+            self.scored += len(rows)
+            self.batches += 1
+
+    def _run(self) -> None:
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                self._process(batch)
+            if stop:
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "challenger": self.challenger,
+                "queued": self._queue.qsize(),
+                "submitted": self.submitted,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "scored": self.scored,
+                "batches": self.batches,
+            }
+
+
+# -----------------------------
+# Rapport d'accord champion / challenger
+# -----------------------------
+def _delta_summary(deltas: np.ndarray) -> dict:
+    if deltas.size == 0:
+        return {"n": 0}
+    d = np.abs(deltas)
+    return {
+        "n": int(deltas.size),
+        "mean": float(deltas.mean()),
+        "mean_abs": float(d.mean()),
+        "p95_abs": float(np.percentile(d, 95)),
+        "max_abs": float(d.max()),
+    }
+
+
+def shadow_report(
+    db: Session,
+    *,
+    challenger: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> dict:
+    """Par challenger : taux d'accord des décisions, transitions champion -> challenger, écarts de score."""
+    q = select(
+        ShadowScore.challenger,
+        ShadowScore.champion_code,
+        ShadowScore.challenger_code,
+        ShadowScore.risk_delta,
+        ShadowScore.fraud_delta,
+    )
+    if challenger:
+        q = q.where(ShadowScore.challenger == challenger)
+    if since:
+        q = q.where(ShadowScore.created_at >= since)
+    if until:
+        q = q.where(ShadowScore.created_at < until)
+
+    by_challenger: dict[str, list] = {}
+    for row in db.execute(q):
+        by_challenger.setdefault(row[0], []).append(row[1:])
+
+    n = len(DECISIONS)
+    out = {}
+    for name, rows in sorted(by_challenger.items()):
+        champ = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        chall = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+        m = np.bincount(champ * n + chall, minlength=n * n).reshape(n, n)
+        risk = np.array([r[2] for r in rows if r[2] is not None], dtype=float)
+        fraud = np.array([r[3] for r in rows if r[3] is not None], dtype=float)
+        total = int(m.sum())
+        out[name] = {
+            "compared": total,
+            "agreement_rate": float(np.trace(m)) / total if total else None,
+            "transitions": {DECISIONS[i]: {DECISIONS[j]: int(m[i, j]) for j in range(n)} for i in range(n)},
+            "risk_delta": _delta_summary(risk),
+            "fraud_delta": _delta_summary(fraud),
+        }
+    return {"challengers": out, "live": _SCORER.stats() if _SCORER is not None else None}
+
+
+# -----------------------------
+# Cycle de vie (main.py)
+# -----------------------------
+def start_shadow() -> Optional[ShadowScorer]:
+    global _SCORER
+    if not settings.shadow_enabled or _SCORER is not None:
+        return _SCORER
+    registry = get_registry()
+    if registry is None:
+        raise ValueError("SHADOW_ENABLED requires MODEL_REGISTRY_PATH (challengers are registry models)")
+    _SCORER = ShadowScorer(
+        registry,
+        credit_key=settings.shadow_credit_model,
+        fraud_key=settings.shadow_fraud_model,
+        sample_rate=settings.shadow_sample_rate,
+        queue_size=settings.shadow_queue_size,
+        batch_size=settings.shadow_batch_size,
+        batch_wait_seconds=settings.shadow_batch_wait_seconds,
+        workers=settings.shadow_workers,
+    ).start()
+    return _SCORER
+
+
+def stop_shadow() -> None:
+    global _SCORER
+    if _SCORER is not None:
+        _SCORER.stop()
+        _SCORER = None
+
+
+def shadow_decision(
+    payload: DecisionRequest,
+    decision_id: str,
+    risk_score: float,
+    fraud_score: float,
+    decision: str,
+    velocity: Optional[dict] = None,
+) -> None:
+    if _SCORER is not None:
+        _SCORER.submit(payload, decision_id, risk_score, fraud_score, decision, velocity)
+
+
+def _parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Champion / challenger agreement report from shadow_scores")
+    p.add_argument("--challenger", help="Restrict to one challenger label")
+    p.add_argument("--since", type=datetime.fromisoformat)
+    p.add_argument("--until", type=datetime.fromisoformat)
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = _parse_args(argv)
+    with SessionLocal() as db:
+        report = shadow_report(db, challenger=args.challenger, since=args.since, until=args.until)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Chronométrage par étape du pipeline de décision + contexte de trace léger.
+
+- `stage("credit_score")` : context manager qui alimente l'histogramme `decision_stage_seconds{stage=...}`
+  et la trace de la requête courante (contextvar). Sans trace active, il renvoie un context manager
+  nul partagé : coût ~ une lecture de contextvar.
+- `StageTimingMiddleware` (ASGI pur) : démarre la trace sur les routes de décision, ajoute
+  l'en-tête `Server-Timing` (et `traceparent` si `TRACING_ENABLED`).
+- `trace_headers()` : en-têtes W3C `traceparent` à propager vers le service agent.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+
+from ..settings import settings
+from .monitoring import STAGE_LATENCY
+
+_NULL_STAGE = nullcontext()
+_CURRENT: ContextVar[Optional["Trace"]] = ContextVar("decision_trace", default=None)
+
+
+class Trace:
+    __slots__ = ("trace_id", "span_id", "parent_id", "t0", "received_at", "stages")
+
+    def __init__(self, trace_id: Optional[str] = None, parent_id: Optional[str] = None):
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.span_id = None
+        self.t0 = perf_counter()
+        self.received_at = time.time()
+        # Cumul par étape (ordre de première apparition) : taille bornée par le nombre d'étapes, même
+        # pour une connexion /decision/stream qui enchaîne les micro-lots
+        self.stages: dict[str, float] = {}
+        if settings.tracing_enabled:
+            self.trace_id = trace_id or os.urandom(16).hex()
+            self.span_id = os.urandom(8).hex()
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> "Trace":
+        # Format W3C : 00-<trace_id 32 hex>-<parent_id 16 hex>-<flags>
+        if header and settings.tracing_enabled:
+            parts = header.strip().split("-")
+            if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+                return cls(trace_id=parts[1], parent_id=parts[2])
+        return cls()
+
+    def record(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        STAGE_LATENCY.labels(stage=name).observe(seconds)
+
+    def traceparent(self) -> Optional[str]:
+        if self.trace_id is None:
+            return None
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def server_timing(self) -> str:
+        items = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        items.append(f"total;dur={(perf_counter() - self.t0) * 1000:.2f}")
+        return ", ".join(items)
+
+    def to_log(self) -> str:
+        return json.dumps({
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "total_ms": round((perf_counter() - self.t0) * 1000, 3),
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+        })
+
+
+class _Stage:
+    __slots__ = ("trace", "name", "t0")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.record(self.name, perf_counter() - self.t0)
+        return False
+
+
+def current_trace() -> Optional[Trace]:
+    return _CURRENT.get()
+
+
+def stage(name: str):
+    trace = _CURRENT.get()
+    if trace is None:
+        return _NULL_STAGE
+    return _Stage(trace, name)
+
+
+def mark_since_start(name: str) -> None:
+    """Enregistre le temps écoulé depuis l'arrivée de la requête (lecture du corps + validation)."""
+    trace = _CURRENT.get()
+    if trace is not None:
+        trace.record(name, perf_counter() - trace.t0)
+
+
+def request_received_at() -> float:
+    """Horodatage (epoch) d'arrivée de la requête courante : début de la trace, sinon maintenant."""
+    trace = _CURRENT.get()
+    return trace.received_at if trace is not None else time.time()
+
+
+def trace_headers() -> dict:
+    trace = _CURRENT.get()
+    if trace is None or trace.trace_id is None:
+        return {}
+    return {"traceparent": trace.traceparent()}
+
+
+class StageTimingMiddleware:
+    """
+    Middleware ASGI pur (pas de BaseHTTPMiddleware) limité aux chemins de décision : chaque préfixe
+    de `paths` et ses sous-routes (`/decision` couvre `/decision/transaction`, `/decision/stream`...).
+    """
+
+    def __init__(self, app, paths: tuple = ("/decision", "/ui/decide")):
+        self.app = app
+        self.paths = frozenset(p.rstrip("/") for p in paths)
+        self.prefixes = tuple(p + "/" for p in self.paths)
+
+    def traced(self, path: str) -> bool:
+        return path in self.paths or path.startswith(self.prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.stage_timing_enabled or not self.traced(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                incoming = value.decode("latin-1")
+                break
+        trace = Trace.from_traceparent(incoming)
+        token = _CURRENT.set(trace)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", trace.server_timing())
+                if trace.trace_id is not None:
+                    headers.append("traceparent", trace.traceparent())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _CURRENT.reset(token)
+            if trace.trace_id is not None:
+                print(trace.to_log())
@@ -0,0 +1,228 @@
+"""
+Features de vélocité par client (nombre de transactions, montant cumulé, pays distincts sur
+10 min / 1 h / 24 h), maintenues en mémoire sans lecture de la base sur le chemin de requête.
+
+Par client pseudonymisé et par fenêtre : un anneau de `VELOCITY_BUCKETS_PER_WINDOW` buckets de
+temps (largeur fenêtre / n) avec totaux courants. Mise à jour et lecture en O(1) : seuls les buckets
+sortis de la fenêtre sont soustraits (au plus n), les pays sont un masque de bits par bucket.
+La fenêtre est donc approchée à la largeur d'un bucket près.
+
+Mémoire bornée : les clients sans transaction depuis la plus longue fenêtre sont évincés (ordre
+LRU, coût amorti O(1)), et au plus `VELOCITY_MAX_CLIENTS` clients sont suivis. Au démarrage, les
+anneaux sont reconstruits depuis la table `decisions` (dernières 24 h).
+
+Les features décrivent l'historique *avant* la transaction courante ; elles alimentent le modèle
+fraude (colonnes ignorées par un modèle entraîné sans elles) et sont renvoyées dans l'explication.
+Chaque process (worker uvicorn) a son propre store : avec plusieurs workers, router les clients
+de façon stable ou accepter des compteurs partiels.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..schemas import DecisionRequest
+from ..settings import settings
+from .monitoring import VELOCITY_EVICTIONS, VELOCITY_TRACKED_CLIENTS
+
+# Fenêtres fixes : les noms de features sont partagés avec ml/training/train_fraud.py
+WINDOWS = (("10m", 600), ("1h", 3600), ("24h", 86400))
+VELOCITY_FEATURES = [f"{name}_{w}" for w, _ in WINDOWS for name in ("tx_count", "amount_sum", "distinct_countries")]
+_MAX_WINDOW = max(s for _, s in WINDOWS)
+
+_STORE: Optional["VelocityStore"] = None
+
+
+class _ClientWindows:
+    """Anneaux d'un client : une ligne par fenêtre, `n` buckets chacune."""
+
+    __slots__ = ("slot", "counts", "sums", "masks", "total_count", "total_sum", "last_seen")
+
+    def __init__(self, n: int):
+        k = len(WINDOWS)
+        self.slot = [None] * k
+        self.counts = [[0] * n for _ in range(k)]
+        self.sums = [[0.0] * n for _ in range(k)]
+        self.masks = [[0] * n for _ in range(k)]
+        self.total_count = [0] * k
+        self.total_sum = [0.0] * k
+        self.last_seen = 0.0
+
+
+class VelocityStore:
+    def __init__(self, *, buckets_per_window: int = 6, max_clients: int = 500_000):
+        self.n = max(1, buckets_per_window)
+        self.widths = [seconds / self.n for _, seconds in WINDOWS]
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[str, _ClientWindows]" = OrderedDict()
+        self._countries: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    # -----------------------------
+    # Anneaux
+    # -----------------------------
+    def _country_bit(self, country: str) -> int:
+        # 63 pays distincts suivis, les suivants partagent le dernier bit (sous-estimation bornée)
+        bit = self._countries.get(country)
+        if bit is None:
+            bit = self._countries[country] = min(len(self._countries), 63)
+        return 1 << bit
+
+    def _rotate(self, c: _ClientWindows, k: int, slot: int) -> None:
+        cur = c.slot[k]
+        if cur is None:
+            c.slot[k] = slot
+            return
+        if slot <= cur:
+            return
+        counts, sums, masks = c.counts[k], c.sums[k], c.masks[k]
+        for s in range(cur + 1, min(slot, cur + self.n) + 1):
+            i = s % self.n
+            c.total_count[k] -= counts[i]
+            c.total_sum[k] -= sums[i]
+            counts[i], sums[i], masks[i] = 0, 0.0, 0
+        if c.total_count[k] == 0:
+            c.total_sum[k] = 0.0  # pas d'erreur d'arrondi résiduelle sur une fenêtre vide
+        c.slot[k] = slot
+
+    def _features(self, c: Optional[_ClientWindows], ts: float) -> dict:
+        out = {}
+        for k, (w, _) in enumerate(WINDOWS):
+            if c is None:
+                count, total, mask = 0, 0.0, 0
+            else:
+                self._rotate(c, k, int(ts // self.widths[k]))
+                count, total, mask = c.total_count[k], c.total_sum[k], 0
+                for m in c.masks[k]:
+                    mask |= m
+            out[f"tx_count_{w}"] = float(count)
+            out[f"amount_sum_{w}"] = float(total)
+            out[f"distinct_countries_{w}"] = float(bin(mask).count("1"))
+        return out
+
+    def _add(self, c: _ClientWindows, amount: float, country_bit: int, ts: float) -> None:
+        for k in range(len(WINDOWS)):
+            slot = int(ts // self.widths[k])
+            self._rotate(c, k, slot)
+            if c.slot[k] - slot >= self.n:
+                continue  # plus vieux que la fenêtre (événement en retard)
+            i = slot % self.n
+            c.counts[k][i] += 1
+            c.sums[k][i] += amount
+            c.masks[k][i] |= country_bit
+            c.total_count[k] += 1
+            c.total_sum[k] += amount
+        c.last_seen = max(c.last_seen, ts)
+
+    def _evict(self, now: float) -> None:
+        # Ordre LRU : les clients inactifs sont en tête
+        while self._clients:
+            key, c = next(iter(self._clients.items()))
+            if c.last_seen >= now - _MAX_WINDOW and len(self._clients) <= self.max_clients:
+                break
+            del self._clients[key]
+            self.evictions += 1
+            VELOCITY_EVICTIONS.inc()
+
+    # -----------------------------
+    # API
+    # -----------------------------
+    def observe(self, client_hash: str, amount: float, country: str, ts: Optional[float] = None) -> dict:
+        """Features sur l'historique précédent, puis ajout de la transaction courante."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            c = self._clients.get(client_hash)
+            features = self._features(c, ts)
+            if c is None:
+                c = self._clients[client_hash] = _ClientWindows(self.n)
+            else:
+                self._clients.move_to_end(client_hash)
+            self._add(c, float(amount), self._country_bit(country), ts)
+            self._evict(ts)
+        return features
+
+    def peek(self, client_hash: str, ts: Optional[float] = None) -> dict:
+        with self._lock:
+            return self._features(self._clients.get(client_hash), time.time() if ts is None else ts)
+
+    def rebuild(self, db: Session, now: Optional[float] = None, batch_size: int = 5000) -> int:
+        """Rejoue les décisions des dernières 24 h (ordre chronologique) ; renvoie le nombre de transactions."""
+        from ..db import Decision
+
+        now = time.time() if now is None else now
+        since = datetime.fromtimestamp(now - _MAX_WINDOW, tz=timezone.utc).replace(tzinfo=None)
+        q = (
+            select(Decision.client_id_hash, Decision.created_at, Decision.request_payload)
+            .where(Decision.created_at >= since)
+            .order_by(Decision.created_at, Decision.id)
+            .execution_options(yield_per=batch_size)
+        )
+        n = 0
+        with self._lock:
+            for client_hash, created_at, payload in db.execute(q):
+                tx = (payload or {}).get("transaction") or {}
+                if "amount" not in tx:
+                    continue
+                ts = created_at.replace(tzinfo=timezone.utc).timestamp()
+                c = self._clients.get(client_hash)
+                if c is None:
+                    c = self._clients[client_hash] = _ClientWindows(self.n)
+                else:
+                    self._clients.move_to_end(client_hash)
+                self._add(c, float(tx["amount"]), self._country_bit(str(tx.get("country", ""))), ts)
+                n += 1
+            self._evict(now)
+        VELOCITY_TRACKED_CLIENTS.set(len(self))
+        return n
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "max_clients": self.max_clients,
+                "buckets_per_window": self.n,
+                "windows": dict(WINDOWS),
+                "evictions": self.evictions,
+            }
+
+
+def get_velocity_store() -> Optional[VelocityStore]:
+    return _STORE
+
+
+def start_velocity(db_factory=None) -> Optional[VelocityStore]:
+    """Crée le store et le reconstruit depuis `decisions` (appelé au démarrage, hors boucle d'événements)."""
+    global _STORE
+    if not settings.velocity_enabled or _STORE is not None:
+        return _STORE
+    store = VelocityStore(buckets_per_window=settings.velocity_buckets_per_window, max_clients=settings.velocity_max_clients)
+    if settings.velocity_rebuild_on_startup:
+        from ..db import SessionLocal
+
+        t0 = time.perf_counter()
+        with (db_factory or SessionLocal)() as db:
+            n = store.rebuild(db)
+        print(f"INFO: velocity store rebuilt from {n} decisions in {time.perf_counter() - t0:.2f}s")
+    _STORE = store
+    return _STORE
+
+
+def observe_velocity(payload: DecisionRequest) -> Optional[dict]:
+    if _STORE is None:
+        return None
+    from .logging import hash_client_id
+
+    tx = payload.transaction
+    features = _STORE.observe(hash_client_id(payload.client.client_id), tx.amount, tx.country)
+    VELOCITY_TRACKED_CLIENTS.set(len(_STORE))
+    return features
@@ -1,7 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
-    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore", protected_namespaces=("settings_",))
 
     app_name: str = "Sentinelle-Plateforme - Plateforme de Décision Risque & Fraude"
     environment: str = "dev"
@@ -15,6 +15,95 @@ class Settings(BaseSettings):
     risk_review_lower: float = 0.45
     risk_review_upper: float = 0.70
 
+    # Monitoring de drift (PSI / KS / chi² vs reference.json d'entraînement)
+    drift_enabled: bool = True
+    drift_window_seconds: int = 3600
+    drift_bucket_seconds: int = 300
+    drift_interval_seconds: float = 60.0
+    drift_psi_threshold: float = 0.2
+    drift_min_samples: int = 200
+
+    # Chronométrage par étape (histogrammes + en-tête Server-Timing) et trace légère propagée à l'agent
+    stage_timing_enabled: bool = True
+    tracing_enabled: bool = False
+
+    # Endpoints d'administration (/debug/...) : en-tête X-Admin-Token, désactivés si vide
+    admin_token: str = ""
+
+    # Rechargement à chaud des modèles : surveillance du pointeur `current` (0 = désactivée)
+    model_watch_interval_seconds: float = 30.0
+
+    # Registre multi-modèles (modèles par segment / challengers), désactivé si vide
+    model_registry_path: str = ""
+    model_registry_budget_mb: float = 1024.0
+    model_registry_cache_dir: str = "./model_cache"
+
+    # Profils clients (features crédit, score, SHAP) réutilisés entre transactions : memory | redis (opt-in)
+    profile_store_enabled: bool = False
+    profile_store_backend: str = "memory"
+    profile_store_ttl_seconds: float = 3600.0
+    profile_store_max_entries: int = 100_000
+    profile_store_redis_url: str = "redis://localhost:6379/0"
+
+    # Features de vélocité par client (anneaux en mémoire, optionnellement reconstruits depuis `decisions` au démarrage) ; opt-in
+    velocity_enabled: bool = False
+    velocity_buckets_per_window: int = 6
+    velocity_max_clients: int = 500_000
+    velocity_rebuild_on_startup: bool = False
+
+    # Idempotency-Key sur les routes de décision : réponse rejouée pendant le TTL (table + front LRU)
+    idempotency_enabled: bool = True
+    idempotency_ttl_seconds: float = 86400.0
+    idempotency_memory_entries: int = 10_000
+    idempotency_lease_seconds: float = 60.0
+    idempotency_wait_seconds: float = 30.0
+    idempotency_purge_interval_seconds: float = 300.0
+
+    # Contrôle d'admission des routes de décision (par worker) et modes dégradés sous charge
+    # Seuils "niveau 1,niveau 2,niveau 3" : sans rapport agent, sans SHAP, fraude par règles seules
+    admission_enabled: bool = True
+    admission_max_concurrency: int = 32
+    admission_max_queue: int = 256
+    admission_queue_timeout_seconds: float = 2.0
+    admission_degrade_queue_depths: str = "8,32,128"
+    admission_degrade_latency_ms: str = "250,500,1000"
+    admission_latency_alpha: float = 0.2
+
+    # File de revue humaine : durée de réservation d'une décision, taille max d'une page / d'un lot
+    review_lease_seconds: float = 900.0
+    review_queue_page_max: int = 200
+    review_bulk_max_items: int = 500
+
+    # Flux NDJSON (POST /decision/stream) : micro-lots et décisions en vol par connexion
+    stream_batch_size: int = 64
+    stream_batch_wait_seconds: float = 0.05
+    stream_max_in_flight: int = 512
+    stream_max_line_bytes: int = 65536
+    # Rapports agent simultanés par micro-lot (0 : pas de rapport sur le flux)
+    stream_report_concurrency: int = 8
+
+    # Explications complètes calculées à la demande par GET /explain (modèles archivés gardés en mémoire)
+    explain_bulk_max_ids: int = 500
+    explain_archived_models: int = 4
+
+    # Shadow scoring : challengers du registre (clés de MODEL_REGISTRY_PATH) scorés hors du chemin de requête
+    shadow_enabled: bool = False
+    shadow_credit_model: str = ""
+    shadow_fraud_model: str = ""
+    shadow_sample_rate: float = 1.0
+    shadow_queue_size: int = 10_000
+    shadow_batch_size: int = 256
+    shadow_batch_wait_seconds: float = 0.5
+    shadow_workers: int = 1
+
+    # Capture de trafic échantillonnée (segments NDJSON gzip, rejeu via benchmarks/replay.py)
+    capture_enabled: bool = False
+    capture_sample_rate: float = 0.01
+    capture_dir: str = "./capture"
+    capture_segment_max_records: int = 100_000
+    capture_segment_max_seconds: float = 3600.0
+    capture_queue_size: int = 10_000
+
     # Pseudonymization
     client_id_salt: str = "CHANGE_ME_SALT"
 
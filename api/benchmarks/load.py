@@ -0,0 +1,75 @@
+"""
+Générateur de charge in-process : pilote l'application ASGI via httpx (sans réseau ni serveur)
+avec des payloads réalistes, et mesure débit et latences p50/p95/p99.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+
+import numpy as np
+
+from .payloads import mixed_payloads
+
+
+def latency_summary(latencies_s: list[float], wall_s: float, errors: int) -> dict:
+    lat_ms = np.asarray(latencies_s) * 1000
+    return {
+        "requests": len(latencies_s),
+        "errors": errors,
+        "wall_s": wall_s,
+        "throughput_rps": len(latencies_s) / wall_s if wall_s > 0 else None,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+        "max_ms": float(lat_ms.max()),
+    }
+
+
+async def _drive(app, payloads: list[dict], *, path: str, concurrency: int) -> dict:
+    import httpx
+
+    latencies: list[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for p in payloads:
+        queue.put_nowait(p)
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        while True:
+            try:
+                body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t0 = time.perf_counter()
+            r = await client.post(path, json=body)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Échauffement hors mesure (chargement modèles, explainer SHAP)
+        await client.post(path, json=payloads[0])
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+
+    return latency_summary(latencies, wall, errors)
+
+
+def run_load(n_requests: int, *, concurrency: int = 8, seed: int = 42, path: str = "/decision") -> dict:
+    from app.db import init_db
+    from app.main import app
+
+    # ASGITransport ne déclenche pas le lifespan : initialiser la base explicitement
+    init_db()
+    payloads = mixed_payloads(n_requests, seed=seed)
+    res = asyncio.run(_drive(app, payloads, path=path, concurrency=concurrency))
+    res["concurrency"] = concurrency
+    print(
+        f"load{path} n={res['requests']} c={concurrency}: {res['throughput_rps']:.1f} req/s, "
+        f"p50={res['p50_ms']:.1f}ms p95={res['p95_ms']:.1f}ms p99={res['p99_ms']:.1f}ms errors={res['errors']}"
+    )
+    return {f"load{path}": res}
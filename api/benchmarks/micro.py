@@ -0,0 +1,180 @@
+"""
+Micro-benchmarks des briques du pipeline de décision, par taille de lot.
+
+Chaque mesure renvoie le temps médian d'un lot de `size` éléments et le coût par élément.
+Les fonctions unitaires (predict_risk_and_fraud, apply_policy, hash_client_id, store_decision)
+sont appelées `size` fois ; les fonctions vectorisables reçoivent un lot de `size` lignes.
+
+`decision_serialization` (pipeline partagé : un `model_dump`, dicts construits une fois, encodeur
+rapide) est comparé à `decision_serialization_legacy` (ancien chemin des routes : aperçu Pydantic
+dumpé 3 fois, payload redumpé, DecisionResponse construite puis revalidée par `response_model`),
+avec le pic de mémoire allouée pour une décision (`alloc_peak_bytes`, tracemalloc).
+"""
+from __future__ import annotations
+
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+
+from .payloads import mixed_payloads
+
+# Budget par (benchmark, taille) : nombre de répétitions ajusté après un premier passage
+TIME_BUDGET_S = 2.0
+MAX_REPEAT = 7
+
+
+def _measure(fn: Callable[[], None], *, budget_s: float = TIME_BUDGET_S) -> list[float]:
+    t0 = time.perf_counter()
+    fn()
+    timings = [time.perf_counter() - t0]
+    repeat = int(min(MAX_REPEAT, budget_s // max(timings[0], 1e-9)))
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def _result(timings: list[float], size: int) -> dict:
+    median = statistics.median(timings)
+    return {
+        "size": size,
+        "repeat": len(timings),
+        "median_s": median,
+        "min_s": min(timings),
+        "per_item_us": median / size * 1e6,
+        "items_per_s": size / median if median > 0 else None,
+    }
+
+
+def _alloc_peak_bytes(fn: Callable[[], None]) -> int:
+    """Pic de mémoire allouée pendant un appel (objets intermédiaires compris), via tracemalloc."""
+    fn()  # caches et imports hors mesure
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - base
+
+
+def run_micro(sizes: list[int], *, seed: int = 42) -> dict:
+    from fastapi.encoders import jsonable_encoder
+
+    from app.db import SessionLocal, init_db
+    from app.schemas import DecisionRequest, DecisionResponse, ExplanationsPreview
+    from app.services.decision_pipeline import build_preview
+    from app.services.serialization import dumps, dumps_bytes
+    from app.services.logging import hash_client_id, store_decision
+    from app.services.fraud_explainer import explain_fraud_batch
+    from app.services.ml_client import (
+        _load_fraud_model,
+        _load_model,
+        compute_shap_values,
+        credit_frame,
+        fraud_frame,
+        predict_risk_and_fraud,
+    )
+    from app.services.policy import PolicyConfig, apply_policy, apply_policy_codes
+
+    init_db()
+    raw = mixed_payloads(max(sizes), seed=seed)
+    requests = [DecisionRequest(**p) for p in raw]
+    model = _load_model()
+    fraud_model = _load_fraud_model()
+
+    # Échauffement : chargement des modèles, import SHAP, création de l'explainer
+    predict_risk_and_fraud(requests[0])
+
+    rng = np.random.default_rng(seed)
+    risk = rng.random(max(sizes))
+    fraud = rng.random(max(sizes))
+    cfg = PolicyConfig.from_settings()
+    stored = {"n": 0}
+
+    # Sorties de scoring réelles : la sérialisation porte sur des explications de taille représentative
+    scored = [predict_risk_and_fraud(p) for p in requests]
+    versions = scored[0][2]
+
+    def serialize_legacy(batch: list[DecisionRequest]) -> list:
+        out = []
+        for p, (r, f, _, shap_impacts, fraud_impacts) in zip(batch, scored):
+            p.client.model_dump(), p.transaction.model_dump()  # frames du scoring
+            preview = ExplanationsPreview(credit_top_features=shap_impacts, fraud_top_features=fraud_impacts)
+            json.dumps(preview.model_dump()), json.dumps(p.model_dump())  # colonnes JSON
+            agent = {"decision": "ACCEPT", "risk_score": r, "fraud_score": f, "explanations_preview": preview.model_dump()}
+            response = DecisionResponse(
+                decision_id="dcn_bench", decision="ACCEPT", risk_score=r, fraud_score=f, policy_rule="otherwise => ACCEPT",
+                model_versions=versions, explanations_preview=preview, report_summary=None,
+            )
+            # response_model : dump, revalidation, jsonable_encoder puis json.dumps
+            content = DecisionResponse.model_validate(response.model_dump()).model_dump(mode="json")
+            out.append((agent, json.dumps(jsonable_encoder(content)).encode("utf-8")))
+        return out
+
+    def serialize_pipeline(batch: list[DecisionRequest]) -> list:
+        out = []
+        for p, (r, f, _, shap_impacts, fraud_impacts) in zip(batch, scored):
+            request = p.model_dump()
+            preview = build_preview(shap_impacts, fraud_impacts, None)
+            dumps(preview), dumps(request)  # colonnes JSON
+            agent = {"decision": "ACCEPT", "risk_score": r, "fraud_score": f, "explanations_preview": preview}
+            body = {
+                "decision_id": "dcn_bench", "decision": "ACCEPT", "risk_score": r, "fraud_score": f,
+                "policy_rule": "otherwise => ACCEPT", "model_versions": versions,
+                "explanations_preview": preview, "report_summary": None,
+            }
+            out.append((agent, dumps_bytes(body)))
+        return out
+
+    def store_batch(batch: list[DecisionRequest]) -> None:
+        db = SessionLocal()
+        try:
+            for p in batch:
+                stored["n"] += 1
+                store_decision(
+                    db,
+                    decision_id=f"dcn_bench_{seed}_{stored['n']}",
+                    client_id_hash=hash_client_id(p.client.client_id),
+                    risk_score=0.3,
+                    fraud_score=0.4,
+                    decision="ACCEPT",
+                    policy_rule="otherwise => ACCEPT",
+                    model_versions={"credit_risk": "bench", "fraud": "bench"},
+                    explanations_preview={"credit_top_features": [], "fraud_top_features": []},
+                    request_payload=p.model_dump(),
+                )
+        finally:
+            db.close()
+
+    results = {}
+    for size in sizes:
+        batch = requests[:size]
+        X_credit = credit_frame([p.client.model_dump() for p in batch])
+        X_fraud = fraud_frame([p.transaction.model_dump() for p in batch])
+        benches = {
+            "predict_risk_and_fraud": lambda: [predict_risk_and_fraud(p) for p in batch],
+            "compute_shap_values": lambda: compute_shap_values(model, X_credit),
+            "explain_fraud_row": lambda: [explain_fraud_batch(fraud_model, X_fraud.iloc[i:i + 1]) for i in range(size)],
+            "explain_fraud_batch": lambda: explain_fraud_batch(fraud_model, X_fraud),
+            "apply_policy": lambda: [apply_policy(r, f, cfg) for r, f in zip(risk[:size], fraud[:size])],
+            "apply_policy_vectorized": lambda: apply_policy_codes(risk[:size], fraud[:size], cfg),
+            "hash_client_id": lambda: [hash_client_id(p.client.client_id) for p in batch],
+            "store_decision": lambda: store_batch(batch),
+            "decision_serialization_legacy": lambda: serialize_legacy(batch),
+            "decision_serialization": lambda: serialize_pipeline(batch),
+        }
+        for name, fn in benches.items():
+            key = f"micro.{name}[{size}]"
+            results[key] = _result(_measure(fn), size)
+            if name.startswith("decision_serialization"):
+                serialize = serialize_legacy if name.endswith("legacy") else serialize_pipeline
+                results[key]["alloc_peak_bytes"] = _alloc_peak_bytes(lambda: serialize(batch[:1]))
+            print(f"{key:45s} {results[key]['per_item_us']:12.1f} us/item  (x{results[key]['repeat']})")
+    return results
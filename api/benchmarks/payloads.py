@@ -0,0 +1,33 @@
+"""
+Payloads réalistes pour les benchmarks : exemples du repo + générateurs synthétiques d'entraînement.
+"""
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+EXAMPLES_DIR = REPO_ROOT / "examples"
+TRAINING_DIR = REPO_ROOT / "ml" / "training"
+
+
+def example_payloads() -> list[dict]:
+    return [json.loads(p.read_text(encoding="utf-8")) for p in sorted(EXAMPLES_DIR.glob("*.json"))]
+
+
+def synthetic_payloads(n: int, seed: int = 42) -> list[dict]:
+    """`n` requêtes DecisionRequest (dicts) tirées du générateur de trafic (ml/training/traffic_generator.py)."""
+    if str(TRAINING_DIR) not in sys.path:
+        sys.path.insert(0, str(TRAINING_DIR))
+    from traffic_generator import TrafficConfig, TrafficGenerator, to_records
+
+    gen = TrafficGenerator(TrafficConfig(n_requests=n, chunk_size=max(n, 1), n_clients=max(n // 4, 1), seed=seed))
+    return [{"client": r["client"], "transaction": r["transaction"]} for r in to_records(gen.chunk(0))]
+
+
+def mixed_payloads(n: int, seed: int = 42) -> list[dict]:
+    # Exemples du repo intercalés (ACCEPT / REJECT / ALERT garantis) dans le flux synthétique
+    examples = example_payloads()
+    payloads = synthetic_payloads(n, seed)
+    for i in range(0, n, 10):
+        payloads[i] = examples[(i // 10) % len(examples)]
+    return payloads
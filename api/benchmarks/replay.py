@@ -0,0 +1,248 @@
+"""
+Rejeu déterministe de trafic capturé (services/capture.py) ou généré (ml/training/traffic_generator.py).
+
+Les segments sont fusionnés par horodatage (heapq.merge, mémoire constante) puis renvoyés vers
+une build de l'API à la vitesse d'origine, accélérée (x N) ou maximale, avec une concurrence bornée.
+Les décisions et scores sont comparés soit entre deux builds (--compare), soit aux réponses
+capturées en production.
+
+Usage (depuis api/) :
+    python -m benchmarks.replay capture/*.ndjson.gz --target http://localhost:8000 --speed max
+    python -m benchmarks.replay capture/*.ndjson.gz --target http://old:8000 --compare http://new:8000 --speed 4
+    python -m benchmarks.replay traffic.ndjson.gz --target asgi --limit 5000 --fail-on-diff 0.01
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import heapq
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+from .load import latency_summary
+
+DECISIONS = ("ACCEPT", "REVIEW", "REJECT", "ALERT")
+
+
+def _read_segment(path: Path) -> Iterator[tuple[float, int, dict]]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            # Capture : {"ts", "request", "response"} ; générateur : {"seq", "ts"?, "client", "transaction"}
+            if "request" not in rec:
+                rec = {"ts": rec.get("ts", rec.get("seq", i)), "request": {"client": rec["client"], "transaction": rec["transaction"]}}
+            yield float(rec.get("ts", i)), i, rec
+
+
+def iter_traffic(paths: list[Path], limit: Optional[int] = None) -> Iterator[dict]:
+    # Chaque segment est ordonné dans le temps : fusion k-way en mémoire constante
+    merged = heapq.merge(*(_read_segment(p) for p in sorted(paths)), key=lambda x: (x[0], x[1]))
+    for n, (_, _, rec) in enumerate(merged):
+        if limit is not None and n >= limit:
+            return
+        yield rec
+
+
+def _client(target: str):
+    import httpx
+
+    if target == "asgi":
+        from app.db import init_db
+        from app.main import app
+
+        init_db()
+        # Échauffement hors mesure : chargement des modèles et de l'explainer SHAP
+        from app.schemas import DecisionRequest
+        from app.services.ml_client import predict_risk_and_fraud
+
+        from .payloads import example_payloads
+
+        predict_risk_and_fraud(DecisionRequest(**example_payloads()[0]))
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://replay", timeout=60.0)
+    return httpx.AsyncClient(base_url=target, timeout=60.0)
+
+
+class _Diff:
+    def __init__(self):
+        self.transitions = np.zeros((len(DECISIONS), len(DECISIONS)), dtype=np.int64)
+        self.risk_delta: list[float] = []
+        self.fraud_delta: list[float] = []
+
+    def add(self, ref: dict, cur: dict) -> None:
+        if ref.get("decision") in DECISIONS and cur.get("decision") in DECISIONS:
+            self.transitions[DECISIONS.index(ref["decision"]), DECISIONS.index(cur["decision"])] += 1
+        if ref.get("risk_score") is not None and cur.get("risk_score") is not None:
+            self.risk_delta.append(cur["risk_score"] - ref["risk_score"])
+        if ref.get("fraud_score") is not None and cur.get("fraud_score") is not None:
+            self.fraud_delta.append(cur["fraud_score"] - ref["fraud_score"])
+
+    @staticmethod
+    def _delta_summary(deltas: list[float], tol: float) -> dict:
+        if not deltas:
+            return {"n": 0}
+        d = np.abs(np.asarray(deltas))
+        return {
+            "n": int(d.size),
+            "mean_abs": float(d.mean()),
+            "p99_abs": float(np.percentile(d, 99)),
+            "max_abs": float(d.max()),
+            "n_changed": int((d > tol).sum()),
+        }
+
+    def report(self, reference: str, tol: float) -> dict:
+        m = self.transitions
+        total = int(m.sum())
+        mismatches = total - int(np.trace(m))
+        return {
+            "reference": reference,
+            "compared": total,
+            "decision_mismatches": mismatches,
+            "decision_mismatch_rate": mismatches / total if total else 0.0,
+            "transitions": {DECISIONS[i]: {DECISIONS[j]: int(m[i, j]) for j in range(len(DECISIONS))} for i in range(len(DECISIONS))},
+            "risk_delta": self._delta_summary(self.risk_delta, tol),
+            "fraud_delta": self._delta_summary(self.fraud_delta, tol),
+        }
+
+
+async def replay(
+    records: Iterator[dict],
+    *,
+    target: str,
+    compare: Optional[str] = None,
+    speed: Optional[float] = None,
+    concurrency: int = 16,
+    score_tolerance: float = 1e-6,
+    out: Optional[Path] = None,
+) -> dict:
+    """`speed=None` : vitesse max ; sinon facteur appliqué aux écarts d'horodatage d'origine."""
+    names = ["target"] + (["compare"] if compare else [])
+    clients = {"target": _client(target)}
+    if compare:
+        clients["compare"] = _client(compare)
+
+    latencies = {n: [] for n in names}
+    errors = {n: 0 for n in names}
+    diff = _Diff()
+    sem = asyncio.Semaphore(concurrency)
+    out_f = open(out, "w", encoding="utf-8") if out else None
+    tasks: set = set()
+
+    async def send(name: str, body: dict) -> Optional[dict]:
+        t0 = time.perf_counter()
+        try:
+            r = await clients[name].post("/decision", json=body)
+        except Exception:
+            errors[name] += 1
+            return None
+        latencies[name].append(time.perf_counter() - t0)
+        if r.status_code != 200:
+            errors[name] += 1
+            return None
+        return r.json()
+
+    async def one(idx: int, rec: dict) -> None:
+        try:
+            results = await asyncio.gather(*(send(n, rec["request"]) for n in names))
+            # Référence : build --compare si fournie, sinon la réponse capturée en production
+            cur = results[0]
+            ref = results[1] if compare else rec.get("response")
+            if cur is not None and ref is not None:
+                diff.add(ref, cur)
+            if out_f is not None:
+                out_f.write(json.dumps({"idx": idx, "ts": rec.get("ts"), **{n: r for n, r in zip(names, results)}}) + "\n")
+        finally:
+            sem.release()
+
+    t_start = time.perf_counter()
+    ts0 = None
+    n = 0
+    try:
+        for idx, rec in enumerate(records):
+            if speed is not None:
+                ts0 = rec["ts"] if ts0 is None else ts0
+                wait = (rec["ts"] - ts0) / speed - (time.perf_counter() - t_start)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            await sem.acquire()  # contrôle de flux : au plus `concurrency` requêtes en vol
+            task = asyncio.create_task(one(idx, rec))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            n += 1
+        await asyncio.gather(*tasks)
+    finally:
+        for c in clients.values():
+            await c.aclose()
+        if out_f is not None:
+            out_f.close()
+    wall = time.perf_counter() - t_start
+
+    reference = "compare (baseline build)" if compare else "captured responses"
+    return {
+        "records": n,
+        "speed": "max" if speed is None else speed,
+        "wall_s": wall,
+        "targets": {
+            name: {"url": target if name == "target" else compare, **latency_summary(latencies[name], wall, errors[name])}
+            for name in names
+            if latencies[name]
+        },
+        "diff": diff.report(reference, score_tolerance),
+    }
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Replay captured traffic against an API build and diff decisions")
+    p.add_argument("segments", nargs="+", help="Capture segments (.ndjson.gz) or generated traffic files")
+    p.add_argument("--target", required=True, help="Base URL of the build under test, or 'asgi' for this tree in-process")
+    p.add_argument("--compare", help="Baseline build (URL or 'asgi'); default: diff against captured responses")
+    p.add_argument("--speed", default="max", help="'original', 'max', or a speed-up factor (e.g. 4)")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--limit", type=int)
+    p.add_argument("--score-tolerance", type=float, default=1e-6)
+    p.add_argument("--out", help="Per-request results as NDJSON")
+    p.add_argument("--report", help="Write the JSON report here (default: stdout)")
+    p.add_argument("--fail-on-diff", type=float, help="Exit 1 if the decision mismatch rate exceeds this value")
+    args = p.parse_args(argv)
+
+    if "asgi" in (args.target, args.compare):
+        # Base SQLite jetable, comme benchmarks.run (doit précéder l'import de app)
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='sentinelle_replay_')}/replay.db"
+        os.environ.setdefault("AGENT_ENABLED", "false")
+
+    speed = None if args.speed == "max" else 1.0 if args.speed == "original" else float(args.speed)
+    report = asyncio.run(replay(
+        iter_traffic([Path(s) for s in args.segments], args.limit),
+        target=args.target,
+        compare=args.compare,
+        speed=speed,
+        concurrency=args.concurrency,
+        score_tolerance=args.score_tolerance,
+        out=Path(args.out) if args.out else None,
+    ))
+
+    text = json.dumps(report, indent=2)
+    if args.report:
+        Path(args.report).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+    rate = report["diff"]["decision_mismatch_rate"]
+    if args.fail_on_diff is not None and rate > args.fail_on_diff:
+        print(f"Decision mismatch rate {rate:.2%} > {args.fail_on_diff:.2%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
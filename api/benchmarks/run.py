@@ -0,0 +1,155 @@
+"""
+Suite de benchmarks (micro + charge) avec porte de non-régression.
+
+Usage (depuis api/) :
+    python -m benchmarks.run --out bench_results.json
+    python -m benchmarks.run --quick --baseline benchmarks/baseline.json --tolerance 0.30
+    python -m benchmarks.run --quick --update-baseline
+
+Les résultats sont écrits en JSON ; avec --baseline, le process sort en code 1 si une métrique
+régresse au-delà de la tolérance (latences plus hautes ou débit plus bas), ou dépasse un budget
+absolu de la section `budgets` de la baseline (conservée par --update-baseline).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+# Métrique comparée -> sens ("lower" = plus bas est meilleur)
+GATED_METRICS = {
+    "per_item_us": "lower",
+    "alloc_peak_bytes": "lower",
+    "throughput_rps": "higher",
+    "p50_ms": "lower",
+    "p95_ms": "lower",
+    "p99_ms": "lower",
+}
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """Renvoie la liste des régressions (clés absentes d'un côté ignorées)."""
+    regressions = []
+    for key, base in baseline.get("results", {}).items():
+        current = results.get("results", {}).get(key)
+        if current is None:
+            continue
+        for metric, direction in GATED_METRICS.items():
+            b, c = base.get(metric), current.get(metric)
+            if not b or c is None:
+                continue
+            ratio = c / b
+            regressed = ratio > 1 + tolerance if direction == "lower" else ratio < 1 - tolerance
+            if regressed:
+                regressions.append({"benchmark": key, "metric": metric, "baseline": b, "current": c, "ratio": ratio})
+    return regressions
+
+
+def over_budget(results: dict, baseline: dict) -> list[dict]:
+    """Budgets absolus (`budgets` de la baseline, ex. latence par ligne < 5 ms) dépassés, quelle que soit la tolérance."""
+    exceeded = []
+    for key, limits in baseline.get("budgets", {}).items():
+        current = results.get("results", {}).get(key)
+        if current is None:
+            continue
+        for metric, limit in limits.items():
+            c = current.get(metric)
+            if c is None:
+                continue
+            if (c > limit) if GATED_METRICS.get(metric, "lower") == "lower" else (c < limit):
+                exceeded.append({"benchmark": key, "metric": metric, "budget": limit, "current": c})
+    return exceeded
+
+
+def missing_from_baseline(results: dict, baseline: dict) -> list[str]:
+    """Benchmarks mesurés mais absents de la baseline : jamais comparés tant qu'elle n'est pas régénérée."""
+    known = baseline.get("results", {})
+    return sorted(k for k in results.get("results", {}) if k not in known)
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Sentinelle benchmark suite")
+    p.add_argument("--sizes", default="1,100,10000", help="Batch sizes for micro-benchmarks")
+    p.add_argument("--requests", type=int, default=2000, help="Requests for the load test")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--quick", action="store_true", help="sizes=1,100 and 300 load requests (CI)")
+    p.add_argument("--skip-micro", action="store_true")
+    p.add_argument("--skip-load", action="store_true")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", default="bench_results.json")
+    p.add_argument("--baseline", help="Fail if results regress beyond --tolerance vs this file")
+    p.add_argument("--tolerance", type=float, default=0.25)
+    p.add_argument("--update-baseline", action="store_true", help=f"Write results to {BASELINE_PATH}")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    if args.quick:
+        args.sizes, args.requests = "1,100", 300
+
+    # Base SQLite jetable : les benchmarks ne touchent jamais app.db (doit précéder l'import de app)
+    tmp = tempfile.mkdtemp(prefix="sentinelle_bench_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ.setdefault("AGENT_ENABLED", "false")
+
+    from .load import run_load
+    from .micro import run_micro
+
+    results = {}
+    if not args.skip_micro:
+        results.update(run_micro([int(s) for s in args.sizes.split(",")], seed=args.seed))
+    if not args.skip_load:
+        results.update(run_load(args.requests, concurrency=args.concurrency, seed=args.seed))
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "sizes": args.sizes,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results -> {args.out}")
+
+    if args.update_baseline:
+        # Budgets fixés à la main, pas mesurés : repris de la baseline précédente
+        previous = json.loads(BASELINE_PATH.read_text(encoding="utf-8")) if BASELINE_PATH.exists() else {}
+        updated = {**report, "budgets": previous.get("budgets", {})} if previous.get("budgets") else report
+        BASELINE_PATH.write_text(json.dumps(updated, indent=2), encoding="utf-8")
+        print(f"Baseline updated -> {BASELINE_PATH}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        exceeded = over_budget(report, baseline)
+        for key in missing_from_baseline(report, baseline):
+            print(f"WARNING {key}: not in {args.baseline}, not gated (run --update-baseline)", file=sys.stderr)
+        for r in regressions:
+            print(
+                f"REGRESSION {r['benchmark']} {r['metric']}: {r['baseline']:.3f} -> {r['current']:.3f} "
+                f"(x{r['ratio']:.2f}, tolerance {args.tolerance:.0%})",
+                file=sys.stderr,
+            )
+        for e in exceeded:
+            print(f"OVER BUDGET {e['benchmark']} {e['metric']}: {e['current']:.3f} (budget {e['budget']:.3f})", file=sys.stderr)
+        if regressions or exceeded:
+            return 1
+        print(f"✅ No regression beyond {args.tolerance:.0%} vs {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base
+from benchmarks.payloads import TRAINING_DIR
+
+# Modules d'entraînement (ml/training, imports à plat) testés depuis api/tests
+if str(TRAINING_DIR) not in sys.path:
+    sys.path.insert(0, str(TRAINING_DIR))
+
+
+@pytest.fixture
+def session_factory():
+    # Base sqlite en mémoire partagée par toutes les sessions du test (StaticPool : une seule connexion)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.db import Decision
+from app.schemas import DecisionRequest
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.services.decision_pipeline import DecisionMode, run_decision
+from app.services.fraud_rules import RULES_VERSION, fraud_precheck
+from benchmarks.payloads import example_payloads
+
+
+def test_concurrency_limit_fifo_handoff_and_rejections():
+    controller = AdmissionController(max_concurrency=2, max_queue=2, queue_timeout_seconds=1.0)
+    order, peak = [], {"n": 0}
+
+    async def work(i: int, hold: float = 0.05):
+        async with controller.admit():
+            peak["n"] = max(peak["n"], controller.in_flight)
+            order.append(i)
+            await asyncio.sleep(hold)
+
+    async def main():
+        running = [asyncio.create_task(work(i)) for i in range(4)]
+        await asyncio.sleep(0)  # 2 en cours, 2 en file
+        with pytest.raises(AdmissionRejected) as e:
+            await work(99)
+        assert e.value.reason == "queue_full" and e.value.retry_after >= 1
+        await asyncio.gather(*running)
+
+    asyncio.run(main())
+    assert order == [0, 1, 2, 3] and peak["n"] == 2
+    assert controller.in_flight == 0 and controller.queue_depth == 0
+
+
+def test_deadline_expires_in_queue_without_leaking_the_slot():
+    controller = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout_seconds=5.0)
+
+    async def main():
+        async def hold():
+            async with controller.admit():
+                await asyncio.sleep(0.1)
+
+        first = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as e:
+            async with controller.admit(deadline_ms=20):
+                pass
+        assert e.value.reason == "deadline"
+        await first
+        async with controller.admit() as level:
+            return level
+
+    assert asyncio.run(main()) == 0
+    assert controller.in_flight == 0 and controller.queue_depth == 0
+
+
+def test_degradation_level_from_queue_depth_and_latency():
+    controller = AdmissionController(max_concurrency=1, degrade_queue_depths=(1, 2, 3), degrade_latency_ms=(100, 200, 300))
+    levels = []
+
+    async def work():
+        async with controller.admit() as level:
+            levels.append(level)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(work() for _ in range(5)))
+
+    asyncio.run(main())
+    # Niveau fixé à l'arrivée selon la file devant la requête, plafonné à 3
+    assert levels == [0, 0, 1, 2, 3]
+
+    controller.degrade_queue_depths = ()
+    controller.latency_ewma_ms = 250.0
+    assert controller.current_level() == 2
+
+
+def test_modes_combine_load_level_and_client_options():
+    assert DecisionMode.for_level(0).tier == "full"
+    assert DecisionMode.for_level(1).tier == "no_report"
+    assert DecisionMode.for_level(2) == DecisionMode(report=False, explain=False)
+    assert DecisionMode.for_level(3).tier == "rules_only"
+    assert DecisionMode.for_level(0, report=False).tier == "no_report"
+    mode = DecisionMode.for_level(0, explain=False)
+    assert mode.tier == "no_explain" and mode.report
+
+
+def test_rules_precheck_is_conservative():
+    quiet = {"amount": 50.0, "hour": 14, "is_new_device": False, "distance_from_home_km": 5.0}
+    assert fraud_precheck(quiet) == (0.0, [])
+    single = dict(quiet, is_new_device=True)
+    assert fraud_precheck(single)[0] < 0.85
+    takeover = {"amount": 2500.0, "hour": 2, "is_new_device": True, "distance_from_home_km": 900.0}
+    score, fired = fraud_precheck(takeover)
+    assert score >= 0.85 and {f["feature"] for f in fired} == {"amount", "hour", "is_new_device", "distance_from_home_km"}
+    assert fraud_precheck(quiet, {"tx_count_10m": 6, "distinct_countries_1h": 3})[0] == pytest.approx(0.6)
+
+
+def test_degraded_decisions_record_their_tier(db):
+    payload = DecisionRequest(**example_payloads()[0])
+
+    no_explain = asyncio.run(run_decision(payload, db, DecisionMode.for_level(2)))
+    assert no_explain["service_tier"] == "no_explain" and no_explain["report_summary"] is None
+    assert no_explain["explanations_preview"]["fraud_top_features"] == []
+
+    rules = asyncio.run(run_decision(payload, db, DecisionMode.for_level(3)))
+    assert rules["model_versions"]["fraud"] == RULES_VERSION
+    assert rules["fraud_score"] == fraud_precheck(payload.transaction.model_dump())[0]
+
+    tiers = {r.decision_id: r.service_tier for r in db.query(Decision).all()}
+    assert tiers == {no_explain["decision_id"]: "no_explain", rules["decision_id"]: "rules_only"}
@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+
+import artifact_cache
+from artifact_cache import ArtifactCache, code_version
+
+
+def _counting(value):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return value
+    return compute, calls
+
+
+def test_hit_after_first_compute_even_from_another_run(tmp_path):
+    df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+    cache = ArtifactCache(tmp_path, max_bytes=1 << 30)
+    key = cache.key("dataset", cfg={"n_samples": 3, "seed": 42})
+    compute, calls = _counting(df)
+
+    pd.testing.assert_frame_equal(cache.get_or_compute(key, compute, fmt="frame"), df)
+    pd.testing.assert_frame_equal(cache.get_or_compute(key, compute, fmt="frame"), df)
+    assert len(calls) == 1 and cache.stats == {"hits": 1, "misses": 1, "evicted": 0}
+
+    # Nouveau process d'entraînement, même répertoire : l'entrée est relue
+    again = ArtifactCache(tmp_path, max_bytes=1 << 30)
+    pd.testing.assert_frame_equal(again.get_or_compute(key, compute, fmt="frame"), df)
+    assert len(calls) == 1 and again.summary()["entries"] == [{"key": key, "hit": True}]
+
+
+def test_key_changes_with_config_code_and_libraries(monkeypatch):
+    def gen_v1(n):
+        return n
+
+    def gen_v2(n):
+        return n + 1
+
+    base = ArtifactCache.key("dataset", cfg={"seed": 42}, code=code_version(gen_v1, ["CDI", "CDD"]))
+    assert ArtifactCache.key("dataset", cfg={"seed": 42}, code=code_version(gen_v1, ["CDI", "CDD"])) == base
+    assert ArtifactCache.key("dataset", cfg={"seed": 43}, code=code_version(gen_v1, ["CDI", "CDD"])) != base
+    assert ArtifactCache.key("dataset", cfg={"seed": 42}, code=code_version(gen_v2, ["CDI", "CDD"])) != base
+    assert ArtifactCache.key("dataset", cfg={"seed": 42}, code=code_version(gen_v1, ["CDI"])) != base
+    assert ArtifactCache.key("preprocessor", cfg={"seed": 42}, code=code_version(gen_v1, ["CDI", "CDD"])) != base
+
+    monkeypatch.setattr(artifact_cache, "_lib_versions", lambda: {"numpy": "0", "pandas": "0", "sklearn": "0"})
+    assert ArtifactCache.key("dataset", cfg={"seed": 42}, code=code_version(gen_v1, ["CDI", "CDD"])) != base
+
+
+def test_corrupt_entry_is_recomputed(tmp_path):
+    cache = ArtifactCache(tmp_path, max_bytes=1 << 30)
+    compute, calls = _counting({"fitted": True})
+    cache.get_or_compute("obj-a", compute)
+    (tmp_path / "obj-a.joblib").write_bytes(b"truncated")
+    assert cache.get_or_compute("obj-a", compute) == {"fitted": True} and len(calls) == 2
+    assert cache.get_or_compute("obj-a", compute) == {"fitted": True} and len(calls) == 2
+
+
+def test_lru_eviction_keeps_recently_hit_entries(tmp_path):
+    cache = ArtifactCache(tmp_path, max_bytes=1 << 30)
+    for i, key in enumerate(("obj-a", "obj-b")):
+        cache.get_or_compute(key, lambda: {"fitted": True})
+        os.utime(tmp_path / f"{key}.joblib", (1000 + i, 1000 + i))
+    cache.max_bytes = sum(p.stat().st_size for p in tmp_path.glob("*.joblib"))
+    cache.get_or_compute("obj-a", lambda: None)  # hit : obj-a redevient le plus récent
+    cache.get_or_compute("obj-c", lambda: {"fitted": True})
+    assert sorted(p.stem for p in tmp_path.glob("*.joblib")) == ["obj-a", "obj-c"]
+    assert cache.stats == {"hits": 1, "misses": 3, "evicted": 1}
+
+
+def test_disabled_cache_always_computes(tmp_path):
+    cache = ArtifactCache(tmp_path, max_bytes=1 << 30, enabled=False)
+    compute, calls = _counting(1)
+    cache.get_or_compute("obj-x", compute)
+    cache.get_or_compute("obj-x", compute)
+    assert len(calls) == 2 and not any(tmp_path.iterdir())
@@ -0,0 +1,29 @@
+import pandas as pd
+
+from app.schemas import DecisionRequest
+from app.services.batch_scoring import BatchConfig, run_batch
+from app.services.ml_client import predict_risk_and_fraud
+from app.services.policy import apply_policy
+from benchmarks.payloads import mixed_payloads
+
+
+def test_batch_scoring_matches_online_path_and_resumes(tmp_path):
+    payloads = mixed_payloads(25, seed=7)
+    src = tmp_path / "portfolio.csv"
+    pd.DataFrame([{**p["client"], **p["transaction"]} for p in payloads]).to_csv(src, index=False)
+    out_dir = tmp_path / "scored"
+    cfg = BatchConfig(chunk_size=10, output_format="csv")
+
+    summary = run_batch(src, out_dir, cfg)
+    assert summary["chunks"] == 3 and summary["rows"] == 25
+
+    out = pd.concat(pd.read_csv(p) for p in sorted(out_dir.glob("part-*.csv"))).set_index("row")
+    for i in (0, 13, 24):
+        risk, fraud, _, _, _ = predict_risk_and_fraud(DecisionRequest(**payloads[i]))
+        pr = apply_policy(risk, fraud)
+        assert abs(out.loc[i, "risk_score"] - risk) < 1e-9
+        assert abs(out.loc[i, "fraud_score"] - fraud) < 1e-9
+        assert (out.loc[i, "decision"], out.loc[i, "policy_rule"]) == (pr.decision, pr.rule)
+
+    resumed = run_batch(src, out_dir, BatchConfig(chunk_size=10, output_format="csv"))
+    assert resumed["scored_this_run"] == 0 and resumed["rows"] == 25
@@ -0,0 +1,43 @@
+import json
+
+from benchmarks.run import BASELINE_PATH, GATED_METRICS, compare_to_baseline, missing_from_baseline, over_budget
+
+
+def test_regression_gate_flags_slower_latency_and_lower_throughput():
+    baseline = {"results": {
+        "micro.apply_policy[100]": {"per_item_us": 1.0},
+        "load/decision": {"throughput_rps": 100.0, "p95_ms": 50.0, "p99_ms": 80.0},
+    }}
+    current = {"results": {
+        "micro.apply_policy[100]": {"per_item_us": 1.2},
+        "load/decision": {"throughput_rps": 70.0, "p95_ms": 80.0, "p99_ms": 60.0},
+        "micro.new_bench[1]": {"per_item_us": 999.0},
+    }}
+    regressions = compare_to_baseline(current, baseline, tolerance=0.25)
+    assert {(r["benchmark"], r["metric"]) for r in regressions} == {
+        ("load/decision", "throughput_rps"),
+        ("load/decision", "p95_ms"),
+    }
+
+
+def test_committed_baseline_gates_every_quick_benchmark():
+    baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    names = {k.split("[")[0] for k in baseline["results"]}
+    # Micro-benchmarks ajoutés après coup (sérialisation, explications fraude) bien présents
+    assert {"micro.decision_serialization", "micro.decision_serialization_legacy", "micro.explain_fraud_row", "micro.explain_fraud_batch"} <= names
+    gated = {m for r in baseline["results"].values() for m in r if m in GATED_METRICS}
+    assert "alloc_peak_bytes" in gated
+    assert missing_from_baseline({"results": {"micro.new_bench[1]": {}}}, baseline) == ["micro.new_bench[1]"]
+
+
+def test_budgets_are_absolute_and_committed():
+    baseline = {"results": {"micro.explain_fraud_row[1]": {"per_item_us": 4000.0}},
+                "budgets": {"micro.explain_fraud_row[1]": {"per_item_us": 5000}}}
+    # Dans la tolérance relative mais au-dessus du budget : bloqué quand même
+    current = {"results": {"micro.explain_fraud_row[1]": {"per_item_us": 5060.0}}}
+    assert compare_to_baseline(current, baseline, tolerance=1.0) == []
+    assert [(e["benchmark"], e["budget"]) for e in over_budget(current, baseline)] == [("micro.explain_fraud_row[1]", 5000)]
+
+    committed = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    budget = committed["budgets"]["micro.explain_fraud_row[1]"]["per_item_us"]
+    assert budget <= 5000 and over_budget(committed, committed) == []
@@ -0,0 +1,63 @@
+import asyncio
+import gzip
+import json
+
+
+from app.schemas import DecisionRequest
+from app.services import capture, tracing
+from app.services.capture import TrafficRecorder
+from app.services.decision_pipeline import run_decision
+from benchmarks.payloads import example_payloads
+from benchmarks.replay import _Diff, iter_traffic
+
+
+def test_recorder_rotates_pseudonymised_segments_and_replay_merges_by_ts(tmp_path):
+    payload = DecisionRequest(**example_payloads()[0])
+    rec = TrafficRecorder(str(tmp_path), sample_rate=1.0, max_records=2).start()
+    for i in range(5):
+        rec.record(payload, {"decision": "ACCEPT", "risk_score": 0.1 * i, "fraud_score": 0.0})
+    rec.stop()
+
+    segments = sorted(tmp_path.glob("capture-*.ndjson.gz"))
+    assert len(segments) == 3 and not list(tmp_path.glob("*.open"))
+    with gzip.open(segments[0], "rt", encoding="utf-8") as f:
+        first = json.loads(f.readline())
+    assert first["request"]["client"]["client_id"] != payload.client.client_id
+
+    records = list(iter_traffic(list(reversed(segments))))
+    assert [r["response"]["risk_score"] for r in records] == [0.1 * i for i in range(5)]
+    assert list(iter_traffic(segments, limit=2)) == records[:2]
+
+
+def test_replay_diff_reports_transitions_and_score_deltas():
+    diff = _Diff()
+    diff.add({"decision": "ACCEPT", "risk_score": 0.2, "fraud_score": 0.1}, {"decision": "ACCEPT", "risk_score": 0.2, "fraud_score": 0.1})
+    diff.add({"decision": "ACCEPT", "risk_score": 0.30, "fraud_score": 0.1}, {"decision": "REVIEW", "risk_score": 0.40, "fraud_score": 0.1})
+    report = diff.report("captured responses", tol=1e-6)
+    assert report["compared"] == 2 and report["decision_mismatches"] == 1
+    assert report["transitions"]["ACCEPT"]["REVIEW"] == 1
+    assert report["risk_delta"]["n_changed"] == 1
+    assert abs(report["risk_delta"]["max_abs"] - 0.1) < 1e-9
+    assert report["fraud_delta"]["n_changed"] == 0
+
+
+def test_capture_timestamp_is_request_arrival(monkeypatch, db):
+    recorded = []
+
+    class _Recorder:
+        def record(self, payload, response, ts=None):
+            recorded.append(ts)
+
+    monkeypatch.setattr(capture, "_RECORDER", _Recorder())
+    trace = tracing.Trace()
+    trace.received_at = 1000.0
+
+    async def main():
+        token = tracing._CURRENT.set(trace)
+        try:
+            return await run_decision(DecisionRequest(**example_payloads()[0]), db)
+        finally:
+            tracing._CURRENT.reset(token)
+
+    asyncio.run(main())
+    assert recorded == [1000.0]
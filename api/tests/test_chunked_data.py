@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from chunked_data import META_FILE, Reservoir, StreamingMoments, chunk_seed, dataset_parts, iter_dataset, write_chunked_dataset
+from train_credit_risk import NUM_COLS, DataConfig, generate_synthetic_credit_data
+
+N, CHUNK, SEED = 2500, 400, 3
+
+
+def _make_chunk(n: int, seed: int) -> pd.DataFrame:
+    return generate_synthetic_credit_data(DataConfig(n_samples=n, seed=seed))
+
+
+def _in_memory() -> pd.DataFrame:
+    # Même découpage que write_chunked_dataset, blocs concaténés en mémoire
+    sizes = [min(CHUNK, N - i * CHUNK) for i in range(-(-N // CHUNK))]
+    return pd.concat([_make_chunk(n, chunk_seed(SEED, i)) for i, n in enumerate(sizes)], ignore_index=True)
+
+
+def _write(path):
+    return write_chunked_dataset(_make_chunk, path, n_samples=N, chunk_size=CHUNK, meta={"generator": "test", "seed": SEED})
+
+
+def test_chunked_dataset_matches_in_memory_data(tmp_path):
+    data_dir = _write(tmp_path / "data")
+    assert len(dataset_parts(data_dir)) == 7
+    chunks = list(iter_dataset(data_dir, test_size=0.2, seed=SEED))
+    full = pd.concat([df for _, df, _ in chunks], ignore_index=True)
+    pd.testing.assert_frame_equal(full, _in_memory())
+
+    # Split train/test identique à chaque passe, quel que soit l'ordre de lecture
+    masks = {idx: test for idx, _, test in chunks}
+    for idx, _, test in iter_dataset(data_dir, test_size=0.2, seed=SEED, order=[6, 2, 0, 5, 1, 4, 3]):
+        assert np.array_equal(test, masks[idx])
+    assert 0.15 < np.concatenate(list(masks.values())).mean() < 0.25
+
+    # Même config : jeu réutilisé sans réécriture
+    stamps = {p.name: p.stat().st_mtime_ns for p in dataset_parts(data_dir)}
+    _write(tmp_path / "data")
+    assert {p.name: p.stat().st_mtime_ns for p in dataset_parts(data_dir)} == stamps
+    assert (data_dir / META_FILE).exists()
+
+
+def test_streaming_moments_match_a_scaler_fitted_in_memory(tmp_path):
+    data_dir = _write(tmp_path / "data")
+    moments = StreamingMoments(NUM_COLS)
+    for _, df, _ in iter_dataset(data_dir, columns=NUM_COLS):
+        moments.update(df)
+
+    ref = StandardScaler().fit(_in_memory()[NUM_COLS])
+    scaler = StandardScaler().fit(_in_memory()[NUM_COLS].iloc[:10])
+    moments.apply_to_scaler(scaler)
+    assert scaler.n_samples_seen_ == N
+    np.testing.assert_allclose(scaler.mean_, ref.mean_, rtol=1e-10)
+    np.testing.assert_allclose(scaler.var_, ref.var_, rtol=1e-10)
+    np.testing.assert_allclose(scaler.scale_, ref.scale_, rtol=1e-10)
+
+
+def test_reservoir_keeps_a_fixed_size_sample_of_the_stream():
+    stream = _in_memory().reset_index(names="row")
+    reservoir = Reservoir(300, seed=SEED)
+    for start in range(0, N, CHUNK):
+        reservoir.update(stream.iloc[start:start + CHUNK])
+    sample = reservoir.frame
+    assert len(sample) == 300 and reservoir.seen == N and sample["row"].is_unique
+    # Lignes du flux inchangées, tirées sur tout le flux et pas seulement dans les premiers blocs
+    pd.testing.assert_frame_equal(sample.sort_values("row").reset_index(drop=True), stream.loc[sorted(sample["row"])].reset_index(drop=True))
+    assert sample["row"].max() > N // 2 and sample["row"].min() < N // 2
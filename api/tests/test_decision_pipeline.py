@@ -0,0 +1,25 @@
+import asyncio
+import json
+
+
+from app.db import Decision
+from app.schemas import DecisionRequest, DecisionResponse
+from app.services.decision_pipeline import run_decision
+from app.services.serialization import FastJSONResponse, loads
+from benchmarks.payloads import example_payloads
+
+
+def test_pipeline_body_matches_response_schema_and_stored_row(db):
+    payload = DecisionRequest(**example_payloads()[0])
+
+    body = asyncio.run(run_decision(payload, db))
+    # Corps non revalidé à l'envoi : il doit déjà respecter DecisionResponse à l'identique
+    assert DecisionResponse.model_validate(body).model_dump() == body
+    assert all(set(f) == {"feature", "impact"} for f in body["explanations_preview"]["credit_top_features"])
+
+    encoded = FastJSONResponse(body).body
+    assert loads(encoded) == json.loads(json.dumps(body))
+
+    row = db.query(Decision).filter(Decision.decision_id == body["decision_id"]).one()
+    assert row.request_payload == payload.model_dump() and row.explanations_preview == body["explanations_preview"]
+    assert (row.decision, row.risk_score, row.model_versions) == (body["decision"], body["risk_score"], body["model_versions"])
@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+
+from app.db import Decision
+from app.schemas import DecisionRequest
+from app.services import decision_pipeline, ml_client
+from app.services.admission import AdmissionController
+from app.services.decision_pipeline import FULL, run_decision_batch
+from app.services.fraud_rules import RULES_VERSION
+from app.services.decision_stream import _TOO_LONG, DecisionStream, iter_lines
+from benchmarks.payloads import example_payloads, mixed_payloads
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def _collect(gen) -> list:
+    return [x async for x in gen]
+
+
+def test_lines_split_across_chunks_and_overlong_lines_skipped():
+    data = b'{"a":1}\n\n' + b"x" * 50 + b'\n{"b":2}'
+    lines = asyncio.run(_collect(iter_lines(_chunks(data, 7), max_line_bytes=20)))
+    assert lines == [b'{"a":1}', b"", _TOO_LONG, b'{"b":2}']
+
+
+async def _fake_score(payloads, session_factory, mode, report_concurrency):
+    await asyncio.sleep(0)
+    return [{"client_id": p.client.client_id} for p in payloads]
+
+
+def test_results_in_input_order_with_errors_in_place():
+    payloads = mixed_payloads(10, seed=4)
+    lines = [json.dumps(p) for p in payloads]
+    lines.insert(3, "{not json")
+    lines.insert(6, json.dumps({"client": {}}))
+    body = ("\n".join(lines) + "\n").encode()
+
+    stream = DecisionStream(None, batch_size=4, batch_wait_seconds=0.01, score_batch=_fake_score)
+    out = [json.loads(line) for chunk in asyncio.run(_collect(stream.run(_chunks(body, 100)))) for line in chunk.splitlines()]
+    assert len(out) == 12
+    assert out[3]["line"] == 4 and out[3]["error"] == "invalid request"
+    assert out[6]["line"] == 7 and out[6]["detail"]
+    assert [o["client_id"] for o in out if "client_id" in o] == [p["client"]["client_id"] for p in payloads]
+
+
+def test_slow_reader_throttles_body_consumption():
+    payload = json.dumps(example_payloads()[0]).encode() + b"\n"
+    consumed = {"n": 0}
+
+    async def producer():
+        for _ in range(10_000):
+            consumed["n"] += 1
+            yield payload
+
+    async def main():
+        stream = DecisionStream(None, batch_size=8, batch_wait_seconds=0.001, max_in_flight=64, score_batch=_fake_score)
+        gen = stream.run(producer())
+        await gen.__anext__()
+        await asyncio.sleep(0.2)  # le client ne lit plus
+        stalled = consumed["n"]
+        await asyncio.sleep(0.1)
+        await gen.aclose()
+        return stalled, consumed["n"]
+
+    stalled, after = asyncio.run(main())
+    # Entrée + lot en cours + sortie bornées (~max_in_flight) : la lecture du corps s'arrête
+    assert stalled == after and stalled <= 64 + 8 * 3
+
+
+def test_micro_batch_pipeline_stores_one_row_per_decision(session_factory):
+    payloads = [DecisionRequest(**p) for p in mixed_payloads(6, seed=8)]
+
+    bodies = asyncio.run(run_decision_batch(payloads, session_factory))
+    db = session_factory()
+    rows = {r.decision_id: r for r in db.query(Decision).all()}
+    assert len(rows) == len(bodies) == 6 and len({b["decision_id"] for b in bodies}) == 6
+    for body, payload in zip(bodies, payloads):
+        row = rows[body["decision_id"]]
+        assert row.request_payload == payload.model_dump() and row.decision == body["decision"]
+        # Scoring vectorisé du lot identique au chemin unitaire
+        risk, fraud, versions, _, _ = ml_client.predict_risk_and_fraud(payload)
+        assert abs(body["risk_score"] - risk) < 1e-12 and abs(body["fraud_score"] - fraud) < 1e-12
+        assert body["model_versions"] == versions
+    db.close()
+
+
+def _ndjson(payloads) -> bytes:
+    return ("\n".join(json.dumps(p) for p in payloads) + "\n").encode()
+
+
+def test_micro_batches_follow_admission_degradation(session_factory):
+    # Latence récente au-dessus du 3e seuil : niveau 3, comme POST /decision sous la même charge
+    admission = AdmissionController(degrade_latency_ms=(1, 2, 3))
+    admission.latency_ewma_ms = 10_000
+    stream = DecisionStream(session_factory, batch_size=4, batch_wait_seconds=0.01, admission=admission)
+    body = _ndjson(mixed_payloads(6, seed=9))
+    out = [json.loads(line) for chunk in asyncio.run(_collect(stream.run(_chunks(body, 256)))) for line in chunk.splitlines()]
+
+    assert len(out) == 6
+    assert {o["service_tier"] for o in out} == {"rules_only"}
+    assert all(o["report_summary"] is None and o["model_versions"]["fraud"] == RULES_VERSION for o in out)
+    db = session_factory()
+    assert {r.service_tier for r in db.query(Decision).all()} == {"rules_only"}
+    db.close()
+
+
+def test_rejected_micro_batch_answers_each_line_with_retry_after():
+    admission = AdmissionController(max_concurrency=1, max_queue=0)
+    admission.in_flight = 1  # seule place occupée, file nulle : refus immédiat
+    stream = DecisionStream(None, batch_size=8, batch_wait_seconds=0.01, admission=admission, score_batch=_fake_score)
+    body = _ndjson(mixed_payloads(3, seed=10))
+    out = [json.loads(line) for chunk in asyncio.run(_collect(stream.run(_chunks(body, 256)))) for line in chunk.splitlines()]
+    assert [o["line"] for o in out] == [1, 2, 3]
+    assert all(o["error"] == "service overloaded" and o["retry_after"] >= 1 for o in out)
+
+
+def test_batch_reports_are_bounded(session_factory, monkeypatch):
+    running = {"now": 0, "max": 0}
+
+    async def fake_report(payload):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        return "ok"
+
+    monkeypatch.setattr(decision_pipeline, "generate_report", fake_report)
+    payloads = [DecisionRequest(**p) for p in mixed_payloads(10, seed=11)]
+    bodies = asyncio.run(run_decision_batch(payloads, session_factory, FULL, report_concurrency=3))
+    assert [b["report_summary"] for b in bodies] == ["ok"] * 10
+    assert running["max"] == 3
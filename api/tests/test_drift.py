@@ -0,0 +1,56 @@
+import numpy as np
+
+from app.schemas import ClientPayload, DecisionRequest, TransactionPayload
+from app.services.drift import DriftMonitor
+
+REFERENCE = {
+    "credit_risk": {
+        "numeric": {"income_annual": {"edges": [30000.0, 50000.0, 70000.0], "proportions": [0.25, 0.25, 0.25, 0.25]}},
+        "categorical": {"employment_status": {"categories": ["CDI", "CDD"], "proportions": [0.8, 0.2]}},
+    },
+}
+
+
+def _payload(income: float, status: str = "CDI") -> DecisionRequest:
+    return DecisionRequest(
+        client=ClientPayload(
+            client_id="C_TEST", age=40, income_annual=income, employment_status=status, debt_to_income=0.2,
+            credit_history_length_months=60, num_open_accounts=2, late_payments_12m=0,
+        ),
+        transaction=TransactionPayload(
+            amount=50.0, merchant_category="groceries", country="FR", hour=12,
+            is_new_device=False, distance_from_home_km=3.0,
+        ),
+    )
+
+
+def _by_feature(results):
+    return {r["feature"]: r for r in results}
+
+
+def test_psi_low_on_reference_like_traffic_and_high_on_shift():
+    monitor = DriftMonitor(REFERENCE, window_seconds=600, bucket_seconds=60)
+    rng = np.random.default_rng(0)
+    for i, income in enumerate(rng.choice([20000, 40000, 60000, 90000], size=400)):
+        monitor.observe(_payload(float(income), "CDI" if i % 5 else "CDD"), now=1000.0)
+    stable = _by_feature(monitor.compute(now=1000.0))
+    assert stable["income_annual"]["psi"] < 0.05
+    assert stable["employment_status"]["chi2_pvalue"] > 0.01
+
+    # Nouvelle fenêtre : population à hauts revenus, statut inconnu de la référence
+    for _ in range(400):
+        monitor.observe(_payload(150000.0, "RETRAITE"), now=5000.0)
+    shifted = _by_feature(monitor.compute(now=5000.0))
+    assert shifted["income_annual"]["n"] == 400  # les anciens buckets sont sortis de la fenêtre
+    assert shifted["income_annual"]["psi"] > 1.0
+    assert shifted["income_annual"]["ks"] > 0.7
+    assert shifted["employment_status"]["chi2_pvalue"] < 1e-6
+
+
+def test_sliding_window_expires_old_buckets():
+    monitor = DriftMonitor(REFERENCE, window_seconds=300, bucket_seconds=60)
+    monitor.observe(_payload(40000.0), now=0.0)
+    monitor.observe(_payload(40000.0), now=120.0)
+    assert _by_feature(monitor.compute(now=240.0))["income_annual"]["n"] == 2
+    assert _by_feature(monitor.compute(now=330.0))["income_annual"]["n"] == 1
+    assert _by_feature(monitor.compute(now=10_000.0))["income_annual"]["psi"] is None
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from fastapi import Response
+from starlette.requests import Request
+
+from app.db import Decision, Explanation
+from app.schemas import DecisionRequest
+from app.routes.explain import explain
+from app.services import explanations, ml_client
+from app.services.fraud_explainer import explainer_for
+from app.services.fraud_rules import RULES_VERSION
+from benchmarks.payloads import mixed_payloads
+
+
+def _store(db, payloads, versions=None):
+    rows = []
+    for i, p in enumerate(payloads):
+        risk, fraud, model_versions, shap_impacts, fraud_impacts = ml_client.predict_risk_and_fraud(DecisionRequest(**p))
+        rows.append(Decision(
+            decision_id=f"dcn_{i}", client_id_hash="h", risk_score=risk, fraud_score=fraud, decision="REVIEW" if i == 0 else "ACCEPT",
+            policy_rule="test", model_versions=versions or model_versions, request_payload=p,
+            explanations_preview={"credit_top_features": shap_impacts, "fraud_top_features": fraud_impacts},
+        ))
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def test_full_vectors_computed_once_then_read_back(db):
+    payloads = mixed_payloads(12, seed=5)
+    rows = _store(db, payloads)
+    found, unavailable = explanations.get_explanations(db, rows)
+    assert unavailable == [] and set(found) == {r.decision_id for r in rows} and db.query(Explanation).count() == len(rows)
+
+    bundle = ml_client.get_bundle()
+    for row in rows:
+        e = found[row.decision_id]
+        # Vecteur complet : toutes les features d'origine, dont le top recoupe l'aperçu de la décision
+        assert {f["feature"] for f in e.credit} == set(ml_client.CREDIT_FEATURES)
+        preview = row.explanations_preview["credit_top_features"]
+        assert [f["feature"] for f in e.credit[:len(preview)]] == [f["feature"] for f in preview]
+        assert e.fraud[0]["feature"] == row.explanations_preview["fraud_top_features"][0]["feature"]
+
+    # Contributions fraude exactes : elles redonnent le score stocké
+    explainer = explainer_for(bundle.fraud)
+    contrib = np.array([sum(f["value"] for f in found[r.decision_id].fraud) for r in rows])
+    h = explainer.expected_path_length - contrib
+    decision = -(2.0 ** (-h / explainer._c_max_samples)) - explainer._offset
+    np.testing.assert_allclose(ml_client._normalize_fraud(decision), [r.fraud_score for r in rows], atol=1e-9)
+
+    again, _ = explanations.get_explanations(db, rows[:3])
+    assert [again[r.decision_id].credit for r in rows[:3]] == [found[r.decision_id].credit for r in rows[:3]]
+
+
+def test_unknown_model_version_is_unavailable_and_cache_headers(db):
+    rows = _store(db, mixed_payloads(2, seed=2), versions={"credit_risk": "credit_risk:retired@gone", "fraud": "fraud:retired"})
+    assert explanations.resolve_model("credit", "credit_risk:retired@gone") is None
+    assert explanations.resolve_model("fraud", ml_client.model_versions()["fraud"]) is ml_client.get_bundle().fraud
+
+    found, unavailable = explanations.get_explanations(db, rows)
+    assert found == {} and unavailable == ["dcn_0", "dcn_1"] and db.query(Explanation).count() == 0
+
+    # Décision encore en REVIEW : revalidation ; décision finale : immuable
+    assert explanations.cache_control_for(rows) == explanations.REVALIDATE_CACHE_CONTROL
+    assert explanations.cache_control_for(rows[1:]) == explanations.IMMUTABLE_CACHE_CONTROL
+    etag = explanations.etag_for(rows[:1])
+    rows[0].decision = "ACCEPT"
+    assert explanations.etag_for(rows[:1]) != etag
+
+
+def test_rules_only_decision_explains_credit_and_fired_rules(db):
+    p = mixed_payloads(1, seed=3)[0]
+    p["transaction"].update(is_new_device=True, hour=2, amount=1500.0, distance_from_home_km=50.0)
+    # Palier rules_only : ni SHAP ni modèle fraude au moment de la décision
+    risk, fraud, versions, shap_impacts, fraud_impacts = ml_client.predict_risk_and_fraud(
+        DecisionRequest(**p), explain=False, fraud_rules_only=True
+    )
+    assert versions["fraud"] == RULES_VERSION
+    db.add(Decision(
+        decision_id="dcn_rules", client_id_hash="h", risk_score=risk, fraud_score=fraud, decision="ACCEPT",
+        policy_rule="test", model_versions=versions, request_payload=p,
+        explanations_preview={"credit_top_features": [], "fraud_top_features": fraud_impacts},
+    ))
+    db.commit()
+
+    out = explain("dcn_rules", Request({"type": "http", "headers": []}), Response(), db)
+    assert out.fraud_explanation == "rules"
+    assert {f.feature for f in out.credit_shap} == set(ml_client.CREDIT_FEATURES)
+    assert [f.feature for f in out.fraud_contributions] == ["is_new_device", "hour", "amount"]
+    assert sum(f.value for f in out.fraud_contributions) == pytest.approx(fraud)
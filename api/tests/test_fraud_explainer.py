@@ -0,0 +1,61 @@
+import numpy as np
+
+from app.services import ml_client
+from app.services.fraud_explainer import IsolationPathExplainer, explain_fraud_batch
+from benchmarks.payloads import mixed_payloads
+
+
+def test_path_attribution_is_exact_and_grouped_by_original_feature():
+    model = ml_client.get_bundle().fraud
+    Xf = ml_client.fraud_frame([p["transaction"] for p in mixed_payloads(64, seed=3)])
+    explainer = IsolationPathExplainer(model)
+    assert set(explainer.names) >= {"amount", "merchant_category", "country", "is_new_device"}
+    assert not any(n.startswith(("cat__", "country_")) for n in explainer.names)
+
+    # Décomposition exacte : E(racine) - Σ contributions = longueur de chemin moyenne de sklearn
+    Xt = model.named_steps["preprocess"].transform(Xf)
+    contrib = explainer.transformed_contributions(Xt)
+    np.testing.assert_allclose(explainer.decision_function(contrib), model.decision_function(Xf), atol=1e-12)
+
+    scores, tops = ml_client.fraud_scores_and_explanations(model, Xf, top_k=3)
+    np.testing.assert_allclose(scores, ml_client.fraud_scores(model, Xf), atol=1e-12)
+    assert all(len(t) <= 3 for t in tops) and any(tops)
+    for top in tops:
+        values = [abs(f["value"]) for f in top]
+        assert values == sorted(values, reverse=True)
+        assert all(f["impact"] == ("+" if f["value"] > 0 else "-") for f in top)
+
+    # Mode batch par blocs : mêmes résultats que d'un seul tenant
+    decision, chunked = explain_fraud_batch(model, Xf, top_k=3, chunk_size=10)
+    assert [[f["feature"] for f in t] for t in chunked] == [[f["feature"] for f in t] for t in tops]
+    np.testing.assert_allclose([f["value"] for t in chunked for f in t], [f["value"] for t in tops for f in t], atol=1e-12)
+    np.testing.assert_allclose(decision, model.decision_function(Xf), atol=1e-12)
+
+
+def test_non_forest_model_falls_back_to_scores_only():
+    model = ml_client.get_bundle().fraud
+    Xf = ml_client.fraud_frame([p["transaction"] for p in mixed_payloads(4, seed=1)])
+
+    class Opaque:
+        named_steps = {}
+
+        def decision_function(self, X):
+            return model.decision_function(X)
+
+    scores, tops = ml_client.fraud_scores_and_explanations(Opaque(), Xf)
+    assert tops == [[]] * 4 and np.allclose(scores, ml_client.fraud_scores(model, Xf))
+
+
+def test_single_row_fast_path_matches_pandas_transform():
+    model = ml_client.get_bundle().fraud
+    transactions = [p["transaction"] for p in mixed_payloads(32, seed=5)]
+    transactions[0] = {**transactions[0], "merchant_category": "unknown_category", "country": "ZZ"}
+    Xf = ml_client.fraud_frame(transactions)
+    explainer = IsolationPathExplainer(model)
+    assert explainer._encoder is not None
+
+    decision, contrib = explainer.contributions(Xf)
+    for i in range(len(Xf)):
+        d, c = explainer.contributions(Xf.iloc[i:i + 1])
+        np.testing.assert_allclose(d, decision[i:i + 1], atol=1e-12)
+        np.testing.assert_allclose(c, contrib[i:i + 1], atol=1e-12)
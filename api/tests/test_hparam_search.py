@@ -0,0 +1,40 @@
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+
+from hparam_search import SearchConfig, build_trials, run_search
+
+# Seule la différence x1 - x2 est informative : une régularisation forte (C petit) ne garde que la
+# direction des moyennes de classes, dominée par le bruit commun, et classe presque au hasard.
+SPACE = {"logreg": {"C": [1e-6, 1e-5, 1e-4, 1e-3, 1.0, 10.0]}}
+
+
+def _data(n: int, seed: int):
+    rng = np.random.default_rng(seed)
+    z, s = rng.normal(0, 10, n), rng.normal(0, 1, n)
+    y = (s + rng.normal(0, 0.3, n) > 0).astype(int)
+    return np.column_stack([z + s, z, rng.normal(size=n)]), y
+
+
+def test_successive_halving_keeps_the_best_config():
+    X, y = _data(9000, 1)
+    X_val, y_val = _data(3000, 2)
+    cfg = SearchConfig(mode="grid", eta=3, min_fraction=1 / 9, workers=2, seed=0, space=SPACE)
+    assert len(build_trials(cfg)) == 6
+
+    out = run_search(X, y, X_val, y_val, cfg)
+    # Paliers : 6 essais sur 1000 lignes, 2 sur 3000, 1 sur toutes les lignes
+    rungs = [[t for t in out["trials"] if t["rung"] == r] for r in range(3)]
+    assert [len(r) for r in rungs] == [6, 2, 1] and out["summary"]["n_fits"] == 9
+    assert [t["n_rows"] for t in rungs[0] + rungs[2]] == [1000] * 6 + [9000]
+    # Les finalistes sont les meilleurs du palier précédent
+    top = sorted(rungs[0], key=lambda t: t["auc"], reverse=True)[:2]
+    assert {t["id"] for t in rungs[1]} == {t["id"] for t in top}
+
+    best = out["best"]["logreg"]
+    full_auc = {
+        c: roc_auc_score(y_val, LogisticRegression(C=c, max_iter=2000).fit(X, y).predict_proba(X_val)[:, 1])
+        for c in SPACE["logreg"]["C"]
+    }
+    assert best["params"]["C"] >= 1.0 and full_auc[best["params"]["C"]] >= max(full_auc.values()) - 1e-3
+    assert best["model"].predict_proba(X_val).shape == (3000, 2)
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.db import IdempotencyKey
+from app.services.idempotency import IdempotencyMismatch, IdempotencyStore, request_fingerprint
+
+
+def _counting_compute(calls: list, body: bytes = b'{"decision_id":"dcn_1"}', delay: float = 0.05):
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return body, "dcn_1"
+    return compute
+
+
+def test_concurrent_duplicates_wait_for_one_computation(session_factory):
+    store = IdempotencyStore(session_factory)
+    calls = []
+
+    async def main():
+        return await asyncio.gather(*(store.run("/decision:k1", "h", _counting_compute(calls)) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1 and {body for body, _ in results} == {b'{"decision_id":"dcn_1"}'}
+    assert sorted(replayed for _, replayed in results) == [False, True, True, True, True]
+
+    db = session_factory()
+    row = db.get(IdempotencyKey, "/decision:k1")
+    assert row.response == b'{"decision_id":"dcn_1"}' and row.decision_id == "dcn_1"
+    db.close()
+
+    # Rejeu depuis un autre worker (mémoire vide) : lu en base, pas recalculé
+    other = IdempotencyStore(session_factory)
+    assert asyncio.run(other.run("/decision:k1", "h", _counting_compute(calls))) == (b'{"decision_id":"dcn_1"}', True)
+    assert len(calls) == 1
+
+    with pytest.raises(IdempotencyMismatch):
+        asyncio.run(store.run("/decision:k1", "other-body", _counting_compute(calls)))
+
+
+def test_failure_releases_key_and_other_worker_waits_for_pending(session_factory):
+    store, other = IdempotencyStore(session_factory), IdempotencyStore(session_factory, poll_seconds=0.01)
+
+    async def failing():
+        raise RuntimeError("scoring failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(store.run("/decision:k2", "h", failing))
+    calls = []
+    assert asyncio.run(store.run("/decision:k2", "h", _counting_compute(calls))) == (b'{"decision_id":"dcn_1"}', False)
+
+    async def two_workers():
+        first = asyncio.create_task(store.run("/decision:k3", "h", _counting_compute(calls, delay=0.1)))
+        await asyncio.sleep(0.02)  # ligne "en cours" posée par le premier worker
+        return await asyncio.gather(first, other.run("/decision:k3", "h", _counting_compute(calls)))
+
+    (body_a, replayed_a), (body_b, replayed_b) = asyncio.run(two_workers())
+    assert body_a == body_b and (replayed_a, replayed_b) == (False, True) and len(calls) == 2
+
+
+def test_expired_keys_are_recomputed_and_purged(session_factory):
+    store = IdempotencyStore(session_factory, ttl_seconds=0.05)
+    calls = []
+    asyncio.run(store.run("/decision:k4", "h", _counting_compute(calls, delay=0)))
+    asyncio.run(asyncio.sleep(0.1))
+    assert asyncio.run(store.run("/decision:k4", "h", _counting_compute(calls, delay=0)))[1] is False
+    assert len(calls) == 2
+
+    asyncio.run(asyncio.sleep(0.1))
+    assert store.purge_expired() == 1
+
+
+def test_fingerprint_covers_query_options():
+    body = b'{"client":{}}'
+    assert request_fingerprint(body, "explain=false&report=false") == request_fingerprint(body, "report=false&explain=false")
+    assert request_fingerprint(body, "explain=false") != request_fingerprint(body)
+    assert request_fingerprint(body, "report=false") != request_fingerprint(body, "explain=false")
+
+
+def test_database_calls_leave_the_event_loop_thread(session_factory):
+    threads = set()
+
+    def tracking_factory():
+        threads.add(threading.get_ident())
+        return session_factory()
+
+    async def main():
+        store = IdempotencyStore(tracking_factory)
+        await store.run("/decision:k5", "h", _counting_compute([]))
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+    assert threads and loop_thread not in threads
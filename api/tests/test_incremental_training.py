@@ -0,0 +1,120 @@
+import json
+import shutil
+
+import joblib
+import pytest
+
+from app.db import Decision, Review
+from app.services import model_store
+from app.services.incremental_training import IncrementalConfig, iter_reviewed_chunks, rows_to_frame, run_incremental
+from app.services.ml_client import _find_model_path, credit_frame
+from benchmarks.payloads import mixed_payloads
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    src = _find_model_path().parent
+    for name in ("model.joblib", "metrics.json", "schema.json", "reference.json"):
+        shutil.copy2(src / name, tmp_path / name)
+    return tmp_path
+
+
+def _add_reviewed(db, start, n):
+    for i, payload in enumerate(mixed_payloads(n, seed=start), start=start):
+        row = Decision(
+            decision_id=f"dcn_inc_{i}",
+            client_id_hash="h",
+            risk_score=0.5,
+            fraud_score=0.1,
+            decision="REVIEW",
+            policy_rule="test",
+            model_versions={},
+            explanations_preview={},
+            request_payload=payload,
+        )
+        db.add(row)
+        db.flush()
+        final = "REJECT" if payload["client"]["late_payments_12m"] > 1 else "ACCEPT"
+        db.add(Review(
+            decision_id_fk=row.id,
+            reviewer_id="r1",
+            human_decision="REJECT" if final == "REJECT" else "APPROVE",
+            comment="",
+            previous_decision="REVIEW",
+            final_decision=final,
+        ))
+    db.commit()
+
+
+def test_incremental_job_consumes_only_new_reviews_and_publishes_versions(db, artifacts):
+    cfg = IncrementalConfig(chunk_size=16, min_labels=10)
+    _add_reviewed(db, 0, 60)
+
+    first = run_incremental(db, artifacts, cfg)
+    assert first["status"] == "published" and first["new_labels"] == 60
+    assert first["holdout_candidate"]["n"] + first["n_train"] == 60
+    version_dir = artifacts / "versions" / first["version"]
+    X = credit_frame([p["client"] for p in mixed_payloads(3, seed=99)])
+    assert joblib.load(version_dir / "model.joblib").predict_proba(X).shape == (3, 2)
+    meta = json.loads((version_dir / "metrics.json").read_text(encoding="utf-8"))
+    assert meta["incremental"]["review_id_range"] == [1, 60] and meta["incremental"]["base_version"] is None
+    assert (version_dir / "reference.json").exists()
+
+    assert run_incremental(db, artifacts, cfg)["status"] == "skipped"
+
+    _add_reviewed(db, 1000, 20)
+    second = run_incremental(db, artifacts, cfg)
+    assert second["new_labels"] == 20 and second["last_review_id"] == 80
+    meta = json.loads((artifacts / "versions" / second["version"] / "metrics.json").read_text(encoding="utf-8"))
+    assert meta["incremental"]["base_version"] == first["version"]
+    # Holdout cumulé entre les runs
+    assert second["holdout_candidate"]["n"] >= first["holdout_candidate"]["n"]
+
+
+def test_labels_follow_the_human_judgement_not_the_model_decision(db):
+    payload = mixed_payloads(1, seed=5)[0]
+    # (décision du modèle, jugement humain, décision finale enregistrée par map_human_to_final)
+    cases = [("REJECT", "APPROVE", "REJECT"), ("ACCEPT", "REJECT", "ACCEPT"), ("REVIEW", "APPROVE", "ACCEPT"), ("ALERT", "APPROVE", "ALERT")]
+    for i, (prev, human, final) in enumerate(cases):
+        row = Decision(
+            decision_id=f"dcn_ovr_{i}",
+            client_id_hash="h",
+            risk_score=0.5,
+            fraud_score=0.1,
+            decision=final,
+            policy_rule="test",
+            model_versions={},
+            explanations_preview={},
+            request_payload=payload,
+        )
+        db.add(row)
+        db.flush()
+        db.add(Review(
+            decision_id_fk=row.id,
+            reviewer_id="r1",
+            human_decision=human,
+            comment="override",
+            previous_decision=prev,
+            final_decision=final,
+        ))
+    db.commit()
+
+    rows = [r for chunk in iter_reviewed_chunks(db, 0, 10) for r in chunk]
+    _, y, ids = rows_to_frame(rows)
+    # Désaveux de décisions automatiques appris tels quels ; revue d'une alerte fraude ignorée
+    assert ids == ["dcn_ovr_0", "dcn_ovr_1", "dcn_ovr_2"] and y.tolist() == [0, 1, 0]
+
+
+def test_promotion_is_gated_on_the_holdout_evaluation(db, artifacts):
+    _add_reviewed(db, 0, 60)
+    # Tolérance négative intenable : candidat publié mais pas servi
+    rejected = run_incremental(db, artifacts, IncrementalConfig(chunk_size=16, min_labels=10, promote=True, tolerance=-1e9))
+    assert rejected["status"] == "published" and not rejected["promoted"]
+    assert model_store.current_version(artifacts) is None and model_store.read_history(artifacts) == []
+    assert model_store.list_versions(artifacts) == [rejected["version"]]
+
+    _add_reviewed(db, 1000, 20)
+    promoted = run_incremental(db, artifacts, IncrementalConfig(chunk_size=16, min_labels=10, promote=True, tolerance=1e9))
+    assert promoted["promoted"] and model_store.current_version(artifacts) == promoted["version"]
+    assert [e["version"] for e in model_store.read_history(artifacts)] == [promoted["version"]]
+    assert not any(p.name.startswith(".") for p in (artifacts / "versions").iterdir())
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parents[1]
+
+# Chaque worker est un vrai process Python qui importe le module de métriques de l'API
+WORKER = """
+import sys
+from app.services.monitoring import DECISION_COUNTER, DRIFT_WARNING, MODEL_LATENCY
+n, drift = int(sys.argv[1]), int(sys.argv[2])
+for _ in range(n):
+    DECISION_COUNTER.labels(decision="ACCEPT", policy_rule="otherwise => ACCEPT").inc()
+    MODEL_LATENCY.observe(0.02)
+DRIFT_WARNING.labels(feature="income_annual").set(drift)
+"""
+
+
+def _samples(registry, name):
+    return {
+        (s.name, tuple(sorted(s.labels.items()))): s.value
+        for metric in registry.collect()
+        for s in metric.samples
+        if s.name == name
+    }
+
+
+def test_multiprocess_totals_are_aggregated_across_workers(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PYTHONPATH": str(API_DIR)}
+    plan = [(10, 0), (25, 1), (7, 0), (3, 0)]
+    procs = [
+        subprocess.Popen([sys.executable, "-c", WORKER, str(n), str(drift)], env=env, cwd=API_DIR)
+        for n, drift in plan
+    ]
+    assert all(p.wait(timeout=120) == 0 for p in procs)
+
+    from app.services.monitoring import aggregated_registry, cleanup_dead_workers
+
+    registry = aggregated_registry(str(tmp_path))
+    counts = _samples(registry, "decision_total_count_total")
+    assert sum(counts.values()) == sum(n for n, _ in plan)
+    latency = _samples(registry, "model_inference_seconds_count")
+    assert sum(latency.values()) == sum(n for n, _ in plan)
+
+    # livemax : tant que les fichiers des workers existent, un seul worker en drift suffit
+    drift = _samples(registry, "model_drift_warning")
+    assert list(drift.values()) == [1.0]
+
+    # Workers terminés : leurs jauges live disparaissent, les compteurs sont conservés
+    dead = cleanup_dead_workers(str(tmp_path))
+    assert sorted(dead) == sorted(p.pid for p in procs)
+    registry = aggregated_registry(str(tmp_path))
+    assert _samples(registry, "model_drift_warning") == {}
+    assert sum(_samples(registry, "decision_total_count_total").values()) == sum(n for n, _ in plan)
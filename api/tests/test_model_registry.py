@@ -0,0 +1,64 @@
+import shutil
+
+import pytest
+
+from app.schemas import DecisionRequest
+from app.services import ml_client, model_registry, model_store
+from app.services.model_registry import ModelRegistry, ModelSpec
+from benchmarks.payloads import example_payloads
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    src = model_store.find_artifact_root("credit_risk")
+    root = tmp_path / "credit_segments"
+    for version in ("v1", "v2"):
+        vdir = root / model_store.VERSIONS_DIR / version
+        vdir.mkdir(parents=True)
+        for f in ("model.joblib", "metrics.json"):
+            shutil.copy2(src / f, vdir / f)
+    find = model_store.find_artifact_root
+    monkeypatch.setattr(model_store, "find_artifact_root", lambda name: root if name == "credit_segments" else find(name))
+
+    specs = {
+        "credit_fr": ModelSpec(key="credit_fr", kind="credit", source="artifacts", name="credit_segments", version="v1"),
+        "credit_de": ModelSpec(key="credit_de", kind="credit", source="artifacts", name="credit_segments", version="v2"),
+    }
+    routes = {"credit": {"segment": "transaction.country", "map": {"FR": "credit_fr", "DE": "credit_de"}}}
+    return ModelRegistry(specs, routes, budget_bytes=1, cache_dir=tmp_path / "cache")
+
+
+def _payload(country):
+    p = example_payloads()[0]
+    return DecisionRequest(**{**p, "transaction": {**p["transaction"], "country": country}})
+
+
+def test_registry_routes_by_segment_with_lru_budget(registry, monkeypatch):
+    assert registry.route_key("credit", _payload("FR")) == "credit_fr"
+    assert registry.route_key("credit", _payload("IT")) is None  # champion
+    assert registry.route("fraud", _payload("FR")) is None
+
+    fr = registry.route("credit", _payload("FR"))
+    assert fr.version.endswith("@v1[credit_fr]") and registry.route("credit", _payload("FR")) is fr
+    # Budget d'un octet : charger credit_de évince credit_fr, qui est rechargé à la demande
+    registry.route("credit", _payload("DE"))
+    registry.route("credit", _payload("FR"))
+    stats = registry.stats()["models"]
+    assert stats["credit_fr"]["loads"] == 2 and stats["credit_fr"]["hits"] == 1
+    assert stats["credit_fr"]["hit_rate"] == pytest.approx(1 / 3)
+    assert stats["credit_de"]["evictions"] == 1 and not stats["credit_de"]["resident"]
+    assert stats["credit_fr"]["size_bytes"] > 0 and stats["credit_fr"]["last_load_s"] is not None
+
+    monkeypatch.setattr(ml_client, "get_registry", lambda: registry)
+    _, _, versions, _, _ = ml_client.predict_risk_and_fraud(_payload("DE"))
+    assert versions["credit_risk"].endswith("[credit_de]")
+    _, _, versions, _, _ = ml_client.predict_risk_and_fraud(_payload("IT"))
+    assert versions == ml_client.get_bundle().versions
+
+
+def test_registry_rejects_routes_to_unknown_or_wrong_kind_models(tmp_path):
+    specs = {"fraud_x": ModelSpec(key="fraud_x", kind="fraud", source="artifacts", name="fraud")}
+    with pytest.raises(ValueError):
+        ModelRegistry(specs, {"credit": {"segment": "transaction.country", "map": {"FR": "fraud_x"}}}, budget_bytes=1, cache_dir=tmp_path)
+    with pytest.raises(ValueError):
+        model_registry.ModelSpec.from_dict("m", {"kind": "credit", "source": "mlflow"})
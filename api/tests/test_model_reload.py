@@ -0,0 +1,118 @@
+import json
+import shutil
+
+import pytest
+
+from app.schemas import DecisionRequest
+from app.services import drift, ml_client, model_store
+from benchmarks.payloads import TRAINING_DIR, example_payloads
+
+
+@pytest.fixture
+def roots(tmp_path, monkeypatch):
+    # Copie des artefacts du repo (disposition à plat) dans des racines temporaires
+    out = {}
+    for name in ("credit_risk", "fraud"):
+        src, dst = model_store.find_artifact_root(name), tmp_path / name
+        dst.mkdir()
+        for f in ("model.joblib", "metrics.json"):
+            shutil.copy2(src / f, dst / f)
+        out[name] = dst
+    monkeypatch.setattr(model_store, "find_artifact_root", lambda name: out.get(name))
+    monkeypatch.setattr(ml_client, "_BUNDLE", None)
+    return out
+
+
+def _publish(root, version, *, broken=False):
+    vdir = root / model_store.VERSIONS_DIR / version
+    vdir.mkdir(parents=True)
+    if broken:
+        (vdir / "model.joblib").write_bytes(b"not a model")
+    else:
+        shutil.copy2(root / "model.joblib", vdir / "model.joblib")
+    metrics = json.loads((root / "metrics.json").read_text(encoding="utf-8"))
+    (vdir / "metrics.json").write_text(json.dumps(metrics), encoding="utf-8")
+
+
+def test_pointer_swap_reload_keeps_inflight_bundle_and_rolls_back(roots):
+    payload = DecisionRequest(**example_payloads()[0])
+    old = ml_client.get_bundle()
+    assert not ml_client.models_changed()
+
+    root = roots["credit_risk"]
+    _publish(root, "v1")
+    model_store.activate(root, "v1")
+    assert ml_client.models_changed()
+    info = ml_client.reload_models()
+    assert info["changed"] and info["current"]["credit_risk"].endswith("@v1")
+    new = ml_client.get_bundle()
+    # Fraude inchangée : même objet réutilisé ; l'ancien bundle reste utilisable par une requête en cours
+    assert new.fraud is old.fraud and new.credit is not old.credit
+    assert old.credit.predict_proba(ml_client.credit_frame([payload.client.model_dump()])).shape == (1, 2)
+    assert ml_client.predict_risk_and_fraud(payload)[2] == new.versions
+
+    _publish(root, "v2", broken=True)
+    model_store.activate(root, "v2")
+    with pytest.raises(Exception):
+        ml_client.reload_models()
+    assert ml_client.get_bundle() is new
+
+    assert model_store.rollback_target(root) == "v1"
+    entry = model_store.rollback(root)
+    assert entry == {"action": "rollback", "version": "v1", "from": "v2"}
+    assert ml_client.reload_models()["current"]["credit_risk"].endswith("@v1")
+    # v2 abandonnée, v1 courante : plus rien avant v1
+    assert model_store.rollback_target(root) is None
+
+
+def test_training_publication_shares_the_api_pointer_and_history(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(TRAINING_DIR))
+    from artifact_versions import publish_version
+
+    root = tmp_path / "credit_risk"
+    src = model_store.find_artifact_root("credit_risk")
+    for version in ("v1", "v2"):
+        with publish_version(root, version) as out:
+            shutil.copy2(src / "model.joblib", out / "model.joblib")
+    with pytest.raises(RuntimeError):
+        with publish_version(root, "v3") as out:
+            raise RuntimeError("training failed")
+
+    assert model_store.list_versions(root) == ["v1", "v2"] and model_store.current_version(root) == "v2"
+    assert [(e["action"], e["version"], e["from"]) for e in model_store.read_history(root)] == [
+        ("activate", "v1", None), ("activate", "v2", "v1"),
+    ]
+    assert model_store.rollback(root)["version"] == "v1"
+
+
+def test_warmup_row_uses_training_categories():
+    # Catégorie inconnue du OneHotEncoder : ligne de zéros, le warm-up ne parcourt pas le chemin réel
+    encoder = ml_client.get_bundle().fraud.named_steps["preprocess"].named_transformers_["cat"].named_steps["onehot"]
+    for column, categories in zip(encoder.feature_names_in_, encoder.categories_):
+        assert ml_client.WARMUP_TRANSACTION[column] in set(categories)
+
+
+def test_reload_swaps_drift_references_and_empties_the_window(roots, monkeypatch):
+    served = model_store.current_dir(TRAINING_DIR.parent / "artifacts" / "credit_risk")
+    reference = json.loads((served / "reference.json").read_text(encoding="utf-8"))
+    shutil.copy2(served / "reference.json", roots["credit_risk"] / "reference.json")
+    monkeypatch.setattr(drift.settings, "drift_enabled", True)
+    monkeypatch.setattr(drift, "_MONITOR", None)
+    monkeypatch.setattr(drift, "_MONITOR_LOADED", False)
+    ml_client.get_bundle()
+    before = drift.get_drift_monitor()
+    before.observe(DecisionRequest(**example_payloads()[0]))
+
+    # v1 entraînée sur une autre population : revenus décalés dans sa référence
+    _publish(roots["credit_risk"], "v1")
+    shifted = json.loads(json.dumps(reference))
+    income = shifted["numeric"]["income_annual"]
+    income["edges"] = [e * 2 for e in income["edges"]]
+    (roots["credit_risk"] / "versions" / "v1" / "reference.json").write_text(json.dumps(shifted), encoding="utf-8")
+    model_store.activate(roots["credit_risk"], "v1")
+    ml_client.reload_models()
+
+    after = drift.get_drift_monitor()
+    assert after is not before and int(after._samples.sum()) == 0
+    spec = next(s for s in after.specs if s.model == "credit_risk" and s.name == "income_annual")
+    assert list(spec.edges) == income["edges"]
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.db import Decision
+from app.main import app
+from app.services import model_store
+from app.services.policy import DECISIONS, PolicyConfig, apply_policy, apply_policy_codes
+from app.services.policy_replay import ReplayCandidate, replay_policies
+from app.settings import settings
+from benchmarks.payloads import example_payloads
+
+
+def _add_decision(db, i, risk, fraud, created_at, payload=None):
+    db.add(Decision(
+        decision_id=f"dcn_test_{i}",
+        client_id_hash="h",
+        risk_score=risk,
+        fraud_score=fraud,
+        decision="ACCEPT",
+        policy_rule="test",
+        model_versions={},
+        explanations_preview={},
+        request_payload=payload if payload is not None else {},
+        created_at=created_at,
+    ))
+
+
+def test_vectorized_policy_matches_scalar():
+    """
+    apply_policy_codes doit donner exactement la même décision que apply_policy, bornes comprises.
+    """
+    cfg = PolicyConfig(fraud_alert_threshold=0.85, risk_reject_threshold=0.7, risk_review_lower=0.45, risk_review_upper=0.7)
+    rng = np.random.default_rng(0)
+    risk = np.concatenate([rng.random(500), [0.45, 0.7, 0.0, 1.0]])
+    fraud = np.concatenate([rng.random(500), [0.85, 0.2, 0.85, 0.0]])
+
+    codes = apply_policy_codes(risk, fraud, cfg)
+    expected = [apply_policy(r, f, cfg).decision for r, f in zip(risk, fraud)]
+    assert [DECISIONS[c] for c in codes] == expected
+
+
+def test_replay_transitions_and_daily_deltas(db):
+    day0 = datetime(2026, 1, 1, 10)
+    # risk_score 0.42 -> ACCEPT en référence, REVIEW si la bande démarre à 0.40
+    scores = [(0.42, 0.1), (0.42, 0.1), (0.20, 0.1), (0.80, 0.1), (0.30, 0.9)]
+    for i, (r, f) in enumerate(scores):
+        _add_decision(db, i, r, f, day0 + timedelta(days=i % 2))
+    db.commit()
+
+    baseline = PolicyConfig(fraud_alert_threshold=0.85, risk_reject_threshold=0.7, risk_review_lower=0.45, risk_review_upper=0.7)
+    cand = ReplayCandidate(
+        name="wider_review",
+        policy=PolicyConfig(fraud_alert_threshold=0.85, risk_reject_threshold=0.7, risk_review_lower=0.40, risk_review_upper=0.7),
+    )
+    # chunk_size=2 : force plusieurs blocs
+    report = replay_policies(db, [cand], baseline=baseline, chunk_size=2)
+
+    assert report["rows"] == 5
+    c = report["candidates"][0]
+    assert c["flipped"] == 2
+    assert c["transitions"]["ACCEPT"]["REVIEW"] == 2
+    assert c["totals_candidate"]["REVIEW"] - c["totals_baseline"]["REVIEW"] == 2
+    assert [d["day"] for d in c["daily"]] == ["2026-01-01", "2026-01-02"]
+    assert c["daily"][0]["delta"]["REVIEW"] == 1
+    assert c["daily"][1]["delta"]["REVIEW"] == 1
+    assert c["mean_daily_delta"]["REVIEW"] == 1.0
+
+
+def test_rescoring_skips_malformed_payloads(db):
+    day0 = datetime(2026, 1, 1, 10)
+    good = example_payloads()[:3]
+    truncated = {"client": good[0]["client"], "transaction": {"amount": 10.0}}
+    for i, payload in enumerate(good + [{}, truncated, {"client": "x", "transaction": None}]):
+        _add_decision(db, i, 0.3, 0.1, day0, payload)
+    db.commit()
+
+    cand = ReplayCandidate(
+        name="same_model",
+        policy=PolicyConfig.from_settings(),
+        credit_model_path=str(model_store.find_artifact_root("credit_risk") / "model.joblib"),
+    )
+    report = replay_policies(db, [cand], chunk_size=2)
+    assert report["rows"] == 3 and report["skipped_rows"] == 3
+    assert sum(report["candidates"][0]["totals_candidate"].values()) == 3
+
+
+def test_replay_route_requires_admin_token(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(settings, "admin_token", "s3cret")
+    client = TestClient(app)
+    body = {"candidates": [{"name": "c"}]}
+    assert client.post("/policy/replay", json=body).status_code == 401
+    assert client.post("/policy/replay", json=body, headers={"X-Admin-Token": "wrong"}).status_code == 403
@@ -0,0 +1,40 @@
+import time
+
+from app.schemas import DecisionRequest
+from app.services import ml_client
+from app.services.profile_store import ClientProfile, MemoryBackend, ProfileStore
+from benchmarks.payloads import example_payloads
+
+
+def _profile(risk=0.2):
+    return ClientProfile(features={"age": 30}, risk_score=risk, shap_impacts=[], credit_version="v1", cost_s=0.01)
+
+
+def test_memory_backend_ttl_and_lru():
+    backend = MemoryBackend(ttl_seconds=0.05, max_entries=2)
+    for key in ("a", "b"):
+        backend.set(key, _profile())
+    backend.get("a")  # "b" devient le moins récemment utilisé
+    backend.set("c", _profile())
+    assert backend.get("b") is None and backend.get("a") is not None and backend.evictions == 1
+    time.sleep(0.06)
+    assert backend.get("a") is None and backend.size() == 1
+
+
+def test_profile_reused_only_for_same_features_and_model(monkeypatch):
+    store = ProfileStore(MemoryBackend(ttl_seconds=3600, max_entries=100))
+    monkeypatch.setattr(ml_client, "get_profile_store", lambda: store)
+    p = example_payloads()[0]
+    payload = DecisionRequest(**p)
+
+    first = ml_client.predict_risk_and_fraud(payload)
+    second = ml_client.predict_risk_and_fraud(DecisionRequest(**{**p, "transaction": {**p["transaction"], "amount": 999.0}}))
+    assert second[0] == first[0] and second[3] == first[3]
+    stats = store.stats()
+    assert (stats["misses"], stats["hits"]) == (1, 1) and stats["saved_inference_s"] > 0
+
+    # Features crédit modifiées : profil périmé, score recalculé puis profil remplacé
+    changed = DecisionRequest(**{**p, "client": {**p["client"], "late_payments_12m": p["client"]["late_payments_12m"] + 5}})
+    ml_client.predict_risk_and_fraud(changed)
+    assert store.stats()["stale"] == 1
+    assert ClientProfile.from_json(store.get(ml_client.hash_client_id(p["client"]["client_id"])).to_json()).features["late_payments_12m"] == p["client"]["late_payments_12m"] + 5
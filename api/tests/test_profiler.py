@@ -0,0 +1,72 @@
+import re
+import threading
+from collections import Counter
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.profiler import DECISION_SCOPE, SamplingProfiler
+from app.settings import settings
+
+
+def _park(ready: threading.Event, done: threading.Event):
+    ready.set()
+    done.wait()
+
+
+def predict_risk_and_fraud(ready: threading.Event, done: threading.Event):
+    # Même nom que la frame racine du mode "decision"
+    _park(ready, done)
+
+
+def unrelated_work(ready: threading.Event, done: threading.Event):
+    _park(ready, done)
+
+
+def test_decision_mode_keeps_only_decision_path_frames():
+    done = threading.Event()
+    threads = []
+    for target in (predict_risk_and_fraud, unrelated_work):
+        ready = threading.Event()
+        threads.append(threading.Thread(target=target, args=(ready, done), daemon=True))
+        threads[-1].start()
+        ready.wait()
+    try:
+        prof = SamplingProfiler(scope=DECISION_SCOPE)
+        for _ in range(3):
+            prof._sample(threading.get_ident())
+    finally:
+        done.set()
+        for t in threads:
+            t.join()
+
+    assert prof.n_samples == 3 and len(prof.stacks) == 1
+    stack = next(iter(prof.stacks))
+    # Pile enracinée sur la frame de décision : rien de ce qui l'appelle, rien de l'autre thread
+    assert stack[0].endswith(":predict_risk_and_fraud") and any(s.endswith(":_park") for s in stack)
+    assert not any("unrelated_work" in s or s.endswith(":run") for s in stack)
+    assert prof.libraries == Counter({"app": 3})
+
+
+def test_collapsed_stacks_format():
+    prof = SamplingProfiler()
+    prof.stacks = Counter({("app/main.py:root", "app/services/ml_client.py:predict"): 3, ("app/main.py:root",): 5})
+    assert prof.collapsed() == "app/main.py:root 5\napp/main.py:root;app/services/ml_client.py:predict 3"
+
+    prof = SamplingProfiler(interval=0.001).start()
+    threading.Event().wait(0.02)
+    prof.stop()
+    assert all(re.fullmatch(r"\S+(;\S+)* \d+", line) for line in prof.collapsed().splitlines())
+
+
+def test_debug_routes_require_admin_token(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "admin_token", "")
+    assert client.get("/debug/profile", headers={"X-Admin-Token": "x"}).status_code == 403
+
+    monkeypatch.setattr(settings, "admin_token", "s3cret")
+    assert client.get("/debug/profile").status_code == 401
+    assert client.get("/debug/profile", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    r = client.get("/debug/profile?seconds=0.05&format=collapsed", headers={"X-Admin-Token": "s3cret"})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
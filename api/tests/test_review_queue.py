@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+
+from app.db import Decision, Review
+from app.services.review_queue import (
+    InvalidCursor,
+    _pending,
+    apply_review,
+    backfill_pending_amounts,
+    bulk_review,
+    claim,
+    claimed_by_other,
+    list_pending,
+)
+
+
+@pytest.fixture
+def seeded(session_factory):
+    """Base de test avec 30 décisions, dont 20 en attente de revue."""
+    db = session_factory()
+    t0 = datetime(2026, 1, 1)
+    for i in range(30):
+        decision = "REVIEW" if i % 3 else "ACCEPT"
+        db.add(Decision(
+            decision_id=f"dcn_{i}",
+            client_id_hash="h",
+            risk_score=0.45 + (i * 7 % 25) / 100,
+            fraud_score=0.4,
+            decision=decision,
+            policy_rule="r",
+            model_versions={},
+            explanations_preview={},
+            request_payload={"transaction": {"amount": float(100 + i * 37 % 500)}},
+            amount=float(100 + i * 37 % 500),
+            created_at=t0 + timedelta(minutes=i),
+        ))
+    db.commit()
+    db.close()
+    return session_factory
+
+
+def _all_pages(db, order: str, limit: int = 4) -> list:
+    out, cursor = [], None
+    while True:
+        rows, cursor = list_pending(db, order=order, limit=limit, cursor=cursor)
+        out += rows
+        if cursor is None:
+            return out
+
+
+def test_pages_follow_order_without_gaps_or_duplicates(seeded):
+    db = seeded()
+    pending = db.query(Decision).filter(Decision.decision == "REVIEW").all()
+    expected = {
+        "risk": sorted(pending, key=lambda r: (r.risk_score, r.id), reverse=True),
+        "amount": sorted(pending, key=lambda r: (r.amount, r.id), reverse=True),
+        "age": sorted(pending, key=lambda r: (r.created_at, r.id)),
+    }
+    for order, rows in expected.items():
+        assert [r.decision_id for r in _all_pages(db, order)] == [r.decision_id for r in rows]
+
+    _, cursor = list_pending(db, order="risk", limit=2)
+    with pytest.raises(InvalidCursor):
+        list_pending(db, order="age", cursor=cursor)
+    db.close()
+
+
+def test_queue_reads_use_partial_indexes(seeded):
+    db = seeded()
+    for order in ("risk", "amount", "age"):
+        stmt = _pending(order, now=datetime.utcnow()).limit(10)
+        sql = str(stmt.compile(db.get_bind(), compile_kwargs={"literal_binds": True}))
+        plan = " ".join(str(row) for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+        assert f"ix_decisions_pending_{order}" in plan and "TEMP B-TREE" not in plan
+    db.close()
+
+
+def test_claims_are_disjoint_and_leases_expire(seeded):
+    db = seeded()
+    alice, _ = claim(db, "alice", limit=5)
+    bob, _ = claim(db, "bob", limit=5)
+    assert len(alice) == len(bob) == 5
+    assert not {r.decision_id for r in alice} & {r.decision_id for r in bob}
+    # Les réservations actives sortent de la vue par défaut
+    visible = {r.decision_id for r in _all_pages(db, "risk")}
+    assert not visible & {r.decision_id for r in alice + bob}
+    assert claimed_by_other(alice[0], "bob") and not claimed_by_other(alice[0], "alice")
+
+    expired, _ = claim(db, "carol", limit=3, lease_seconds=-1)
+    again, _ = claim(db, "dave", limit=20)
+    assert {r.decision_id for r in expired} <= {r.decision_id for r in again}
+    db.close()
+
+
+def test_bulk_review_applies_in_one_transaction_with_per_item_status(seeded):
+    db = seeded()
+    claimed, _ = claim(db, "alice", limit=1)
+    free = [r.decision_id for r in _all_pages(db, "age")][:3]
+    items = [SimpleNamespace(decision_id=d, human_decision="APPROVE", comment="ok after check") for d in free]
+    items += [
+        SimpleNamespace(decision_id=free[0], human_decision="REJECT", comment="dup"),
+        SimpleNamespace(decision_id="dcn_missing", human_decision="REJECT", comment="none"),
+        SimpleNamespace(decision_id=claimed[0].decision_id, human_decision="REJECT", comment="taken"),
+        SimpleNamespace(decision_id="dcn_0", human_decision="REJECT", comment="auto ACCEPT"),
+    ]
+    results = bulk_review(db, "bob", items)
+    assert [r.status for r in results] == ["stored"] * 3 + ["duplicate", "not_found", "claimed", "not_pending"]
+    assert all(r.previous_decision == "REVIEW" and r.final_decision == "ACCEPT" for r in results[:3])
+
+    assert db.query(Review).count() == 3
+    remaining = {r.decision_id for r in _all_pages(db, "age")}
+    assert not remaining & set(free)
+
+    # Un second lot sur les mêmes décisions ne crée aucune revue
+    again = bulk_review(db, "carol", items[:3])
+    assert [r.status for r in again] == ["not_pending"] * 3 and db.query(Review).count() == 3
+    db.close()
+
+
+def test_concurrent_reviews_of_the_same_decision_store_only_one(seeded):
+    first, second = seeded(), seeded()
+    decision_id = next(r.decision_id for r in _all_pages(first, "age"))
+    # Les deux analystes ont lu la décision encore en attente
+    row_a = first.query(Decision).filter_by(decision_id=decision_id).one()
+    row_b = second.query(Decision).filter_by(decision_id=decision_id).one()
+
+    assert apply_review(first, row_a, "alice", "APPROVE", "checked") == "ACCEPT"
+    first.commit()
+    assert apply_review(second, row_b, "bob", "REJECT", "checked too") is None
+    second.rollback()
+
+    assert first.query(Review).count() == 1
+    first.close()
+    second.close()
+
+
+def test_backfill_fills_amount_of_pending_rows_only(seeded):
+    db = seeded()
+    db.query(Decision).update({Decision.amount: None})
+    db.commit()
+    n_pending = db.query(Decision).filter(Decision.decision == "REVIEW").count()
+    assert backfill_pending_amounts(seeded, batch_size=7) == n_pending
+    db.expire_all()
+    for r in db.query(Decision).all():
+        assert r.amount == (r.request_payload["transaction"]["amount"] if r.decision == "REVIEW" else None)
+    db.close()
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from app.db import ShadowScore
+from app.schemas import DecisionRequest
+from app.services import ml_client
+from app.services.model_registry import ModelRegistry, ModelSpec
+from app.services.policy import DECISIONS, apply_policy
+from app.services.shadow import ShadowScorer, shadow_report
+from benchmarks.payloads import example_payloads
+
+
+@pytest.fixture
+def registry(tmp_path):
+    # Challenger = le modèle crédit courant : mêmes scores que le champion, accord total attendu
+    specs = {"credit_same": ModelSpec(key="credit_same", kind="credit", source="artifacts", name="credit_risk")}
+    return ModelRegistry(specs, {}, budget_bytes=1 << 30, cache_dir=tmp_path)
+
+
+def test_shadow_scores_in_batches_and_reports_agreement(registry, session_factory):
+    payloads = [DecisionRequest(**p) for p in example_payloads()]
+    scorer = ShadowScorer(registry, credit_key="credit_same", batch_size=4, batch_wait_seconds=0.05, session_factory=session_factory).start()
+    for i, payload in enumerate(payloads):
+        risk, fraud, _, _, _ = ml_client.predict_risk_and_fraud(payload)
+        assert scorer.submit(payload, f"dcn_{i}", risk, fraud, apply_policy(risk, fraud).decision)
+    scorer.stop()
+    assert scorer.stats()["scored"] == len(payloads) and scorer.stats()["batches"] >= len(payloads) // 4
+
+    db = session_factory()
+    rows = db.query(ShadowScore).all()
+    assert len(rows) == len(payloads) and all(r.fraud_score is None and r.fraud_delta is None for r in rows)
+    report = shadow_report(db)["challengers"]["credit_same"]
+    assert report["compared"] == len(payloads) and report["agreement_rate"] == 1.0
+    assert report["risk_delta"]["max_abs"] < 1e-9 and report["fraud_delta"] == {"n": 0}
+
+    db.add(ShadowScore(
+        decision_id="dcn_x", challenger="credit_same", risk_score=0.9, risk_delta=0.5,
+        champion_code=DECISIONS.index("ACCEPT"), challenger_code=DECISIONS.index("REJECT"),
+    ))
+    db.commit()
+    report = shadow_report(db, challenger="credit_same")["challengers"]["credit_same"]
+    assert report["transitions"]["ACCEPT"]["REJECT"] == 1
+    assert report["agreement_rate"] == pytest.approx(len(payloads) / (len(payloads) + 1))
+    db.close()
+
+
+def test_shadow_drops_and_counts_when_queue_is_full(registry, session_factory):
+    payload = DecisionRequest(**example_payloads()[0])
+    scorer = ShadowScorer(registry, credit_key="credit_same", queue_size=2, session_factory=session_factory)
+    # Workers non démarrés : la file se remplit, les suivantes sont rejetées sans bloquer
+    results = [scorer.submit(payload, f"dcn_{i}", 0.1, 0.1, "ACCEPT") for i in range(5)]
+    assert results == [True, True, False, False, False]
+    assert scorer.stats()["dropped"] == 3 and scorer.stats()["queued"] == 2
+
+    with pytest.raises(ValueError):
+        ShadowScorer(registry, fraud_key="credit_same")
+
+
+def test_stop_returns_within_timeout_when_queue_is_full(registry, session_factory):
+    scorer = ShadowScorer(registry, credit_key="credit_same", queue_size=1, batch_size=1, session_factory=session_factory)
+    payload = DecisionRequest(**example_payloads()[0])
+    busy, release = threading.Event(), threading.Event()
+
+    def stuck(batch):
+        busy.set()
+        release.wait()
+        return []
+
+    scorer.score_batch = stuck
+    scorer.start()
+    assert scorer.submit(payload, "dcn_0", 0.1, 0.1, "ACCEPT")
+    busy.wait()
+    assert scorer.submit(payload, "dcn_1", 0.1, 0.1, "ACCEPT")
+    # Worker bloqué, file pleine : aucun marqueur ne peut être déposé
+    t0 = time.monotonic()
+    scorer.stop(timeout=0.2)
+    assert time.monotonic() - t0 < 1.0
+    release.set()
+
+    # Workers démarrés : la file est vidée avant l'arrêt
+    scorer = ShadowScorer(registry, credit_key="credit_same", queue_size=2, batch_wait_seconds=0.01, session_factory=session_factory)
+    for i in range(2):
+        assert scorer.submit(payload, f"dcn_{i}", 0.1, 0.1, "ACCEPT")
+    scorer.start().stop(timeout=5.0)
+    assert scorer.scored == 2 and not any(t.is_alive() for t in scorer._threads)
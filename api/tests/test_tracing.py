@@ -0,0 +1,44 @@
+import asyncio
+
+from app.services.tracing import StageTimingMiddleware, Trace, _CURRENT, stage
+
+
+async def _endpoint(scope, receive, send):
+    with stage("policy"):
+        pass
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def _headers(path: str) -> dict:
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(StageTimingMiddleware(_endpoint)({"type": "http", "path": path, "headers": []}, None, send))
+    return {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+
+
+def test_decision_routes_and_subroutes_are_traced():
+    for path in ("/decision", "/decision/transaction", "/decision/stream", "/ui/decide"):
+        timing = _headers(path).get("server-timing", "")
+        assert timing.startswith("policy;dur=") and "total;dur=" in timing, path
+    for path in ("/decisions", "/review/queue", "/health"):
+        assert "server-timing" not in _headers(path), path
+
+
+def test_repeated_stages_are_totals_not_one_entry_per_call():
+    trace = Trace()
+    token = _CURRENT.set(trace)
+    try:
+        for _ in range(5):  # micro-lots d'un flux
+            with stage("credit_score"):
+                pass
+            for _ in range(64):
+                with stage("policy"):
+                    pass
+    finally:
+        _CURRENT.reset(token)
+    assert list(trace.stages) == ["credit_score", "policy"]
+    assert trace.server_timing().count("policy;dur=") == 1
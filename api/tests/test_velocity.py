@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.db import Decision
+from app.services.ml_client import fraud_frame
+from app.services.velocity import VELOCITY_FEATURES, VelocityStore
+from benchmarks.payloads import example_payloads
+
+T0 = 1_800_000_000.0  # aligné sur les buckets de toutes les fenêtres
+
+
+def test_sliding_windows_expire_by_bucket_and_count_distinct_countries():
+    store = VelocityStore(buckets_per_window=6)
+    assert store.observe("c1", 10.0, "FR", ts=T0) == dict.fromkeys(VELOCITY_FEATURES, 0.0)
+    store.observe("c1", 20.0, "US", ts=T0 + 60)
+    f = store.observe("c1", 5.0, "FR", ts=T0 + 120)
+    assert f["tx_count_10m"] == 2 and f["amount_sum_10m"] == 30.0 and f["distinct_countries_10m"] == 2
+
+    # 15 min plus tard : sorti de la fenêtre 10 min, toujours dans 1 h / 24 h
+    f = store.peek("c1", ts=T0 + 900)
+    assert f["tx_count_10m"] == 0 and f["amount_sum_10m"] == 0.0
+    assert f["tx_count_1h"] == 3 and f["amount_sum_24h"] == pytest.approx(35.0) and f["distinct_countries_24h"] == 2
+    assert store.peek("c1", ts=T0 + 86400 + 3600)["tx_count_24h"] == 0
+
+
+def test_idle_and_overflow_clients_are_evicted():
+    store = VelocityStore(max_clients=2)
+    store.observe("a", 1.0, "FR", ts=T0)
+    store.observe("b", 1.0, "FR", ts=T0 + 10)
+    store.observe("a", 1.0, "FR", ts=T0 + 20)  # "b" devient le moins récent
+    store.observe("c", 1.0, "FR", ts=T0 + 30)
+    assert len(store) == 2 and store.peek("b", ts=T0 + 30)["tx_count_24h"] == 0
+    store.observe("d", 1.0, "FR", ts=T0 + 2 * 86400)
+    assert len(store) == 1 and store.evictions == 3
+
+
+def test_rebuild_from_decisions_and_fraud_frame_columns(db):
+    payload = example_payloads()[0]
+    for i, offset in enumerate((-2 * 86400, -300, -60)):
+        db.add(Decision(
+            decision_id=f"dcn_{i}", client_id_hash="h", risk_score=0.1, fraud_score=0.1, decision="ACCEPT",
+            policy_rule="test", model_versions={}, explanations_preview={}, request_payload=payload,
+            created_at=datetime.fromtimestamp(T0 + offset, tz=timezone.utc).replace(tzinfo=None),
+        ))
+    db.commit()
+
+    store = VelocityStore()
+    assert store.rebuild(db, now=T0) == 2  # la décision d'avant-hier est hors fenêtre
+    f = store.peek("h", ts=T0)
+    assert f["tx_count_10m"] == 2 and f["amount_sum_1h"] == pytest.approx(2 * payload["transaction"]["amount"])
+
+    X = fraud_frame([payload["transaction"]] * 2, [f, {}])
+    assert X.loc[0, "tx_count_10m"] == 2 and X.loc[1, VELOCITY_FEATURES].eq(0).all()
+    assert fraud_frame([payload["transaction"]])[VELOCITY_FEATURES].eq(0).all(axis=None)
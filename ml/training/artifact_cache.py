@@ -0,0 +1,127 @@
+"""
+Cache d'artefacts d'entraînement adressé par contenu (jeux de données générés, préprocesseurs ajustés).
+
+La clé est le SHA-256 de (type, configuration, version du code) : source des fonctions de génération
+et constantes dont elles dépendent, versions numpy / pandas / scikit-learn. Changer un hyper-paramètre
+de modèle ne change donc pas la clé du jeu de données ni celle du préprocesseur.
+
+- DataFrames : Parquet (colonnaire, zstd) ; objets ajustés : joblib.
+- Écriture atomique (fichier temporaire + rename) : un run interrompu ne laisse pas d'entrée corrompue.
+- Éviction LRU (date d'accès = mtime, mise à jour à chaque hit) au-delà de `max_bytes`.
+
+Variables d'environnement : ML_CACHE=off pour désactiver, ML_CACHE_DIR (défaut ml/.cache),
+ML_CACHE_MAX_GB (défaut 5).
+"""
+import hashlib
+import inspect
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable
+
+import joblib
+import pandas as pd
+
+_SUFFIX = {"frame": ".parquet", "object": ".joblib"}
+
+
+def code_version(*objs) -> str:
+    """Empreinte du code : source des callables, repr des constantes."""
+    h = hashlib.sha256()
+    for obj in objs:
+        h.update((inspect.getsource(obj) if callable(obj) else repr(obj)).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _lib_versions() -> dict:
+    import numpy
+    import sklearn
+
+    return {"numpy": numpy.__version__, "pandas": pd.__version__, "sklearn": sklearn.__version__}
+
+
+class ArtifactCache:
+    def __init__(self, root: Path, max_bytes: int, enabled: bool = True):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+        self.events: list[dict] = []
+
+    @classmethod
+    def from_env(cls) -> "ArtifactCache":
+        default = Path(__file__).resolve().parents[1] / ".cache"
+        return cls(
+            Path(os.getenv("ML_CACHE_DIR", str(default))),
+            max_bytes=int(float(os.getenv("ML_CACHE_MAX_GB", "5")) * 1024**3),
+            enabled=os.getenv("ML_CACHE", "on") != "off",
+        )
+
+    @staticmethod
+    def key(kind: str, **parts: Any) -> str:
+        payload = json.dumps({"kind": kind, "libs": _lib_versions(), **parts}, sort_keys=True, default=repr)
+        return f"{kind}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]}"
+
+    def _path(self, key: str, fmt: str) -> Path:
+        return self.root / f"{key}{_SUFFIX[fmt]}"
+
+    def _load(self, path: Path, fmt: str):
+        return pd.read_parquet(path) if fmt == "frame" else joblib.load(path)
+
+    def _store(self, path: Path, value, fmt: str) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        if fmt == "frame":
+            value.to_parquet(tmp, index=False, compression="zstd")
+        else:
+            joblib.dump(value, tmp)
+        os.replace(tmp, path)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], fmt: str = "object") -> Any:
+        """Valeur en cache pour `key`, sinon `compute()` (puis stockage et éviction)."""
+        if not self.enabled:
+            return compute()
+        path = self._path(key, fmt)
+        if path.exists():
+            try:
+                value = self._load(path, fmt)
+                os.utime(path)  # LRU : marquer l'accès
+                self._record(key, hit=True)
+                return value
+            except Exception as e:
+                print(f"WARNING: unreadable cache entry {path.name} ({e}), recomputing")
+        value = compute()
+        self._store(path, value, fmt)
+        self._record(key, hit=False)
+        self.evict()
+        return value
+
+    def _record(self, key: str, hit: bool) -> None:
+        self.stats["hits" if hit else "misses"] += 1
+        self.events.append({"key": key, "hit": hit})
+
+    def evict(self) -> None:
+        entries = sorted(
+            (p for p in self.root.glob("*") if p.suffix in _SUFFIX.values()),
+            key=lambda p: p.stat().st_mtime,
+        )
+        total = sum(p.stat().st_size for p in entries)
+        for p in entries:
+            if total <= self.max_bytes:
+                break
+            total -= p.stat().st_size
+            p.unlink(missing_ok=True)
+            self.stats["evicted"] += 1
+
+    def summary(self) -> dict:
+        return {**self.stats, "enabled": self.enabled, "entries": self.events}
+
+    def log_to_mlflow(self, prefix: str = "cache") -> None:
+        import mlflow
+
+        if mlflow.active_run() is None:
+            return
+        mlflow.log_metrics({f"{prefix}_hits": self.stats["hits"], f"{prefix}_misses": self.stats["misses"]})
+        # Détail par artefact : dataset / preprocessor -> hit|miss
+        mlflow.log_params({f"{prefix}_{e['key'].split('-')[0]}": "hit" if e["hit"] else "miss" for e in self.events})
+
@@ -0,0 +1,31 @@
+"""
+Publication versionnée des artefacts d'entraînement (même disposition que api/app/services/model_store.py).
+
+    ml/artifacts/<modèle>/versions/<version>/   artefacts du run (écrits dans un répertoire temporaire)
+    ml/artifacts/<modèle>/current               pointeur vers la version servie (rename atomique)
+    ml/artifacts/<modèle>/history.ndjson        journal des activations
+
+La version n'est renommée sous son nom final qu'une fois tous les fichiers écrits, puis le pointeur
+est basculé par `model_store.activate` : `publish_version` est celui de l'API (même code que sa CLI
+de rollback et que le ré-entraînement incrémental), l'API (watcher ou POST /debug/models/reload) ne
+voit jamais de fichier partiel.
+"""
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+# api/ du repo, ou /app dans le conteneur API (ml/ monté sur /ml)
+API_DIR = next(
+    (p for p in (Path(__file__).resolve().parents[2] / "api", Path("/app")) if (p / "app" / "services" / "model_store.py").exists()),
+    None,
+)
+if API_DIR is not None and str(API_DIR) not in sys.path:
+    sys.path.insert(0, str(API_DIR))
+from app.services.model_store import VERSIONS_DIR, publish_version  # noqa: E402,F401
+
+
+def new_version_name(run_id: Optional[str] = None) -> str:
+    stamp = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}"
+    return f"{stamp}-{run_id[:8]}" if run_id else stamp
+
@@ -0,0 +1,169 @@
+"""
+Chemin de données par blocs (out-of-core) pour l'entraînement sur de gros volumes.
+
+- `write_chunked_dataset` : génère (ou convertit) les données bloc par bloc vers un répertoire de
+  fichiers Parquet `part-*.parquet` + `_meta.json` ; un jeu déjà écrit avec la même config est réutilisé.
+  Le bloc i est tiré avec SeedSequence([seed, i]) : même résultat quel que soit l'ordre de lecture.
+- `iter_dataset` : relit le jeu bloc par bloc (colonnes choisies), avec un masque train/test
+  déterministe par bloc.
+- `StreamingMoments` : moyenne/variance par colonne fusionnées bloc à bloc (Chan et al.), appliquées
+  ensuite à un `StandardScaler` sans jamais matérialiser le jeu complet.
+- `Reservoir` : échantillon uniforme de taille fixe (profil de drift, fit des encodeurs, IsolationForest).
+- `peak_rss_mb` : pic mémoire du process, reporté dans MLflow / metrics.json.
+
+Mémoire : O(chunk_size + taille du réservoir), indépendante de n_samples.
+"""
+import json
+import resource
+import sys
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+META_FILE = "_meta.json"
+
+
+def chunk_seed(seed: int, idx: int) -> int:
+    return int(np.random.SeedSequence([seed, idx]).generate_state(1)[0])
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+# -----------------------------
+# Écriture / lecture du jeu par blocs
+# -----------------------------
+def write_chunked_dataset(
+    make_chunk: Callable[[int, int], pd.DataFrame],
+    out_dir: Path,
+    *,
+    n_samples: int,
+    chunk_size: int,
+    meta: dict,
+) -> Path:
+    """
+    `make_chunk(n, seed)` produit un bloc de n lignes. Le jeu n'est (ré)écrit que si `_meta.json`
+    diffère (config, taille de bloc) ; un bloc n'est visible sous son nom final qu'une fois complet.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    meta = {**meta, "n_samples": n_samples, "chunk_size": chunk_size}
+    meta_path = out_dir / META_FILE
+    if meta_path.exists() and json.loads(meta_path.read_text(encoding="utf-8")) == meta:
+        return out_dir
+
+    for stale in out_dir.glob("part-*.parquet"):
+        stale.unlink()
+    seed = meta.get("seed", 0)
+    n_chunks = -(-n_samples // chunk_size)
+    for idx in range(n_chunks):
+        n = min(chunk_size, n_samples - idx * chunk_size)
+        df = make_chunk(n, chunk_seed(seed, idx))
+        tmp = out_dir / f"part-{idx:05d}.parquet.tmp"
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="zstd")
+        tmp.rename(out_dir / f"part-{idx:05d}.parquet")
+    meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return out_dir
+
+
+def dataset_parts(path: Path) -> list[Path]:
+    return [path] if path.is_file() else sorted(path.glob("part-*.parquet"))
+
+
+def iter_dataset(
+    path: Path,
+    *,
+    columns: Optional[list] = None,
+    test_size: float = 0.0,
+    seed: int = 42,
+    order: Optional[list] = None,
+) -> Iterator[tuple[int, pd.DataFrame, np.ndarray]]:
+    """
+    Renvoie (indice du bloc, bloc, masque test). Le masque ne dépend que de (seed, bloc), donc
+    le même split est retrouvé à chaque passe (statistiques, époques, évaluation).
+    """
+    import pyarrow.parquet as pq
+
+    parts = dataset_parts(path)
+    for idx in order if order is not None else range(len(parts)):
+        df = pq.read_table(parts[idx], columns=columns).to_pandas()
+        rng = np.random.default_rng(np.random.SeedSequence([seed, idx, 1]))
+        yield idx, df, rng.random(len(df)) < test_size
+
+
+# -----------------------------
+# Statistiques en streaming
+# -----------------------------
+class StreamingMoments:
+    """Moyenne / variance (ddof=0, comme StandardScaler) par colonne, fusion bloc à bloc."""
+
+    def __init__(self, columns: list):
+        self.columns = list(columns)
+        self.n = 0
+        self.mean = np.zeros(len(columns))
+        self.m2 = np.zeros(len(columns))
+
+    def update(self, X: pd.DataFrame) -> None:
+        x = X[self.columns].to_numpy(dtype=float)
+        n_b = len(x)
+        if n_b == 0:
+            return
+        mean_b = x.mean(axis=0)
+        m2_b = ((x - mean_b) ** 2).sum(axis=0)
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * n_b / n
+        self.m2 = self.m2 + m2_b + delta**2 * self.n * n_b / n
+        self.n = n
+
+    @property
+    def var(self) -> np.ndarray:
+        return self.m2 / max(self.n, 1)
+
+    def apply_to_scaler(self, scaler) -> None:
+        """Remplace les statistiques d'un StandardScaler déjà ajusté par celles du flux complet."""
+        scale = np.sqrt(self.var)
+        scaler.mean_ = self.mean.copy()
+        scaler.var_ = self.var.copy()
+        scaler.scale_ = np.where(scale == 0.0, 1.0, scale)
+        scaler.n_samples_seen_ = self.n
+
+
+class Reservoir:
+    """Échantillon uniforme de `size` lignes sur un flux de blocs (algorithme R, vectorisé par bloc)."""
+
+    def __init__(self, size: int, seed: int = 42):
+        self.size = size
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+        self._frame: Optional[pd.DataFrame] = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        df = df.reset_index(drop=True)
+        if self._frame is None or len(self._frame) < self.size:
+            take = self.size - (0 if self._frame is None else len(self._frame))
+            head = df.iloc[:take]
+            self._frame = head.copy() if self._frame is None else pd.concat([self._frame, head], ignore_index=True)
+            self.seen += len(head)
+            df = df.iloc[take:].reset_index(drop=True)
+        if len(df) == 0:
+            return
+        # Ligne k du flux (0-based) retenue avec proba size/(k+1), à une position uniforme
+        k = self.seen + np.arange(len(df))
+        slots = (self.rng.random(len(df)) * (k + 1)).astype(np.int64)
+        keep = np.flatnonzero(slots < self.size)
+        # En cas de collision sur un même slot, la dernière ligne gagne (comme en séquentiel)
+        for col in self._frame.columns:
+            self._frame.loc[slots[keep], col] = df[col].to_numpy()[keep]
+        self.seen += len(df)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        return self._frame if self._frame is not None else pd.DataFrame()
@@ -0,0 +1,57 @@
+"""
+Profil de référence pour le monitoring de dérive (drift) en production.
+
+Écrit à côté de metrics.json / schema.json sous le nom reference.json :
+- numériques : bornes d'histogramme (déciles du jeu d'entraînement), proportions par bin, quantiles
+- catégorielles : fréquences par modalité
+
+L'API (services/drift.py) réutilise exactement ces bornes pour ses histogrammes glissants,
+ce qui rend PSI / KS / chi² directement comparables à la référence.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+N_BINS = 10
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+def numeric_reference(values: np.ndarray, n_bins: int = N_BINS) -> dict:
+    values = np.asarray(values, dtype=float)
+    # Bornes internes : bins = (-inf, e1), [e1, e2), ..., [ek, +inf) -> searchsorted(side="right")
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+    counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+    return {
+        "edges": [float(e) for e in edges],
+        "proportions": [float(c) for c in counts / counts.sum()],
+        "quantiles": {str(q): float(v) for q, v in zip(QUANTILES, np.quantile(values, QUANTILES))},
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+    }
+
+
+def categorical_reference(values: pd.Series, allowed: list) -> dict:
+    freq = values.astype(str).value_counts(normalize=True)
+    categories = [str(c) for c in allowed]
+    return {
+        "categories": categories,
+        "proportions": [float(freq.get(c, 0.0)) for c in categories],
+    }
+
+
+def build_reference_profile(X: pd.DataFrame, numeric: list, categorical: dict) -> dict:
+    """`categorical` : {colonne: modalités autorisées}."""
+    return {
+        "n_reference": int(len(X)),
+        "numeric": {col: numeric_reference(X[col].to_numpy()) for col in numeric},
+        "categorical": {col: categorical_reference(X[col], allowed) for col, allowed in categorical.items()},
+    }
+
+
+def save_reference_profile(profile: dict, out_dir: Path) -> Path:
+    path = out_dir / "reference.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+    return path
@@ -0,0 +1,252 @@
+"""
+Recherche d'hyper-paramètres parallèle pour le modèle crédit (LogisticRegression, XGBoost).
+
+- Le ColumnTransformer est ajusté une seule fois ; les matrices prétraitées (train / validation)
+  sont écrites en .npy et ouvertes en mmap par chaque worker : une seule copie en page cache.
+- Grille complète ou tirage aléatoire dans la grille, par famille de modèles.
+- Successive halving : chaque palier entraîne les configs restantes sur une fraction croissante
+  des lignes (préfixe d'une permutation fixe) et ne garde que le meilleur 1/eta.
+- XGBoost : early stopping sur la validation (n_estimators = plafond).
+- Chaque essai renvoie ses métriques, sa durée et son temps CPU ; ils sont loggés dans MLflow
+  par appels `log_batch` (un par palier), pas un appel par métrique.
+
+Activé depuis train_credit_risk.py par CR_SEARCH=grid|random.
+"""
+import itertools
+import json
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+try:
+    from xgboost import XGBClassifier
+except Exception:
+    XGBClassifier = None
+
+DEFAULT_SPACE = {
+    "logreg": {
+        "C": [0.01, 0.1, 1.0, 10.0],
+        "class_weight": ["balanced", None],
+    },
+    "xgb": {
+        "max_depth": [3, 4, 6],
+        "learning_rate": [0.03, 0.1],
+        "subsample": [0.8, 1.0],
+        "colsample_bytree": [0.8, 1.0],
+        "reg_lambda": [1.0, 5.0],
+    },
+}
+XGB_MAX_ESTIMATORS = 1000
+XGB_EARLY_STOPPING = 50
+
+# Limites MLflow par appel log_batch
+_MAX_BATCH_METRICS = 1000
+_MAX_BATCH_PARAMS = 100
+
+
+@dataclass
+class SearchConfig:
+    mode: str = "grid"  # grid | random
+    n_trials: int = 20  # par famille, mode random
+    eta: int = 3
+    min_fraction: float = 1 / 9
+    workers: int = os.cpu_count() or 1
+    threads_per_trial: int = 1
+    seed: int = 42
+    space: dict = field(default_factory=lambda: DEFAULT_SPACE)
+
+
+def available_families(space: dict) -> list:
+    return [f for f in space if f != "xgb" or XGBClassifier is not None]
+
+
+def build_trials(cfg: SearchConfig) -> list[dict]:
+    rng = np.random.default_rng(cfg.seed)
+    trials = []
+    for family in available_families(cfg.space):
+        grid = cfg.space[family]
+        combos = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+        if cfg.mode == "random" and cfg.n_trials < len(combos):
+            combos = [combos[i] for i in rng.choice(len(combos), size=cfg.n_trials, replace=False)]
+        trials.extend({"id": len(trials) + i, "family": family, "params": p} for i, p in enumerate(combos))
+    return trials
+
+
+def make_estimator(family: str, params: dict, seed: int, threads: int = 1):
+    if family == "logreg":
+        return LogisticRegression(max_iter=2000, solver="lbfgs", **params)
+    if family == "xgb":
+        return XGBClassifier(
+            n_estimators=XGB_MAX_ESTIMATORS,
+            early_stopping_rounds=XGB_EARLY_STOPPING,
+            eval_metric="logloss",
+            random_state=seed,
+            n_jobs=threads,
+            **params,
+        )
+    raise ValueError(f"Unknown model family {family!r}")
+
+
+# -----------------------------
+# Worker : matrices partagées en mmap
+# -----------------------------
+_DATA: dict = {}
+
+
+def _init_worker(cache_dir: str) -> None:
+    for name in ("X_train", "y_train", "X_val", "y_val"):
+        _DATA[name] = np.load(Path(cache_dir) / f"{name}.npy", mmap_mode="r")
+
+
+def _cpu_seconds() -> float:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return ru.ru_utime + ru.ru_stime
+
+
+def _run_trial(trial: dict, n_rows: int, seed: int, threads: int, keep_model: bool) -> dict:
+    from train_credit_risk import evaluate_proba
+
+    t0, c0 = time.perf_counter(), _cpu_seconds()
+    X, y = _DATA["X_train"][:n_rows], _DATA["y_train"][:n_rows]
+    model = make_estimator(trial["family"], trial["params"], seed, threads)
+    if trial["family"] == "xgb":
+        model.fit(X, y, eval_set=[(_DATA["X_val"], _DATA["y_val"])], verbose=False)
+    else:
+        model.fit(X, y)
+    metrics = evaluate_proba(_DATA["y_val"], model.predict_proba(_DATA["X_val"])[:, 1])
+    wall, cpu = time.perf_counter() - t0, _cpu_seconds() - c0
+    return {
+        **trial,
+        "n_rows": n_rows,
+        **metrics,
+        "best_iteration": getattr(model, "best_iteration", None),
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "cpu_util": cpu / wall if wall > 0 else None,
+        "model": model if keep_model else None,
+    }
+
+
+def _score_key(res: dict) -> tuple:
+    return (res["auc"], res["recall_default"])
+
+
+# -----------------------------
+# MLflow (appels groupés)
+# -----------------------------
+def _log_rung(results: list[dict], rung: int) -> None:
+    import mlflow
+    from mlflow.entities import Metric, Param
+
+    run = mlflow.active_run()
+    if run is None:
+        return
+    ts = int(time.time() * 1000)
+    metrics, params = [], []
+    for r in results:
+        for key in ("auc", "recall_default", "wall_s", "cpu_s", "cpu_util"):
+            if r[key] is not None:
+                # Un essai = un step : courbes trial_* comparables dans l'UI MLflow
+                metrics.append(Metric(f"trial_{key}_rung{rung}", float(r[key]), ts, r["id"]))
+        if rung == 0:
+            params.append(Param(f"trial_{r['id']:03d}", json.dumps({"family": r["family"], **r["params"]})))
+    client = mlflow.tracking.MlflowClient()
+    for i in range(0, len(params), _MAX_BATCH_PARAMS):
+        client.log_batch(run.info.run_id, params=params[i : i + _MAX_BATCH_PARAMS])
+    for i in range(0, len(metrics), _MAX_BATCH_METRICS):
+        client.log_batch(run.info.run_id, metrics=metrics[i : i + _MAX_BATCH_METRICS])
+
+
+def run_search(X_train_t: np.ndarray, y_train: np.ndarray, X_val_t: np.ndarray, y_val: np.ndarray, cfg: SearchConfig) -> dict:
+    """
+    Successive halving sur des matrices déjà prétraitées. Renvoie le meilleur essai par famille
+    (modèle ajusté sur toutes les lignes d'entraînement), la liste des essais et les totaux CPU.
+    """
+    trials = build_trials(cfg)
+    n = len(y_train)
+    n_rungs = int(np.ceil(np.log(1 / cfg.min_fraction) / np.log(cfg.eta) - 1e-9)) + 1
+    perm = np.random.default_rng(cfg.seed).permutation(n)
+
+    t_start = time.perf_counter()
+    history = []
+    with tempfile.TemporaryDirectory(prefix="cr_search_") as cache_dir:
+        # Permutation appliquée une fois : chaque palier lit un préfixe contigu (sous-échantillon aléatoire)
+        np.save(Path(cache_dir) / "X_train.npy", np.ascontiguousarray(X_train_t[perm], dtype=np.float32))
+        np.save(Path(cache_dir) / "y_train.npy", y_train[perm])
+        np.save(Path(cache_dir) / "X_val.npy", np.ascontiguousarray(X_val_t, dtype=np.float32))
+        np.save(Path(cache_dir) / "y_val.npy", y_val)
+
+        with ProcessPoolExecutor(cfg.workers, initializer=_init_worker, initargs=(cache_dir,)) as pool:
+            alive = trials
+            for rung in range(n_rungs):
+                last = rung == n_rungs - 1
+                n_rows = n if last else max(int(n * cfg.min_fraction * cfg.eta**rung), 1000)
+                futures = [
+                    pool.submit(_run_trial, t, min(n_rows, n), cfg.seed, cfg.threads_per_trial, last) for t in alive
+                ]
+                results = [f.result() for f in futures]
+                for r in results:
+                    r["rung"] = rung
+                history.extend(results)
+                _log_rung(results, rung)
+                print(
+                    f"rung {rung}: {len(results)} trials on {min(n_rows, n)} rows, "
+                    f"best auc={max(r['auc'] for r in results):.4f}"
+                )
+                if last:
+                    break
+                # Meilleur 1/eta par famille : chaque famille garde au moins un finaliste
+                alive = []
+                for family in {r["family"] for r in results}:
+                    ranked = sorted((r for r in results if r["family"] == family), key=_score_key, reverse=True)
+                    keep = max(1, len(ranked) // cfg.eta)
+                    alive.extend({"id": r["id"], "family": r["family"], "params": r["params"]} for r in ranked[:keep])
+
+    wall = time.perf_counter() - t_start
+    finals = [r for r in history if r["rung"] == n_rungs - 1]
+    best = {}
+    for r in sorted(finals, key=_score_key, reverse=True):
+        best.setdefault(r["family"], r)
+    cpu_total = sum(r["cpu_s"] for r in history)
+    return {
+        "best": best,
+        "trials": [{k: v for k, v in r.items() if k != "model"} for r in history],
+        "summary": {
+            "n_trials": len(trials),
+            "n_fits": len(history),
+            "n_rungs": n_rungs,
+            "workers": cfg.workers,
+            "wall_s": wall,
+            "cpu_s": cpu_total,
+            # Part de la capacité du pool réellement utilisée
+            "cpu_utilisation": cpu_total / (wall * cfg.workers) if wall > 0 else None,
+        },
+    }
+
+
+def config_from_env(seed: int) -> Optional[SearchConfig]:
+    mode = os.getenv("CR_SEARCH", "off")
+    if mode == "off":
+        return None
+    if mode not in ("grid", "random"):
+        raise ValueError(f"CR_SEARCH must be off, grid or random (got {mode!r})")
+    space = DEFAULT_SPACE
+    if os.getenv("CR_SEARCH_SPACE"):
+        space = json.loads(Path(os.environ["CR_SEARCH_SPACE"]).read_text(encoding="utf-8"))
+    return SearchConfig(
+        mode=mode,
+        n_trials=int(os.getenv("CR_SEARCH_TRIALS", "20")),
+        eta=int(os.getenv("CR_SEARCH_ETA", "3")),
+        workers=int(os.getenv("CR_SEARCH_WORKERS", str(os.cpu_count() or 1))),
+        threads_per_trial=int(os.getenv("CR_SEARCH_THREADS", "1")),
+        seed=seed,
+        space=space,
+    )
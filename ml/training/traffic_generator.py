@@ -0,0 +1,268 @@
+"""
+Générateur de trafic synthétique en streaming (tests de charge, capacity planning).
+
+Produit des requêtes au format `DecisionRequest` (client + transaction) par blocs vectorisés de
+taille fixe, en réutilisant les générateurs d'entraînement :
+- population de clients fixe (`n_clients`) tirée une fois par `generate_synthetic_credit_data`,
+  chaque requête référence un client (features cohérentes d'une requête à l'autre) ;
+- transactions tirées bloc par bloc par `generate_synthetic_fraud_data`.
+
+Reproductible : le bloc i est tiré avec SeedSequence([seed, i]), indépendamment des autres blocs,
+donc la sortie ne dépend ni du découpage en shards ni du nombre de process.
+
+Scénarios :
+- baseline    : distributions d'entraînement
+- drift       : dérive progressive (revenus en baisse, endettement et montants en hausse, plus de SANS_EMPLOI)
+- fraud_burst : fenêtres où une fraction des transactions suit un motif de fraude (ALERT)
+
+Usage :
+    python ml/training/traffic_generator.py --n-requests 10000000 --out traffic.ndjson.gz --workers 8
+    python ml/training/traffic_generator.py --scenario fraud_burst --out traffic.parquet
+"""
+import argparse
+import gzip
+import json
+import os
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from train_credit_risk import DataConfig, generate_synthetic_credit_data
+from train_fraud import FraudDataConfig, generate_synthetic_fraud_data
+
+CLIENT_COLS = [
+    "age",
+    "income_annual",
+    "employment_status",
+    "debt_to_income",
+    "credit_history_length_months",
+    "num_open_accounts",
+    "late_payments_12m",
+]
+TX_COLS = ["amount", "merchant_category", "country", "hour", "is_new_device", "distance_from_home_km"]
+SCENARIOS = ("baseline", "drift", "fraud_burst")
+NIGHT_HOURS = np.array([23, 0, 1, 2, 3, 4, 5])
+
+
+@dataclass
+class TrafficConfig:
+    n_requests: int = 1_000_000
+    chunk_size: int = 50_000
+    n_clients: int = 100_000
+    seed: int = 42
+    scenario: str = "baseline"
+    drift_strength: float = 1.0
+    # Fenêtres de burst en fraction du flux [début, fin)
+    burst_windows: list = field(default_factory=lambda: [(0.45, 0.55)])
+    burst_rate: float = 0.3
+    # Débit simulé (req/s) pour horodater les requêtes ; None = pas d'horodatage
+    rate_per_s: Optional[float] = None
+    with_labels: bool = False
+
+
+class TrafficGenerator:
+    def __init__(self, cfg: TrafficConfig):
+        if cfg.scenario not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {cfg.scenario!r}, expected one of {SCENARIOS}")
+        self.cfg = cfg
+        self._clients: Optional[pd.DataFrame] = None
+
+    @property
+    def n_chunks(self) -> int:
+        return -(-self.cfg.n_requests // self.cfg.chunk_size)
+
+    def client_pool(self) -> pd.DataFrame:
+        # Mémoire proportionnelle à n_clients, pas au volume de trafic
+        if self._clients is None:
+            self._clients = generate_synthetic_credit_data(DataConfig(n_samples=self.cfg.n_clients, seed=self.cfg.seed))
+        return self._clients
+
+    def chunk(self, idx: int) -> pd.DataFrame:
+        """Bloc `idx` sous forme de DataFrame plat (une ligne = une requête)."""
+        cfg = self.cfg
+        start = idx * cfg.chunk_size
+        n = min(cfg.chunk_size, cfg.n_requests - start)
+        rng = np.random.default_rng(np.random.SeedSequence([cfg.seed, idx]))
+
+        client_idx = rng.integers(0, cfg.n_clients, size=n)
+        clients = self.client_pool().iloc[client_idx].reset_index(drop=True)
+        tx = generate_synthetic_fraud_data(FraudDataConfig(n_samples=n, seed=int(rng.integers(2**31))))
+
+        seq = start + np.arange(n)
+        df = pd.concat([clients, tx], axis=1)
+        df.insert(0, "client_id", np.char.add("C", np.char.zfill(client_idx.astype(str), 8)))
+        df.insert(0, "seq", seq)
+        if cfg.rate_per_s:
+            df.insert(1, "ts", (seq + rng.random(n)) / cfg.rate_per_s)
+
+        progress = seq / max(cfg.n_requests - 1, 1)
+        if cfg.scenario == "drift":
+            _apply_drift(df, progress, cfg.drift_strength, rng)
+        elif cfg.scenario == "fraud_burst":
+            in_burst = np.zeros(n, dtype=bool)
+            for lo, hi in cfg.burst_windows:
+                in_burst |= (progress >= lo) & (progress < hi)
+            _apply_fraud_burst(df, in_burst & (rng.random(n) < cfg.burst_rate), rng)
+        return df
+
+    def iter_chunks(self, shard: int = 0, num_shards: int = 1) -> Iterator[pd.DataFrame]:
+        for idx in range(shard, self.n_chunks, num_shards):
+            yield self.chunk(idx)
+
+
+def _apply_drift(df: pd.DataFrame, t: np.ndarray, strength: float, rng: np.random.Generator) -> None:
+    s = strength * t
+    df["income_annual"] = np.clip(df["income_annual"] * (1 - 0.35 * s), 12000, 200000).round(2)
+    df["debt_to_income"] = np.clip(df["debt_to_income"] + 0.3 * s, 0.0, 1.5).round(4)
+    df["amount"] = np.clip(df["amount"] * (1 + s), 1, 10000).round(2)
+    unemployed = rng.random(len(df)) < 0.2 * s
+    df.loc[unemployed, "employment_status"] = "SANS_EMPLOI"
+
+
+def _apply_fraud_burst(df: pd.DataFrame, mask: np.ndarray, rng: np.random.Generator) -> None:
+    k = int(mask.sum())
+    if k == 0:
+        return
+    df.loc[mask, "merchant_category"] = "electronics"
+    df.loc[mask, "country"] = "US"
+    df.loc[mask, "is_new_device"] = True
+    df.loc[mask, "hour"] = rng.choice(NIGHT_HOURS, size=k)
+    df.loc[mask, "amount"] = rng.uniform(800, 4000, size=k).round(2)
+    df.loc[mask, "distance_from_home_km"] = rng.uniform(300, 2000, size=k).round(3)
+    df.loc[mask, "is_fraud"] = 1
+
+
+def to_records(df: pd.DataFrame, with_labels: bool = False) -> list[dict]:
+    """Bloc plat -> liste de dicts DecisionRequest (+ seq / ts / labels optionnels)."""
+    clients = df[["client_id"] + CLIENT_COLS].to_dict("records")
+    txs = df[TX_COLS].to_dict("records")
+    meta_cols = [c for c in ("seq", "ts") if c in df.columns]
+    metas = df[meta_cols].to_dict("records")
+    labels = df[["default_flag", "is_fraud"]].to_dict("records") if with_labels else None
+
+    records = []
+    for i, (c, t, m) in enumerate(zip(clients, txs, metas)):
+        rec = {**m, "client": c, "transaction": t}
+        if labels is not None:
+            rec["labels"] = labels[i]
+        records.append(rec)
+    return records
+
+
+# -----------------------------
+# Writers (mémoire constante : un bloc à la fois)
+# -----------------------------
+def write_ndjson(gen: TrafficGenerator, path: Path, shard: int = 0, num_shards: int = 1) -> int:
+    opener = gzip.open if path.suffix == ".gz" else open
+    n = 0
+    with opener(path, "wt", encoding="utf-8") as f:
+        for df in gen.iter_chunks(shard, num_shards):
+            f.write("\n".join(json.dumps(r, separators=(",", ":")) for r in to_records(df, gen.cfg.with_labels)))
+            f.write("\n")
+            n += len(df)
+    return n
+
+
+def _struct(pa, df: pd.DataFrame, cols: list):
+    return pa.StructArray.from_arrays([pa.array(df[c].to_numpy()) for c in cols], names=cols)
+
+
+def write_parquet(gen: TrafficGenerator, path: Path, shard: int = 0, num_shards: int = 1) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    n = 0
+    try:
+        for df in gen.iter_chunks(shard, num_shards):
+            cols = {c: pa.array(df[c].to_numpy()) for c in ("seq", "ts") if c in df.columns}
+            cols["client"] = _struct(pa, df, ["client_id"] + CLIENT_COLS)
+            cols["transaction"] = _struct(pa, df, TX_COLS)
+            if gen.cfg.with_labels:
+                cols["labels"] = _struct(pa, df, ["default_flag", "is_fraud"])
+            table = pa.table(cols)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+            writer.write_table(table)
+            n += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
+
+
+def shard_path(out: Path, shard: int, num_shards: int) -> Path:
+    if num_shards == 1:
+        return out
+    suffixes = "".join(out.suffixes)
+    return out.with_name(f"{out.name[: -len(suffixes)] if suffixes else out.name}.part-{shard:04d}{suffixes}")
+
+
+def generate_shard(cfg: TrafficConfig, out: Path, shard: int, num_shards: int) -> tuple[Path, int]:
+    gen = TrafficGenerator(cfg)
+    path = shard_path(out, shard, num_shards)
+    writer = write_parquet if ".parquet" in out.suffixes else write_ndjson
+    return path, writer(gen, path, shard, num_shards)
+
+
+def _generate_shard_star(args) -> tuple[Path, int]:
+    return generate_shard(*args)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Streaming synthetic DecisionRequest traffic generator")
+    p.add_argument("--n-requests", type=int, default=1_000_000)
+    p.add_argument("--chunk-size", type=int, default=50_000)
+    p.add_argument("--n-clients", type=int, default=100_000)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--scenario", choices=SCENARIOS, default="baseline")
+    p.add_argument("--drift-strength", type=float, default=1.0)
+    p.add_argument("--burst-window", action="append", help="start:end as stream fractions, e.g. 0.45:0.55 (repeatable)")
+    p.add_argument("--burst-rate", type=float, default=0.3)
+    p.add_argument("--rate", type=float, help="Simulated arrival rate (req/s) used to add a `ts` field")
+    p.add_argument("--with-labels", action="store_true")
+    p.add_argument("--shard", type=int, help="Only generate this shard (multi-machine runs)")
+    p.add_argument("--num-shards", type=int, default=1)
+    p.add_argument("--workers", type=int, default=1, help="Local processes (one shard each when --shard is unset)")
+    p.add_argument("--out", required=True, help=".ndjson, .ndjson.gz or .parquet")
+    args = p.parse_args(argv)
+
+    cfg = TrafficConfig(
+        n_requests=args.n_requests,
+        chunk_size=args.chunk_size,
+        n_clients=args.n_clients,
+        seed=args.seed,
+        scenario=args.scenario,
+        drift_strength=args.drift_strength,
+        burst_rate=args.burst_rate,
+        rate_per_s=args.rate,
+        with_labels=args.with_labels,
+    )
+    if args.burst_window:
+        cfg.burst_windows = [tuple(float(x) for x in w.split(":")) for w in args.burst_window]
+
+    out = Path(args.out)
+    if args.shard is not None:
+        jobs = [(cfg, out, args.shard, args.num_shards)]
+    else:
+        num_shards = max(args.num_shards, args.workers)
+        jobs = [(cfg, out, s, num_shards) for s in range(num_shards)]
+
+    workers = min(args.workers, len(jobs))
+    if workers > 1:
+        with Pool(workers) as pool:
+            done = pool.map(_generate_shard_star, jobs)
+    else:
+        done = [generate_shard(*job) for job in jobs]
+
+    for path, n in done:
+        print(f"✅ {n} requests -> {path}")
+    print(f"Total: {sum(n for _, n in done)} requests (scenario={cfg.scenario}, seed={cfg.seed}, pid={os.getpid()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import json
 import os
+import time
 from dataclasses import asdict, dataclass
 from pathlib import Path
 
@@ -9,12 +10,18 @@ import mlflow.sklearn
 import numpy as np
 import pandas as pd
 from sklearn.compose import ColumnTransformer
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.metrics import roc_auc_score, recall_score
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 
+from artifact_cache import ArtifactCache, code_version
+from artifact_versions import VERSIONS_DIR, new_version_name, publish_version
+from chunked_data import Reservoir, StreamingMoments, dataset_parts, iter_dataset, peak_rss_mb, write_chunked_dataset
+from drift_reference import build_reference_profile, save_reference_profile
+from hparam_search import SearchConfig, config_from_env, run_search
+
 try:
     from xgboost import XGBClassifier
 except Exception as e:
@@ -56,7 +63,7 @@ def generate_synthetic_credit_data(cfg: DataConfig) -> pd.DataFrame:
 
     # debt_to_income : plus élevé pour revenus faibles / emploi instable
     base_dti = rng.beta(a=2.0, b=5.0, size=cfg.n_samples)  # mostly < 0.5
-    emp_risk = np.array([1.0 if s in ("SANS_EMPLOI", "ETUDIANT") else 0.0 for s in employment_status])
+    emp_risk = np.isin(employment_status, ["SANS_EMPLOI", "ETUDIANT"]).astype(float)
     dti = base_dti + 0.15 * emp_risk + 0.05 * (income_annual < 25000)
     debt_to_income = np.clip(dti, 0.0, 1.5)
 
@@ -140,9 +147,23 @@ def build_preprocessor() -> ColumnTransformer:
     )
 
 
+def fit_preprocessor(cache: ArtifactCache, data_key: str, X: pd.DataFrame, split: dict) -> ColumnTransformer:
+    # Préprocesseur ajusté réutilisé tant que données, split et spécification sont inchangés
+    key = cache.key(
+        "preprocessor",
+        dataset=data_key,
+        split=split,
+        spec=code_version(build_preprocessor, NUM_COLS, CAT_COLS),
+    )
+    return cache.get_or_compute(key, lambda: build_preprocessor().fit(X))
+
+
 def evaluate_model(model: Pipeline, X_test: pd.DataFrame, y_test: np.ndarray) -> dict:
     # Predict proba for AUC
-    proba = model.predict_proba(X_test)[:, 1]
+    return evaluate_proba(y_test, model.predict_proba(X_test)[:, 1])
+
+
+def evaluate_proba(y_test: np.ndarray, proba: np.ndarray) -> dict:
     auc = roc_auc_score(y_test, proba)
 
     # Seuil de décision pour le rappel (classe défaut=1)
@@ -153,6 +174,136 @@ def evaluate_model(model: Pipeline, X_test: pd.DataFrame, y_test: np.ndarray) ->
     return {"auc": float(auc), "recall_default": float(recall)}
 
 
+def train_chunked(cfg: DataConfig, data_dir: Path, *, chunk_size: int, epochs: int = 3, reservoir_size: int = 200_000) -> dict:
+    """
+    Entraînement out-of-core : données générées bloc par bloc en Parquet, StandardScaler ajusté par
+    statistiques en streaming, régression logistique incrémentale (SGDClassifier.partial_fit).
+    Mémoire bornée par chunk_size + reservoir_size, quel que soit n_samples.
+    """
+    features = NUM_COLS + CAT_COLS
+    timings = {}
+
+    t = time.perf_counter()
+    write_chunked_dataset(
+        lambda n, seed: generate_synthetic_credit_data(DataConfig(n_samples=n, seed=seed)),
+        data_dir,
+        n_samples=cfg.n_samples,
+        chunk_size=chunk_size,
+        meta={"generator": "credit_risk", **asdict(cfg)},
+    )
+    timings["generate_s"] = time.perf_counter() - t
+
+    # Passe 1 : moyennes/variances, catégories, effectifs par classe, échantillon (encodeurs + profil de drift)
+    t = time.perf_counter()
+    moments = StreamingMoments(NUM_COLS)
+    categories = {c: set() for c in CAT_COLS}
+    reservoir = Reservoir(reservoir_size, seed=cfg.seed)
+    class_counts = np.zeros(2, dtype=np.int64)
+    for _, df, test in iter_dataset(data_dir, test_size=0.2, seed=cfg.seed):
+        train = df[~test]
+        moments.update(train)
+        for c in CAT_COLS:
+            categories[c].update(train[c].unique())
+        reservoir.update(train[features])
+        class_counts += np.bincount(train[TARGET], minlength=2)
+    n_parts = len(dataset_parts(data_dir))
+
+    preprocessor = build_preprocessor()
+    preprocessor.set_params(cat__onehot__categories=[sorted(categories[c]) for c in CAT_COLS])
+    preprocessor.fit(reservoir.frame)
+    moments.apply_to_scaler(preprocessor.named_transformers_["num"].named_steps["scaler"])
+    timings["stats_s"] = time.perf_counter() - t
+
+    # Passe 2 : époques de partial_fit, ordre des blocs permuté à chaque époque
+    t = time.perf_counter()
+    n_train = int(class_counts.sum())
+    clf = SGDClassifier(
+        loss="log_loss",
+        alpha=1e-4,
+        # Équivalent de class_weight="balanced" (non supporté par partial_fit)
+        class_weight={k: n_train / (2 * int(class_counts[k])) for k in (0, 1)},
+        random_state=cfg.seed,
+    )
+    rng = np.random.default_rng(cfg.seed)
+    for _epoch in range(epochs):
+        for _, df, test in iter_dataset(data_dir, test_size=0.2, seed=cfg.seed, order=rng.permutation(n_parts)):
+            train = df[~test]
+            clf.partial_fit(preprocessor.transform(train[features]), train[TARGET].to_numpy(), classes=np.array([0, 1]))
+    model = Pipeline(steps=[("preprocess", preprocessor), ("model", clf)])
+    timings["train_s"] = time.perf_counter() - t
+
+    # Passe 3 : évaluation sur le split test (scores float32 uniquement)
+    t = time.perf_counter()
+    probas, labels = [], []
+    for _, df, test in iter_dataset(data_dir, test_size=0.2, seed=cfg.seed):
+        held = df[test]
+        probas.append(model.predict_proba(held[features])[:, 1].astype(np.float32))
+        labels.append(held[TARGET].to_numpy(dtype=np.int8))
+    y_test = np.concatenate(labels)
+    metrics = evaluate_proba(y_test, np.concatenate(probas))
+    timings["eval_s"] = time.perf_counter() - t
+
+    return {
+        "model": model,
+        "metrics": metrics,
+        "reference_sample": reservoir.frame,
+        "default_rate": float(class_counts[1] / n_train),
+        "n_chunks": n_parts,
+        "n_train": n_train,
+        "n_test": int(len(y_test)),
+        "timings": timings,
+    }
+
+
+def search_models(
+    X_train: pd.DataFrame,
+    y_train: np.ndarray,
+    X_test: pd.DataFrame,
+    y_test: np.ndarray,
+    search_cfg: SearchConfig,
+    *,
+    cache: ArtifactCache,
+    data_key: str,
+) -> dict:
+    """
+    Recherche parallèle (hparam_search) : préprocesseur ajusté une seule fois sur le train, sélection
+    sur un split de validation, puis meilleur modèle de chaque famille évalué sur le test.
+    Renvoie {famille: (pipeline, métriques test)}.
+    """
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=0.2, random_state=search_cfg.seed, stratify=y_train
+    )
+    preprocessor = fit_preprocessor(cache, data_key, X_fit, {"test_size": 0.2, "validation": 0.2, "seed": search_cfg.seed})
+    res = run_search(preprocessor.transform(X_fit), y_fit, preprocessor.transform(X_val), y_val, search_cfg)
+
+    summary = res["summary"]
+    mlflow.log_params({
+        "search_mode": search_cfg.mode,
+        "search_trials": summary["n_trials"],
+        "search_workers": summary["workers"],
+        "search_eta": search_cfg.eta,
+    })
+    mlflow.log_metrics({
+        "search_wall_s": summary["wall_s"],
+        "search_cpu_s": summary["cpu_s"],
+        "search_cpu_utilisation": summary["cpu_utilisation"] or 0.0,
+    })
+    mlflow.log_dict({"summary": summary, "trials": res["trials"]}, "search/trials.json")
+
+    found = {}
+    for family, best in res["best"].items():
+        model = Pipeline(steps=[("preprocess", preprocessor), ("model", best["model"])])
+        metrics = evaluate_model(model, X_test, y_test)
+        mlflow.log_params({f"{family}_best_params": json.dumps(best["params"])})
+        mlflow.log_metrics({f"{family}_auc": metrics["auc"], f"{family}_recall_default": metrics["recall_default"]})
+        found[family] = (model, metrics)
+    print(
+        f"Search: {summary['n_trials']} configs, {summary['n_fits']} fits in {summary['wall_s']:.1f}s "
+        f"(CPU utilisation {summary['cpu_utilisation']:.0%} of {summary['workers']} workers)"
+    )
+    return found
+
+
 def setup_mlflow() -> None:
     tracking_uri = os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5001")
     mlflow.set_tracking_uri(tracking_uri)
@@ -178,12 +329,17 @@ def setup_mlflow() -> None:
 
 
 def main():
+    # Chemin out-of-core si CR_CHUNK_SIZE > 0 (gros volumes)
+    if int(os.getenv("CR_CHUNK_SIZE", "0")) > 0:
+        return main_chunked()
+
     # Output paths
     root = Path(__file__).resolve().parents[1]  # ml/
     out_dir = root / "artifacts" / "credit_risk"
     out_dir.mkdir(parents=True, exist_ok=True)
     
     setup_mlflow()
+    t_start = time.perf_counter()
 
     with mlflow.start_run(run_name="credit_risk_training") as run:
         # 1) Generate data
@@ -191,7 +347,14 @@ def main():
             n_samples=int(os.getenv("CR_N_SAMPLES", "50000")),
             seed=int(os.getenv("CR_SEED", "42")),
         )
-        df = generate_synthetic_credit_data(cfg)
+        cache = ArtifactCache.from_env()
+        data_key = cache.key(
+            "dataset",
+            generator="credit_risk",
+            config=asdict(cfg),
+            code=code_version(generate_synthetic_credit_data, sigmoid, EMPLOYMENT_STATUSES),
+        )
+        df = cache.get_or_compute(data_key, lambda: generate_synthetic_credit_data(cfg), fmt="frame")
         default_rate = float(df[TARGET].mean())
 
         X = df.drop(columns=[TARGET])
@@ -201,8 +364,6 @@ def main():
             X, y, test_size=0.2, random_state=cfg.seed, stratify=y
         )
 
-        preprocessor = build_preprocessor()
-
         # Log config / data stats
         mlflow.log_params({
             "n_samples": cfg.n_samples,
@@ -211,45 +372,58 @@ def main():
         })
         mlflow.log_metrics({"default_rate": default_rate})
 
-        # 2) Baseline: Logistic Regression
-        logreg = LogisticRegression(
-            max_iter=2000,
-            class_weight="balanced",
-            solver="lbfgs",
-        )
-        model_logreg = Pipeline(steps=[("preprocess", preprocessor), ("model", logreg)])
-        model_logreg.fit(X_train, y_train)
-        metrics_logreg = evaluate_model(model_logreg, X_test, y_test)
-        mlflow.log_metrics({
-            "logreg_auc": metrics_logreg["auc"],
-            "logreg_recall_default": metrics_logreg["recall_default"],
-        })
-
-        # 3) Challenger: XGBoost
-        metrics_xgb = None
-        model_xgb = None
-        if XGBClassifier is not None:
-            xgb = XGBClassifier(
-                n_estimators=400,
-                max_depth=4,
-                learning_rate=0.05,
-                subsample=0.9,
-                colsample_bytree=0.9,
-                reg_lambda=1.0,
-                random_state=cfg.seed,
-                eval_metric="logloss",
-                n_jobs=4,
+        search_cfg = config_from_env(cfg.seed)
+        if search_cfg is not None:
+            # 2-3) Recherche parallèle d'hyper-paramètres à la place des configurations fixes
+            found = search_models(X_train, y_train, X_test, y_test, search_cfg, cache=cache, data_key=data_key)
+            model_logreg, metrics_logreg = found.get("logreg", (None, None))
+            model_xgb, metrics_xgb = found.get("xgb", (None, None))
+        else:
+            # Préprocesseur ajusté une fois (ou lu en cache), partagé par les deux modèles
+            preprocessor = fit_preprocessor(cache, data_key, X_train, {"test_size": 0.2, "seed": cfg.seed})
+            Xt_train = preprocessor.transform(X_train)
+
+            # 2) Baseline: Logistic Regression
+            logreg = LogisticRegression(
+                max_iter=2000,
+                class_weight="balanced",
+                solver="lbfgs",
             )
-            model_xgb = Pipeline(steps=[("preprocess", preprocessor), ("model", xgb)])
-            model_xgb.fit(X_train, y_train)
-            metrics_xgb = evaluate_model(model_xgb, X_test, y_test)
+            logreg.fit(Xt_train, y_train)
+            model_logreg = Pipeline(steps=[("preprocess", preprocessor), ("model", logreg)])
+            metrics_logreg = evaluate_model(model_logreg, X_test, y_test)
             mlflow.log_metrics({
-                "xgb_auc": metrics_xgb["auc"],
-                "xgb_recall_default": metrics_xgb["recall_default"],
+                "logreg_auc": metrics_logreg["auc"],
+                "logreg_recall_default": metrics_logreg["recall_default"],
             })
 
+            # 3) Challenger: XGBoost
+            metrics_xgb = None
+            model_xgb = None
+            if XGBClassifier is not None:
+                xgb = XGBClassifier(
+                    n_estimators=400,
+                    max_depth=4,
+                    learning_rate=0.05,
+                    subsample=0.9,
+                    colsample_bytree=0.9,
+                    reg_lambda=1.0,
+                    random_state=cfg.seed,
+                    eval_metric="logloss",
+                    n_jobs=4,
+                )
+                xgb.fit(Xt_train, y_train)
+                model_xgb = Pipeline(steps=[("preprocess", preprocessor), ("model", xgb)])
+                metrics_xgb = evaluate_model(model_xgb, X_test, y_test)
+                mlflow.log_metrics({
+                    "xgb_auc": metrics_xgb["auc"],
+                    "xgb_recall_default": metrics_xgb["recall_default"],
+                })
+
+        cache.log_to_mlflow()
+
         # 4) Select best model
-        candidates = [("logreg", model_logreg, metrics_logreg)]
+        candidates = [("logreg", model_logreg, metrics_logreg)] if model_logreg is not None else []
         if model_xgb is not None and metrics_xgb is not None:
             candidates.append(("xgb", model_xgb, metrics_xgb))
 
@@ -265,22 +439,117 @@ def main():
             "best_recall_default": best_metrics["recall_default"],
         })
 
-        # 5) Save local artifacts
-        model_path = out_dir / "model.joblib"
-        joblib.dump(best_model, model_path)
+        save_artifacts(
+            out_dir,
+            run,
+            best_name=best_name,
+            best_model=best_model,
+            metrics={
+                "best_model": best_name,
+                "best_metrics": best_metrics,
+                "logreg_metrics": metrics_logreg,
+                "xgb_metrics": metrics_xgb,
+                "default_rate": default_rate,
+                "data_config": asdict(cfg),
+                "cache": cache.summary(),
+            },
+            X_reference=X_train,
+            t_start=t_start,
+        )
+
+
+def main_chunked():
+    root = Path(__file__).resolve().parents[1]  # ml/
+    out_dir = root / "artifacts" / "credit_risk"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    setup_mlflow()
+    t_start = time.perf_counter()
+
+    with mlflow.start_run(run_name="credit_risk_training_chunked") as run:
+        cfg = DataConfig(
+            n_samples=int(os.getenv("CR_N_SAMPLES", "50000")),
+            seed=int(os.getenv("CR_SEED", "42")),
+        )
+        chunk_size = int(os.getenv("CR_CHUNK_SIZE"))
+        epochs = int(os.getenv("CR_EPOCHS", "3"))
+        data_dir = Path(os.getenv("CR_DATA_DIR", str(root / "data" / "credit_risk")))
+
+        mlflow.log_params({
+            "n_samples": cfg.n_samples,
+            "seed": cfg.seed,
+            "threshold": 0.5,
+            "chunk_size": chunk_size,
+            "epochs": epochs,
+            "learner": "sgd_partial_fit",
+        })
+
+        res = train_chunked(cfg, data_dir, chunk_size=chunk_size, epochs=epochs)
+        best_metrics = res["metrics"]
+        mlflow.log_params({"best_model": "sgd", "n_chunks": res["n_chunks"]})
+        mlflow.log_metrics({
+            "default_rate": res["default_rate"],
+            "sgd_auc": best_metrics["auc"],
+            "sgd_recall_default": best_metrics["recall_default"],
+            "best_auc": best_metrics["auc"],
+            "best_recall_default": best_metrics["recall_default"],
+            **{f"wall_{k}": v for k, v in res["timings"].items()},
+        })
+
+        save_artifacts(
+            out_dir,
+            run,
+            best_name="sgd",
+            best_model=res["model"],
+            metrics={
+                "best_model": "sgd",
+                "best_metrics": best_metrics,
+                "sgd_metrics": best_metrics,
+                "default_rate": res["default_rate"],
+                "data_config": asdict(cfg),
+                "chunked": {
+                    "chunk_size": chunk_size,
+                    "epochs": epochs,
+                    "n_chunks": res["n_chunks"],
+                    "n_train": res["n_train"],
+                    "n_test": res["n_test"],
+                    "data_dir": str(data_dir),
+                    "timings": res["timings"],
+                },
+            },
+            X_reference=res["reference_sample"],
+            t_start=t_start,
+        )
+
+
+def save_artifacts(
+    root: Path,
+    run,
+    *,
+    best_name: str,
+    best_model: Pipeline,
+    metrics: dict,
+    X_reference: pd.DataFrame,
+    t_start: float,
+) -> None:
+    # Ressources (pic mémoire du process, durée totale) : comparables entre chemin en mémoire et par blocs
+    resources = {"peak_rss_mb": peak_rss_mb(), "wall_total_s": time.perf_counter() - t_start}
+    mlflow.log_metrics(resources)
+
+    # 5) Save local artifacts : nouvelle version publiée puis activée (pointeur `current`)
+    version = new_version_name(run.info.run_id)
+    with publish_version(root, version) as out_dir:
+        joblib.dump(best_model, out_dir / "model.joblib")
 
         metrics = {
-            "best_model": best_name,
-            "best_metrics": best_metrics,
-            "logreg_metrics": metrics_logreg,
-            "xgb_metrics": metrics_xgb,
-            "default_rate": default_rate,
-            "data_config": asdict(cfg),
+            **metrics,
             "features_numeric": NUM_COLS,
             "features_categorical": CAT_COLS,
             "target": TARGET,
             "threshold": 0.5,
+            "resources": resources,
             "mlflow_run_id": run.info.run_id,
+            "version": version,
         }
         with open(out_dir / "metrics.json", "w", encoding="utf-8") as f:
             json.dump(metrics, f, indent=2, ensure_ascii=False)
@@ -292,9 +561,14 @@ def main():
         with open(out_dir / "schema.json", "w", encoding="utf-8") as f:
             json.dump(schema, f, indent=2, ensure_ascii=False)
 
+        # Profil de référence pour le monitoring de drift (API)
+        reference = build_reference_profile(X_reference, NUM_COLS, {"employment_status": EMPLOYMENT_STATUSES})
+        reference_path = save_reference_profile(reference, out_dir)
+
         # 6) Log artifacts to MLflow
         mlflow.log_artifact(str(out_dir / "metrics.json"))
         mlflow.log_artifact(str(out_dir / "schema.json"))
+        mlflow.log_artifact(str(reference_path))
 
         # Log model artifact (simple)
         mlflow.sklearn.log_model(
@@ -302,11 +576,12 @@ def main():
             artifact_path="model",
         )
 
-        print("✅ Training done")
-        print(f"MLflow run_id: {run.info.run_id}")
-        print(f"Best model: {best_name}")
-        print(f"Saved local: {model_path}")
-        print("Metrics:", best_metrics)
+    print("✅ Training done")
+    print(f"MLflow run_id: {run.info.run_id}")
+    print(f"Best model: {best_name}")
+    print(f"Saved local: {root / VERSIONS_DIR / version} (current)")
+    print("Metrics:", metrics["best_metrics"])
+    print(f"Peak RSS: {resources['peak_rss_mb']:.0f} MB, wall: {resources['wall_total_s']:.1f}s")
 
 
 if __name__ == "__main__":
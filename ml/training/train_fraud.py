@@ -1,7 +1,9 @@
 import json
 import os
+import time
 from dataclasses import asdict, dataclass
 from pathlib import Path
+from typing import Optional
 
 import joblib
 import numpy as np
@@ -13,6 +15,11 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.ensemble import IsolationForest
 
+from artifact_cache import ArtifactCache, code_version
+from artifact_versions import VERSIONS_DIR, new_version_name, publish_version
+from chunked_data import Reservoir, StreamingMoments, iter_dataset, peak_rss_mb, write_chunked_dataset
+from drift_reference import build_reference_profile, save_reference_profile
+
 
 # -----------------------------
 # 1) Générateur de fraudes synthétiques
@@ -47,6 +54,19 @@ def generate_synthetic_fraud_data(cfg: FraudDataConfig) -> pd.DataFrame:
     distance_from_home_km = rng.gamma(shape=2.0, scale=12.0, size=cfg.n_samples)  # mostly small distances
     distance_from_home_km = np.clip(distance_from_home_km, 0, 2000)
 
+    # Vélocité du client avant la transaction (mêmes noms que api/app/services/velocity.py) :
+    # fenêtres imbriquées 10 min ⊂ 1 h ⊂ 24 h, montants au niveau habituel du client
+    tx_count_10m = rng.poisson(0.15, size=cfg.n_samples)
+    tx_count_1h = tx_count_10m + rng.poisson(0.5, size=cfg.n_samples)
+    tx_count_24h = tx_count_1h + rng.poisson(2.5, size=cfg.n_samples)
+    typical_amount = rng.lognormal(mean=4.0, sigma=0.6, size=cfg.n_samples)
+    extra_countries = rng.binomial(tx_count_24h, 0.03)
+    velocity = {}
+    for w, count in (("10m", tx_count_10m), ("1h", tx_count_1h), ("24h", tx_count_24h)):
+        velocity[f"tx_count_{w}"] = count.astype(float)
+        velocity[f"amount_sum_{w}"] = (count * typical_amount).round(2)
+        velocity[f"distinct_countries_{w}"] = np.minimum(count, (count > 0) + np.minimum(extra_countries, count)).astype(float)
+
     # Modèle de probabilité de fraude (synthétique) :
     night = ((hour >= 23) | (hour <= 5)).astype(float)
     high_amount = (amount > 800).astype(float)
@@ -65,6 +85,9 @@ def generate_synthetic_fraud_data(cfg: FraudDataConfig) -> pd.DataFrame:
         + 1.0 * is_new_device.astype(float)
         + 0.9 * risky_country
         + 2.0 * combo
+        # rafale de transactions (test de carte) et pays multiples
+        + 1.5 * (tx_count_10m >= 2)
+        + 1.0 * (velocity["distinct_countries_24h"] >= 2)
     )
 
     p = sigmoid(logit)
@@ -86,6 +109,7 @@ def generate_synthetic_fraud_data(cfg: FraudDataConfig) -> pd.DataFrame:
             "hour": hour,
             "is_new_device": is_new_device,
             "distance_from_home_km": distance_from_home_km.round(3),
+            **velocity,
             "is_fraud": is_fraud,
         }
     )
@@ -95,7 +119,11 @@ def generate_synthetic_fraud_data(cfg: FraudDataConfig) -> pd.DataFrame:
 # -----------------------------
 # 2) Training
 # -----------------------------
-NUM_COLS = ["amount", "hour", "distance_from_home_km"]
+TX_NUM_COLS = ["amount", "hour", "distance_from_home_km"]
+VELOCITY_COLS = [
+    f"{name}_{w}" for w in ("10m", "1h", "24h") for name in ("tx_count", "amount_sum", "distinct_countries")
+]
+NUM_COLS = TX_NUM_COLS + VELOCITY_COLS
 CAT_COLS = ["merchant_category", "country"]
 BOOL_COLS = ["is_new_device"]
 TARGET = "is_fraud"
@@ -115,17 +143,138 @@ def build_preprocessor() -> ColumnTransformer:
     )
 
 
+def _config_from_env() -> FraudDataConfig:
+    return FraudDataConfig(
+        n_samples=int(os.getenv("FR_N_SAMPLES", "80000")),
+        fraud_rate=float(os.getenv("FR_FRAUD_RATE", "0.03")),
+        seed=int(os.getenv("FR_SEED", "42")),
+    )
+
+
+def _build_model(cfg: FraudDataConfig, preprocessor: Optional[ColumnTransformer] = None) -> Pipeline:
+    iso = IsolationForest(
+        n_estimators=300,
+        contamination=cfg.fraud_rate,  # expected anomaly proportion
+        random_state=cfg.seed,
+        n_jobs=4,
+    )
+    return Pipeline(steps=[("preprocess", preprocessor or build_preprocessor()), ("model", iso)])
+
+
+def fit_preprocessor(cache: ArtifactCache, data_key: str, X: pd.DataFrame, split: dict) -> ColumnTransformer:
+    # Préprocesseur ajusté réutilisé tant que données, split et spécification sont inchangés
+    key = cache.key(
+        "preprocessor",
+        dataset=data_key,
+        split=split,
+        spec=code_version(build_preprocessor, NUM_COLS, CAT_COLS, BOOL_COLS),
+    )
+    return cache.get_or_compute(key, lambda: build_preprocessor().fit(X))
+
+
+def train_chunked(cfg: FraudDataConfig, data_dir: Path, *, chunk_size: int, reservoir_size: int = 200_000) -> dict:
+    """
+    Entraînement out-of-core. IsolationForest n'a pas de partial_fit mais ne voit de toute façon que
+    `max_samples` (256) lignes par arbre : il est ajusté sur un échantillon uniforme (réservoir) des
+    transactions normales, tandis que le StandardScaler reçoit les statistiques du flux complet.
+    """
+    features = NUM_COLS + CAT_COLS + BOOL_COLS
+    timings = {}
+
+    t = time.perf_counter()
+    write_chunked_dataset(
+        lambda n, seed: generate_synthetic_fraud_data(FraudDataConfig(n_samples=n, fraud_rate=cfg.fraud_rate, seed=seed)),
+        data_dir,
+        n_samples=cfg.n_samples,
+        chunk_size=chunk_size,
+        meta={"generator": "fraud", **asdict(cfg)},
+    )
+    timings["generate_s"] = time.perf_counter() - t
+
+    # Passe 1 : statistiques des transactions normales (train), réservoirs normal / tout le trafic (drift)
+    t = time.perf_counter()
+    moments = StreamingMoments(NUM_COLS)
+    normal_sample = Reservoir(reservoir_size, seed=cfg.seed)
+    reference_sample = Reservoir(reservoir_size, seed=cfg.seed + 1)
+    n_train, n_fraud = 0, 0
+    for _, df, test in iter_dataset(data_dir, test_size=0.2, seed=cfg.seed):
+        train = df[~test]
+        normal = train[train[TARGET] == 0]
+        moments.update(normal)
+        normal_sample.update(normal[features])
+        reference_sample.update(train[features])
+        n_train += len(train)
+        n_fraud += int(train[TARGET].sum())
+    timings["stats_s"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    model = _build_model(cfg)
+    preprocessor = model.named_steps["preprocess"].fit(normal_sample.frame)
+    # Statistiques du flux complet appliquées avant l'ajustement de la forêt
+    moments.apply_to_scaler(preprocessor.named_transformers_["num"].named_steps["scaler"])
+    model.named_steps["model"].fit(preprocessor.transform(normal_sample.frame))
+    timings["train_s"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    scores, labels = [], []
+    for _, df, test in iter_dataset(data_dir, test_size=0.2, seed=cfg.seed):
+        held = df[test]
+        scores.append(-model.decision_function(held[features]).astype(np.float32))
+        labels.append(held[TARGET].to_numpy(dtype=np.int8))
+    anomaly_score = np.concatenate(scores)
+    y_test = np.concatenate(labels)
+    timings["eval_s"] = time.perf_counter() - t
+
+    return {
+        "model": model,
+        "anomaly_score": anomaly_score,
+        "y_test": y_test,
+        "reference_sample": reference_sample.frame,
+        "fraud_rate": (n_fraud + int(y_test.sum())) / (n_train + len(y_test)),
+        "n_train": n_train,
+        "n_test": int(len(y_test)),
+        "timings": timings,
+    }
+
+
 def main():
     root = Path(__file__).resolve().parents[1]  # ml/
     out_dir = root / "artifacts" / "fraud"
     out_dir.mkdir(parents=True, exist_ok=True)
-
-    cfg = FraudDataConfig(
-        n_samples=int(os.getenv("FR_N_SAMPLES", "80000")),
-        fraud_rate=float(os.getenv("FR_FRAUD_RATE", "0.03")),
-        seed=int(os.getenv("FR_SEED", "42")),
+    t_start = time.perf_counter()
+
+    cfg = _config_from_env()
+    chunk_size = int(os.getenv("FR_CHUNK_SIZE", "0"))
+    if chunk_size > 0:
+        # Chemin out-of-core (gros volumes)
+        data_dir = Path(os.getenv("FR_DATA_DIR", str(root / "data" / "fraud")))
+        res = train_chunked(cfg, data_dir, chunk_size=chunk_size)
+        return save_artifacts(
+            out_dir,
+            cfg,
+            model=res["model"],
+            anomaly_score=res["anomaly_score"],
+            y_test=res["y_test"],
+            fraud_rate=res["fraud_rate"],
+            X_reference=res["reference_sample"],
+            t_start=t_start,
+            extra={"chunked": {
+                "chunk_size": chunk_size,
+                "n_train": res["n_train"],
+                "n_test": res["n_test"],
+                "data_dir": str(data_dir),
+                "timings": res["timings"],
+            }},
+        )
+
+    cache = ArtifactCache.from_env()
+    data_key = cache.key(
+        "dataset",
+        generator="fraud",
+        config=asdict(cfg),
+        code=code_version(generate_synthetic_fraud_data, sigmoid, MERCHANT_CATS, COUNTRIES),
     )
-    df = generate_synthetic_fraud_data(cfg)
+    df = cache.get_or_compute(data_key, lambda: generate_synthetic_fraud_data(cfg), fmt="frame")
 
     X = df.drop(columns=[TARGET])
     y = df[TARGET].to_numpy()
@@ -135,26 +284,43 @@ def main():
         X, y, test_size=0.2, random_state=cfg.seed, stratify=y
     )
 
-    preprocessor = build_preprocessor()
-
     # IsolationForest est non supervisé : on entraîne sur des données "principalement normales"
     # Pour le MVP : filtrer la fraude dans le jeu d'entraînement pour simuler un scénario réel
     X_train_normal = X_train[y_train == 0]
 
-    iso = IsolationForest(
-        n_estimators=300,
-        contamination=cfg.fraud_rate,  # expected anomaly proportion
-        random_state=cfg.seed,
-        n_jobs=4,
+    preprocessor = fit_preprocessor(cache, data_key, X_train_normal, {"test_size": 0.2, "seed": cfg.seed, "subset": "normal"})
+    model = _build_model(cfg, preprocessor)
+    model.named_steps["model"].fit(preprocessor.transform(X_train_normal))
+
+    # Scores : IsolationForest donne un score d'anomalie via decision_function (plus haut = plus normal)
+    normal_score = model.decision_function(X_test)  # plus haut signifie normal
+    save_artifacts(
+        out_dir,
+        cfg,
+        model=model,
+        anomaly_score=-normal_score,
+        y_test=y_test,
+        fraud_rate=fraud_rate,
+        X_reference=X_train,
+        t_start=t_start,
+        # Pas de run MLflow pour la fraude : hits/misses du cache consignés dans metrics.json
+        extra={"cache": cache.summary()},
     )
 
-    model = Pipeline(steps=[("preprocess", preprocessor), ("model", iso)])
-    model.fit(X_train_normal)
 
-    # Scores : IsolationForest donne un score d'anomalie via decision_function (plus haut = plus normal)
+def save_artifacts(
+    root: Path,
+    cfg: FraudDataConfig,
+    *,
+    model: Pipeline,
+    anomaly_score: np.ndarray,
+    y_test: np.ndarray,
+    fraud_rate: float,
+    X_reference: pd.DataFrame,
+    t_start: float,
+    extra: Optional[dict] = None,
+) -> None:
     # On convertit en "probabilité d'anomalie" dans [0,1] :
-    normal_score = model.decision_function(X_test)  # plus haut signifie normal
-    anomaly_score = -normal_score
     # Normaliser à [0,1] pour une sortie API stable
     min_s, max_s = float(anomaly_score.min()), float(anomaly_score.max())
     fraud_score = (anomaly_score - min_s) / (max_s - min_s + 1e-9)
@@ -163,39 +329,56 @@ def main():
     auc = roc_auc_score(y_test, fraud_score)
     ap = average_precision_score(y_test, fraud_score)
 
-    model_path = out_dir / "model.joblib"
-    joblib.dump(model, model_path)
-
-    metrics = {
-        "model": "isolation_forest",
-        "auc": float(auc),
-        "avg_precision": float(ap),
-        "fraud_rate": fraud_rate,
-        "data_config": asdict(cfg),
-        "features_numeric": NUM_COLS,
-        "features_categorical": CAT_COLS,
-        "features_bool": BOOL_COLS,
-        "target": TARGET,
-        "score_normalization": "minmax_on_test (MVP)",
-    }
-    with open(out_dir / "metrics.json", "w", encoding="utf-8") as f:
-        json.dump(metrics, f, indent=2, ensure_ascii=False)
-
-    schema = {
-        "input_features": {
-            "numeric": NUM_COLS,
-            "categorical": CAT_COLS,
-            "bool": BOOL_COLS,
-        },
-        "merchant_category_allowed": MERCHANT_CATS,
-        "country_allowed": COUNTRIES,
-    }
-    with open(out_dir / "schema.json", "w", encoding="utf-8") as f:
-        json.dump(schema, f, indent=2, ensure_ascii=False)
+    # Nouvelle version publiée puis activée (pointeur `current`), rechargée à chaud par l'API
+    version = new_version_name()
+    with publish_version(root, version) as out_dir:
+        joblib.dump(model, out_dir / "model.joblib")
+
+        metrics = {
+            "model": "isolation_forest",
+            "version": version,
+            "auc": float(auc),
+            "avg_precision": float(ap),
+            "fraud_rate": fraud_rate,
+            "data_config": asdict(cfg),
+            "features_numeric": NUM_COLS,
+            "features_velocity": VELOCITY_COLS,
+            "features_categorical": CAT_COLS,
+            "features_bool": BOOL_COLS,
+            "target": TARGET,
+            "score_normalization": "minmax_on_test (MVP)",
+            "resources": {"peak_rss_mb": peak_rss_mb(), "wall_total_s": time.perf_counter() - t_start},
+            **(extra or {}),
+        }
+        with open(out_dir / "metrics.json", "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2, ensure_ascii=False)
+
+        schema = {
+            "input_features": {
+                "numeric": NUM_COLS,
+                "velocity": VELOCITY_COLS,
+                "categorical": CAT_COLS,
+                "bool": BOOL_COLS,
+            },
+            "merchant_category_allowed": MERCHANT_CATS,
+            "country_allowed": COUNTRIES,
+        }
+        with open(out_dir / "schema.json", "w", encoding="utf-8") as f:
+            json.dump(schema, f, indent=2, ensure_ascii=False)
+
+        # Profil de référence pour le monitoring de drift (API) : tout le trafic d'entraînement, fraudes incluses.
+        # Champs du payload transaction seulement (la vélocité est calculée côté API, pas envoyée)
+        reference = build_reference_profile(
+            X_reference,
+            TX_NUM_COLS,
+            {"merchant_category": MERCHANT_CATS, "country": COUNTRIES, "is_new_device": [False, True]},
+        )
+        save_reference_profile(reference, out_dir)
 
     print("✅ Fraud training done")
-    print(f"Saved: {model_path}")
+    print(f"Saved: {root / VERSIONS_DIR / version} (current)")
     print("AUC:", float(auc), "AP:", float(ap), "fraud_rate:", fraud_rate)
+    print(f"Peak RSS: {metrics['resources']['peak_rss_mb']:.0f} MB, wall: {metrics['resources']['wall_total_s']:.1f}s")
 
 
 if __name__ == "__main__":